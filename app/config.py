@@ -88,6 +88,15 @@ class Config:
     SQUARE_ACCESS_TOKEN = os.getenv('SQUARE_ACCESS_TOKEN')
     SQUARE_ENVIRONMENT = os.getenv('SQUARE_ENVIRONMENT', 'production')
     
+    # How long the shared "today's sales" snapshot is served before Square is asked again
+    TODAYS_SALES_CACHE_TTL_SECONDS = float(os.getenv('TODAYS_SALES_CACHE_TTL_SECONDS', '60'))
+    # After the first load of the day, only fetch orders updated since the previous poll
+    TODAYS_SALES_INCREMENTAL = os.getenv('TODAYS_SALES_INCREMENTAL', 'true').lower() == 'true'
+    
+    # Square webhook subscription (signature key and the exact URL registered with Square)
+    SQUARE_WEBHOOK_SIGNATURE_KEY = os.getenv('SQUARE_WEBHOOK_SIGNATURE_KEY')
+    SQUARE_WEBHOOK_NOTIFICATION_URL = os.getenv('SQUARE_WEBHOOK_NOTIFICATION_URL')
+    
     # OpenWeather API configuration
     OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
     
@@ -27,6 +27,7 @@ def init_models():
     from app.database.models.tender import Tender
     from app.database.models.payment import Payment
     from app.database.models.square_sale import SquareSale
+    from app.database.models.daily_location_sales import DailyLocationSales
     
     # Import catalog models
     from app.database.models.catalog import (
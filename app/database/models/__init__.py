@@ -9,6 +9,7 @@ from app.database.models.order_return import OrderReturn  # noqa: F401
 from app.database.models.order_refund import OrderRefund  # noqa: F401
 from app.database.models.payment import Payment  # noqa: F401
 from app.database.models.square_sale import SquareSale  # noqa: F401
+from app.database.models.daily_location_sales import DailyLocationSales  # noqa: F401
 from app.database.models.catalog import (  # noqa: F401
     CatalogCategory, CatalogItem, CatalogVariation,
     CatalogVendorInfo, CatalogLocationAvailability, CatalogInventory
@@ -21,7 +22,7 @@ from app.database.models.transaction import Transaction  # noqa: F401
 __all__ = [
     'Location', 'Order', 'OperatingSeason', 'Tender', 'OrderLineItem',
     'OrderFulfillment', 'OrderReturn', 'OrderRefund', 'Payment',
-    'SquareSale', 'CatalogCategory', 'CatalogItem', 'CatalogVariation',
+    'SquareSale', 'DailyLocationSales', 'CatalogCategory', 'CatalogItem', 'CatalogVariation',
     'CatalogVendorInfo', 'CatalogLocationAvailability', 'CatalogInventory',
     'InventoryCount', 'Vendor', 'Transaction'
 ]
@@ -13,6 +13,7 @@ class CatalogCategory(Base):
     description = Column(String)
     version = Column(BigInteger)
     is_deleted = Column(Boolean, default=False)
+    content_hash = Column(String(32))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -38,6 +39,7 @@ class CatalogItem(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     version = Column(BigInteger)
+    content_hash = Column(String(32))
     present_at_all_locations = Column(Boolean, default=False)
     present_at_location_ids = Column(JSONB, default=list)
     
@@ -64,6 +66,7 @@ class CatalogVariation(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     version = Column(BigInteger)
+    content_hash = Column(String(32))
     present_at_all_locations = Column(Boolean, default=False)
     present_at_location_ids = Column(JSONB, default=list)
     
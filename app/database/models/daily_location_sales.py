@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Date, DateTime, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class DailyLocationSales(Base):
+    """Completed orders and sales per Central-time day and location, maintained by app.services.sales_rollup"""
+    __tablename__ = 'daily_location_sales'
+    
+    sale_date = Column(Date, primary_key=True)
+    location_id = Column(String, primary_key=True)
+    
+    completed_orders = Column(Integer, nullable=False, server_default='0')
+    zero_amount_orders = Column(Integer, nullable=False, server_default='0')  # Completed with a $0 total
+    
+    # Amounts in cents
+    gross_sales_cents = Column(BigInteger, nullable=False, server_default='0')  # total_money
+    net_sales_cents = Column(BigInteger, nullable=False, server_default='0')    # total_money less tax
+    tax_cents = Column(BigInteger, nullable=False, server_default='0')
+    discount_cents = Column(BigInteger, nullable=False, server_default='0')
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_daily_location_sales_location_date', 'location_id', 'sale_date'),
+    )
+    
+    def __repr__(self):
+        return f"<DailyLocationSales(sale_date='{self.sale_date}', location_id='{self.location_id}', orders={self.completed_orders})>"
@@ -21,6 +21,7 @@ class Location(Base):
     business_email = Column(String)
     phone_number = Column(String)
     website_url = Column(String)
+    content_hash = Column(String(32))
     
     orders = relationship("Order", back_populates="location")
     tenders = relationship("Tender", back_populates="location")
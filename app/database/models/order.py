@@ -38,6 +38,7 @@ class Order(Base):
     source = Column(JSON)
     return_amounts = Column(JSON)
     order_metadata = Column(JSON)
+    content_hash = Column(String(32))  # MD5 of the synced values, to skip unchanged upserts
 
     # Use string references for relationships
     location = relationship("Location", back_populates="orders", lazy="joined")
@@ -28,6 +28,7 @@ class OrderLineItem(Base):
     modifiers = Column(JSON)
     pricing_blocklists = Column(JSON)
     item_variation_metadata = Column(JSON)
+    content_hash = Column(String(32))
 
     # Use string reference for relationship
     order = relationship("Order", back_populates="line_items", lazy="joined")
@@ -57,6 +57,7 @@ class Payment(Base):
     device_details = Column(JSON)
     application_details = Column(JSON)
     version_token = Column(String)
+    content_hash = Column(String(32))
     refund_ids = Column(JSON)
 
     # Use string references for relationships
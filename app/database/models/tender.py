@@ -39,6 +39,7 @@ class Tender(Base):
     cash_details = Column(JSON)
     additional_recipients = Column(JSON)
     payment_id = Column(String, index=True)
+    content_hash = Column(String(32))
 
     # Use string references for relationships
     order = relationship("Order", back_populates="tenders", lazy="joined")
@@ -20,6 +20,7 @@ class Vendor(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
     synced_at = Column(DateTime, default=func.now())
+    content_hash = Column(String(32))
     
     def __repr__(self):
         return f"<Vendor(id='{self.id}', name='{self.name}')>" 
\ No newline at end of file
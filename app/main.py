@@ -14,6 +14,10 @@ from .middleware.template_monitor import TemplateMonitorMiddleware
 from .middleware.proxy_middleware import ProxyHeaderMiddleware
 # from .middleware.auth_middleware import AuthMiddleware  # DISABLED: Authentication removed for public access
 from .services.monitor_service import monitor
+from .services.job_runner import get_job_runner
+from .services.webhook_service import get_webhook_service
+from .services.square_api_client import close_square_clients
+from .config import Config
 from .database import init_models
 import logging
 
@@ -21,6 +25,7 @@ import logging
 from .routes import tools_router, admin_router
 from .routes.items_routes import router as items_router
 from .routes.docs import router as docs_router
+from .routes.webhooks import router as webhooks_router
 
 # Configure logging
 logging.basicConfig(
@@ -75,6 +80,34 @@ app.include_router(tools_router, prefix="/tools")
 app.include_router(items_router, prefix="/items")
 app.include_router(admin_router)  # Admin routes with /admin prefix
 app.include_router(docs_router, prefix="/help", tags=["help"])
+app.include_router(webhooks_router, prefix="/webhooks")
+
+@app.on_event("startup")
+async def resume_background_jobs():
+    """Pick up jobs queued, or left running, before this instance started, and keep reclaiming"""
+    try:
+        job_runner = get_job_runner()
+        job_runner.schedule()
+        job_runner.start_periodic_reclaim()
+    except Exception as e:
+        logger.warning(f"Could not start background job workers: {e}")
+
+@app.on_event("startup")
+async def start_webhook_drain():
+    """Periodically apply webhook events that are due a retry or were queued before a restart"""
+    if Config.SQUARE_WEBHOOK_SIGNATURE_KEY:
+        get_webhook_service().start_periodic_drain()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    """Stop job workers; their running jobs are picked up again by the next instance"""
+    await get_job_runner().shutdown()
+    await get_webhook_service().shutdown()
+
+@app.on_event("shutdown")
+async def close_square_connections():
+    """Close the pooled Square API sessions once background work has stopped"""
+    await close_square_clients()
 
 # Root redirect to dashboard
 @app.get("/")
@@ -1,35 +1,34 @@
 import logging
-import os
 import json
-import asyncio
 from datetime import datetime, timezone, timedelta
 from fastapi import APIRouter, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from app.database import get_session
 from app.config import Config, get_database_url
 from app.templates_config import templates
 from app.logger import logger
-from app.services.incremental_sync_service import IncrementalSyncService
+from app.services.incremental_sync_service import (
+    CATALOG_TABLES, IncrementalSyncService, filter_changed_catalog_objects, is_removed_catalog_object,
+    mark_catalog_objects_deleted, parse_square_timestamp
+)
+from app.services.square_api_client import get_square_client
+from app.services.job_runner import JobContext, get_job_runner, job_handler
+from app.services.sales_rollup import rebuild_daily_location_sales
+from app.services.sync_lock import SyncAlreadyRunning, advisory_lock, lock_wait_stats
+from app.services.sync_telemetry import daily_sync_trends, recent_sync_runs
 from sqlalchemy import text
-import aiohttp
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from typing import List, Dict, Any
-import time
+from typing import List, Dict, Any, Optional
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-# Global progress tracking for historical sync
-historical_sync_progress = {
-    "is_running": False,
-    "total_chunks": 0,
-    "completed_chunks": 0,
-    "current_chunk_info": "",
-    "total_orders_synced": 0,
-    "errors": [],
-    "start_time": None,
-    "estimated_completion": None,
-    "last_update": None
-}
+# sync_state row holding the catalog timestamp the next incremental catalog sync starts from
+CATALOG_SYNC_STATE_KEY = 'catalog'
+CATALOG_HIGH_WATER_OVERLAP = timedelta(minutes=5)
+
+# Sync locks the complete sync's catalog step holds; it writes all three tables
+CATALOG_SYNC_LOCKS = ('catalog_categories', 'catalog_items', 'catalog_variations')
 
 @router.get("/sync")
 async def admin_sync_page(request: Request):
@@ -141,18 +140,114 @@ async def create_tables():
             "message": f"Error creating tables: {str(e)}"
         }, status_code=500)
 
+async def enqueue_job(job_type: str, params: Dict[str, Any], wait: bool = False) -> JSONResponse:
+    """
+    Queue a background job and return 202 with its ID for the UI to poll at
+    /admin/jobs/<id>. An identical job that is already queued or running is
+    returned instead of starting another. wait=true blocks until the job
+    finishes and returns its result, for schedulers and scripts.
+    """
+    runner = get_job_runner()
+    try:
+        job, created = await runner.enqueue(job_type, params)
+    except Exception as e:
+        logger.error(f"Error queueing {job_type} job: {str(e)}", exc_info=True)
+        return JSONResponse({
+            "success": False,
+            "error": f"Could not queue {job_type}: {str(e)}",
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }, status_code=500)
+    runner.schedule()
+
+    if wait:
+        job = await runner.wait(job.id)
+        if job.status == 'succeeded':
+            return JSONResponse({**(job.result or {}), "job_id": job.id})
+        return JSONResponse({
+            "success": False,
+            "job_id": job.id,
+            "status": job.status,
+            "error": job.error,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }, status_code=500)
+
+    return JSONResponse({
+        "success": True,
+        "message": f"{job_type} {'queued' if created else 'already ' + job.status}",
+        "job_id": job.id,
+        "status": job.status,
+        "deduplicated": not created,
+        "status_url": f"/admin/jobs/{job.id}",
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }, status_code=202)
+
+@router.get("/jobs")
+async def list_jobs_api(job_type: Optional[str] = None, limit: int = 20):
+    """Most recent background jobs, newest first"""
+    try:
+        jobs = await get_job_runner().list_jobs(job_type, limit)
+        return JSONResponse({"success": True, "jobs": [job.to_dict() for job in jobs]})
+    except Exception as e:
+        logger.error(f"Error listing jobs: {str(e)}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+@router.get("/jobs/{job_id}")
+async def get_job_api(job_id: int):
+    """Status, progress and (once finished) result of one background job"""
+    try:
+        job = await get_job_runner().get(job_id)
+    except Exception as e:
+        logger.error(f"Error loading job {job_id}: {str(e)}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+    if job is None:
+        return JSONResponse({"success": False, "error": f"Job {job_id} not found"}, status_code=404)
+    return JSONResponse({"success": True, "job": job.to_dict()})
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job_api(job_id: int):
+    """Cancel a queued job, or ask a running one to stop"""
+    try:
+        job = await get_job_runner().cancel(job_id)
+    except Exception as e:
+        logger.error(f"Error cancelling job {job_id}: {str(e)}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+    if job is None:
+        return JSONResponse({"success": False, "error": f"Job {job_id} not found"}, status_code=404)
+    return JSONResponse({"success": True, "job": job.to_dict()})
+
+async def run_locked_sync_step(lock_names, step, *args) -> Dict[str, Any]:
+    """
+    Run one complete-sync step while holding its data types' sync locks. When
+    another instance is already syncing them the step is skipped and reported
+    as already running, with zero counts.
+    """
+    try:
+        async with advisory_lock(lock_names):
+            return await step(*args)
+    except SyncAlreadyRunning as e:
+        logger.info(f"⏭️ Skipping {step.__name__}: {str(e)}")
+        empty = {"created": 0, "updated": 0, "deleted": 0, "already_running": True}
+        if lock_names == CATALOG_SYNC_LOCKS:
+            return {"success": True, "stats": {"categories": dict(empty), "items": dict(empty), "variations": dict(empty)}}
+        return {"success": True, "stats": dict(empty)}
+
 @router.post("/complete-sync")
-async def complete_sync(request: Request):
-    """Trigger complete production data sync with incremental updates by default"""
+async def complete_sync(request: Request, wait: bool = False):
+    """Queue a complete production data sync, incremental unless full_refresh is set"""
+    # Parse request body to check for full_refresh flag
+    request_body = {}
     try:
-        # Parse request body to check for full_refresh flag
-        request_body = {}
-        try:
-            request_body = await request.json()
-        except:
-            pass  # No JSON body is fine, use defaults
-        
-        full_refresh = request_body.get('full_refresh', False)
+        request_body = await request.json()
+    except:
+        pass  # No JSON body is fine, use defaults
+    
+    return await enqueue_job('complete_sync', {'full_refresh': bool(request_body.get('full_refresh', False))}, wait)
+
+@job_handler('complete_sync')
+async def run_complete_sync(job: JobContext) -> Dict[str, Any]:
+    """Complete production data sync with incremental updates by default"""
+    try:
+        full_refresh = job.params.get('full_refresh', False)
         sync_mode = "FULL REFRESH" if full_refresh else "INCREMENTAL"
         
         logger.info(f"Starting complete production data sync via API - Mode: {sync_mode}")
@@ -162,11 +257,7 @@ async def complete_sync(request: Request):
         square_environment = getattr(Config, 'SQUARE_ENVIRONMENT', 'production')
         
         if not square_access_token:
-            return JSONResponse({
-                "success": False,
-                "error": "Square access token not configured",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }, status_code=500)
+            raise RuntimeError("Square access token not configured")
         
         # Determine Square API base URL
         if square_environment.lower() == 'production':
@@ -193,37 +284,31 @@ async def complete_sync(request: Request):
         
         # Step 1: Sync Locations
         logger.info("Step 1: Syncing locations...")
-        locations_result = await sync_locations_incremental(square_access_token, base_url, db_url, full_refresh)
+        job.update_progress(step=1, total_steps=4, current_step="Syncing locations", sync_stats=sync_stats)
+        locations_result = await run_locked_sync_step(
+            'locations', sync_locations_incremental, square_access_token, base_url, db_url, full_refresh)
         if not locations_result["success"]:
-            return JSONResponse({
-                "success": False,
-                "error": f"Location sync failed: {locations_result['error']}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }, status_code=500)
+            raise RuntimeError(f"Location sync failed: {locations_result['error']}")
         sync_stats["locations"] = locations_result["stats"]
         
         # Step 2: Sync Catalog Data
         logger.info("Step 2: Syncing catalog data...")
-        catalog_result = await sync_catalog_incremental(square_access_token, base_url, db_url, full_refresh)
+        job.update_progress(step=2, total_steps=4, current_step="Syncing catalog data", sync_stats=sync_stats)
+        catalog_result = await run_locked_sync_step(
+            CATALOG_SYNC_LOCKS, sync_catalog_incremental, square_access_token, base_url, db_url, full_refresh)
         if not catalog_result["success"]:
-            return JSONResponse({
-                "success": False,
-                "error": f"Catalog sync failed: {catalog_result['error']}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }, status_code=500)
+            raise RuntimeError(f"Catalog sync failed: {catalog_result['error']}")
         sync_stats["categories"] = catalog_result["stats"]["categories"]
         sync_stats["items"] = catalog_result["stats"]["items"]
         sync_stats["variations"] = catalog_result["stats"]["variations"]
         
         # Step 3: Sync Inventory (Enhanced with Units Per Case and deduplication)
         logger.info("Step 3: Syncing inventory with advanced features...")
-        inventory_result = await sync_inventory_incremental(square_access_token, base_url, db_url, full_refresh)
+        job.update_progress(step=3, total_steps=4, current_step="Syncing inventory", sync_stats=sync_stats)
+        inventory_result = await run_locked_sync_step(
+            'inventory', sync_inventory_incremental, square_access_token, base_url, db_url, full_refresh)
         if not inventory_result["success"]:
-            return JSONResponse({
-                "success": False,
-                "error": f"Inventory sync failed: {inventory_result['error']}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }, status_code=500)
+            raise RuntimeError(f"Inventory sync failed: {inventory_result['error']}")
         sync_stats["inventory"] = inventory_result["stats"]
         
         # Add catalog updates from inventory sync to the overall stats
@@ -245,7 +330,9 @@ async def complete_sync(request: Request):
         
         # Step 4: Sync Vendors
         logger.info("Step 4: Syncing vendors...")
-        vendor_result = await sync_vendors_incremental(square_access_token, base_url, db_url, full_refresh)
+        job.update_progress(step=4, total_steps=4, current_step="Syncing vendors", sync_stats=sync_stats)
+        vendor_result = await run_locked_sync_step(
+            'vendors', sync_vendors_incremental, square_access_token, base_url, db_url, full_refresh)
         if not vendor_result["success"]:
             # Log vendor sync failure but don't fail entire sync since vendors might not be available
             logger.warning(f"Vendor sync failed (continuing with other data): {vendor_result['error']}")
@@ -302,7 +389,8 @@ async def complete_sync(request: Request):
                 }
             }
         
-        return JSONResponse(response_data)
+        job.update_progress(step=4, current_step="Completed", sync_stats=sync_stats)
+        return response_data
         
     except Exception as e:
         logger.error(f"Error during complete sync: {str(e)}", exc_info=True)
@@ -325,11 +413,7 @@ async def complete_sync(request: Request):
         except Exception as notify_error:
             logger.warning(f"Failed to send failure notification: {notify_error}")
         
-        return JSONResponse({
-            "success": False,
-            "error": f"Complete sync error: {str(e)}",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }, status_code=500)
+        raise
 
 @router.post("/incremental-sync")
 async def incremental_sync_api(request: Request):
@@ -501,6 +585,7 @@ async def get_sync_status_api():
                 "success": True,
                 "sync_status": status,
                 "table_counts": table_counts,
+                "sync_locks": lock_wait_stats(),
                 "timestamp": datetime.now(timezone.utc).isoformat()
             })
         
@@ -512,6 +597,59 @@ async def get_sync_status_api():
             "timestamp": datetime.now(timezone.utc).isoformat()
         }, status_code=500)
 
+@router.get("/sync-runs")
+async def get_sync_runs(days: int = 14, limit: int = 50, data_type: Optional[str] = None):
+    """Per-stage timings of recent sync runs, plus daily averages per data type"""
+    try:
+        async with get_session() as session:
+            runs = await recent_sync_runs(session, limit, data_type)
+            trends = await daily_sync_trends(session, days)
+        
+        return JSONResponse(jsonable_encoder({
+            "success": True,
+            "runs": runs,
+            "trends": trends,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }))
+        
+    except Exception as e:
+        logger.error(f"❌ Error getting sync runs: {str(e)}", exc_info=True)
+        return JSONResponse({
+            "success": False,
+            "error": f"Sync runs API error: {str(e)}",
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }, status_code=500)
+
+@router.post("/rebuild-sales-rollup")
+async def rebuild_sales_rollup(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                               wait: bool = False):
+    """
+    Queue a rebuild of daily_location_sales from orders, for every day or for
+    start_date..end_date (YYYY-MM-DD, Central time, inclusive)
+    """
+    return await enqueue_job('rebuild_sales_rollup', {'start_date': start_date, 'end_date': end_date}, wait)
+
+@job_handler('rebuild_sales_rollup')
+async def run_rebuild_sales_rollup(job: JobContext) -> Dict[str, Any]:
+    """Recompute daily_location_sales in one transaction; readers see the old rows until it commits"""
+    start_date, end_date = (
+        datetime.strptime(job.params[key], '%Y-%m-%d').date() if job.params.get(key) else None
+        for key in ('start_date', 'end_date')
+    )
+    job.update_progress(phase="rebuilding", start_date=job.params.get('start_date'),
+                        end_date=job.params.get('end_date'))
+    
+    async with get_session() as session:
+        rows = await rebuild_daily_location_sales(session, start_date, end_date)
+        await session.commit()
+    
+    return {
+        "success": True,
+        "message": f"Rebuilt daily_location_sales: {rows} day/location rows",
+        "rows": rows,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
 @router.post("/table-migration")
 async def migrate_missing_tables():
     """Create missing table schemas in production"""
@@ -551,8 +689,13 @@ async def migrate_missing_tables():
         }, status_code=500)
 
 @router.post("/bulk-data-sync")
-async def bulk_data_sync_api(request: Request):
-    """API endpoint for bulk data synchronization from local to production"""
+async def bulk_data_sync_api(request: Request, wait: bool = False):
+    """API endpoint to queue bulk data synchronization from local to production"""
+    return await enqueue_job('bulk_data_sync', {}, wait)
+
+@job_handler('bulk_data_sync')
+async def run_bulk_data_sync(job: JobContext) -> Dict[str, Any]:
+    """Bulk data synchronization from local to production"""
     try:
         logger.info("🚛 Starting bulk data sync from local database")
         
@@ -573,8 +716,10 @@ async def bulk_data_sync_api(request: Request):
         sync_results = {}
         
         async with get_session() as session:
-            for table_name in sync_tables:
+            for table_index, table_name in enumerate(sync_tables):
                 logger.info(f"🔄 Syncing table: {table_name}")
+                job.update_progress(current_table=table_name, tables_completed=table_index,
+                                    total_tables=len(sync_tables), total_records_synced=total_synced)
                 
                 try:
                     # Get count first
@@ -637,22 +782,20 @@ async def bulk_data_sync_api(request: Request):
                     sync_results[table_name] = {"status": "error", "error": error_msg}
         
         logger.info(f"🎉 Bulk sync completed: {total_synced:,} total records")
+        job.update_progress(current_table=None, tables_completed=len(sync_tables),
+                            total_tables=len(sync_tables), total_records_synced=total_synced)
         
-        return JSONResponse({
+        return {
             "success": True,
             "message": f"Bulk data sync completed successfully",
             "total_records_synced": total_synced,
             "table_results": sync_results,
             "timestamp": datetime.now(timezone.utc).isoformat()
-        })
+        }
         
     except Exception as e:
         logger.error(f"Error during bulk data sync: {str(e)}", exc_info=True)
-        return JSONResponse({
-            "success": False,
-            "error": f"Bulk sync error: {str(e)}",
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }, status_code=500)
+        raise
 
 @router.post("/import-table-data")
 async def import_table_data_api(request: Request):
@@ -742,10 +885,9 @@ async def apply_bulk_upsert(session: AsyncSession, table_name: str, records: Lis
 async def sync_locations_direct(access_token, base_url, db_url):
     """Sync locations directly"""
     try:
-        timeout = aiohttp.ClientTimeout(total=300)
         engine = create_async_engine(db_url, echo=False)
         
-        async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with get_square_client(access_token, base_url).session() as session:
             url = f"{base_url}/v2/locations"
             headers = {'Authorization': f'Bearer {access_token}'}
             
@@ -795,7 +937,6 @@ async def sync_locations_direct(access_token, base_url, db_url):
 async def sync_catalog_direct(access_token, base_url, db_url):
     """Sync catalog data directly"""
     try:
-        timeout = aiohttp.ClientTimeout(total=600)
         engine = create_async_engine(db_url, echo=False)
         
         async with engine.begin() as conn:
@@ -862,7 +1003,6 @@ async def sync_catalog_direct(access_token, base_url, db_url):
 async def sync_inventory_direct(access_token, base_url, db_url):
     """Sync inventory data directly"""
     try:
-        timeout = aiohttp.ClientTimeout(total=600)
         engine = create_async_engine(db_url, echo=False)
         
         async with engine.begin() as conn:
@@ -878,7 +1018,7 @@ async def sync_inventory_direct(access_token, base_url, db_url):
             
             total_inventory = 0
             
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with get_square_client(access_token, base_url).session() as session:
                 for location in locations:
                     location_id, location_name = location
                     
@@ -927,10 +1067,44 @@ async def sync_inventory_direct(access_token, base_url, db_url):
         logger.error(f"Error syncing inventory: {str(e)}")
         return False
 
+async def fetch_catalog_changes_direct(access_token, base_url, begin_time):
+    """
+    Fetch categories, items and variations changed since begin_time, including
+    deleted objects. Returns (objects, Square's latest catalog time).
+    """
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    body = {
+        "object_types": list(CATALOG_TABLES),
+        "include_deleted_objects": True,
+        "begin_time": begin_time.replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z'),
+        "limit": 1000
+    }
+    all_objects = []
+    latest_time = None
+    
+    async with get_square_client(access_token, base_url).session() as session:
+        while True:
+            async with session.post(f"{base_url}/v2/catalog/search", headers=headers, json=body) as response:
+                if response.status != 200:
+                    raise Exception(f"Square API error for catalog changes: {response.status} - {await response.text()}")
+                
+                data = await response.json()
+                all_objects.extend(data.get('objects', []))
+                latest_time = latest_time or parse_square_timestamp(data.get('latest_time'))
+                
+                cursor = data.get('cursor')
+                if not cursor:
+                    break
+                body["cursor"] = cursor
+    
+    return all_objects, latest_time
+
 async def fetch_catalog_objects_direct(access_token, base_url, object_type):
     """Fetch catalog objects from Square API, excluding archived items"""
     try:
-        timeout = aiohttp.ClientTimeout(total=300)
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json'
@@ -943,7 +1117,7 @@ async def fetch_catalog_objects_direct(access_token, base_url, object_type):
             # For items, use SearchCatalogItems to filter out archived items
             url = f"{base_url}/v2/catalog/search-catalog-items"
             
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with get_square_client(access_token, base_url).session() as session:
                 while True:
                     body = {
                         "limit": 100,  # Maximum allowed for SearchCatalogItems
@@ -969,7 +1143,7 @@ async def fetch_catalog_objects_direct(access_token, base_url, object_type):
             # For other object types, use the standard catalog search
             url = f"{base_url}/v2/catalog/search"
             
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with get_square_client(access_token, base_url).session() as session:
                 while True:
                     body = {
                         "object_types": [object_type],
@@ -1365,11 +1539,10 @@ async def debug_db_config():
 async def sync_locations_incremental(access_token, base_url, db_url, full_refresh=False):
     """Sync locations with incremental updates or full refresh"""
     try:
-        timeout = aiohttp.ClientTimeout(total=300)
         engine = create_async_engine(db_url, echo=False)
         stats = {"created": 0, "updated": 0, "deleted": 0}
         
-        async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with get_square_client(access_token, base_url).session() as session:
             url = f"{base_url}/v2/locations"
             headers = {'Authorization': f'Bearer {access_token}'}
             
@@ -1428,7 +1601,7 @@ async def sync_locations_incremental(access_token, base_url, db_url, full_refres
                             """), location_data)
                             stats["created"] += 1
                         else:
-                            # Upsert location
+                            # Upsert location; clearing content_hash makes the next incremental sync rewrite it
                             result = await conn.execute(text("""
                                 INSERT INTO locations (id, name, address, timezone, status, created_at, updated_at)
                                 VALUES (:id, :name, :address, :timezone, :status, :created_at, :updated_at)
@@ -1437,6 +1610,7 @@ async def sync_locations_incremental(access_token, base_url, db_url, full_refres
                                     address = EXCLUDED.address,
                                     timezone = EXCLUDED.timezone,
                                     status = EXCLUDED.status,
+                                    content_hash = NULL,
                                     updated_at = EXCLUDED.updated_at
                                 RETURNING (xmax = 0) AS inserted
                             """), location_data)
@@ -1459,31 +1633,60 @@ async def sync_locations_incremental(access_token, base_url, db_url, full_refres
         return {"success": False, "error": str(e), "stats": stats}
 
 async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=False):
-    """Sync catalog data with incremental updates or full refresh"""
+    """
+    Sync catalog data with incremental updates or full refresh.
+    Once a catalog timestamp is recorded, incremental runs only fetch objects
+    changed since then (deletions included) and only write objects whose
+    version moved, so a run with no catalog changes is a single API call.
+    """
     try:
-        timeout = aiohttp.ClientTimeout(total=600)
         engine = create_async_engine(db_url, echo=False)
         stats = {
             "categories": {"created": 0, "updated": 0, "deleted": 0},
             "items": {"created": 0, "updated": 0, "deleted": 0},
             "variations": {"created": 0, "updated": 0, "deleted": 0}
         }
+        sync_service = IncrementalSyncService()
         
         async with engine.begin() as conn:
             if full_refresh:
                 # Full refresh mode - catalog data already cleared in locations sync
                 logger.info("🔥 FULL REFRESH MODE: Catalog tables already cleared")
             
-            # Fetch all catalog data from Square
-            categories = await fetch_catalog_objects_direct(access_token, base_url, "CATEGORY")
-            items = await fetch_catalog_objects_direct(access_token, base_url, "ITEM")
-            variations = await fetch_catalog_objects_direct(access_token, base_url, "ITEM_VARIATION")
+            await sync_service._ensure_sync_state_table(conn)
+            catalog_since = None if full_refresh else await sync_service._get_last_sync_timestamp(conn, CATALOG_SYNC_STATE_KEY)
+            
+            if catalog_since:
+                # Delta mode - only objects changed since the last recorded catalog timestamp
+                changed, latest_time = await fetch_catalog_changes_direct(access_token, base_url, catalog_since)
+                fetched = len(changed)
+                changed = await filter_changed_catalog_objects(conn, changed)
+                logger.info(f"🔍 Catalog delta since {catalog_since.isoformat()}: {fetched} objects returned, {len(changed)} changed")
+                
+                removed = [obj for obj in changed if is_removed_catalog_object(obj)]
+                for object_type, stats_key in (('CATEGORY', 'categories'), ('ITEM', 'items'), ('ITEM_VARIATION', 'variations')):
+                    stats[stats_key]["deleted"] += await mark_catalog_objects_deleted(
+                        conn, CATALOG_TABLES[object_type], [obj for obj in removed if obj['type'] == object_type])
+                
+                live = [obj for obj in changed if not is_removed_catalog_object(obj)]
+                categories = [obj for obj in live if obj['type'] == 'CATEGORY']
+                items = [obj for obj in live if obj['type'] == 'ITEM']
+                variations = [obj for obj in live if obj['type'] == 'ITEM_VARIATION']
+                catalog_high_water = latest_time or catalog_since
+            else:
+                # Square's clock may differ from ours; the version check absorbs the overlap
+                catalog_high_water = datetime.now(timezone.utc).replace(tzinfo=None) - CATALOG_HIGH_WATER_OVERLAP
+                
+                # Fetch all catalog data from Square
+                categories = await fetch_catalog_objects_direct(access_token, base_url, "CATEGORY")
+                items = await fetch_catalog_objects_direct(access_token, base_url, "ITEM")
+                variations = await fetch_catalog_objects_direct(access_token, base_url, "ITEM_VARIATION")
             
             square_category_ids = {cat['id'] for cat in categories}
             square_item_ids = {item['id'] for item in items}
             square_variation_ids = {var['id'] for var in variations}
             
-            if not full_refresh:
+            if not full_refresh and not catalog_since:
                 # Mark deleted categories
                 existing_result = await conn.execute(text("SELECT id FROM catalog_categories WHERE is_deleted = false"))
                 existing_category_ids = {row[0] for row in existing_result.fetchall()}
@@ -1522,6 +1725,7 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                 category_data = {
                     'id': category['id'],
                     'name': category.get('category_data', {}).get('name', ''),
+                    'version': category.get('version'),
                     'is_deleted': False,
                     'created_at': datetime.now(),
                     'updated_at': datetime.now()
@@ -1529,17 +1733,19 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                 
                 if full_refresh:
                     await conn.execute(text("""
-                        INSERT INTO catalog_categories (id, name, is_deleted, created_at, updated_at)
-                        VALUES (:id, :name, :is_deleted, :created_at, :updated_at)
+                        INSERT INTO catalog_categories (id, name, version, is_deleted, created_at, updated_at)
+                        VALUES (:id, :name, :version, :is_deleted, :created_at, :updated_at)
                     """), category_data)
                     stats["categories"]["created"] += 1
                 else:
                     result = await conn.execute(text("""
-                        INSERT INTO catalog_categories (id, name, is_deleted, created_at, updated_at)
-                        VALUES (:id, :name, :is_deleted, :created_at, :updated_at)
+                        INSERT INTO catalog_categories (id, name, version, is_deleted, created_at, updated_at)
+                        VALUES (:id, :name, :version, :is_deleted, :created_at, :updated_at)
                         ON CONFLICT (id) DO UPDATE SET
                             name = EXCLUDED.name,
+                            version = EXCLUDED.version,
                             is_deleted = EXCLUDED.is_deleted,
+                            content_hash = NULL,
                             updated_at = EXCLUDED.updated_at
                         RETURNING (xmax = 0) AS inserted
                     """), category_data)
@@ -1571,6 +1777,7 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                     'name': item_data_obj.get('name', ''),
                     'description': item_data_obj.get('description', ''),
                     'category_id': category_id,
+                    'version': item.get('version'),
                     'is_deleted': False,
                     'created_at': datetime.now(),
                     'updated_at': datetime.now()
@@ -1578,19 +1785,21 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                 
                 if full_refresh:
                     await conn.execute(text("""
-                        INSERT INTO catalog_items (id, name, description, category_id, is_deleted, created_at, updated_at)
-                        VALUES (:id, :name, :description, :category_id, :is_deleted, :created_at, :updated_at)
+                        INSERT INTO catalog_items (id, name, description, category_id, version, is_deleted, created_at, updated_at)
+                        VALUES (:id, :name, :description, :category_id, :version, :is_deleted, :created_at, :updated_at)
                     """), item_data)
                     stats["items"]["created"] += 1
                 else:
                     result = await conn.execute(text("""
-                        INSERT INTO catalog_items (id, name, description, category_id, is_deleted, created_at, updated_at)
-                        VALUES (:id, :name, :description, :category_id, :is_deleted, :created_at, :updated_at)
+                        INSERT INTO catalog_items (id, name, description, category_id, version, is_deleted, created_at, updated_at)
+                        VALUES (:id, :name, :description, :category_id, :version, :is_deleted, :created_at, :updated_at)
                         ON CONFLICT (id) DO UPDATE SET
                             name = EXCLUDED.name,
                             description = EXCLUDED.description,
                             category_id = EXCLUDED.category_id,
+                            version = EXCLUDED.version,
                             is_deleted = EXCLUDED.is_deleted,
+                            content_hash = NULL,
                             updated_at = EXCLUDED.updated_at
                         RETURNING (xmax = 0) AS inserted
                     """), item_data)
@@ -1628,6 +1837,7 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                     'sku': variation_data_obj.get('sku', ''),
                     'price_money': json.dumps(variation_data_obj.get('price_money', {})),
                     'default_unit_cost': default_unit_cost_json,
+                    'version': variation.get('version'),
                     'is_deleted': False,
                     'created_at': datetime.now(),
                     'updated_at': datetime.now()
@@ -1635,21 +1845,23 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                 
                 if full_refresh:
                     await conn.execute(text("""
-                        INSERT INTO catalog_variations (id, name, item_id, sku, price_money, default_unit_cost, is_deleted, created_at, updated_at)
-                        VALUES (:id, :name, :item_id, :sku, :price_money, :default_unit_cost, :is_deleted, :created_at, :updated_at)
+                        INSERT INTO catalog_variations (id, name, item_id, sku, price_money, default_unit_cost, version, is_deleted, created_at, updated_at)
+                        VALUES (:id, :name, :item_id, :sku, :price_money, :default_unit_cost, :version, :is_deleted, :created_at, :updated_at)
                     """), variation_data)
                     stats["variations"]["created"] += 1
                 else:
                     result = await conn.execute(text("""
-                        INSERT INTO catalog_variations (id, name, item_id, sku, price_money, default_unit_cost, is_deleted, created_at, updated_at)
-                        VALUES (:id, :name, :item_id, :sku, :price_money, :default_unit_cost, :is_deleted, :created_at, :updated_at)
+                        INSERT INTO catalog_variations (id, name, item_id, sku, price_money, default_unit_cost, version, is_deleted, created_at, updated_at)
+                        VALUES (:id, :name, :item_id, :sku, :price_money, :default_unit_cost, :version, :is_deleted, :created_at, :updated_at)
                         ON CONFLICT (id) DO UPDATE SET
                             name = EXCLUDED.name,
                             item_id = EXCLUDED.item_id,
                             sku = EXCLUDED.sku,
                             price_money = EXCLUDED.price_money,
                             default_unit_cost = EXCLUDED.default_unit_cost,
+                            version = EXCLUDED.version,
                             is_deleted = EXCLUDED.is_deleted,
+                            content_hash = NULL,
                             updated_at = EXCLUDED.updated_at
                         RETURNING (xmax = 0) AS inserted
                     """), variation_data)
@@ -1709,7 +1921,11 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
                                     present_at_location_ids = EXCLUDED.present_at_location_ids
                             """), vendor_info_record)
             
-            mode_text = "FULL REFRESH" if full_refresh else "INCREMENTAL"
+            # Record where the next incremental catalog sync starts
+            catalog_changes = sum(sum(type_stats.values()) for type_stats in stats.values())
+            await sync_service._update_last_sync_timestamp(conn, CATALOG_SYNC_STATE_KEY, catalog_changes, catalog_high_water)
+            
+            mode_text = "FULL REFRESH" if full_refresh else ("DELTA" if catalog_since else "INCREMENTAL")
             if skipped_variations > 0:
                 logger.warning(f"⚠️ Skipped {skipped_variations} variations due to missing parent items")
             logger.info(f"✅ Catalog sync completed ({mode_text}): {stats}")
@@ -1724,7 +1940,6 @@ async def sync_catalog_incremental(access_token, base_url, db_url, full_refresh=
 async def sync_inventory_incremental(access_token, base_url, db_url, full_refresh=False):
     """Enhanced inventory sync with Units Per Case, deduplication, and catalog updates"""
     try:
-        timeout = aiohttp.ClientTimeout(total=600)
         engine = create_async_engine(db_url, echo=False)
         stats = {"created": 0, "updated": 0, "deleted": 0}
         catalog_updates = {
@@ -1779,7 +1994,7 @@ async def sync_inventory_incremental(access_token, base_url, db_url, full_refres
             # Step 1: Update catalog items and variations with Units Per Case
             logger.info("📋 Updating catalog with Units Per Case data...")
             
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with get_square_client(access_token, base_url).session() as session:
                 catalog_url = f"{base_url}/v2/catalog/search"
                 headers = {
                     'Authorization': f'Bearer {access_token}',
@@ -2111,7 +2326,6 @@ async def get_recent_logs():
 async def sync_vendors_incremental(access_token, base_url, db_url, full_refresh=False):
     """Sync vendor data with incremental updates or full refresh"""
     try:
-        timeout = aiohttp.ClientTimeout(total=300)
         engine = create_async_engine(db_url, echo=False)
         stats = {"created": 0, "updated": 0, "deleted": 0}
         
@@ -2123,7 +2337,7 @@ async def sync_vendors_incremental(access_token, base_url, db_url, full_refresh=
                 await conn.execute(text("DELETE FROM vendors"))
             
             # Fetch vendors from Square using correct API endpoint
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with get_square_client(access_token, base_url).session() as session:
                 url = f"{base_url}/v2/vendors/search"
                 headers = {
                     'Authorization': f'Bearer {access_token}',
@@ -2232,504 +2446,110 @@ async def sync_vendors_incremental(access_token, base_url, db_url, full_refresh=
         return {"success": False, "error": str(e), "stats": stats}
 
 @router.post("/historical-orders-sync")
-async def historical_orders_sync_api(request: Request):
-    """API endpoint to trigger historical orders sync from January 2018 to present"""
-    try:
-        logger.info("🚛 Starting historical orders sync from January 2018...")
-        
-        # Import required modules
-        import aiohttp
-        import time
-        from datetime import datetime, timezone, timedelta
-        from typing import List, Dict, Any, Optional, Tuple
-        from dataclasses import dataclass
-        
-        @dataclass
-        class SyncConfig:
-            """Configuration for the historical sync"""
-            start_date: datetime = datetime(2018, 1, 1, tzinfo=timezone.utc)
-            end_date: datetime = datetime.now(timezone.utc).replace(hour=23, minute=59, second=59, microsecond=999999)  # Include full current day
-            chunk_size_days: int = 30  # Process 30 days at a time
-            batch_size: int = 100      # Insert 100 orders at a time
-            max_requests_per_minute: int = 100  # Square API rate limit
-            request_delay: float = 0.6  # Delay between requests (60s / 100 requests)
-        
-        # Initialize configuration
-        config = SyncConfig()
-        square_access_token = os.getenv('SQUARE_ACCESS_TOKEN')
-        square_base_url = os.getenv('SQUARE_BASE_URL', 'https://connect.squareup.com')
-        
-        if not square_access_token:
-            raise ValueError("SQUARE_ACCESS_TOKEN environment variable is required")
-        
-        # Track progress
-        total_orders_synced = 0
-        total_chunks_processed = 0
-        errors = []
-        
-        def generate_date_chunks() -> List[Tuple[datetime, datetime]]:
-            """Generate date chunks for processing"""
-            chunks = []
-            current_date = config.start_date
-            
-            while current_date < config.end_date:
-                # Calculate chunk end, ensuring we include the full day
-                chunk_end = current_date + timedelta(days=config.chunk_size_days)
-                
-                # If this would go past our end date, use the end date but ensure it includes the full day
-                if chunk_end > config.end_date:
-                    chunk_end = config.end_date
-                    # If end_date is at midnight, extend to end of day to include all orders from that day
-                    if chunk_end.hour == 0 and chunk_end.minute == 0 and chunk_end.second == 0:
-                        chunk_end = chunk_end.replace(hour=23, minute=59, second=59, microsecond=999999)
-                
-                chunks.append((current_date, chunk_end))
-                current_date = current_date + timedelta(days=config.chunk_size_days)
-            
-            return chunks
-        
-        async def get_active_locations() -> List[Dict[str, Any]]:
-            """Get active locations from Square API"""
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                url = f"{square_base_url}/v2/locations"
-                headers = {
-                    'Authorization': f'Bearer {square_access_token}',
-                    'Content-Type': 'application/json'
-                }
-                
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        locations = data.get('locations', [])
-                        # Filter for active locations
-                        active_locations = [loc for loc in locations if loc.get('status') == 'ACTIVE']
-                        return active_locations
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"Square API error getting locations: {response.status} - {error_text}")
-        
-        async def fetch_orders_for_period(location_ids: List[str], start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
-            """Fetch all orders for a specific date period"""
-            all_orders = []
-            
-            timeout = aiohttp.ClientTimeout(total=60)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                url = f"{square_base_url}/v2/orders/search"
-                headers = {
-                    'Authorization': f'Bearer {square_access_token}',
-                    'Content-Type': 'application/json'
-                }
-                
-                # Build query
-                base_query = {
-                    "location_ids": location_ids,
-                    "query": {
-                        "filter": {
-                            "date_time_filter": {
-                                "created_at": {
-                                    "start_at": start_date.isoformat(),
-                                    "end_at": end_date.isoformat()
-                                }
-                            },
-                            "state_filter": {
-                                "states": ["COMPLETED", "OPEN", "CANCELED"]  # Include all states for historical data
-                            }
-                        }
-                    },
-                    "limit": 500  # Maximum allowed by Square API
-                }
-                
-                cursor = None
-                page = 1
-                
-                while True:
-                    # Add cursor if we have one
-                    body = base_query.copy()
-                    if cursor:
-                        body["cursor"] = cursor
-                    
-                    # Rate limiting
-                    await asyncio.sleep(config.request_delay)
-                    
-                    async with session.post(url, headers=headers, json=body) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            orders = data.get('orders', [])
-                            all_orders.extend(orders)
-                            
-                            logger.info(f"  📄 Page {page}: retrieved {len(orders)} orders (total: {len(all_orders)})")
-                            
-                            # Check for more pages
-                            cursor = data.get('cursor')
-                            if not cursor:
-                                break
-                                
-                            page += 1
-                            
-                        elif response.status == 429:
-                            # Rate limited - wait longer
-                            logger.warning("⏳ Rate limited, waiting 60 seconds...")
-                            await asyncio.sleep(60)
-                            continue
-                            
-                        else:
-                            error_text = await response.text()
-                            raise Exception(f"Square API error: {response.status} - {error_text}")
-            
-            return all_orders
-        
-        def parse_timestamp(timestamp_str: Optional[str]) -> Optional[datetime]:
-            """Parse ISO timestamp string to datetime object"""
-            if not timestamp_str:
-                return None
-            try:
-                # Handle RFC3339 format from Square API
-                dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                # Convert timezone-aware datetime to UTC, but keep timezone info
-                # This preserves the original timezone context for proper conversion
-                if dt.tzinfo:
-                    # Convert to UTC but keep as timezone-aware
-                    dt = dt.astimezone(timezone.utc)
-                    # For database storage, we need to strip timezone but preserve the UTC conversion
-                    dt = dt.replace(tzinfo=None)
-                return dt
-            except Exception as e:
-                logger.warning(f"Failed to parse timestamp '{timestamp_str}': {e}")
-                return None
-        
-        def should_skip_order(order: Dict[str, Any]) -> bool:
-            """Check if an order should be skipped due to being erroneous"""
-            order_id = order.get('id')
-            
-            # Exclude known erroneous orders - specifically the $2.16M "The Godfather" order
-            if order_id == 'mknasZtDiUul9el73zNLANleV':
-                logger.info(f"   🚫 Skipping erroneous order {order_id} ($2.16M 'The Godfather' order)")
-                return True
-            
-            # Additional safety check: skip orders with unreasonably high amounts (over $100K)
-            total_money = order.get('total_money', {})
-            if total_money.get('amount'):
-                try:
-                    amount_cents = int(total_money['amount'])
-                    amount_dollars = amount_cents / 100
-                    if amount_dollars > 100000:  # Over $100,000
-                        logger.warning(f"   ⚠️ Skipping suspiciously large order {order_id}: ${amount_dollars:,.2f}")
-                        return True
-                except (ValueError, TypeError):
-                    pass  # If we can't parse the amount, continue with normal processing
-            
-            return False
+async def historical_orders_sync_api(request: Request, reset: bool = False, wait: bool = False):
+    """
+    API endpoint to queue the historical orders sync from January 2018 to present.
+    Progress is reported by /historical-orders-sync-status.
+    """
+    return await enqueue_job('historical_orders_sync', {'reset': reset}, wait)
 
-        async def insert_orders_batch(session, orders: List[Dict[str, Any]]):
-            """Insert orders using upsert"""
-            # Filter out erroneous orders first
-            filtered_orders = [order for order in orders if not should_skip_order(order)]
-            skipped_count = len(orders) - len(filtered_orders)
-            
-            if skipped_count > 0:
-                logger.info(f"  🚫 Skipped {skipped_count} erroneous orders in this batch")
-            
-            for order_data in filtered_orders:
-                await session.execute(text("""
-                    INSERT INTO orders (
-                        id, location_id, created_at, updated_at, closed_at,
-                        state, version, total_money, total_tax_money, total_discount_money,
-                        net_amounts, source, return_amounts, order_metadata
-                    ) VALUES (
-                        :id, :location_id, :created_at, :updated_at, :closed_at,
-                        :state, :version, :total_money, :total_tax_money, :total_discount_money,
-                        :net_amounts, :source, :return_amounts, :order_metadata
-                    )
-                    ON CONFLICT (id) DO UPDATE SET
-                        location_id = EXCLUDED.location_id,
-                        updated_at = EXCLUDED.updated_at,
-                        closed_at = EXCLUDED.closed_at,
-                        state = EXCLUDED.state,
-                        version = EXCLUDED.version,
-                        total_money = EXCLUDED.total_money,
-                        total_tax_money = EXCLUDED.total_tax_money,
-                        total_discount_money = EXCLUDED.total_discount_money,
-                        net_amounts = EXCLUDED.net_amounts,
-                        source = EXCLUDED.source,
-                        return_amounts = EXCLUDED.return_amounts,
-                        order_metadata = EXCLUDED.order_metadata
-                """), {
-                    'id': order_data['id'],
-                    'location_id': order_data.get('location_id'),
-                    'created_at': parse_timestamp(order_data.get('created_at')),
-                    'updated_at': parse_timestamp(order_data.get('updated_at')),
-                    'closed_at': parse_timestamp(order_data.get('closed_at')),
-                    'state': order_data.get('state'),
-                    'version': order_data.get('version'),
-                    'total_money': json.dumps(order_data.get('total_money', {})),
-                    'total_tax_money': json.dumps(order_data.get('total_tax_money', {})),
-                    'total_discount_money': json.dumps(order_data.get('total_discount_money', {})),
-                    'net_amounts': json.dumps(order_data.get('net_amounts', {})),
-                    'source': json.dumps(order_data.get('source', {})),
-                    'return_amounts': json.dumps(order_data.get('return_amounts', {})),
-                    'order_metadata': json.dumps(order_data.get('metadata', {}))
-                })
-        
-        async def insert_order_line_items_batch(session, orders: List[Dict[str, Any]]):
-            """Insert order line items"""
-            # Filter out erroneous orders first (same filtering as order insertion)
-            filtered_orders = [order for order in orders if not should_skip_order(order)]
-            
-            for order_data in filtered_orders:
-                line_items = order_data.get('line_items', [])
-                for line_item in line_items:
-                    await session.execute(text("""
-                        INSERT INTO order_line_items (
-                            uid, order_id, catalog_object_id, catalog_version, name, 
-                            quantity, item_type, base_price_money, variation_total_price_money,
-                            gross_sales_money, total_discount_money, total_tax_money, total_money,
-                            variation_name, item_variation_metadata, note, applied_taxes, 
-                            applied_discounts, modifiers, pricing_blocklists
-                        ) VALUES (
-                            :uid, :order_id, :catalog_object_id, :catalog_version, :name,
-                            :quantity, :item_type, :base_price_money, :variation_total_price_money,
-                            :gross_sales_money, :total_discount_money, :total_tax_money, :total_money,
-                            :variation_name, :item_variation_metadata, :note, :applied_taxes,
-                            :applied_discounts, :modifiers, :pricing_blocklists
-                        )
-                        ON CONFLICT (order_id, uid) DO UPDATE SET
-                            catalog_object_id = EXCLUDED.catalog_object_id,
-                            catalog_version = EXCLUDED.catalog_version,
-                            name = EXCLUDED.name,
-                            quantity = EXCLUDED.quantity,
-                            item_type = EXCLUDED.item_type,
-                            base_price_money = EXCLUDED.base_price_money,
-                            variation_total_price_money = EXCLUDED.variation_total_price_money,
-                            gross_sales_money = EXCLUDED.gross_sales_money,
-                            total_discount_money = EXCLUDED.total_discount_money,
-                            total_tax_money = EXCLUDED.total_tax_money,
-                            total_money = EXCLUDED.total_money,
-                            variation_name = EXCLUDED.variation_name,
-                            item_variation_metadata = EXCLUDED.item_variation_metadata,
-                            note = EXCLUDED.note,
-                            applied_taxes = EXCLUDED.applied_taxes,
-                            applied_discounts = EXCLUDED.applied_discounts,
-                            modifiers = EXCLUDED.modifiers,
-                            pricing_blocklists = EXCLUDED.pricing_blocklists
-                    """), {
-                        'uid': line_item['uid'],
-                        'order_id': order_data['id'],
-                        'catalog_object_id': line_item.get('catalog_object_id'),
-                        'catalog_version': line_item.get('catalog_version'),
-                        'name': line_item.get('name'),
-                        'quantity': line_item.get('quantity'),
-                        'item_type': line_item.get('item_type'),
-                        'base_price_money': json.dumps(line_item.get('base_price_money', {})),
-                        'variation_total_price_money': json.dumps(line_item.get('variation_total_price_money', {})),
-                        'gross_sales_money': json.dumps(line_item.get('gross_sales_money', {})),
-                        'total_discount_money': json.dumps(line_item.get('total_discount_money', {})),
-                        'total_tax_money': json.dumps(line_item.get('total_tax_money', {})),
-                        'total_money': json.dumps(line_item.get('total_money', {})),
-                        'variation_name': line_item.get('variation_name'),
-                        'item_variation_metadata': json.dumps(line_item.get('metadata', {})),
-                        'note': line_item.get('note'),
-                        'applied_taxes': json.dumps(line_item.get('applied_taxes', [])),
-                        'applied_discounts': json.dumps(line_item.get('applied_discounts', [])),
-                        'modifiers': json.dumps(line_item.get('modifiers', [])),
-                        'pricing_blocklists': json.dumps(line_item.get('pricing_blocklists', {}))
-                    })
-        
-        # Initialize progress tracking
-        global historical_sync_progress
-        historical_sync_progress.update({
-            "is_running": True,
-            "total_chunks": 0,
-            "completed_chunks": 0,
-            "current_chunk_info": "Initializing...",
-            "total_orders_synced": 0,
-            "errors": [],
-            "start_time": time.time(),
-            "last_update": datetime.now(timezone.utc).isoformat()
-        })
-        
-        # Start the actual sync process
-        start_time = time.time()
-        logger.info("🚀 Starting historical orders sync...")
-        
-        # Get active locations first
-        locations = await get_active_locations()
-        if not locations:
-            raise Exception("No active locations found")
-        
-        location_ids = [loc['id'] for loc in locations]
-        logger.info(f"Found {len(location_ids)} active locations: {[loc['name'] for loc in locations]}")
-        
-        # Generate date chunks
-        date_chunks = generate_date_chunks()
-        logger.info(f"Generated {len(date_chunks)} date chunks to process")
-        
-        # Update progress with total chunks
-        historical_sync_progress.update({
-            "total_chunks": len(date_chunks),
-            "current_chunk_info": f"Ready to process {len(date_chunks)} chunks",
-            "last_update": datetime.now(timezone.utc).isoformat()
-        })
-        
-        # Process each chunk
-        async with get_session() as db_session:
-            for i, (start_date, end_date) in enumerate(date_chunks, 1):
-                period_str = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-                logger.info(f"\n📅 Processing chunk {i}/{len(date_chunks)}: {period_str}")
-                
-                # Update progress
-                historical_sync_progress.update({
-                    "current_chunk_info": f"Processing chunk {i}/{len(date_chunks)}: {period_str}",
-                    "completed_chunks": i - 1,
-                    "total_orders_synced": total_orders_synced,
-                    "last_update": datetime.now(timezone.utc).isoformat()
-                })
-                
-                try:
-                    chunk_orders = await fetch_orders_for_period(location_ids, start_date, end_date)
-                    
-                    if chunk_orders:
-                        # Process orders in batches
-                        for j in range(0, len(chunk_orders), config.batch_size):
-                            batch = chunk_orders[j:j + config.batch_size]
-                            
-                            # Insert orders
-                            await insert_orders_batch(db_session, batch)
-                            
-                            # Insert line items for these orders
-                            await insert_order_line_items_batch(db_session, batch)
-                            
-                            total_orders_synced += len(batch)
-                            logger.info(f"  💾 Inserted batch of {len(batch)} orders (total: {total_orders_synced})")
-                            
-                            # Update progress for batch completion
-                            historical_sync_progress.update({
-                                "total_orders_synced": total_orders_synced,
-                                "current_chunk_info": f"Chunk {i}/{len(date_chunks)}: processed {total_orders_synced} orders",
-                                "last_update": datetime.now(timezone.utc).isoformat()
-                            })
-                        
-                        logger.info(f"✅ Processed {len(chunk_orders)} orders for period")
-                    else:
-                        logger.info(f"📭 No orders found for period")
-                    
-                    total_chunks_processed += 1
-                    
-                    # Update progress for chunk completion
-                    historical_sync_progress.update({
-                        "completed_chunks": total_chunks_processed,
-                        "current_chunk_info": f"Completed chunk {i}/{len(date_chunks)} - {total_orders_synced} total orders",
-                        "last_update": datetime.now(timezone.utc).isoformat()
-                    })
-                    
-                    # Commit after each chunk
-                    await db_session.commit()
-                    
-                    # Rate limiting delay
-                    await asyncio.sleep(config.request_delay)
-                    
-                except Exception as e:
-                    logger.error(f"❌ Error processing chunk {i}: {str(e)}")
-                    error_msg = f"Chunk {i} ({start_date} to {end_date}): {str(e)}"
-                    errors.append(error_msg)
-                    
-                    # Update progress with error
-                    historical_sync_progress["errors"].append(error_msg)
-                    historical_sync_progress.update({
-                        "current_chunk_info": f"Error in chunk {i}/{len(date_chunks)} - continuing...",
-                        "last_update": datetime.now(timezone.utc).isoformat()
-                    })
-                    
-                    await db_session.rollback()
-                    # Continue with next chunk
-                    continue
-        
-        end_time = time.time()
-        duration = end_time - start_time
-        
-        # Mark sync as completed
-        historical_sync_progress.update({
-            "is_running": False,
-            "completed_chunks": total_chunks_processed,
-            "current_chunk_info": f"✅ Sync completed! {total_orders_synced} orders synced in {total_chunks_processed}/{len(date_chunks)} chunks",
-            "total_orders_synced": total_orders_synced,
-            "last_update": datetime.now(timezone.utc).isoformat()
-        })
-        
-        result = {
-            'success': True,
-            'total_orders_synced': total_orders_synced,
-            'total_chunks_processed': total_chunks_processed,
-            'total_chunks': len(date_chunks),
-            'duration_seconds': duration,
-            'errors': errors
-        }
-        
-        logger.info(f"\n🎉 Historical sync completed!")
-        logger.info(f"Total orders synced: {total_orders_synced}")
-        logger.info(f"Chunks processed: {total_chunks_processed}/{len(date_chunks)}")
-        logger.info(f"Duration: {duration:.2f} seconds")
-        
-        return {
-            "success": True,
-            "message": f"Historical orders sync completed successfully",
-            "total_orders_synced": result['total_orders_synced'],
-            "total_chunks_processed": result['total_chunks_processed'],
-            "total_chunks": result['total_chunks'],
-            "duration_seconds": result['duration_seconds'],
-            "errors": result.get('errors', [])
-        }
-            
-    except Exception as e:
-        logger.error(f"❌ Error in historical orders sync: {str(e)}", exc_info=True)
-        
-        # Mark sync as failed
-        historical_sync_progress.update({
-            "is_running": False,
-            "current_chunk_info": f"❌ Sync failed: {str(e)}",
-            "last_update": datetime.now(timezone.utc).isoformat()
-        })
-        
-        return {
-            "success": False,
-            "error": str(e)
-        } 
+@job_handler('historical_orders_sync')
+async def run_historical_orders_sync(job: JobContext) -> Dict[str, Any]:
+    """
+    Historical orders sync. Chunks run in parallel and are checkpointed, so a
+    job that is interrupted and claimed again resumes where it stopped;
+    reset=true starts over.
+    """
+    logger.info("🚛 Starting historical orders sync from January 2018...")
+    
+    from app.services.order_backfill import OrderBackfill
+    
+    job.update_progress({
+        "total_chunks": 0,
+        "completed_chunks": 0,
+        "current_chunk_info": "Initializing...",
+        "total_orders_synced": 0,
+        "errors": [],
+        "last_update": datetime.now(timezone.utc).isoformat()
+    })
+    
+    backfill = OrderBackfill(on_progress=job.update_progress)
+    result = await backfill.run(reset=job.params.get('reset', False))
+    
+    job.update_progress(errors=list(result.errors))
+    if not result.success:
+        raise Exception('; '.join(result.errors))
+    
+    total_chunks_processed = result.chunks_completed + result.chunks_skipped
+    
+    job.update_progress({
+        "completed_chunks": total_chunks_processed,
+        "current_chunk_info": f"✅ Sync completed! {result.total_orders_synced} orders synced in {total_chunks_processed}/{result.total_chunks} chunks",
+        "total_orders_synced": result.total_orders_synced,
+        "last_update": datetime.now(timezone.utc).isoformat()
+    })
+    
+    return {
+        "success": True,
+        "message": f"Historical orders sync completed successfully",
+        "total_orders_synced": result.total_orders_synced,
+        "total_chunks_processed": total_chunks_processed,
+        "total_chunks": result.total_chunks,
+        "chunks_resumed": result.chunks_resumed,
+        "duration_seconds": result.duration_seconds,
+        "errors": result.errors
+    }
 
 @router.get("/historical-orders-sync-status")
 async def get_historical_sync_status():
-    """Get current status of historical orders sync"""
-    global historical_sync_progress
+    """Get current status of the most recent historical orders sync job"""
+    try:
+        job = await get_job_runner().latest('historical_orders_sync')
+    except Exception as e:
+        logger.error(f"Error loading historical sync job: {str(e)}")
+        job = None
     
-    if not historical_sync_progress["is_running"] and historical_sync_progress["completed_chunks"] == 0:
+    if job is None:
         return JSONResponse({
             "is_running": False,
             "message": "No historical sync has been started",
             "progress_percentage": 0
         })
     
+    progress = job.progress
+    total_chunks = progress.get("total_chunks", 0)
+    completed_chunks = progress.get("completed_chunks", 0)
+    current_chunk_info = progress.get("current_chunk_info", "Queued...")
+    if job.status == 'failed':
+        current_chunk_info = f"❌ Sync failed: {job.error}"
+    elif job.status == 'cancelled':
+        current_chunk_info = "⏹️ Sync cancelled"
+    
     # Calculate progress percentage
     progress_percentage = 0
-    if historical_sync_progress["total_chunks"] > 0:
-        progress_percentage = (historical_sync_progress["completed_chunks"] / historical_sync_progress["total_chunks"]) * 100
+    if total_chunks > 0:
+        progress_percentage = (completed_chunks / total_chunks) * 100
     
     # Calculate estimated time remaining
     estimated_remaining = None
-    if historical_sync_progress["start_time"] and historical_sync_progress["completed_chunks"] > 0:
-        elapsed_time = time.time() - historical_sync_progress["start_time"]
-        avg_time_per_chunk = elapsed_time / historical_sync_progress["completed_chunks"]
-        remaining_chunks = historical_sync_progress["total_chunks"] - historical_sync_progress["completed_chunks"]
+    if not job.is_finished and job.started_at and completed_chunks > 0:
+        elapsed_time = (datetime.now(timezone.utc) - job.started_at).total_seconds()
+        avg_time_per_chunk = elapsed_time / completed_chunks
+        remaining_chunks = total_chunks - completed_chunks
         estimated_remaining = remaining_chunks * avg_time_per_chunk
     
     return JSONResponse({
-        "is_running": historical_sync_progress["is_running"],
-        "total_chunks": historical_sync_progress["total_chunks"],
-        "completed_chunks": historical_sync_progress["completed_chunks"],
-        "current_chunk_info": historical_sync_progress["current_chunk_info"],
-        "total_orders_synced": historical_sync_progress["total_orders_synced"],
+        "job_id": job.id,
+        "status": job.status,
+        "is_running": not job.is_finished,
+        "total_chunks": total_chunks,
+        "completed_chunks": completed_chunks,
+        "current_chunk_info": current_chunk_info,
+        "total_orders_synced": progress.get("total_orders_synced", 0),
         "progress_percentage": round(progress_percentage, 1),
-        "errors": historical_sync_progress["errors"],
+        "errors": progress.get("errors", []),
         "estimated_remaining_seconds": estimated_remaining,
-        "last_update": historical_sync_progress["last_update"],
+        "last_update": progress.get("last_update"),
         "timestamp": datetime.now(timezone.utc).isoformat()
     })
 
@@ -2867,6 +2687,7 @@ async def orchestrator_sync_api(request: Request):
         total_processed = sum(result.records_processed for result in results.values())
         total_added = sum(result.records_added for result in results.values())
         total_updated = sum(result.records_updated for result in results.values())
+        total_unchanged = sum(result.records_unchanged for result in results.values())
         total_duration = sum(result.duration_seconds for result in results.values())
         
         # Check if all syncs were successful
@@ -2896,6 +2717,7 @@ async def orchestrator_sync_api(request: Request):
                 "total_records_processed": total_processed,
                 "total_records_added": total_added,
                 "total_records_updated": total_updated,
+                "total_records_unchanged": total_unchanged,
                 "total_duration_seconds": total_duration,
                 "data_types_synced": list(results.keys()),
                 "results": {
@@ -2903,7 +2725,11 @@ async def orchestrator_sync_api(request: Request):
                         "records_processed": result.records_processed,
                         "records_added": result.records_added,
                         "records_updated": result.records_updated,
+                        "records_unchanged": result.records_unchanged,
+                        "api_calls_saved": result.api_calls_saved,
                         "duration_seconds": result.duration_seconds,
+                        "already_running": result.already_running,
+                        "lock_wait_seconds": result.lock_wait_seconds,
                         "success": result.success
                     }
                     for data_type, result in results.items()
@@ -2928,6 +2754,8 @@ async def orchestrator_sync_api(request: Request):
                         "records_added": result.records_added,
                         "records_updated": result.records_updated,
                         "duration_seconds": result.duration_seconds,
+                        "already_running": result.already_running,
+                        "lock_wait_seconds": result.lock_wait_seconds,
                         "success": result.success,
                         "errors": result.errors if not result.success else []
                     }
@@ -8,6 +8,7 @@ import aiohttp
 import asyncio
 from sqlalchemy import text
 from datetime import timezone
+from typing import Optional
 import pytz
 import pandas as pd
 from fastapi.responses import FileResponse
@@ -41,14 +42,14 @@ async def catalog_index(request: Request):
         })
 
 @router.post("/export")
-async def export_catalog(request: Request, background_tasks: BackgroundTasks):
-    """Trigger catalog export to database"""
+async def export_catalog(request: Request, background_tasks: BackgroundTasks, mode: str = 'full'):
+    """Trigger catalog export to database (mode=incremental rewrites only changed rows)"""
     try:
-        logger.info("Starting catalog export via API")
+        logger.info(f"Starting {mode} catalog export via API")
         
         async with get_session() as session:
             catalog_service = SquareCatalogService()
-            result = await catalog_service.export_catalog_to_database(session)
+            result = await catalog_service.export_catalog_to_database(session, incremental=(mode == 'incremental'))
         
         if result['success']:
             # Handle different response types based on status
@@ -183,11 +184,11 @@ async def get_catalog_status_component(request: Request):
         })
 
 @router.get("/export/status")
-async def check_export_status(request: Request):
-    """Check the status of the external export service"""
+async def check_export_status(request: Request, job_id: Optional[str] = None):
+    """Check the status of the external export service, or the phase and progress of one export job"""
     try:
         catalog_service = SquareCatalogService()
-        status = await catalog_service.check_export_status()
+        status = await catalog_service.check_export_status(job_id)
         
         return JSONResponse({
             "success": True,
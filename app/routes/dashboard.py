@@ -622,19 +622,14 @@ async def get_location_comprehensive_comparison(location_id: str, current_data:
         async with get_db() as session:
             comparisons = {}
             
-            # 1. TODAY vs SAME DATE LAST YEAR
+            # 1. TODAY vs SAME DATE LAST YEAR (from the daily_location_sales rollup)
             today_query = """
                 SELECT 
-                    COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as last_year_orders,
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) as last_year_sales_cents
-                FROM orders o
-                WHERE o.location_id = :location_id
-                AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) = :last_year_date
-                AND o.state = 'COMPLETED'
+                    COALESCE(SUM(dls.completed_orders), 0) as last_year_orders,
+                    COALESCE(SUM(dls.gross_sales_cents), 0) as last_year_sales_cents
+                FROM daily_location_sales dls
+                WHERE dls.location_id = :location_id
+                AND dls.sale_date = :last_year_date
             """
             
             result = await session.execute(text(today_query), {
@@ -683,18 +678,13 @@ async def get_location_comprehensive_comparison(location_id: str, current_data:
                             SELECT 
                                 os.start_date,
                                 EXTRACT(YEAR FROM os.start_date) as season_year,
-                                COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as season_orders,
-                                COALESCE(SUM(CASE 
-                                    WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                                    THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                                    ELSE 0 
-                                END), 0) as season_sales_cents
+                                COALESCE(SUM(dls.completed_orders), 0) as season_orders,
+                                COALESCE(SUM(dls.gross_sales_cents), 0) as season_sales_cents
                             FROM operating_seasons os
-                            LEFT JOIN orders o ON 
-                                o.location_id = :location_id
-                                AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                                AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.start_date + INTERVAL '1 day' * (:current_day - 1)
-                                AND o.state = 'COMPLETED'
+                            LEFT JOIN daily_location_sales dls ON 
+                                dls.location_id = :location_id
+                                AND dls.sale_date >= os.start_date
+                                AND dls.sale_date <= os.start_date + INTERVAL '1 day' * (:current_day - 1)
                             WHERE os.name = :season_name
                             AND EXTRACT(YEAR FROM os.start_date) IN (:current_year, :last_year)
                             GROUP BY os.start_date, EXTRACT(YEAR FROM os.start_date)
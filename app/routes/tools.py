@@ -2,6 +2,7 @@ from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from app.templates_config import templates
 from app.services.square_catalog_service import SquareCatalogService
+from app.services.job_runner import get_job_runner
 from app.database import get_session
 from app.logger import logger
 from sqlalchemy import text
@@ -123,32 +124,23 @@ async def square_inventory_update_tool(request: Request):
 
 @router.post("/square-inventory-update/start")
 async def start_inventory_update(request: Request):
-    """Start the Square inventory update process using complete sync"""
+    """Queue the Square inventory update as a complete sync job"""
     try:
         logger.info("Starting Square inventory update via complete sync")
         
-        # Use the complete sync endpoint for inventory updates
-        import aiohttp
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "http://localhost:8000/admin/complete-sync",
-                json={"full_refresh": False},
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return JSONResponse({
-                        "success": True,
-                        "message": "Inventory update completed via complete sync",
-                        "data": result
-                    })
-                else:
-                    error_text = await response.text()
-                    return JSONResponse({
-                        "success": False,
-                        "message": f"Complete sync failed: {error_text}"
-                    }, status_code=500)
+        # Same job the admin sync page queues, so a sync already running there is reused
+        runner = get_job_runner()
+        job, created = await runner.enqueue('complete_sync', {'full_refresh': False})
+        runner.schedule()
+        
+        return JSONResponse({
+            "success": True,
+            "message": "Inventory update started" if created else "Inventory update already in progress",
+            "job_id": job.id,
+            "status": job.status,
+            "deduplicated": not created,
+            "status_url": f"/admin/jobs/{job.id}"
+        }, status_code=202)
         
     except Exception as e:
         logger.error(f"Error starting inventory update: {str(e)}", exc_info=True)
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from app.config import Config
+from app.logger import logger
+from app.services.webhook_service import SUPPORTED_EVENT_TYPES, get_webhook_service, verify_square_signature
+import json
+
+router = APIRouter(tags=["webhooks"])
+
+
+@router.post("/square")
+async def square_webhook(request: Request):
+    """
+    Square webhook receiver for order and inventory notifications.
+    Verified events are queued in Postgres and applied in the background, so
+    Square gets its 200 straight away; unsupported event types are acknowledged
+    without being queued.
+    """
+    body = await request.body()
+    notification_url = Config.SQUARE_WEBHOOK_NOTIFICATION_URL or str(request.url)
+
+    if not verify_square_signature(body, request.headers.get('x-square-hmacsha256-signature'),
+                                   Config.SQUARE_WEBHOOK_SIGNATURE_KEY, notification_url):
+        logger.warning("🚫 Rejected Square webhook with an invalid signature")
+        return JSONResponse({"success": False, "error": "Invalid signature"}, status_code=403)
+
+    try:
+        event = json.loads(body)
+    except ValueError:
+        return JSONResponse({"success": False, "error": "Invalid JSON"}, status_code=400)
+
+    event_type = event.get('type')
+    if event_type not in SUPPORTED_EVENT_TYPES or not event.get('event_id'):
+        logger.info(f"Ignoring Square webhook event type {event_type}")
+        return {"success": True, "queued": False}
+
+    try:
+        service = get_webhook_service()
+        queued = await service.enqueue(event)
+        service.schedule_processing()
+        logger.info(f"🔔 Square webhook {event_type} {event['event_id']} "
+                    f"{'queued' if queued else 'already queued'}")
+        return {"success": True, "queued": queued}
+
+    except Exception as e:
+        # A non-2xx response makes Square redeliver the event later
+        logger.error(f"Error queueing Square webhook {event.get('event_id')}: {str(e)}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+@router.post("/square/process")
+async def process_square_webhooks():
+    """Apply any queued webhook events now (e.g. after a restart or from a scheduler)"""
+    try:
+        result = await get_webhook_service().process_pending()
+        return {
+            "success": not result.errors,
+            "events_applied": result.events_applied,
+            "events_failed": result.events_failed,
+            "orders_written": result.orders_written,
+            "inventory_counts_written": result.inventory_counts_written,
+            "errors": result.errors
+        }
+    except Exception as e:
+        logger.error(f"Error processing Square webhook queue: {str(e)}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
@@ -3,11 +3,12 @@ Incremental Sync Service
 Handles intelligent change detection and targeted updates from Square API
 """
 import asyncio
-import aiohttp
+import os
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional, Set
+from functools import partial
+from typing import Dict, Any, List, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text, select, update, delete, and_
+from sqlalchemy import text, select, update, delete, and_, literal_column
 from sqlalchemy.dialects.postgresql import insert
 import json
 
@@ -16,6 +17,181 @@ from app.logger import logger
 from app.database.models.location import Location
 from app.database.models.catalog import CatalogCategory, CatalogItem, CatalogVariation, CatalogInventory
 from app.database.models.vendor import Vendor
+from app.database.models.order import Order
+from app.database.models.payment import Payment
+from app.services.square_api_client import SquareAPIClient, get_square_client
+from app.services.sync_engine import content_hash
+from app.services.sync_lock import SyncAlreadyRunning, database_connection, single_flight
+from app.services.sync_scheduler import run_dependency_graph
+from app.services.sync_telemetry import sync_stage, track_sync_run
+
+# Tables holding each catalog object type, for version comparison and deletion
+CATALOG_TABLES = {
+    'CATEGORY': 'catalog_categories',
+    'ITEM': 'catalog_items',
+    'ITEM_VARIATION': 'catalog_variations'
+}
+
+# Columns the apply methods stamp on every run; kept out of the content hash
+CONTENT_HASH_EXCLUDED_COLUMNS = ('created_at', 'updated_at', 'synced_at')
+
+# Re-read this much before the stored inventory high-water mark; unchanged counts are not rewritten
+INVENTORY_HIGH_WATER_OVERLAP = timedelta(minutes=5)
+
+# One statement per batch of counts: update rows whose quantity moved, insert missing ones.
+# catalog_inventory has no unique key on (variation_id, location_id), so this cannot be ON CONFLICT.
+INVENTORY_UPSERT_SQL = text("""
+    WITH incoming AS (
+        SELECT * FROM unnest(
+            CAST(:variation_ids AS VARCHAR[]), CAST(:location_ids AS VARCHAR[]),
+            CAST(:quantities AS INTEGER[]), CAST(:calculated_ats AS TIMESTAMP[])
+        ) AS t(variation_id, location_id, quantity, calculated_at)
+    ),
+    updated AS (
+        UPDATE catalog_inventory ci
+        SET quantity = i.quantity, calculated_at = i.calculated_at, updated_at = NOW()
+        FROM incoming i
+        WHERE ci.variation_id = i.variation_id AND ci.location_id = i.location_id
+          AND ci.quantity IS DISTINCT FROM i.quantity
+          AND (ci.calculated_at IS NULL OR ci.calculated_at <= i.calculated_at)
+        RETURNING ci.id
+    ),
+    inserted AS (
+        INSERT INTO catalog_inventory (variation_id, location_id, quantity, calculated_at, created_at, updated_at)
+        SELECT i.variation_id, i.location_id, i.quantity, i.calculated_at, NOW(), NOW()
+        FROM incoming i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM catalog_inventory ci
+            WHERE ci.variation_id = i.variation_id AND ci.location_id = i.location_id
+        )
+          AND EXISTS (SELECT 1 FROM catalog_variations v WHERE v.id = i.variation_id)
+          AND EXISTS (SELECT 1 FROM locations l WHERE l.id = i.location_id)
+        RETURNING id
+    )
+    SELECT (SELECT COUNT(*) FROM updated) + (SELECT COUNT(*) FROM inserted)
+""")
+
+
+def inventory_rows_from_counts(counts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Latest IN_STOCK count per (variation, location) in catalog_inventory's shape.
+    calculated_at is stored as timezone-naive UTC like the rest of the table.
+    """
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    
+    for count in counts:
+        catalog_object_id = count.get('catalog_object_id')
+        location_id = count.get('location_id')
+        if not catalog_object_id or not location_id or count.get('state', 'IN_STOCK') != 'IN_STOCK':
+            continue
+        
+        try:
+            quantity = int(float(count.get('quantity', 0)))
+        except (ValueError, TypeError):
+            quantity = 0
+        
+        calculated_at = datetime.now(timezone.utc)
+        if count.get('calculated_at'):
+            try:
+                calculated_at = datetime.fromisoformat(count['calculated_at'].replace('Z', '+00:00'))
+            except ValueError:
+                pass
+        calculated_at = calculated_at.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        key = (catalog_object_id, location_id)
+        if key not in rows or rows[key]['calculated_at'] <= calculated_at:
+            rows[key] = {
+                'variation_id': catalog_object_id,
+                'location_id': location_id,
+                'quantity': quantity,
+                'calculated_at': calculated_at
+            }
+    
+    return list(rows.values())
+
+
+def parse_square_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Square RFC 3339 timestamp as timezone-naive UTC (how sync_state stores it)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def is_removed_catalog_object(obj: Dict[str, Any]) -> bool:
+    """Deleted objects, and archived items, are kept out of the live catalog tables"""
+    return bool(obj.get('is_deleted') or (obj.get('type') == 'ITEM' and obj.get('item_data', {}).get('is_archived')))
+
+
+async def filter_changed_catalog_objects(conn, objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keep only catalog objects whose Square version moved past the stored version
+    (or that are new, or whose deleted state changed), one lookup per object type.
+    """
+    by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for obj in objects:
+        table_name = CATALOG_TABLES.get(obj.get('type'))
+        if table_name:
+            by_table.setdefault(table_name, []).append(obj)
+    
+    changed = []
+    for table_name, table_objects in by_table.items():
+        result = await conn.execute(
+            text(f"SELECT id, version, is_deleted FROM {table_name} WHERE id = ANY(:ids)"),
+            {'ids': [obj['id'] for obj in table_objects]}
+        )
+        stored = {row[0]: (row[1], bool(row[2])) for row in result.fetchall()}
+        
+        for obj in table_objects:
+            if obj['id'] not in stored:
+                # Nothing to delete for removed objects we never stored
+                if not is_removed_catalog_object(obj):
+                    changed.append(obj)
+                continue
+            stored_version, stored_deleted = stored[obj['id']]
+            if (stored_version is None or (obj.get('version') or 0) > stored_version
+                    or stored_deleted != is_removed_catalog_object(obj)):
+                changed.append(obj)
+    
+    return changed
+
+
+async def mark_catalog_objects_deleted(conn, table_name: str, objects: List[Dict[str, Any]]) -> int:
+    """Flag removed objects as deleted in one statement; returns the rows that changed"""
+    if not objects:
+        return 0
+    
+    result = await conn.execute(text(f"""
+        UPDATE {table_name} t
+        SET is_deleted = true, version = v.version, content_hash = NULL, updated_at = NOW()
+        FROM unnest(CAST(:ids AS VARCHAR[]), CAST(:versions AS BIGINT[])) AS v(id, version)
+        WHERE t.id = v.id AND t.is_deleted IS NOT TRUE
+    """), {
+        'ids': [obj['id'] for obj in objects],
+        'versions': [obj.get('version') for obj in objects]
+    })
+    return result.rowcount or 0
+
+
+async def write_inventory_counts(conn, rows: List[Dict[str, Any]]) -> int:
+    """
+    Write inventory rows (see inventory_rows_from_counts) in one statement and return
+    how many rows actually changed. Counts whose quantity is unchanged, counts older
+    than the stored one and counts for unknown variations or locations are skipped.
+    Works with both an AsyncSession and an AsyncConnection.
+    """
+    if not rows:
+        return 0
+    
+    result = await conn.execute(INVENTORY_UPSERT_SQL, {
+        'variation_ids': [row['variation_id'] for row in rows],
+        'location_ids': [row['location_id'] for row in rows],
+        'quantities': [row['quantity'] for row in rows],
+        'calculated_ats': [row['calculated_at'] for row in rows]
+    })
+    return result.scalar() or 0
 
 
 class IncrementalSyncService:
@@ -29,8 +205,21 @@ class IncrementalSyncService:
             self.base_url = "https://connect.squareup.com"
         else:
             self.base_url = "https://connect.squareupsandbox.com"
-            
-        self.timeout = aiohttp.ClientTimeout(total=600)
+        
+        # Rows per multi-row upsert statement
+        self.upsert_chunk_size = int(os.getenv('INCREMENTAL_SYNC_CHUNK_SIZE', '500'))
+        # Rows the last _apply_changes call inserted, or left alone because their content hash matched
+        self.rows_inserted = 0
+        self.rows_unchanged = 0
+        
+        # Sync types run at once when their dependencies allow it; they share the
+        # caller's session, so only the Square fetches overlap and database work takes turns
+        self.max_concurrent_types = int(os.getenv('SYNC_TYPE_CONCURRENCY', '3'))
+        self._session_lock = asyncio.Lock()
+        
+        # Each type holds its cluster-wide sync lock (taken on its own connection) while it runs
+        self.lock_connect = database_connection
+        self.lock_wait_seconds = float(os.getenv('SYNC_LOCK_WAIT_SECONDS', '0'))
         
         # Sync configurations for each data type
         self.sync_configs = {
@@ -106,6 +295,10 @@ class IncrementalSyncService:
             }
         }
 
+    def _square_client(self) -> SquareAPIClient:
+        """Shared, rate-limited Square client for the running event loop"""
+        return get_square_client(self.square_access_token, self.base_url)
+
     async def run_incremental_sync(self, session: AsyncSession, sync_types: Optional[List[str]] = None) -> Dict[str, Any]:
         """Run incremental sync for specified data types"""
         try:
@@ -136,35 +329,36 @@ class IncrementalSyncService:
                 if self.sync_configs.get(sync_type, {}).get('enabled', True)
             ]
             
-            # Order syncs by dependencies
+            # Run syncs as their dependencies finish; dependency order breaks ties
             ordered_syncs = self._order_syncs_by_dependencies(enabled_sync_types)
+            report = await run_dependency_graph(
+                {sync_type: partial(self._run_sync_type, session, sync_type) for sync_type in ordered_syncs},
+                {sync_type: self.sync_configs[sync_type].get('dependencies', []) for sync_type in ordered_syncs},
+                self.max_concurrent_types
+            )
             
-            results = {}
-            total_changes = 0
-            
-            for sync_type in ordered_syncs:
-                logger.info(f"🔄 Processing {sync_type}...")
-                
-                result = await self._sync_data_type(session, sync_type)
-                results[sync_type] = result
-                
-                if result['success']:
-                    total_changes += result.get('changes_applied', 0)
-                    logger.info(f"✅ {sync_type}: {result.get('changes_applied', 0)} changes applied")
-                else:
-                    logger.error(f"❌ {sync_type}: {result.get('error', 'Unknown error')}")
-                    # Continue with other syncs even if one fails
+            # Failed syncs don't stop the others
+            results = {sync_type: report.results[sync_type] for sync_type in ordered_syncs}
+            succeeded = [result for result in results.values() if result['success']]
+            total_changes = sum(result.get('changes_applied', 0) for result in succeeded)
+            total_unchanged = sum(result.get('unchanged', 0) for result in succeeded)
             
             # Update overall sync status
             await self._update_sync_status(session, 'incremental_sync', total_changes)
             
             logger.info("=" * 50)
-            logger.info(f"✅ Incremental sync completed - {total_changes} total changes applied")
+            logger.info(f"✅ Incremental sync completed - {total_changes} total changes applied, "
+                        f"{total_unchanged} unchanged")
+            logger.info(f"⏱️ {report.summary()}")
             
             return {
                 'success': True,
                 'total_changes': total_changes,
+                'total_unchanged': total_unchanged,
                 'results': results,
+                'critical_path': report.critical_path,
+                'critical_path_seconds': round(report.critical_path_seconds, 3),
+                'wall_seconds': round(report.wall_seconds, 3),
                 'timestamp': datetime.now(timezone.utc).isoformat()
             }
             
@@ -176,42 +370,72 @@ class IncrementalSyncService:
                 'timestamp': datetime.now(timezone.utc).isoformat()
             }
 
+    async def _run_sync_type(self, session: AsyncSession, sync_type: str) -> Dict[str, Any]:
+        """Sync one type for run_incremental_sync and log the outcome"""
+        logger.info(f"🔄 Processing {sync_type}...")
+        
+        async def run():
+            async with track_sync_run(sync_type, 'incremental_sync', self.lock_connect) as stats:
+                result = await self._sync_data_type(session, sync_type)
+                stats.success = result['success']
+                stats.error = result.get('error')
+                inserted = result.get('inserted', 0)
+                stats.record_rows(inserted=inserted, updated=result.get('changes_applied', 0) - inserted,
+                                  unchanged=result.get('unchanged', 0))
+                return result
+        
+        try:
+            result = await single_flight(sync_type, run, self.lock_connect, self.lock_wait_seconds,
+                                         caller='incremental_sync')
+        except SyncAlreadyRunning as e:
+            logger.info(f"⏭️ {sync_type}: already running on another instance")
+            return {'success': True, 'already_running': True, 'changes_applied': 0,
+                    'lock_wait_seconds': round(e.waited_seconds, 3)}
+        
+        if result['success']:
+            logger.info(f"✅ {sync_type}: {result.get('changes_applied', 0)} changes applied, "
+                        f"{result.get('unchanged', 0)} unchanged")
+        else:
+            logger.error(f"❌ {sync_type}: {result.get('error', 'Unknown error')}")
+        return result
+
     async def _sync_data_type(self, session: AsyncSession, sync_type: str) -> Dict[str, Any]:
         """Sync a specific data type incrementally"""
         try:
-            config = self.sync_configs[sync_type]
-            
             # Get last sync timestamp
-            last_sync = await self._get_last_sync_timestamp(session, sync_type)
+            async with self._session_lock:
+                last_sync = await self._get_last_sync_timestamp(session, sync_type)
             
             # Fetch changes from Square API
-            if sync_type == 'locations':
-                changes = await self._fetch_location_changes(last_sync)
-            elif sync_type.startswith('catalog_'):
-                changes = await self._fetch_catalog_changes(sync_type, config, last_sync)
-            elif sync_type == 'vendors':
-                changes = await self._fetch_vendor_changes(last_sync)
-            elif sync_type == 'orders':
-                changes = await self._fetch_orders_changes(last_sync)
-            elif sync_type == 'payments':
-                changes = await self._fetch_payments_changes(last_sync)
-            elif sync_type == 'transactions':
-                changes = await self._fetch_transactions_changes(last_sync)
-            else:
-                return {'success': False, 'error': f'Unknown sync type: {sync_type}'}
-            
+            changes = await self._fetch_changes(sync_type, last_sync)
             if not changes['success']:
                 return changes
             
-            # Apply changes to database
-            changes_applied = await self._apply_changes(session, sync_type, changes['data'])
-            
-            # Update sync timestamp
-            await self._update_last_sync_timestamp(session, sync_type, changes_applied)
+            # The session is shared with the other types running now, so writes take turns
+            async with self._session_lock:
+                if sync_type in ('catalog_categories', 'catalog_items', 'catalog_variations'):
+                    # Skip objects already stored at their current version
+                    fetched = len(changes['data'])
+                    changes['data'] = await filter_changed_catalog_objects(session, changes['data'])
+                    logger.info(f"  🔍 {sync_type}: {fetched} objects returned, {len(changes['data'])} changed")
+                
+                # Apply changes to database
+                self.rows_inserted = 0
+                self.rows_unchanged = 0
+                with sync_stage('db'):
+                    changes_applied = await self._apply_changes(session, sync_type, changes['data'])
+                inserted = self.rows_inserted
+                unchanged = self.rows_unchanged
+                
+                # Update sync timestamp (or the high-water mark the next fetch starts from)
+                await self._update_last_sync_timestamp(session, sync_type, changes_applied,
+                                                       changes.get('high_water'))
             
             return {
                 'success': True,
                 'changes_applied': changes_applied,
+                'inserted': inserted,
+                'unchanged': unchanged,
                 'last_sync': last_sync.isoformat() if last_sync else None,
                 'new_sync_time': datetime.now(timezone.utc).isoformat()
             }
@@ -220,10 +444,29 @@ class IncrementalSyncService:
             logger.error(f"Error syncing {sync_type}: {str(e)}", exc_info=True)
             return {'success': False, 'error': str(e)}
 
+    async def _fetch_changes(self, sync_type: str, last_sync: Optional[datetime]) -> Dict[str, Any]:
+        """Fetch one type's changes since last_sync from Square API"""
+        if sync_type == 'locations':
+            return await self._fetch_location_changes(last_sync)
+        elif sync_type == 'catalog_inventory':
+            return await self._fetch_inventory_changes(last_sync)
+        elif sync_type.startswith('catalog_'):
+            return await self._fetch_catalog_changes(sync_type, self.sync_configs[sync_type], last_sync)
+        elif sync_type == 'vendors':
+            return await self._fetch_vendor_changes(last_sync)
+        elif sync_type == 'orders':
+            return await self._fetch_orders_changes(last_sync)
+        elif sync_type == 'payments':
+            return await self._fetch_payments_changes(last_sync)
+        elif sync_type == 'transactions':
+            return await self._fetch_transactions_changes(last_sync)
+        else:
+            return {'success': False, 'error': f'Unknown sync type: {sync_type}'}
+
     async def _fetch_location_changes(self, last_sync: Optional[datetime]) -> Dict[str, Any]:
         """Fetch location changes from Square API"""
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as client_session:
+            async with self._square_client().session() as client_session:
                 url = f"{self.base_url}/v2/locations"
                 headers = {'Authorization': f'Bearer {self.square_access_token}'}
                 
@@ -250,9 +493,13 @@ class IncrementalSyncService:
             return {'success': False, 'error': str(e)}
 
     async def _fetch_catalog_changes(self, sync_type: str, config: Dict, last_sync: Optional[datetime]) -> Dict[str, Any]:
-        """Fetch catalog changes from Square API"""
+        """
+        Fetch catalog objects changed since the last recorded catalog timestamp
+        (everything on the first run), including deletions. The returned high_water
+        is Square's latest_time for the catalog, so the next run starts from there.
+        """
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as client_session:
+            async with self._square_client().session() as client_session:
                 url = f"{self.base_url}/v2/catalog/search"
                 headers = {
                     'Authorization': f'Bearer {self.square_access_token}',
@@ -260,6 +507,7 @@ class IncrementalSyncService:
                 }
                 
                 all_objects = []
+                latest_time = None
                 
                 for object_type in config.get('object_types', []):
                     cursor = None
@@ -268,24 +516,23 @@ class IncrementalSyncService:
                     while True:
                         payload = {
                             "object_types": [object_type],
-                            "include_deleted_objects": True,  # Include archived items so we can remove them
+                            "include_deleted_objects": True,  # Include deleted objects so we can remove them
                             "limit": 1000
                         }
                         
                         if cursor:
                             payload["cursor"] = cursor
                         
-                        # Add timestamp filter if we have a last sync time
-                        if last_sync and sync_type != 'catalog_inventory':
-                            # For catalog items, use updated_at filter
-                            # Note: Square API may not support this filter for all endpoints
-                            pass
+                        # Only objects modified since the last recorded catalog timestamp
+                        if last_sync:
+                            payload["begin_time"] = last_sync.replace(tzinfo=timezone.utc).isoformat().replace('+00:00', 'Z')
                         
                         async with client_session.post(url, headers=headers, json=payload) as response:
                             if response.status == 200:
                                 data = await response.json()
                                 objects = data.get('objects', [])
                                 all_objects.extend(objects)
+                                latest_time = latest_time or parse_square_timestamp(data.get('latest_time'))
                                 
                                 cursor = data.get('cursor')
                                 if not cursor:
@@ -303,7 +550,62 @@ class IncrementalSyncService:
                 return {
                     'success': True,
                     'data': all_objects,
-                    'total_items': len(all_objects)
+                    'total_items': len(all_objects),
+                    'high_water': latest_time
+                }
+                
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    async def _fetch_inventory_changes(self, last_sync: Optional[datetime]) -> Dict[str, Any]:
+        """
+        Fetch IN_STOCK inventory counts calculated since the stored high-water mark.
+        The first run (no mark yet) retrieves every count. The returned high_water is
+        the newest calculated_at seen, so the mark follows Square's clock, not ours.
+        """
+        try:
+            async with self._square_client().session() as client_session:
+                url = f"{self.base_url}/v2/inventory/counts/batch-retrieve"
+                headers = {
+                    'Authorization': f'Bearer {self.square_access_token}',
+                    'Content-Type': 'application/json'
+                }
+                
+                payload: Dict[str, Any] = {
+                    'states': ['IN_STOCK'],
+                    'limit': 1000
+                }
+                if last_sync:
+                    updated_after = last_sync.replace(tzinfo=timezone.utc) - INVENTORY_HIGH_WATER_OVERLAP
+                    payload['updated_after'] = updated_after.isoformat().replace('+00:00', 'Z')
+                
+                all_counts = []
+                while True:
+                    async with client_session.post(url, headers=headers, json=payload) as response:
+                        if response.status != 200:
+                            error_text = await response.text()
+                            return {
+                                'success': False,
+                                'error': f'Square API error: {response.status} - {error_text}'
+                            }
+                        
+                        data = await response.json()
+                        all_counts.extend(data.get('counts', []))
+                        
+                        cursor = data.get('cursor')
+                        if not cursor:
+                            break
+                        payload['cursor'] = cursor
+                
+                rows = inventory_rows_from_counts(all_counts)
+                logger.info(f"  📦 {len(all_counts)} inventory counts updated since "
+                            f"{payload.get('updated_after', 'the beginning')} ({len(rows)} unique)")
+                
+                return {
+                    'success': True,
+                    'data': rows,
+                    'total_items': len(rows),
+                    'high_water': max((row['calculated_at'] for row in rows), default=last_sync)
                 }
                 
         except Exception as e:
@@ -312,7 +614,7 @@ class IncrementalSyncService:
     async def _fetch_vendor_changes(self, last_sync: Optional[datetime]) -> Dict[str, Any]:
         """Fetch vendor changes from Square API"""
         try:
-            async with aiohttp.ClientSession(timeout=self.timeout) as client_session:
+            async with self._square_client().session() as client_session:
                 url = f"{self.base_url}/v2/vendors/search"
                 headers = {
                     'Authorization': f'Bearer {self.square_access_token}',
@@ -356,7 +658,7 @@ class IncrementalSyncService:
         """Fetch orders changes from Square API"""
         try:
             # First get active location IDs
-            async with aiohttp.ClientSession(timeout=self.timeout) as client_session:
+            async with self._square_client().session() as client_session:
                 locations_url = f"{self.base_url}/v2/locations"
                 headers = {'Authorization': f'Bearer {self.square_access_token}'}
                 
@@ -421,7 +723,7 @@ class IncrementalSyncService:
         """Fetch payments changes from Square API"""
         try:
             # Get location IDs first
-            async with aiohttp.ClientSession(timeout=self.timeout) as client_session:
+            async with self._square_client().session() as client_session:
                 locations_url = f"{self.base_url}/v2/locations"
                 headers = {'Authorization': f'Bearer {self.square_access_token}'}
                 
@@ -517,350 +819,260 @@ class IncrementalSyncService:
         
         return changes_applied
 
-    async def _apply_location_changes(self, session: AsyncSession, locations: List[Dict[str, Any]]) -> int:
-        """Apply location changes using upsert"""
-        changes = 0
+    async def _bulk_upsert(self, session: AsyncSession, model, rows: List[Dict[str, Any]],
+                           update_columns: List[str], key_column: str = 'id',
+                           hash_exclude: Tuple[str, ...] = CONTENT_HASH_EXCLUDED_COLUMNS) -> int:
+        """
+        Multi-row INSERT ... ON CONFLICT DO UPDATE, one statement per chunk of
+        `upsert_chunk_size` rows. Returns the number of rows inserted or updated,
+        and adds the inserted ones to `rows_inserted`.
+        Rows are de-duplicated on the key first (last one wins), since one
+        statement cannot update the same row twice. Existing rows whose content
+        hash matches are skipped and added to `rows_unchanged`.
+        """
+        rows = [
+            dict(row, content_hash=content_hash(row, hash_exclude))
+            for row in {row[key_column]: row for row in rows}.values()
+        ]
+        changed = 0
         
-        for location_data in locations:
-            stmt = insert(Location).values(
-                id=location_data['id'],
-                name=location_data.get('name', ''),
-                address=json.dumps(location_data.get('address', {})),
-                timezone=location_data.get('timezone', ''),
-                status=location_data.get('status', 'ACTIVE'),
-                capabilities=location_data.get('capabilities', []),
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-                description=location_data.get('description', ''),
-                coordinates=json.dumps(location_data.get('coordinates', {})),
-                business_hours=location_data.get('business_hours', {}),
-                business_email=location_data.get('business_email', ''),
-                phone_number=location_data.get('phone_number', ''),
-                website_url=location_data.get('website_url', '')
-            )
-            
+        for start in range(0, len(rows), self.upsert_chunk_size):
+            chunk = rows[start:start + self.upsert_chunk_size]
+            stmt = insert(model).values(chunk)
             stmt = stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_=dict(
-                    name=stmt.excluded.name,
-                    address=stmt.excluded.address,
-                    timezone=stmt.excluded.timezone,
-                    status=stmt.excluded.status,
-                    capabilities=stmt.excluded.capabilities,
-                    updated_at=stmt.excluded.updated_at,
-                    description=stmt.excluded.description,
-                    coordinates=stmt.excluded.coordinates,
-                    business_hours=stmt.excluded.business_hours,
-                    business_email=stmt.excluded.business_email,
-                    phone_number=stmt.excluded.phone_number,
-                    website_url=stmt.excluded.website_url
-                )
-            )
+                index_elements=[key_column],
+                set_={column: stmt.excluded[column] for column in [*update_columns, 'content_hash']},
+                where=model.__table__.c.content_hash.is_distinct_from(stmt.excluded.content_hash)
+            ).returning(literal_column('xmax = 0').label('inserted'))
             
-            await session.execute(stmt)
-            changes += 1
+            result = await session.execute(stmt)
+            flags = [row[0] for row in result.fetchall()]
+            changed += len(flags)
+            self.rows_inserted += sum(1 for inserted in flags if inserted)
+            self.rows_unchanged += len(chunk) - len(flags)
         
-        return changes
+        return changed
+
+    async def _apply_location_changes(self, session: AsyncSession, locations: List[Dict[str, Any]]) -> int:
+        """Apply location changes using bulk upsert"""
+        rows = [
+            {
+                'id': location_data['id'],
+                'name': location_data.get('name', ''),
+                'address': json.dumps(location_data.get('address', {})),
+                'timezone': location_data.get('timezone', ''),
+                'status': location_data.get('status', 'ACTIVE'),
+                'capabilities': location_data.get('capabilities', []),
+                'created_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow(),
+                'description': location_data.get('description', ''),
+                'coordinates': json.dumps(location_data.get('coordinates', {})),
+                'business_hours': location_data.get('business_hours', {}),
+                'business_email': location_data.get('business_email', ''),
+                'phone_number': location_data.get('phone_number', ''),
+                'website_url': location_data.get('website_url', '')
+            }
+            for location_data in locations
+        ]
+        
+        return await self._bulk_upsert(session, Location, rows, [
+            'name', 'address', 'timezone', 'status', 'capabilities', 'updated_at', 'description',
+            'coordinates', 'business_hours', 'business_email', 'phone_number', 'website_url'
+        ])
 
     async def _apply_category_changes(self, session: AsyncSession, categories: List[Dict[str, Any]]) -> int:
-        """Apply category changes using upsert"""
-        changes = 0
+        """Apply category changes using bulk upsert"""
+        changes = await mark_catalog_objects_deleted(
+            session, 'catalog_categories', [c for c in categories if is_removed_catalog_object(c)])
         
-        for category_data in categories:
-            category_info = category_data.get('category_data', {})
-            
-            stmt = insert(CatalogCategory).values(
-                id=category_data['id'],
-                name=category_info.get('name', ''),
-                is_deleted=False,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            
-            stmt = stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_=dict(
-                    name=stmt.excluded.name,
-                    is_deleted=stmt.excluded.is_deleted,
-                    updated_at=stmt.excluded.updated_at
-                )
-            )
-            
-            await session.execute(stmt)
-            changes += 1
+        rows = [
+            {
+                'id': category_data['id'],
+                'name': category_data.get('category_data', {}).get('name', ''),
+                'version': category_data.get('version'),
+                'is_deleted': False,
+                'created_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow()
+            }
+            for category_data in categories if not is_removed_catalog_object(category_data)
+        ]
         
-        return changes
+        return changes + await self._bulk_upsert(session, CatalogCategory, rows,
+                                                 ['name', 'version', 'is_deleted', 'updated_at'])
 
     async def _apply_item_changes(self, session: AsyncSession, items: List[Dict[str, Any]]) -> int:
-        """Apply item changes using upsert"""
-        changes = 0
+        """Apply item changes using bulk upsert"""
+        changes = await mark_catalog_objects_deleted(
+            session, 'catalog_items', [item for item in items if item.get('is_deleted')])
+        live_items = [item for item in items if not item.get('is_deleted')]
+        
+        # Handle archived items - remove them from our database
+        archived_ids = [item['id'] for item in live_items if item.get('item_data', {}).get('is_archived', False)]
+        if archived_ids:
+            result = await session.execute(
+                text("DELETE FROM catalog_items WHERE id = ANY(:item_ids) RETURNING id"),
+                {"item_ids": archived_ids}
+            )
+            removed_ids = [row[0] for row in result.fetchall()]
+            if removed_ids:
+                logger.info(f"Removed {len(removed_ids)} archived items from database: {', '.join(removed_ids)}")
+            changes += len(removed_ids)
         
-        for item_data in items:
+        rows = []
+        for item_data in live_items:
             item_info = item_data.get('item_data', {})
-            categories = item_info.get('categories', [])
-            category_id = categories[0]['id'] if categories else None
-
-            # Handle archived items - remove them from our database
             if item_info.get('is_archived', False):
-                item_id = item_data['id']
-                item_name = item_info.get('name', item_id)
-                
-                # Check if this item exists in our database
-                existing_item = await session.execute(
-                    text("SELECT id FROM catalog_items WHERE id = :item_id"),
-                    {"item_id": item_id}
-                )
-                
-                if existing_item.fetchone():
-                    # Item exists in our DB but is archived in Square - remove it
-                    await session.execute(
-                        text("DELETE FROM catalog_items WHERE id = :item_id"),
-                        {"item_id": item_id}
-                    )
-                    logger.info(f"Removed archived item from database: {item_name} ({item_id})")
-                    changes += 1
-                else:
-                    logger.debug(f"Skipping archived item (not in our DB): {item_name} ({item_id})")
-                
                 continue
-
-            stmt = insert(CatalogItem).values(
-                id=item_data['id'],
-                name=item_info.get('name', ''),
-                description=item_info.get('description', ''),
-                category_id=category_id,
-                is_archived=False,  # Only non-archived items in our database
-                is_deleted=False,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            
-            stmt = stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_=dict(
-                    name=stmt.excluded.name,
-                    description=stmt.excluded.description,
-                    category_id=stmt.excluded.category_id,
-                    is_archived=stmt.excluded.is_archived,
-                    is_deleted=stmt.excluded.is_deleted,
-                    updated_at=stmt.excluded.updated_at
-                )
-            )
+            categories = item_info.get('categories', [])
             
-            await session.execute(stmt)
-            changes += 1
+            rows.append({
+                'id': item_data['id'],
+                'name': item_info.get('name', ''),
+                'description': item_info.get('description', ''),
+                'category_id': categories[0]['id'] if categories else None,
+                'version': item_data.get('version'),
+                'is_archived': False,  # Only non-archived items in our database
+                'is_deleted': False,
+                'created_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow()
+            })
         
-        return changes
+        return changes + await self._bulk_upsert(session, CatalogItem, rows, [
+            'name', 'description', 'category_id', 'version', 'is_archived', 'is_deleted', 'updated_at'
+        ])
 
     async def _apply_variation_changes(self, session: AsyncSession, variations: List[Dict[str, Any]]) -> int:
-        """Apply variation changes using upsert"""
-        changes = 0
+        """Apply variation changes using bulk upsert"""
+        changes = await mark_catalog_objects_deleted(
+            session, 'catalog_variations', [v for v in variations if is_removed_catalog_object(v)])
         
+        rows = []
         for variation_data in variations:
+            if is_removed_catalog_object(variation_data):
+                continue
             variation_info = variation_data.get('item_variation_data', {})
             
             # Extract unit cost from default_unit_cost field
             default_unit_cost = variation_info.get('default_unit_cost')
-            default_unit_cost_json = json.dumps(default_unit_cost) if default_unit_cost else None
-            
-            stmt = insert(CatalogVariation).values(
-                id=variation_data['id'],
-                name=variation_info.get('name', ''),
-                item_id=variation_info.get('item_id'),
-                sku=variation_info.get('sku', ''),
-                price_money=json.dumps(variation_info.get('price_money', {})),
-                default_unit_cost=default_unit_cost_json,
-                is_deleted=False,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            
-            stmt = stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_=dict(
-                    name=stmt.excluded.name,
-                    item_id=stmt.excluded.item_id,
-                    sku=stmt.excluded.sku,
-                    price_money=stmt.excluded.price_money,
-                    default_unit_cost=stmt.excluded.default_unit_cost,
-                    is_deleted=stmt.excluded.is_deleted,
-                    updated_at=stmt.excluded.updated_at
-                )
-            )
             
-            await session.execute(stmt)
-            changes += 1
+            rows.append({
+                'id': variation_data['id'],
+                'name': variation_info.get('name', ''),
+                'item_id': variation_info.get('item_id'),
+                'sku': variation_info.get('sku', ''),
+                'price_money': json.dumps(variation_info.get('price_money', {})),
+                'default_unit_cost': json.dumps(default_unit_cost) if default_unit_cost else None,
+                'version': variation_data.get('version'),
+                'is_deleted': False,
+                'created_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow()
+            })
         
-        return changes
+        return changes + await self._bulk_upsert(session, CatalogVariation, rows, [
+            'name', 'item_id', 'sku', 'price_money', 'default_unit_cost', 'version', 'is_deleted', 'updated_at'
+        ])
 
     async def _apply_inventory_changes(self, session: AsyncSession, inventory_data: List[Dict[str, Any]]) -> int:
-        """Apply inventory changes using upsert"""
-        changes = 0
-        
-        # This would be implemented based on the inventory API response structure
-        # For now, placeholder implementation
-        
-        return changes
+        """Apply inventory count changes in bulk, counting only rows whose quantity changed"""
+        return await write_inventory_counts(session, inventory_data)
 
     async def _apply_vendor_changes(self, session: AsyncSession, vendors: List[Dict[str, Any]]) -> int:
-        """Apply vendor changes using upsert"""
-        changes = 0
-        
-        for vendor_data in vendors:
-            stmt = insert(Vendor).values(
-                id=vendor_data['id'],
-                name=vendor_data.get('name', ''),
-                account_number=vendor_data.get('account_number', ''),
-                note=vendor_data.get('note', ''),
-                status=vendor_data.get('status', 'ACTIVE'),
-                version=str(vendor_data.get('version', '')),  # Convert to string
-                address=json.dumps(vendor_data.get('address', {})),
-                contacts=json.dumps(vendor_data.get('contacts', [])),
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow(),
-                synced_at=datetime.utcnow()
-            )
-            
-            stmt = stmt.on_conflict_do_update(
-                index_elements=['id'],
-                set_=dict(
-                    name=stmt.excluded.name,
-                    account_number=stmt.excluded.account_number,
-                    note=stmt.excluded.note,
-                    status=stmt.excluded.status,
-                    version=stmt.excluded.version,
-                    address=stmt.excluded.address,
-                    contacts=stmt.excluded.contacts,
-                    updated_at=stmt.excluded.updated_at,
-                    synced_at=stmt.excluded.synced_at
-                )
-            )
-            
-            await session.execute(stmt)
-            changes += 1
+        """Apply vendor changes using bulk upsert"""
+        rows = [
+            {
+                'id': vendor_data['id'],
+                'name': vendor_data.get('name', ''),
+                'account_number': vendor_data.get('account_number', ''),
+                'note': vendor_data.get('note', ''),
+                'status': vendor_data.get('status', 'ACTIVE'),
+                'version': str(vendor_data.get('version', '')),  # Convert to string
+                'address': json.dumps(vendor_data.get('address', {})),
+                'contacts': json.dumps(vendor_data.get('contacts', [])),
+                'created_at': datetime.utcnow(),
+                'updated_at': datetime.utcnow(),
+                'synced_at': datetime.utcnow()
+            }
+            for vendor_data in vendors
+        ]
         
-        return changes
+        return await self._bulk_upsert(session, Vendor, rows, [
+            'name', 'account_number', 'note', 'status', 'version', 'address', 'contacts', 'updated_at', 'synced_at'
+        ])
 
     async def _apply_orders_changes(self, session: AsyncSession, orders: List[Dict[str, Any]]) -> int:
-        """Apply orders changes using raw SQL upsert"""
-        changes = 0
-        
-        for order_data in orders:
-            await session.execute(text("""
-                INSERT INTO orders (
-                    id, location_id, created_at, updated_at, closed_at,
-                    state, version, total_money, total_tax_money, total_discount_money,
-                    net_amounts, source, return_amounts, order_metadata
-                ) VALUES (
-                    :id, :location_id, :created_at, :updated_at, :closed_at,
-                    :state, :version, :total_money, :total_tax_money, :total_discount_money,
-                    :net_amounts, :source, :return_amounts, :order_metadata
-                )
-                ON CONFLICT (id) DO UPDATE SET
-                    location_id = EXCLUDED.location_id,
-                    updated_at = EXCLUDED.updated_at,
-                    closed_at = EXCLUDED.closed_at,
-                    state = EXCLUDED.state,
-                    version = EXCLUDED.version,
-                    total_money = EXCLUDED.total_money,
-                    total_tax_money = EXCLUDED.total_tax_money,
-                    total_discount_money = EXCLUDED.total_discount_money,
-                    net_amounts = EXCLUDED.net_amounts,
-                    source = EXCLUDED.source,
-                    return_amounts = EXCLUDED.return_amounts,
-                    order_metadata = EXCLUDED.order_metadata
-            """), {
+        """Apply orders changes using bulk upsert"""
+        rows = [
+            {
                 'id': order_data['id'],
                 'location_id': order_data.get('location_id'),
-                'created_at': order_data.get('created_at'),
-                'updated_at': order_data.get('updated_at'),
-                'closed_at': order_data.get('closed_at'),
+                'created_at': parse_square_timestamp(order_data.get('created_at')),
+                'updated_at': parse_square_timestamp(order_data.get('updated_at')),
+                'closed_at': parse_square_timestamp(order_data.get('closed_at')),
                 'state': order_data.get('state'),
                 'version': order_data.get('version'),
-                'total_money': json.dumps(order_data.get('total_money', {})),
-                'total_tax_money': json.dumps(order_data.get('total_tax_money', {})),
-                'total_discount_money': json.dumps(order_data.get('total_discount_money', {})),
-                'net_amounts': json.dumps(order_data.get('net_amounts', {})),
-                'source': json.dumps(order_data.get('source', {})),
-                'return_amounts': json.dumps(order_data.get('return_amounts', {})),
-                'order_metadata': json.dumps(order_data.get('metadata', {}))
-            })
-            changes += 1
+                'total_money': order_data.get('total_money', {}),
+                'total_tax_money': order_data.get('total_tax_money', {}),
+                'total_discount_money': order_data.get('total_discount_money', {}),
+                'net_amounts': order_data.get('net_amounts', {}),
+                'source': order_data.get('source', {}),
+                'return_amounts': order_data.get('return_amounts', {}),
+                'order_metadata': order_data.get('metadata', {})
+            }
+            for order_data in orders
+        ]
         
-        return changes
+        # Order timestamps come from Square, so they are part of the hash
+        return await self._bulk_upsert(session, Order, rows, [
+            'location_id', 'updated_at', 'closed_at', 'state', 'version', 'total_money', 'total_tax_money',
+            'total_discount_money', 'net_amounts', 'source', 'return_amounts', 'order_metadata'
+        ], hash_exclude=())
 
     async def _apply_payments_changes(self, session: AsyncSession, payments: List[Dict[str, Any]]) -> int:
-        """Apply payments changes using raw SQL upsert"""
-        changes = 0
-        
-        for payment_data in payments:
-            await session.execute(text("""
-                INSERT INTO payments (
-                    id, created_at, updated_at, amount_money, status, source_type,
-                    location_id, order_id, receipt_number, receipt_url, card_details,
-                    cash_details, external_details, refunded_money, approved_money,
-                    processing_fee, refund_ids, risk_evaluation, buyer_email_address,
-                    billing_address, shipping_address, note, statement_description_identifier,
-                    total_money, tip_money, app_fee_money, delay_duration, delay_action,
-                    delayed_until, reference_id, capabilities, device_details,
-                    application_details, version_token
-                ) VALUES (
-                    :id, :created_at, :updated_at, :amount_money, :status, :source_type,
-                    :location_id, :order_id, :receipt_number, :receipt_url, :card_details,
-                    :cash_details, :external_details, :refunded_money, :approved_money,
-                    :processing_fee, :refund_ids, :risk_evaluation, :buyer_email_address,
-                    :billing_address, :shipping_address, :note, :statement_description_identifier,
-                    :total_money, :tip_money, :app_fee_money, :delay_duration, :delay_action,
-                    :delayed_until, :reference_id, :capabilities, :device_details,
-                    :application_details, :version_token
-                )
-                ON CONFLICT (id) DO UPDATE SET
-                    updated_at = EXCLUDED.updated_at,
-                    status = EXCLUDED.status,
-                    amount_money = EXCLUDED.amount_money,
-                    refunded_money = EXCLUDED.refunded_money,
-                    approved_money = EXCLUDED.approved_money,
-                    processing_fee = EXCLUDED.processing_fee,
-                    version_token = EXCLUDED.version_token
-            """), {
+        """Apply payments changes using bulk upsert"""
+        rows = [
+            {
                 'id': payment_data['id'],
-                'created_at': payment_data.get('created_at'),
-                'updated_at': payment_data.get('updated_at'),
-                'amount_money': json.dumps(payment_data.get('amount_money', {})),
+                'created_at': parse_square_timestamp(payment_data.get('created_at')),
+                'updated_at': parse_square_timestamp(payment_data.get('updated_at')),
+                'amount_money': payment_data.get('amount_money', {}),
                 'status': payment_data.get('status'),
                 'source_type': payment_data.get('source_type'),
                 'location_id': payment_data.get('location_id'),
                 'order_id': payment_data.get('order_id'),
                 'receipt_number': payment_data.get('receipt_number'),
                 'receipt_url': payment_data.get('receipt_url'),
-                'card_details': json.dumps(payment_data.get('card_details', {})),
-                'cash_details': json.dumps(payment_data.get('cash_details', {})),
-                'external_details': json.dumps(payment_data.get('external_details', {})),
-                'refunded_money': json.dumps(payment_data.get('refunded_money', {})),
-                'approved_money': json.dumps(payment_data.get('approved_money', {})),
-                'processing_fee': json.dumps(payment_data.get('processing_fee', {})),
-                'refund_ids': json.dumps(payment_data.get('refund_ids', [])),
-                'risk_evaluation': json.dumps(payment_data.get('risk_evaluation', {})),
+                'card_details': payment_data.get('card_details', {}),
+                'cash_details': payment_data.get('cash_details', {}),
+                'external_details': payment_data.get('external_details', {}),
+                'refunded_money': payment_data.get('refunded_money', {}),
+                'approved_money': payment_data.get('approved_money', {}),
+                'processing_fee': payment_data.get('processing_fee', {}),
+                'refund_ids': payment_data.get('refund_ids', []),
+                'risk_evaluation': payment_data.get('risk_evaluation', {}),
                 'buyer_email_address': payment_data.get('buyer_email_address'),
-                'billing_address': json.dumps(payment_data.get('billing_address', {})),
-                'shipping_address': json.dumps(payment_data.get('shipping_address', {})),
+                'billing_address': payment_data.get('billing_address', {}),
+                'shipping_address': payment_data.get('shipping_address', {}),
                 'note': payment_data.get('note'),
                 'statement_description_identifier': payment_data.get('statement_description_identifier'),
-                'total_money': json.dumps(payment_data.get('total_money', {})),
-                'tip_money': json.dumps(payment_data.get('tip_money', {})),
-                'app_fee_money': json.dumps(payment_data.get('app_fee_money', {})),
+                'total_money': payment_data.get('total_money', {}),
+                'tip_money': payment_data.get('tip_money', {}),
+                'app_fee_money': payment_data.get('app_fee_money', {}),
                 'delay_duration': payment_data.get('delay_duration'),
                 'delay_action': payment_data.get('delay_action'),
-                'delayed_until': payment_data.get('delayed_until'),
+                'delayed_until': parse_square_timestamp(payment_data.get('delayed_until')),
                 'reference_id': payment_data.get('reference_id'),
-                'capabilities': json.dumps(payment_data.get('capabilities', [])),
-                'device_details': json.dumps(payment_data.get('device_details', {})),
-                'application_details': json.dumps(payment_data.get('application_details', {})),
+                'capabilities': payment_data.get('capabilities', []),
+                'device_details': payment_data.get('device_details', {}),
+                'application_details': payment_data.get('application_details', {}),
                 'version_token': payment_data.get('version_token')
-            })
-            changes += 1
+            }
+            for payment_data in payments
+        ]
         
-        return changes
+        return await self._bulk_upsert(session, Payment, rows, [
+            'updated_at', 'status', 'amount_money', 'refunded_money', 'approved_money', 'processing_fee',
+            'version_token'
+        ], hash_exclude=())
 
     async def _apply_transactions_changes(self, session: AsyncSession, transactions: List[Dict[str, Any]]) -> int:
         """Apply transactions changes using raw SQL upsert"""
@@ -910,16 +1122,17 @@ class IncrementalSyncService:
         row = result.fetchone()
         return row[0] if row else None
 
-    async def _update_last_sync_timestamp(self, session: AsyncSession, sync_type: str, records_synced: int):
-        """Update the last sync timestamp for a data type"""
+    async def _update_last_sync_timestamp(self, session: AsyncSession, sync_type: str, records_synced: int,
+                                          high_water: Optional[datetime] = None):
+        """Update the last sync timestamp for a data type (NOW() unless a high-water mark is given)"""
         await session.execute(text("""
             INSERT INTO sync_state (table_name, last_sync_timestamp, records_synced, updated_at)
-            VALUES (:table_name, NOW(), :records_synced, NOW())
+            VALUES (:table_name, COALESCE(CAST(:high_water AS TIMESTAMP), NOW()), :records_synced, NOW())
             ON CONFLICT (table_name) DO UPDATE SET
-                last_sync_timestamp = NOW(),
+                last_sync_timestamp = COALESCE(CAST(:high_water AS TIMESTAMP), NOW()),
                 records_synced = :records_synced,
                 updated_at = NOW()
-        """), {"table_name": sync_type, "records_synced": records_synced})
+        """), {"table_name": sync_type, "records_synced": records_synced, "high_water": high_water})
 
     async def _update_sync_status(self, session: AsyncSession, sync_name: str, total_changes: int):
         """Update overall sync status"""
@@ -0,0 +1,453 @@
+"""
+Background Job Runner
+Long admin operations (complete sync, historical order backfill, bulk data copy)
+run as jobs recorded in the background_jobs table instead of inside the HTTP
+request, so they survive request timeouts and don't tie up a web worker. An
+endpoint enqueues a job and returns its ID; the UI polls /admin/jobs/<id>.
+
+Enqueueing a job identical to one already queued or running (same type and
+parameters) returns the existing job instead of starting a second copy. Jobs
+are claimed with FOR UPDATE SKIP LOCKED so several app instances can share the
+queue. While a job runs, a heartbeat writes its progress and picks up
+cancellation requests; a running job whose heartbeat stops (its instance died
+or shut down) is claimed again, up to max_attempts times, unless it had been
+asked to cancel, in which case it is finished as cancelled. Workers exit once
+the queue is empty, so a periodic reclaim restarts them to pick up abandoned
+jobs without waiting for the next enqueue.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'running')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+# Running jobs without a heartbeat for this long are treated as abandoned
+STALE_HEARTBEAT_MINUTES = 10
+
+
+@dataclass
+class Job:
+    """One row of the background_jobs table"""
+    id: int
+    job_type: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = 'queued'
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'job_type': self.job_type,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class JobContext:
+    """Handed to a job handler: its parameters and a progress dict the heartbeat saves"""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.params = job.params
+        self.progress: Dict[str, Any] = dict(job.progress)
+
+    def update_progress(self, fields: Optional[Dict[str, Any]] = None, **kwargs):
+        """Merge fields into the job's progress; cheap enough to call on every step"""
+        self.progress.update(fields or {}, **kwargs)
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[Dict[str, Any]]]]
+
+# job type -> handler, filled in by @job_handler where each operation is defined
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(job_type: str):
+    """Register the decorated coroutine as the handler for `job_type`"""
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return register
+
+
+def dedup_key(job_type: str, params: Dict[str, Any]) -> str:
+    return f"{job_type}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+class JobRunner:
+    """Postgres-backed queue and in-process workers for background jobs"""
+
+    def __init__(self, max_workers: Optional[int] = None, heartbeat_seconds: Optional[float] = None,
+                 max_attempts: int = 3, handlers: Optional[Dict[str, JobHandler]] = None,
+                 reclaim_seconds: Optional[float] = None):
+        self.max_workers = max_workers or int(os.getenv('JOB_RUNNER_WORKERS', '2'))
+        self.heartbeat_seconds = heartbeat_seconds or float(os.getenv('JOB_HEARTBEAT_SECONDS', '5'))
+        self.reclaim_seconds = reclaim_seconds or float(os.getenv('JOB_RECLAIM_SECONDS', '60'))
+        self.max_attempts = max_attempts
+        self.handlers = JOB_HANDLERS if handlers is None else handlers
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self._table_ready = False
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+        self._reclaim_task: Optional[asyncio.Task] = None
+        self._wakeup = False
+
+    async def enqueue(self, job_type: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Job, bool]:
+        """
+        Queue a job; returns (job, created). When an identical job is already
+        queued or running, that job is returned with created=False.
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        params = params or {}
+        await self._ensure_table()
+
+        key = dedup_key(job_type, params)
+        job = await self._insert_job(job_type, params, key)
+        if job is not None:
+            logger.info(f"🗂️ Queued {job_type} job {job.id}")
+            return job, True
+
+        existing = await self._find_active(key)
+        if existing is not None:
+            logger.info(f"🗂️ {job_type} already {existing.status} as job {existing.id}")
+            return existing, False
+        # The other copy finished between the two statements
+        return await self.enqueue(job_type, params)
+
+    async def get(self, job_id: int) -> Optional[Job]:
+        await self._ensure_table()
+        return await self._load_job(job_id)
+
+    async def latest(self, job_type: str) -> Optional[Job]:
+        await self._ensure_table()
+        jobs = await self._list_jobs(job_type, 1)
+        return jobs[0] if jobs else None
+
+    async def list_jobs(self, job_type: Optional[str] = None, limit: int = 20) -> List[Job]:
+        await self._ensure_table()
+        return await self._list_jobs(job_type, limit)
+
+    async def cancel(self, job_id: int) -> Optional[Job]:
+        """Cancel a queued job now, or ask a running one to stop at its next heartbeat"""
+        await self._ensure_table()
+        job = await self._request_cancel(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            # Running here: no need to wait for the heartbeat
+            task.cancel()
+        return job
+
+    async def wait(self, job_id: int, poll_seconds: float = 2.0) -> Optional[Job]:
+        """Poll until the job finishes (for callers that still want a blocking request)"""
+        while True:
+            job = await self.get(job_id)
+            if job is None or job.is_finished:
+                return job
+            await asyncio.sleep(poll_seconds)
+
+    async def shutdown(self):
+        """
+        Stop this process's workers and periodic reclaim. Jobs they were running
+        stay 'running' in the table and are claimed again once their heartbeat
+        goes stale.
+        """
+        workers, self._workers = self._workers, []
+        if self._reclaim_task is not None:
+            workers.append(self._reclaim_task)
+            self._reclaim_task = None
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    
+    def schedule(self):
+        """Start workers (up to max_workers) to drain the queue in the background"""
+        self._wakeup = True
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.max_workers:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def start_periodic_reclaim(self):
+        """Call schedule() every reclaim_seconds until shutdown(), so abandoned jobs are picked up"""
+        if self._reclaim_task is None or self._reclaim_task.done():
+            self._reclaim_task = asyncio.create_task(self._reclaim_periodically())
+
+    async def _reclaim_periodically(self):
+        while True:
+            await asyncio.sleep(self.reclaim_seconds)
+            self.schedule()
+
+    async def _worker(self):
+        try:
+            while True:
+                if not await self.run_next():
+                    if not self._wakeup:
+                        return
+                    # Something was queued while this worker was looking; look again
+                    self._wakeup = False
+        except Exception as e:
+            logger.error(f"❌ Job worker stopped: {str(e)}")
+
+    async def run_next(self) -> bool:
+        """Claim and run one job; returns False when there was nothing to claim"""
+        await self._ensure_table()
+        job = await self._claim_job()
+        if job is None:
+            return False
+        await self._run_job(job)
+        return True
+
+    async def _run_job(self, job: Job):
+        handler = self.handlers.get(job.job_type)
+        context = JobContext(job)
+        if handler is None:
+            await self._finish(job.id, 'failed', context.progress, error=f"Unknown job type: {job.job_type}")
+            return
+
+        logger.info(f"▶️ Running {job.job_type} job {job.id} (attempt {job.attempts})")
+        task = asyncio.create_task(handler(context))
+        self._running[job.id] = task
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_seconds)
+                if done:
+                    break
+                if await self._heartbeat(job.id, context.progress):
+                    logger.info(f"⏹️ Cancelling {job.job_type} job {job.id}")
+                    task.cancel()
+            result = task.result()
+            await self._finish(job.id, 'succeeded', context.progress, result=result)
+            logger.info(f"✅ {job.job_type} job {job.id} succeeded")
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # This worker was cancelled (process shutdown), not the job: leave
+                # the job running in the table so it is claimed again
+                logger.info(f"⏸️ {job.job_type} job {job.id} interrupted; it will be picked up again")
+                raise
+            await self._finish(job.id, 'cancelled', context.progress, error='Cancelled')
+            logger.info(f"⏹️ {job.job_type} job {job.id} cancelled")
+        except Exception as e:
+            await self._finish(job.id, 'failed', context.progress, error=str(e))
+            logger.error(f"❌ {job.job_type} job {job.id} failed: {str(e)}")
+        finally:
+            if not task.done():
+                task.cancel()
+            self._running.pop(job.id, None)
+
+    @asynccontextmanager
+    async def _connect(self):
+        # Import here to avoid circular imports
+        from app.database import get_engine
+        engine = get_engine()
+        if engine is None:
+            raise RuntimeError("Database not configured")
+        async with engine.connect() as conn:
+            async with conn.begin():
+                yield conn
+
+    async def _ensure_table(self):
+        if self._table_ready:
+            return
+        async with self._connect() as conn:
+            await conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS background_jobs (
+                    id BIGSERIAL PRIMARY KEY,
+                    job_type VARCHAR(100) NOT NULL,
+                    params JSONB NOT NULL DEFAULT '{}',
+                    dedup_key TEXT NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    progress JSONB NOT NULL DEFAULT '{}',
+                    result JSONB,
+                    error TEXT,
+                    cancel_requested BOOLEAN NOT NULL DEFAULT false,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker_id VARCHAR(200),
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP WITH TIME ZONE,
+                    heartbeat_at TIMESTAMP WITH TIME ZONE,
+                    finished_at TIMESTAMP WITH TIME ZONE
+                )
+            """))
+            # At most one queued or running copy of each identical job
+            await conn.execute(text("""
+                CREATE UNIQUE INDEX IF NOT EXISTS ux_background_jobs_active_dedup
+                ON background_jobs (dedup_key) WHERE status IN ('queued', 'running')
+            """))
+            await conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_background_jobs_type
+                ON background_jobs (job_type, id DESC)
+            """))
+        self._table_ready = True
+
+    async def _insert_job(self, job_type: str, params: Dict[str, Any], key: str) -> Optional[Job]:
+        async with self._connect() as conn:
+            result = await conn.execute(text("""
+                INSERT INTO background_jobs (job_type, params, dedup_key)
+                VALUES (:job_type, CAST(:params AS JSONB), :dedup_key)
+                ON CONFLICT (dedup_key) WHERE status IN ('queued', 'running') DO NOTHING
+                RETURNING *
+            """), {'job_type': job_type, 'params': json.dumps(params, default=str), 'dedup_key': key})
+            return _job_from_row(result.mappings().first())
+
+    async def _find_active(self, key: str) -> Optional[Job]:
+        async with self._connect() as conn:
+            result = await conn.execute(text("""
+                SELECT * FROM background_jobs
+                WHERE dedup_key = :dedup_key AND status IN ('queued', 'running')
+            """), {'dedup_key': key})
+            return _job_from_row(result.mappings().first())
+
+    async def _claim_job(self) -> Optional[Job]:
+        """Mark the oldest queued (or abandoned) job as running here and return it"""
+        async with self._connect() as conn:
+            # Abandoned too many times: give up rather than crash another instance
+            await conn.execute(text(f"""
+                UPDATE background_jobs
+                SET status = 'failed', error = 'Worker stopped responding', finished_at = NOW()
+                WHERE status = 'running' AND attempts >= :max_attempts
+                  AND heartbeat_at < NOW() - INTERVAL '{STALE_HEARTBEAT_MINUTES} minutes'
+            """), {'max_attempts': self.max_attempts})
+            # Asked to cancel but its instance died before it could stop: finish it
+            # so it stops holding the dedup slot of identical jobs
+            await conn.execute(text(f"""
+                UPDATE background_jobs
+                SET status = 'cancelled', error = 'Cancelled', finished_at = NOW()
+                WHERE status = 'running' AND cancel_requested
+                  AND heartbeat_at < NOW() - INTERVAL '{STALE_HEARTBEAT_MINUTES} minutes'
+            """))
+            result = await conn.execute(text(f"""
+                UPDATE background_jobs
+                SET status = 'running', attempts = attempts + 1, worker_id = :worker_id,
+                    started_at = COALESCE(started_at, NOW()), heartbeat_at = NOW()
+                WHERE id = (
+                    SELECT id FROM background_jobs
+                    WHERE (status = 'queued'
+                           OR (status = 'running'
+                               AND heartbeat_at < NOW() - INTERVAL '{STALE_HEARTBEAT_MINUTES} minutes'))
+                      AND NOT cancel_requested
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            """), {'worker_id': self.worker_id})
+            return _job_from_row(result.mappings().first())
+
+    async def _heartbeat(self, job_id: int, progress: Dict[str, Any]) -> bool:
+        """Save progress; returns True when cancellation has been requested"""
+        async with self._connect() as conn:
+            result = await conn.execute(text("""
+                UPDATE background_jobs
+                SET progress = CAST(:progress AS JSONB), heartbeat_at = NOW()
+                WHERE id = :id
+                RETURNING cancel_requested
+            """), {'id': job_id, 'progress': json.dumps(progress, default=str)})
+            return bool(result.scalar())
+
+    async def _finish(self, job_id: int, status: str, progress: Dict[str, Any],
+                      result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        async with self._connect() as conn:
+            await conn.execute(text("""
+                UPDATE background_jobs
+                SET status = :status, progress = CAST(:progress AS JSONB), result = CAST(:result AS JSONB),
+                    error = :error, finished_at = NOW(), heartbeat_at = NOW()
+                WHERE id = :id
+            """), {
+                'id': job_id,
+                'status': status,
+                'progress': json.dumps(progress, default=str),
+                'result': json.dumps(result, default=str) if result is not None else None,
+                'error': error
+            })
+
+    async def _request_cancel(self, job_id: int) -> Optional[Job]:
+        async with self._connect() as conn:
+            result = await conn.execute(text("""
+                UPDATE background_jobs
+                SET cancel_requested = true,
+                    status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN status = 'queued' THEN NOW() ELSE finished_at END
+                WHERE id = :id
+                RETURNING *
+            """), {'id': job_id})
+            return _job_from_row(result.mappings().first())
+
+    async def _load_job(self, job_id: int) -> Optional[Job]:
+        async with self._connect() as conn:
+            result = await conn.execute(text("SELECT * FROM background_jobs WHERE id = :id"), {'id': job_id})
+            return _job_from_row(result.mappings().first())
+
+    async def _list_jobs(self, job_type: Optional[str], limit: int) -> List[Job]:
+        async with self._connect() as conn:
+            result = await conn.execute(text("""
+                SELECT * FROM background_jobs
+                WHERE CAST(:job_type AS VARCHAR) IS NULL OR job_type = :job_type
+                ORDER BY id DESC
+                LIMIT :limit
+            """), {'job_type': job_type, 'limit': limit})
+            return [_job_from_row(row) for row in result.mappings().all()]
+
+
+def _json_column(value: Any) -> Any:
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _job_from_row(row) -> Optional[Job]:
+    if row is None:
+        return None
+    return Job(
+        id=row['id'],
+        job_type=row['job_type'],
+        params=_json_column(row['params']) or {},
+        status=row['status'],
+        progress=_json_column(row['progress']) or {},
+        result=_json_column(row['result']),
+        error=row['error'],
+        cancel_requested=row['cancel_requested'],
+        attempts=row['attempts'],
+        created_at=row['created_at'],
+        started_at=row['started_at'],
+        finished_at=row['finished_at']
+    )
+
+
+_job_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> JobRunner:
+    """Process-wide job runner, so every endpoint shares one set of workers"""
+    global _job_runner
+    if _job_runner is None:
+        _job_runner = JobRunner()
+    return _job_runner
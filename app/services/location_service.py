@@ -10,7 +10,6 @@ from app.database.models.catalog import CatalogInventory, CatalogItem, CatalogVa
 from app.database.models.weather import DailyWeather
 from app.services.weather_service import WeatherService
 from app.services.square_service import SquareService
-from app.utils.timezone import convert_utc_to_central
 from app.logger import logger
 
 
@@ -123,31 +122,29 @@ class LocationService:
             # Also exclude $0 orders (no sale transactions to open cash drawer)
             query = """
                 SELECT 
-                    COUNT(*) as total_orders,
-                    COUNT(CASE WHEN state = 'COMPLETED' THEN 1 END) as completed_orders,
+                    COALESCE(SUM(dls.completed_orders - dls.zero_amount_orders), 0) as total_orders,
+                    COALESCE(SUM(dls.completed_orders - dls.zero_amount_orders), 0) as completed_orders,
+                    CAST(COALESCE(SUM(dls.gross_sales_cents), 0) AS BIGINT) as total_sales_cents,
                     COALESCE(SUM(CASE 
-                        WHEN state = 'COMPLETED' AND total_money IS NOT NULL 
-                        THEN CAST(total_money->>'amount' AS INTEGER) 
+                        WHEN dls.sale_date >= CURRENT_DATE - 30 
+                        THEN dls.completed_orders - dls.zero_amount_orders 
                         ELSE 0 
-                    END), 0) as total_sales_cents,
-                    COUNT(CASE WHEN created_at >= CURRENT_DATE - INTERVAL '30 days' THEN 1 END) as orders_last_30_days,
-                    COALESCE(SUM(CASE 
-                        WHEN created_at >= CURRENT_DATE - INTERVAL '30 days' 
-                        AND state = 'COMPLETED' 
-                        AND total_money IS NOT NULL 
-                        THEN CAST(total_money->>'amount' AS INTEGER) 
+                    END), 0) as orders_last_30_days,
+                    CAST(COALESCE(SUM(CASE 
+                        WHEN dls.sale_date >= CURRENT_DATE - 30 
+                        THEN dls.gross_sales_cents 
                         ELSE 0 
-                    END), 0) as sales_last_30_days_cents
-                FROM orders 
-                WHERE location_id = :location_id 
-                AND EXTRACT(YEAR FROM created_at) = :current_year
-                AND NOT (EXTRACT(MONTH FROM created_at) = 1 AND EXTRACT(DAY FROM created_at) = 1)
-                AND (total_money IS NULL OR CAST(total_money->>'amount' AS INTEGER) > 0)
+                    END), 0) AS BIGINT) as sales_last_30_days_cents
+                FROM daily_location_sales dls 
+                WHERE dls.location_id = :location_id 
+                AND dls.sale_date > :new_years_day
+                AND dls.sale_date < :next_new_years_day
             """
             
             result = await session.execute(text(query), {
                 "location_id": location_id,
-                "current_year": current_year
+                "new_years_day": date(current_year, 1, 1),
+                "next_new_years_day": date(current_year + 1, 1, 1)
             })
             row = result.fetchone()
             
@@ -194,25 +191,21 @@ class LocationService:
             # Also exclude $0 orders (no sale transactions to open cash drawer)
             query = """
                 SELECT 
-                    EXTRACT(YEAR FROM created_at) as year,
-                    COUNT(*) as total_orders,
-                    COUNT(CASE WHEN state = 'COMPLETED' THEN 1 END) as completed_orders,
-                    COALESCE(SUM(CASE 
-                        WHEN state = 'COMPLETED' AND total_money IS NOT NULL 
-                        THEN CAST(total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) as total_sales_cents
-                FROM orders 
-                WHERE location_id = :location_id 
-                AND NOT (EXTRACT(YEAR FROM created_at) = :current_year AND EXTRACT(MONTH FROM created_at) = 1 AND EXTRACT(DAY FROM created_at) = 1)
-                AND (total_money IS NULL OR CAST(total_money->>'amount' AS INTEGER) > 0)
-                GROUP BY EXTRACT(YEAR FROM created_at)
+                    EXTRACT(YEAR FROM dls.sale_date) as year,
+                    SUM(dls.completed_orders - dls.zero_amount_orders) as total_orders,
+                    SUM(dls.completed_orders - dls.zero_amount_orders) as completed_orders,
+                    CAST(SUM(dls.gross_sales_cents) AS BIGINT) as total_sales_cents
+                FROM daily_location_sales dls 
+                WHERE dls.location_id = :location_id 
+                AND dls.sale_date <> :new_years_day
+                GROUP BY EXTRACT(YEAR FROM dls.sale_date)
+                HAVING SUM(dls.completed_orders - dls.zero_amount_orders) > 0
                 ORDER BY year DESC
             """
             
             result = await session.execute(text(query), {
                 "location_id": location_id,
-                "current_year": datetime.now().year
+                "new_years_day": date(datetime.now().year, 1, 1)
             })
             
             yearly_data = []
@@ -257,25 +250,24 @@ class LocationService:
             current_year = datetime.now().year
             current_date = datetime.now().date()
             
-            # Get orders from current year only (no January from next year for New Years Eve)
+            # Get days from current year only (no January from next year for New Years Eve)
             # Also exclude $0 orders (no sale transactions to open cash drawer)
             query = """
                 SELECT 
-                    created_at,
-                    CASE WHEN state = 'COMPLETED' AND total_money IS NOT NULL 
-                         THEN CAST(total_money->>'amount' AS INTEGER) 
-                         ELSE 0 END as amount_cents
-                FROM orders 
-                WHERE location_id = :location_id 
-                AND EXTRACT(YEAR FROM created_at) = :current_year
-                AND state = 'COMPLETED'
-                AND (total_money IS NULL OR CAST(total_money->>'amount' AS INTEGER) > 0)
-                ORDER BY created_at
+                    dls.sale_date,
+                    dls.completed_orders - dls.zero_amount_orders as orders,
+                    dls.gross_sales_cents as amount_cents
+                FROM daily_location_sales dls 
+                WHERE dls.location_id = :location_id 
+                AND dls.sale_date >= :new_years_day
+                AND dls.sale_date < :next_new_years_day
+                ORDER BY dls.sale_date
             """
             
             result = await session.execute(text(query), {
                 "location_id": location_id,
-                "current_year": current_year
+                "new_years_day": date(current_year, 1, 1),
+                "next_new_years_day": date(current_year + 1, 1, 1)
             })
             
             # Initialize seasonal totals based on firework business seasons
@@ -289,20 +281,16 @@ class LocationService:
                 'Off Season': {'sales': 0, 'orders': 0}
             }
             
-            # Process each order
+            # Process each day (sale dates are already in Central time)
             for row in result.fetchall():
-                created_at, amount_cents = row
-                if created_at:
-                    # Convert to central time and categorize by season
-                    central_dt = convert_utc_to_central(created_at)
-                    order_date = central_dt.date()
-                    season = self._categorize_season(order_date)
-                    
-                    # Add to seasonal totals if it's a valid season for current year
-                    # Exclude New Years Eve from current year since it belongs to previous year
-                    if season in seasons and season != 'New Years Eve':
-                        seasons[season]['sales'] += (amount_cents or 0) / 100
-                        seasons[season]['orders'] += 1
+                sale_date, orders, amount_cents = row
+                season = self._categorize_season(sale_date)
+                
+                # Add to seasonal totals if it's a valid season for current year
+                # Exclude New Years Eve from current year since it belongs to previous year
+                if season in seasons and season != 'New Years Eve':
+                    seasons[season]['sales'] += (amount_cents or 0) / 100
+                    seasons[season]['orders'] += orders
             
             # Remove seasons that haven't started yet this year
             seasons_to_remove = []
@@ -332,24 +320,19 @@ class LocationService:
             # Note: Only exclude Jan 1st from current year for New Years Eve attribution
             query = """
                 SELECT 
-                    EXTRACT(YEAR FROM created_at) as year,
-                    COUNT(*) as total_orders,
-                    COALESCE(SUM(CASE 
-                        WHEN state = 'COMPLETED' AND total_money IS NOT NULL 
-                        THEN CAST(total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) as total_sales_cents
-                FROM orders 
-                WHERE location_id = :location_id 
-                AND state = 'COMPLETED'
-                AND NOT (EXTRACT(YEAR FROM created_at) = :current_year AND EXTRACT(MONTH FROM created_at) = 1 AND EXTRACT(DAY FROM created_at) = 1)
-                GROUP BY EXTRACT(YEAR FROM created_at)
+                    EXTRACT(YEAR FROM dls.sale_date) as year,
+                    SUM(dls.completed_orders) as total_orders,
+                    CAST(SUM(dls.gross_sales_cents) AS BIGINT) as total_sales_cents
+                FROM daily_location_sales dls 
+                WHERE dls.location_id = :location_id 
+                AND dls.sale_date <> :new_years_day
+                GROUP BY EXTRACT(YEAR FROM dls.sale_date)
                 ORDER BY year
             """
             
             result = await session.execute(text(query), {
                 "location_id": location_id,
-                "current_year": datetime.now().year
+                "new_years_day": date(datetime.now().year, 1, 1)
             })
             
             yearly_data = []
@@ -392,59 +375,50 @@ class LocationService:
             # Note: Only exclude Jan 1st from current year for New Years Eve attribution
             query = """
                 SELECT 
-                    EXTRACT(YEAR FROM created_at) as year,
-                    created_at,
-                    CASE WHEN state = 'COMPLETED' AND total_money IS NOT NULL 
-                         THEN CAST(total_money->>'amount' AS INTEGER) 
-                         ELSE 0 END as amount_cents
-                FROM orders 
-                WHERE location_id = :location_id 
-                AND state = 'COMPLETED'
-                AND NOT (EXTRACT(YEAR FROM created_at) = :current_year AND EXTRACT(MONTH FROM created_at) = 1 AND EXTRACT(DAY FROM created_at) = 1)
-                ORDER BY year, created_at
+                    dls.sale_date,
+                    dls.completed_orders,
+                    dls.gross_sales_cents as amount_cents
+                FROM daily_location_sales dls 
+                WHERE dls.location_id = :location_id 
+                AND dls.sale_date <> :new_years_day
+                ORDER BY dls.sale_date
             """
             
             result = await session.execute(text(query), {
                 "location_id": location_id,
-                "current_year": datetime.now().year
+                "new_years_day": date(datetime.now().year, 1, 1)
             })
             
-            # Group orders by year and season with detailed metrics
+            # Group days by year and season with detailed metrics
             yearly_seasonal_data = {}
             
             for row in result.fetchall():
-                year, created_at, amount_cents = row
-                # Convert year to int to avoid Decimal JSON serialization issues
-                year = int(year) if year is not None else None
-                if created_at and year:
-                    # Convert to central time and categorize by season
-                    central_dt = convert_utc_to_central(created_at)
-                    order_date = central_dt.date()
-                    season = self._categorize_season(order_date)
-                    
-                    # Skip New Years Eve for current year (belongs to previous year)
-                    if season == 'New Years Eve' and year == datetime.now().year:
-                        continue
-                    
-                    # Skip off-season orders for cleaner chart
-                    if season == 'Off Season':
-                        continue
-                    
-                    if year not in yearly_seasonal_data:
-                        yearly_seasonal_data[year] = {}
-                    
-                    if season not in yearly_seasonal_data[year]:
-                        yearly_seasonal_data[year][season] = {
-                            'total_sales': 0,
-                            'order_count': 0,
-                            'orders': []
-                        }
-                    
-                    # Convert amount_cents to float to avoid Decimal JSON serialization issues
-                    amount_value = float(amount_cents) if amount_cents is not None else 0
-                    yearly_seasonal_data[year][season]['total_sales'] += amount_value / 100
-                    yearly_seasonal_data[year][season]['order_count'] += 1
-                    yearly_seasonal_data[year][season]['orders'].append(amount_value / 100)
+                sale_date, orders, amount_cents = row
+                year = sale_date.year
+                # Sale dates are already in Central time
+                season = self._categorize_season(sale_date)
+                
+                # Skip New Years Eve for current year (belongs to previous year)
+                if season == 'New Years Eve' and year == datetime.now().year:
+                    continue
+                
+                # Skip off-season orders for cleaner chart
+                if season == 'Off Season':
+                    continue
+                
+                if year not in yearly_seasonal_data:
+                    yearly_seasonal_data[year] = {}
+                
+                if season not in yearly_seasonal_data[year]:
+                    yearly_seasonal_data[year][season] = {
+                        'total_sales': 0,
+                        'order_count': 0
+                    }
+                
+                # Convert amount_cents to float to avoid Decimal JSON serialization issues
+                amount_value = float(amount_cents) if amount_cents is not None else 0
+                yearly_seasonal_data[year][season]['total_sales'] += amount_value / 100
+                yearly_seasonal_data[year][season]['order_count'] += orders
             
             # Format data for the chart with enhanced metrics
             annual_data = []
@@ -559,26 +533,17 @@ class LocationService:
             query = """
                 SELECT 
                     os.name,
-                    COUNT(o.id) as total_orders,
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) as total_sales_cents,
-                    AVG(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END) as avg_order_value_cents
+                    COALESCE(SUM(dls.completed_orders), 0) as total_orders,
+                    CAST(COALESCE(SUM(dls.gross_sales_cents), 0) AS BIGINT) as total_sales_cents,
+                    SUM(dls.gross_sales_cents) / NULLIF(SUM(dls.completed_orders), 0) as avg_order_value_cents
                 FROM operating_seasons os
-                LEFT JOIN orders o ON 
-                    o.location_id = :location_id
-                    AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date 
-                    AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                    AND o.state = 'COMPLETED'
+                LEFT JOIN daily_location_sales dls ON 
+                    dls.location_id = :location_id
+                    AND dls.sale_date >= os.start_date 
+                    AND dls.sale_date <= os.end_date
                 WHERE EXTRACT(YEAR FROM os.start_date) >= 2018  -- All available historical data
                 GROUP BY os.name
-                HAVING COUNT(o.id) > 0  -- Only include seasons with orders
+                HAVING COALESCE(SUM(dls.completed_orders), 0) > 0  -- Only include seasons with orders
                 ORDER BY total_sales_cents DESC, total_orders DESC
             """
             
@@ -731,18 +696,17 @@ class LocationService:
             # Aggregate year-to-date sales across all locations from database
             year_query = """
                 SELECT 
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) as total_sales,
-                    COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as total_orders
-                FROM orders o
-                WHERE EXTRACT(YEAR FROM (o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago')) = :current_year
-                AND o.state = 'COMPLETED'
+                    COALESCE(SUM(dls.gross_sales_cents), 0) as total_sales,
+                    COALESCE(SUM(dls.completed_orders), 0) as total_orders
+                FROM daily_location_sales dls
+                WHERE dls.sale_date >= :year_start
+                AND dls.sale_date < :next_year_start
             """
             
-            result = await session.execute(text(year_query), {"current_year": current_year})
+            result = await session.execute(text(year_query), {
+                "year_start": date(current_year, 1, 1),
+                "next_year_start": date(current_year + 1, 1, 1)
+            })
             year_row = result.fetchone()
             year_sales = 0
             year_orders = 0
@@ -859,16 +823,11 @@ class LocationService:
                     -- Get total sales per year for this season across ALL locations
                     SELECT 
                         EXTRACT(YEAR FROM os.start_date) as season_year,
-                        COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                            ELSE 0 
-                        END), 0) as total_season_sales
+                        COALESCE(SUM(dls.gross_sales_cents), 0) as total_season_sales
                     FROM operating_seasons os
-                    LEFT JOIN orders o ON 
-                        CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                        AND o.state = 'COMPLETED'
+                    LEFT JOIN daily_location_sales dls ON 
+                        dls.sale_date >= os.start_date
+                        AND dls.sale_date <= os.end_date
                     WHERE os.name = :season_name
                     AND EXTRACT(YEAR FROM os.start_date) BETWEEN 2018 AND 2025
                     GROUP BY EXTRACT(YEAR FROM os.start_date)
@@ -876,28 +835,20 @@ class LocationService:
                 daily_season_data AS (
                     SELECT 
                         EXTRACT(YEAR FROM os.start_date) as season_year,
-                        (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) as day_in_season,
-                        COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                            ELSE 0 
-                        END), 0) as daily_sales,
-                        COUNT(CASE 
-                            WHEN o.state = 'COMPLETED' 
-                            THEN 1 
-                        END) as daily_orders
+                        (dls.sale_date - os.start_date + 1) as day_in_season,
+                        SUM(dls.gross_sales_cents) as daily_sales,
+                        SUM(dls.completed_orders) as daily_orders
                     FROM operating_seasons os
-                    LEFT JOIN orders o ON 
-                        CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                        AND o.state = 'COMPLETED'
+                    JOIN daily_location_sales dls ON 
+                        dls.sale_date >= os.start_date
+                        AND dls.sale_date <= os.end_date
+                        AND dls.sale_date - os.start_date + 1 <= :current_day
                     WHERE os.name = :season_name
                     AND EXTRACT(YEAR FROM os.start_date) BETWEEN 2018 AND 2025
                     GROUP BY 
                         EXTRACT(YEAR FROM os.start_date),
-                        CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE),
+                        dls.sale_date,
                         os.start_date
-                    HAVING (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) <= :current_day
                 )
                 SELECT 
                     dsd.day_in_season,
@@ -959,75 +910,70 @@ class LocationService:
             current_time_of_day = current_central_time.time()
             current_date = current_central_time.date()
             
-            # Get cumulative progress for each year across ALL locations
+            # Get cumulative progress for each year across ALL locations. Whole days
+            # come from the daily rollup; only the current day of past seasons is
+            # cut off at the current time of day, so that slice reads orders.
             query = """
-                WITH season_cumulative AS (
+                WITH full_days AS (
                     SELECT 
                         EXTRACT(YEAR FROM os.start_date) as season_year,
                         COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            AND (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) <= :current_day
-                            AND (
-                                -- For historical years: apply time filter only to the current day of season
-                                EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
-                                AND (
-                                    (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) < :current_day
-                                    OR (
-                                        (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) = :current_day
-                                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS TIME) <= :current_time_of_day
-                                    )
-                                )
-                                OR
-                                -- For current year: include all orders (they're naturally limited by current time)
-                                EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
-                            )
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
+                            WHEN (dls.sale_date - os.start_date + 1) < :current_day
+                            AND EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
+                            OR (dls.sale_date - os.start_date + 1) <= :current_day
+                            AND EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
+                            THEN dls.gross_sales_cents 
                             ELSE 0 
                         END), 0) as cumulative_sales,
-                        COUNT(CASE 
-                            WHEN o.state = 'COMPLETED' 
-                            AND (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) <= :current_day
-                            AND (
-                                -- For historical years: apply time filter only to the current day of season
-                                EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
-                                AND (
-                                    (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) < :current_day
-                                    OR (
-                                        (CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) - os.start_date + 1) = :current_day
-                                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS TIME) <= :current_time_of_day
-                                    )
-                                )
-                                OR
-                                -- For current year: include all orders (they're naturally limited by current time)
-                                EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
-                            )
-                            THEN 1 
-                        END) as cumulative_orders
+                        COALESCE(SUM(CASE 
+                            WHEN (dls.sale_date - os.start_date + 1) < :current_day
+                            AND EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
+                            OR (dls.sale_date - os.start_date + 1) <= :current_day
+                            AND EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
+                            THEN dls.completed_orders 
+                            ELSE 0 
+                        END), 0) as cumulative_orders,
+                        COALESCE(SUM(dls.gross_sales_cents), 0) as total_season_sales
+                    FROM operating_seasons os
+                    LEFT JOIN daily_location_sales dls ON 
+                        dls.sale_date >= os.start_date
+                        AND dls.sale_date <= os.end_date
+                    WHERE os.name = :season_name
+                    AND EXTRACT(YEAR FROM os.start_date) BETWEEN 2018 AND 2025
+                    GROUP BY EXTRACT(YEAR FROM os.start_date)
+                ),
+                partial_day AS (
+                    -- For historical years: the current day of season up to the current time of day
+                    SELECT 
+                        EXTRACT(YEAR FROM os.start_date) as season_year,
+                        COALESCE(SUM(CAST(o.total_money->>'amount' AS BIGINT)), 0) as partial_sales,
+                        COUNT(*) as partial_orders
                     FROM operating_seasons os
-                    LEFT JOIN orders o ON 
-                        CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
+                    JOIN orders o ON 
+                        o.created_at >= ((os.start_date + INTERVAL '1 day' * (:current_day - 1)) AT TIME ZONE 'America/Chicago' AT TIME ZONE 'UTC')
+                        AND o.created_at < ((os.start_date + INTERVAL '1 day' * :current_day) AT TIME ZONE 'America/Chicago' AT TIME ZONE 'UTC')
                         AND o.state = 'COMPLETED'
+                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS TIME) <= :current_time_of_day
                     WHERE os.name = :season_name
                     AND EXTRACT(YEAR FROM os.start_date) BETWEEN 2018 AND 2025
+                    AND EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
+                    AND :current_day >= 1
+                    AND os.start_date + INTERVAL '1 day' * (:current_day - 1) <= os.end_date
                     GROUP BY EXTRACT(YEAR FROM os.start_date)
-                    HAVING COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) > 0  -- Only include years with sales
                 )
                 SELECT 
-                    season_year,
-                    cumulative_sales / 100.0 as total_sales,
-                    cumulative_orders as total_orders,
+                    fd.season_year,
+                    (fd.cumulative_sales + COALESCE(pd.partial_sales, 0)) / 100.0 as total_sales,
+                    fd.cumulative_orders + COALESCE(pd.partial_orders, 0) as total_orders,
                     CASE 
-                        WHEN cumulative_orders > 0 
-                        THEN ROUND((cumulative_sales / 100.0) / cumulative_orders, 2)
+                        WHEN fd.cumulative_orders + COALESCE(pd.partial_orders, 0) > 0 
+                        THEN ROUND(((fd.cumulative_sales + COALESCE(pd.partial_sales, 0)) / 100.0) / (fd.cumulative_orders + COALESCE(pd.partial_orders, 0)), 2)
                         ELSE 0 
                     END as avg_per_order
-                FROM season_cumulative
-                ORDER BY season_year
+                FROM full_days fd
+                LEFT JOIN partial_day pd ON pd.season_year = fd.season_year
+                WHERE fd.total_season_sales > 0  -- Only include years with sales
+                ORDER BY fd.season_year
             """
             
             result = await session.execute(text(query), {
@@ -1088,19 +1034,14 @@ class LocationService:
             query = """
                 SELECT 
                     os.name as season_name,
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) / 100.0 as total_sales,
-                    COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as total_orders,
+                    COALESCE(SUM(dls.gross_sales_cents), 0) / 100.0 as total_sales,
+                    COALESCE(SUM(dls.completed_orders), 0) as total_orders,
                     os.start_date,
                     os.end_date
                 FROM operating_seasons os
-                LEFT JOIN orders o ON 
-                    CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                    AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                    AND o.state = 'COMPLETED'
+                LEFT JOIN daily_location_sales dls ON 
+                    dls.sale_date >= os.start_date
+                    AND dls.sale_date <= os.end_date
                 WHERE EXTRACT(YEAR FROM os.start_date) = 2025
                 GROUP BY os.name, os.start_date, os.end_date
                 ORDER BY os.start_date
@@ -1144,22 +1085,14 @@ class LocationService:
             # Get yearly totals across ALL locations
             query = """
                 SELECT 
-                    EXTRACT(YEAR FROM (o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago')) as year,
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) / 100.0 as total_sales,
-                    COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as total_orders
-                FROM orders o
-                WHERE o.state = 'COMPLETED'
-                AND EXTRACT(YEAR FROM (o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago')) BETWEEN 2018 AND 2025
-                GROUP BY EXTRACT(YEAR FROM (o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago'))
-                HAVING COALESCE(SUM(CASE 
-                    WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                    THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                    ELSE 0 
-                END), 0) > 0
+                    EXTRACT(YEAR FROM dls.sale_date) as year,
+                    SUM(dls.gross_sales_cents) / 100.0 as total_sales,
+                    SUM(dls.completed_orders) as total_orders
+                FROM daily_location_sales dls
+                WHERE dls.sale_date >= DATE '2018-01-01'
+                AND dls.sale_date < DATE '2026-01-01'
+                GROUP BY EXTRACT(YEAR FROM dls.sale_date)
+                HAVING SUM(dls.gross_sales_cents) > 0
                 ORDER BY year
             """
             
@@ -1208,26 +1141,17 @@ class LocationService:
                 SELECT 
                     os.name as season_name,
                     EXTRACT(YEAR FROM os.start_date) as season_year,
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) / 100.0 as total_sales,
-                    COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as total_orders,
+                    COALESCE(SUM(dls.gross_sales_cents), 0) / 100.0 as total_sales,
+                    COALESCE(SUM(dls.completed_orders), 0) as total_orders,
                     os.start_date,
                     os.end_date
                 FROM operating_seasons os
-                LEFT JOIN orders o ON 
-                    CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                    AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                    AND o.state = 'COMPLETED'
+                LEFT JOIN daily_location_sales dls ON 
+                    dls.sale_date >= os.start_date
+                    AND dls.sale_date <= os.end_date
                 WHERE EXTRACT(YEAR FROM os.start_date) BETWEEN 2018 AND 2025
                 GROUP BY os.name, os.start_date, os.end_date
-                HAVING COALESCE(SUM(CASE 
-                    WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                    THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                    ELSE 0 
-                END), 0) > 0
+                HAVING COALESCE(SUM(dls.gross_sales_cents), 0) > 0
                 ORDER BY os.start_date
             """
             
@@ -1386,18 +1310,17 @@ class LocationService:
                 # Fall back to year-to-date data if no current season
                 ytd_query = """
                     SELECT 
-                        COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                            ELSE 0 
-                        END), 0) as total_sales,
-                        COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as total_orders
-                    FROM orders o
-                    WHERE EXTRACT(YEAR FROM (o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago')) = :current_year
-                    AND o.state = 'COMPLETED'
+                        COALESCE(SUM(dls.gross_sales_cents), 0) as total_sales,
+                        COALESCE(SUM(dls.completed_orders), 0) as total_orders
+                    FROM daily_location_sales dls
+                    WHERE dls.sale_date >= :year_start
+                    AND dls.sale_date < :next_year_start
                 """
                 
-                result = await session.execute(text(ytd_query), {'current_year': current_year})
+                result = await session.execute(text(ytd_query), {
+                    'year_start': date(current_year, 1, 1),
+                    'next_year_start': date(current_year + 1, 1, 1)
+                })
                 row = result.fetchone()
                 
                 if row:
@@ -1414,16 +1337,11 @@ class LocationService:
             # Get sales from current season so far (same logic for all years including 2025)
             season_data_query = """
                 SELECT 
-                    COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) as total_sales,
-                    COUNT(CASE WHEN o.state = 'COMPLETED' THEN 1 END) as total_orders
-                FROM orders o
-                WHERE CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= :season_start
-                AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= :season_end
-                AND o.state = 'COMPLETED'
+                    COALESCE(SUM(dls.gross_sales_cents), 0) as total_sales,
+                    COALESCE(SUM(dls.completed_orders), 0) as total_orders
+                FROM daily_location_sales dls
+                WHERE dls.sale_date >= :season_start
+                AND dls.sale_date <= :season_end
             """
             
             result = await session.execute(text(season_data_query), {
@@ -1724,26 +1642,16 @@ class LocationService:
                     -- First, get total sales per year for this season to filter out years with no sales
                     SELECT 
                         EXTRACT(YEAR FROM os.start_date) as season_year,
-                        COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                            ELSE 0 
-                        END), 0) as total_season_sales
+                        COALESCE(SUM(dls.gross_sales_cents), 0) as total_season_sales
                     FROM operating_seasons os
-                    LEFT JOIN orders o ON 
-                        o.location_id = :location_id
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                        AND o.state = 'COMPLETED'
-                        AND (o.total_money IS NULL OR CAST(o.total_money->>'amount' AS INTEGER) > 0)
+                    LEFT JOIN daily_location_sales dls ON 
+                        dls.location_id = :location_id
+                        AND dls.sale_date >= os.start_date
+                        AND dls.sale_date <= os.end_date
                     WHERE os.name = :season_name
                     AND EXTRACT(YEAR FROM os.start_date) >= 2018
                     GROUP BY EXTRACT(YEAR FROM os.start_date)
-                    HAVING COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) > 0 
+                    HAVING COALESCE(SUM(dls.gross_sales_cents), 0) > 0 
                     OR EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)  -- Always include current year
                 ),
                 season_days AS (
@@ -1770,21 +1678,12 @@ class LocationService:
                         sd.season_year,
                         sd.day_number,
                         sd.day_date,
-                        COUNT(CASE 
-                            WHEN o.state = 'COMPLETED' 
-                            THEN 1 
-                        END) as orders,
-                        COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                            ELSE 0 
-                        END), 0) as sales_cents
+                        COALESCE(SUM(dls.completed_orders - dls.zero_amount_orders), 0) as orders,
+                        COALESCE(SUM(dls.gross_sales_cents), 0) as sales_cents
                     FROM season_days sd
-                    LEFT JOIN orders o ON 
-                        o.location_id = :location_id
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) = sd.day_date
-                        AND o.state = 'COMPLETED'
-                        AND (o.total_money IS NULL OR CAST(o.total_money->>'amount' AS INTEGER) > 0)
+                    LEFT JOIN daily_location_sales dls ON 
+                        dls.location_id = :location_id
+                        AND dls.sale_date = sd.day_date
                     WHERE sd.day_number <= :current_day
                     GROUP BY sd.season_year, sd.day_number, sd.day_date
                     ORDER BY sd.day_number, sd.season_year DESC
@@ -1848,82 +1747,79 @@ class LocationService:
                     -- First, get total sales per year for this season to filter out years with no sales
                     SELECT 
                         EXTRACT(YEAR FROM os.start_date) as season_year,
-                        COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                            ELSE 0 
-                        END), 0) as total_season_sales
+                        COALESCE(SUM(dls.gross_sales_cents), 0) as total_season_sales
                     FROM operating_seasons os
-                    LEFT JOIN orders o ON 
-                        o.location_id = :location_id
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.end_date
-                        AND o.state = 'COMPLETED'
-                        AND (o.total_money IS NULL OR CAST(o.total_money->>'amount' AS INTEGER) > 0)
+                    LEFT JOIN daily_location_sales dls ON 
+                        dls.location_id = :location_id
+                        AND dls.sale_date >= os.start_date
+                        AND dls.sale_date <= os.end_date
                     WHERE os.name = :season_name
                     AND EXTRACT(YEAR FROM os.start_date) >= 2018
                     GROUP BY EXTRACT(YEAR FROM os.start_date)
-                    HAVING COALESCE(SUM(CASE 
-                        WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                        THEN CAST(o.total_money->>'amount' AS INTEGER) 
-                        ELSE 0 
-                    END), 0) > 0 
+                    HAVING COALESCE(SUM(dls.gross_sales_cents), 0) > 0 
                     OR EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)  -- Always include current year
                 ),
-                season_cumulative AS (
+                full_days AS (
+                    -- Whole days come from the daily rollup; for historical years the
+                    -- current day of season is left to partial_day below
                     SELECT 
                         EXTRACT(YEAR FROM os.start_date) as season_year,
-                        os.start_date,
-                        os.start_date + INTERVAL '1 day' * (:current_day - 1) as end_date_for_comparison,
-                        COUNT(CASE 
-                            WHEN o.state = 'COMPLETED' 
-                            AND (
-                                -- For historical years: apply time filter only to the current day of season
-                                EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
-                                AND (
-                                    CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) < (os.start_date + INTERVAL '1 day' * (:current_day - 1))
-                                    OR (
-                                        CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) = (os.start_date + INTERVAL '1 day' * (:current_day - 1))
-                                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS TIME) <= :current_time_of_day
-                                    )
-                                )
-                                OR
-                                -- For current year: include all orders (they're naturally limited by current time)
-                                EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
-                            )
-                            THEN 1 
-                        END) as total_orders,
                         COALESCE(SUM(CASE 
-                            WHEN o.state = 'COMPLETED' AND o.total_money IS NOT NULL 
-                            AND (
-                                -- For historical years: apply time filter only to the current day of season
-                                EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
-                                AND (
-                                    CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) < (os.start_date + INTERVAL '1 day' * (:current_day - 1))
-                                    OR (
-                                        CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) = (os.start_date + INTERVAL '1 day' * (:current_day - 1))
-                                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS TIME) <= :current_time_of_day
-                                    )
-                                )
-                                OR
-                                -- For current year: include all orders (they're naturally limited by current time)
-                                EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
-                            )
-                            THEN CAST(o.total_money->>'amount' AS INTEGER) 
+                            WHEN EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
+                            OR dls.sale_date < os.start_date + INTERVAL '1 day' * (:current_day - 1)
+                            THEN dls.completed_orders - dls.zero_amount_orders 
+                            ELSE 0 
+                        END), 0) as total_orders,
+                        COALESCE(SUM(CASE 
+                            WHEN EXTRACT(YEAR FROM os.start_date) = EXTRACT(YEAR FROM CURRENT_DATE)
+                            OR dls.sale_date < os.start_date + INTERVAL '1 day' * (:current_day - 1)
+                            THEN dls.gross_sales_cents 
                             ELSE 0 
                         END), 0) as total_sales_cents
                     FROM operating_seasons os
                     INNER JOIN season_totals st ON st.season_year = EXTRACT(YEAR FROM os.start_date)
-                    LEFT JOIN orders o ON 
+                    LEFT JOIN daily_location_sales dls ON 
+                        dls.location_id = :location_id
+                        AND dls.sale_date >= os.start_date
+                        AND dls.sale_date <= os.start_date + INTERVAL '1 day' * (:current_day - 1)
+                    WHERE os.name = :season_name
+                    AND EXTRACT(YEAR FROM os.start_date) >= 2018
+                    AND EXTRACT(YEAR FROM os.start_date) <= EXTRACT(YEAR FROM CURRENT_DATE)
+                    GROUP BY EXTRACT(YEAR FROM os.start_date)
+                ),
+                partial_day AS (
+                    -- For historical years: the current day of season up to the current time of day
+                    SELECT 
+                        EXTRACT(YEAR FROM os.start_date) as season_year,
+                        COUNT(*) as partial_orders,
+                        COALESCE(SUM(CAST(o.total_money->>'amount' AS BIGINT)), 0) as partial_sales_cents
+                    FROM operating_seasons os
+                    JOIN orders o ON 
                         o.location_id = :location_id
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) >= os.start_date
-                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE) <= os.start_date + INTERVAL '1 day' * (:current_day - 1)
+                        AND o.created_at >= ((os.start_date + INTERVAL '1 day' * (:current_day - 1)) AT TIME ZONE 'America/Chicago' AT TIME ZONE 'UTC')
+                        AND o.created_at < ((os.start_date + INTERVAL '1 day' * :current_day) AT TIME ZONE 'America/Chicago' AT TIME ZONE 'UTC')
+                        AND CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS TIME) <= :current_time_of_day
                         AND o.state = 'COMPLETED'
                         AND (o.total_money IS NULL OR CAST(o.total_money->>'amount' AS INTEGER) > 0)
                     WHERE os.name = :season_name
                     AND EXTRACT(YEAR FROM os.start_date) >= 2018
-                    GROUP BY EXTRACT(YEAR FROM os.start_date), os.start_date
-                    ORDER BY season_year ASC  -- Change to ASC so 2025 appears rightmost
+                    AND EXTRACT(YEAR FROM os.start_date) < EXTRACT(YEAR FROM CURRENT_DATE)
+                    AND :current_day >= 1
+                    GROUP BY EXTRACT(YEAR FROM os.start_date)
+                ),
+                season_cumulative AS (
+                    SELECT 
+                        fd.season_year,
+                        os.start_date,
+                        os.start_date + INTERVAL '1 day' * (:current_day - 1) as end_date_for_comparison,
+                        fd.total_orders + COALESCE(pd.partial_orders, 0) as total_orders,
+                        fd.total_sales_cents + COALESCE(pd.partial_sales_cents, 0) as total_sales_cents
+                    FROM full_days fd
+                    INNER JOIN operating_seasons os ON 
+                        os.name = :season_name
+                        AND EXTRACT(YEAR FROM os.start_date) = fd.season_year
+                    LEFT JOIN partial_day pd ON pd.season_year = fd.season_year
+                    ORDER BY fd.season_year ASC  -- Change to ASC so 2025 appears rightmost
                 )
                 SELECT 
                     season_year,
@@ -0,0 +1,428 @@
+"""
+Historical Order Backfill
+Parallel, resumable backfill of Square orders shared by the admin endpoint and
+scripts/historical_orders_sync.py.
+
+The date range is split into chunks sized by order density (see ChunkPlanner)
+that are fetched several at a time through the shared, rate-limited Square
+client. Every page is written with the sync engine's bulk upserts and then
+checkpointed (chunk status + Square cursor) in the order_backfill_checkpoints
+table, so an interrupted backfill resumes from the last written page instead
+of starting over.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.services.square_api_client import get_square_client
+from app.services.sync_engine import SyncEngine, SyncResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKFILL_START = datetime(2018, 1, 1, tzinfo=timezone.utc)
+BACKFILL_NAME = 'historical_orders'
+
+# Include all states for historical data
+BACKFILL_ORDER_STATES = ["COMPLETED", "OPEN", "CANCELED"]
+
+
+class ChunkPlanner:
+    """
+    Sizes backfill chunks so each one holds roughly `target_orders` orders.
+    Orders per day come from orders already stored (days inside the stored range
+    with no orders count as empty), then from the rate observed in chunks
+    completed during this run, and finally from target_orders / default_chunk_days.
+    Dense days are split into partial-day chunks; sparse stretches are merged
+    up to max_chunk_days.
+    """
+
+    def __init__(self, target_orders: int, daily_counts: Optional[Dict[date, int]] = None,
+                 default_chunk_days: int = 30, max_chunk_days: int = 120,
+                 min_chunk: timedelta = timedelta(hours=1)):
+        self.target_orders = target_orders
+        self.daily_counts = daily_counts or {}
+        self.known_days = (min(self.daily_counts), max(self.daily_counts)) if self.daily_counts else None
+        self.default_rate = target_orders / default_chunk_days
+        self.max_chunk = timedelta(days=max_chunk_days)
+        self.min_chunk = min_chunk
+        self.observed_orders = 0
+        self.observed_days = 0.0
+
+    def record(self, chunk_start: datetime, chunk_end: datetime, orders: int):
+        """Feed back the size of a completed chunk"""
+        self.observed_orders += orders
+        self.observed_days += (chunk_end - chunk_start).total_seconds() / 86400
+
+    def orders_per_day(self, day: date) -> float:
+        if day in self.daily_counts:
+            return self.daily_counts[day]
+        if self.known_days and self.known_days[0] <= day <= self.known_days[1]:
+            return 0.0
+        if self.observed_days >= 1:
+            return self.observed_orders / self.observed_days
+        return self.default_rate
+
+    def _steps(self, start: datetime, end: datetime):
+        """Yield (step_start, step_end, orders per day) split on day boundaries"""
+        current = start
+        while current < end:
+            next_day = datetime.combine(current.date() + timedelta(days=1), dt_time.min, tzinfo=current.tzinfo)
+            step_end = min(next_day, end)
+            yield current, step_end, self.orders_per_day(current.date())
+            current = step_end
+
+    def expected_orders(self, start: datetime, end: datetime) -> float:
+        return sum(rate * (step_end - step_start).total_seconds() / 86400
+                   for step_start, step_end, rate in self._steps(start, end))
+
+    def next_chunk_end(self, start: datetime, limit: datetime) -> datetime:
+        """End of the chunk starting at `start` (never past `limit`)"""
+        limit = min(limit, start + self.max_chunk)
+        expected = 0.0
+
+        for step_start, step_end, rate in self._steps(start, limit):
+            step_orders = rate * (step_end - step_start).total_seconds() / 86400
+            if rate > 0 and expected + step_orders >= self.target_orders:
+                # Stop part-way through this day once the target is reached
+                chunk_end = step_start + timedelta(days=(self.target_orders - expected) / rate)
+                return min(max(chunk_end, start + self.min_chunk), limit)
+            expected += step_orders
+
+        return limit
+
+
+@dataclass
+class BackfillCheckpoint:
+    """Stored progress for one date chunk"""
+    chunk_start: datetime
+    chunk_end: datetime
+    status: str = 'pending'  # pending, running, completed, failed
+    cursor: Optional[str] = None
+    orders_synced: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class BackfillResult:
+    """Result of a backfill run"""
+    success: bool
+    total_chunks: int = 0
+    chunks_completed: int = 0
+    chunks_skipped: int = 0
+    chunks_resumed: int = 0
+    total_orders_synced: int = 0
+    records_added: int = 0
+    records_updated: int = 0
+    records_unchanged: int = 0
+    errors: List[str] = field(default_factory=list)
+    duration_seconds: float = 0.0
+
+
+class OrderBackfill:
+    """Parallel, checkpointed order backfill"""
+
+    def __init__(self, sync_engine: Optional[SyncEngine] = None,
+                 start_date: datetime = DEFAULT_BACKFILL_START,
+                 end_date: Optional[datetime] = None,
+                 chunk_size_days: int = 30,
+                 max_concurrent_chunks: Optional[int] = None,
+                 target_orders_per_chunk: Optional[int] = None,
+                 max_chunk_days: int = 120,
+                 name: str = BACKFILL_NAME,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.sync_engine = sync_engine or SyncEngine()
+        self.start_date = start_date
+        # Include the full current day
+        self.end_date = end_date or datetime.now(timezone.utc).replace(hour=23, minute=59, second=59, microsecond=999999)
+        # chunk_size_days only applies until order density is known
+        self.chunk_size_days = chunk_size_days
+        self.target_orders_per_chunk = target_orders_per_chunk or int(os.getenv('BACKFILL_TARGET_ORDERS_PER_CHUNK', '5000'))
+        self.max_chunk_days = max_chunk_days
+        self.max_concurrent_chunks = max_concurrent_chunks or int(os.getenv('HISTORICAL_SYNC_CONCURRENCY', '4'))
+        self.name = name
+        self.on_progress = on_progress
+
+        self.result = BackfillResult(success=True)
+        self._started_at = 0.0
+        self.planner: Optional[ChunkPlanner] = None
+        self._resumable: List[BackfillCheckpoint] = []
+        self._gaps: List[Tuple[datetime, datetime]] = []
+        self._chunks_started = 0
+
+    async def run(self, reset: bool = False) -> BackfillResult:
+        """Backfill every chunk not already completed; reset=True discards stored checkpoints first"""
+        self._started_at = time.time()
+        self.result = BackfillResult(success=True)
+        logger.info(f"🚀 Starting order backfill '{self.name}': {self.start_date.date()} to {self.end_date.date()} "
+                    f"({self.max_concurrent_chunks} chunks at a time)")
+
+        try:
+            await self._ensure_checkpoint_table()
+            if reset:
+                await self._reset_checkpoints()
+
+            locations = await self.sync_engine.fetch_locations()
+            if not locations:
+                raise Exception("No active locations found")
+            location_ids = [loc['id'] for loc in locations]
+
+            self.planner = ChunkPlanner(
+                self.target_orders_per_chunk,
+                daily_counts=await self._load_daily_counts(),
+                default_chunk_days=self.chunk_size_days,
+                max_chunk_days=self.max_chunk_days
+            )
+            self._plan_from_checkpoints(await self._load_checkpoints())
+            self.result.chunks_resumed = sum(1 for checkpoint in self._resumable if checkpoint.cursor)
+
+            logger.info(f"   {self.result.chunks_skipped} chunks already completed, {len(self._resumable)} to resume, "
+                        f"{len(self._gaps)} ranges to plan (~{self.target_orders_per_chunk} orders per chunk)")
+            self._report_progress("Planning chunks...")
+
+            async def worker():
+                while True:
+                    checkpoint = self._next_checkpoint()
+                    if checkpoint is None:
+                        return
+                    await self._run_chunk(location_ids, checkpoint)
+
+            await asyncio.gather(*(worker() for _ in range(self.max_concurrent_chunks)))
+
+        except Exception as e:
+            logger.error(f"❌ Order backfill failed: {str(e)}")
+            self.result.success = False
+            self.result.errors.append(str(e))
+
+        self.result.duration_seconds = time.time() - self._started_at
+        logger.info(f"🎉 Order backfill finished: {self.result.total_orders_synced} orders, "
+                    f"{self.result.chunks_completed + self.result.chunks_skipped}/{self.result.total_chunks} chunks "
+                    f"in {self.result.duration_seconds:.1f}s")
+        return self.result
+
+    def _plan_from_checkpoints(self, checkpoints: Dict[datetime, BackfillCheckpoint]):
+        """Queue unfinished checkpoints as they are and leave the uncovered ranges to the planner"""
+        covered = sorted(
+            (checkpoint for checkpoint in checkpoints.values()
+             if checkpoint.chunk_end > self.start_date and checkpoint.chunk_start < self.end_date),
+            key=lambda checkpoint: checkpoint.chunk_start
+        )
+
+        self._resumable = []
+        self._gaps = []
+        self._chunks_started = 0
+        gap_start = self.start_date
+        for checkpoint in covered:
+            if checkpoint.chunk_start > gap_start:
+                self._gaps.append((gap_start, checkpoint.chunk_start))
+            gap_start = max(gap_start, checkpoint.chunk_end)
+            if checkpoint.status == 'completed':
+                self.result.chunks_skipped += 1
+            else:
+                self._resumable.append(checkpoint)
+        if gap_start < self.end_date:
+            self._gaps.append((gap_start, self.end_date))
+
+    def _next_checkpoint(self) -> Optional[BackfillCheckpoint]:
+        """Hand the next chunk to a worker, sizing new chunks with what has been observed so far"""
+        if self._resumable:
+            self._chunks_started += 1
+            return self._resumable.pop(0)
+
+        while self._gaps:
+            gap_start, gap_end = self._gaps[0]
+            chunk_end = self.planner.next_chunk_end(gap_start, gap_end)
+            if chunk_end >= gap_end:
+                self._gaps.pop(0)
+            else:
+                self._gaps[0] = (chunk_end, gap_end)
+            self._chunks_started += 1
+            return BackfillCheckpoint(gap_start, chunk_end)
+
+        return None
+
+    def _estimate_total_chunks(self) -> int:
+        remaining_orders = sum(self.planner.expected_orders(gap_start, gap_end) for gap_start, gap_end in self._gaps)
+        remaining_chunks = -(-int(remaining_orders) // self.target_orders_per_chunk)
+        remaining_chunks = max(remaining_chunks, 1 if self._gaps else 0) + len(self._resumable)
+        return self.result.chunks_skipped + self._chunks_started + remaining_chunks
+
+    async def _run_chunk(self, location_ids: List[str], checkpoint: BackfillCheckpoint):
+        """Fetch and write one chunk page by page, checkpointing after every page"""
+        period = f"{checkpoint.chunk_start.strftime('%Y-%m-%d')} to {checkpoint.chunk_end.strftime('%Y-%m-%d')}"
+        checkpoint.status = 'running'
+        checkpoint.error = None
+
+        try:
+            await self._save_checkpoint(checkpoint)
+            while True:
+                data = await self._search_orders(location_ids, checkpoint)
+                orders = data.get('orders', [])
+
+                if orders:
+                    page_result = SyncResult(success=True, data_type='orders', records_processed=len(orders))
+                    await self.sync_engine.write_orders(orders, page_result)
+                    if page_result.errors:
+                        raise Exception('; '.join(page_result.errors))
+                    self.result.records_added += page_result.records_added
+                    self.result.records_updated += page_result.records_updated
+                    self.result.records_unchanged += page_result.records_unchanged
+
+                # Checkpoint only after the page is written, so a resume re-reads at most one page
+                checkpoint.cursor = data.get('cursor')
+                checkpoint.orders_synced += len(orders)
+                self.result.total_orders_synced += len(orders)
+                if not checkpoint.cursor:
+                    break
+                await self._save_checkpoint(checkpoint)
+                self._report_progress(f"Chunk {period}: {checkpoint.orders_synced} orders so far")
+
+            checkpoint.status = 'completed'
+            await self._save_checkpoint(checkpoint)
+            self.planner.record(checkpoint.chunk_start, checkpoint.chunk_end, checkpoint.orders_synced)
+            self.result.chunks_completed += 1
+            logger.info(f"✅ Chunk {period}: {checkpoint.orders_synced} orders")
+            self._report_progress(f"Completed chunk {period}")
+
+        except Exception as e:
+            error_msg = f"Chunk {period}: {str(e)}"
+            logger.error(f"❌ {error_msg}")
+            checkpoint.status = 'failed'
+            checkpoint.error = str(e)
+            self.result.errors.append(error_msg)
+            try:
+                await self._save_checkpoint(checkpoint)
+            except Exception as save_error:
+                logger.error(f"   Could not save checkpoint for {period}: {str(save_error)}")
+            self._report_progress(f"Error in chunk {period} - continuing...")
+
+    async def _search_orders(self, location_ids: List[str], checkpoint: BackfillCheckpoint) -> Dict[str, Any]:
+        """Fetch one SearchOrders page for a chunk, starting over if a stored cursor has expired"""
+        body = {
+            "location_ids": location_ids,
+            "query": {
+                "filter": {
+                    "date_time_filter": {
+                        "created_at": {
+                            "start_at": checkpoint.chunk_start.isoformat(),
+                            "end_at": checkpoint.chunk_end.isoformat()
+                        }
+                    },
+                    "state_filter": {
+                        "states": BACKFILL_ORDER_STATES
+                    }
+                }
+            },
+            "limit": 500  # Maximum allowed by Square API
+        }
+        if checkpoint.cursor:
+            body["cursor"] = checkpoint.cursor
+
+        client = get_square_client(self.sync_engine.square_access_token, self.sync_engine.square_base_url)
+        response = await client.post('/v2/orders/search', json=body)
+
+        if response.status == 400 and checkpoint.cursor:
+            logger.warning(f"   Stored cursor for chunk {checkpoint.chunk_start.date()} was rejected; restarting chunk")
+            checkpoint.cursor = None
+            checkpoint.orders_synced = 0
+            return await self._search_orders(location_ids, checkpoint)
+
+        if response.status != 200:
+            raise Exception(f"Square API error: {response.status} - {await response.text()}")
+
+        return await response.json()
+
+    def _report_progress(self, message: str):
+        if self.planner is not None:
+            self.result.total_chunks = self._estimate_total_chunks()
+        if not self.on_progress:
+            return
+        self.on_progress({
+            "total_chunks": self.result.total_chunks,
+            "completed_chunks": self.result.chunks_completed + self.result.chunks_skipped,
+            "current_chunk_info": message,
+            "total_orders_synced": self.result.total_orders_synced,
+            "last_update": datetime.now(timezone.utc).isoformat()
+        })
+
+    async def _ensure_checkpoint_table(self):
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                await conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS order_backfill_checkpoints (
+                        backfill_name VARCHAR(100) NOT NULL,
+                        chunk_start TIMESTAMP WITH TIME ZONE NOT NULL,
+                        chunk_end TIMESTAMP WITH TIME ZONE NOT NULL,
+                        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                        cursor TEXT,
+                        orders_synced INTEGER DEFAULT 0,
+                        error TEXT,
+                        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (backfill_name, chunk_start)
+                    )
+                """))
+
+    async def _load_daily_counts(self) -> Dict[date, int]:
+        """Orders per UTC day already stored, used to size chunks before anything is fetched"""
+        async with self.sync_engine.connect() as conn:
+            result = await conn.execute(text("""
+                SELECT (created_at AT TIME ZONE 'UTC')::date AS day, COUNT(*) AS orders
+                FROM orders
+                WHERE created_at >= :start_date AND created_at < :end_date
+                GROUP BY 1
+            """), {'start_date': self.start_date, 'end_date': self.end_date})
+            return {row.day: row.orders for row in result.fetchall()}
+
+    async def _reset_checkpoints(self):
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                await conn.execute(text("DELETE FROM order_backfill_checkpoints WHERE backfill_name = :name"),
+                                   {'name': self.name})
+        logger.info(f"   Cleared checkpoints for backfill '{self.name}'")
+
+    async def _load_checkpoints(self) -> Dict[datetime, BackfillCheckpoint]:
+        async with self.sync_engine.connect() as conn:
+            result = await conn.execute(text("""
+                SELECT chunk_start, chunk_end, status, cursor, orders_synced, error
+                FROM order_backfill_checkpoints
+                WHERE backfill_name = :name
+            """), {'name': self.name})
+            rows = result.fetchall()
+
+        return {
+            row.chunk_start: BackfillCheckpoint(row.chunk_start, row.chunk_end, row.status,
+                                                row.cursor, row.orders_synced or 0, row.error)
+            for row in rows
+        }
+
+    async def _save_checkpoint(self, checkpoint: BackfillCheckpoint):
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                await conn.execute(text("""
+                    INSERT INTO order_backfill_checkpoints (
+                        backfill_name, chunk_start, chunk_end, status, cursor, orders_synced, error, updated_at
+                    ) VALUES (
+                        :name, :chunk_start, :chunk_end, :status, :cursor, :orders_synced, :error, NOW()
+                    )
+                    ON CONFLICT (backfill_name, chunk_start) DO UPDATE SET
+                        chunk_end = EXCLUDED.chunk_end,
+                        status = EXCLUDED.status,
+                        cursor = EXCLUDED.cursor,
+                        orders_synced = EXCLUDED.orders_synced,
+                        error = EXCLUDED.error,
+                        updated_at = NOW()
+                """), {
+                    'name': self.name,
+                    'chunk_start': checkpoint.chunk_start,
+                    'chunk_end': checkpoint.chunk_end,
+                    'status': checkpoint.status,
+                    'cursor': checkpoint.cursor,
+                    'orders_synced': checkpoint.orders_synced,
+                    'error': checkpoint.error
+                })
@@ -95,16 +95,27 @@ class DailySalesService:
         """Get today's performance metrics"""
         try:
             location_filter = ""
+            rollup_location_filter = ""
             if location_id:
                 location_filter = "AND o.location_id = :location_id"
+                rollup_location_filter = "AND dls.location_id = :location_id"
             
+            # Revenue and transactions come from the daily rollup; units sold
+            # need the line items, so they are summed separately
             query = text(f"""
                 SELECT 
-                    COUNT(DISTINCT o.id) as transaction_count,
-                    COALESCE(SUM((o.total_money->>'amount')::numeric / 100), 0) as total_revenue,
+                    COALESCE(SUM(dls.completed_orders), 0) as transaction_count,
+                    COALESCE(SUM(dls.gross_sales_cents), 0) / 100.0 as total_revenue
+                FROM daily_location_sales dls
+                WHERE dls.sale_date = :report_date
+                {rollup_location_filter}
+            """)
+            
+            units_query = text(f"""
+                SELECT 
                     COALESCE(SUM(oli.quantity::numeric), 0) as units_sold
                 FROM orders o
-                LEFT JOIN order_line_items oli ON o.id = oli.order_id
+                JOIN order_line_items oli ON o.id = oli.order_id
                 WHERE DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') = :report_date
                 AND o.state = 'COMPLETED'
                 {location_filter}
@@ -116,11 +127,13 @@ class DailySalesService:
                 
             result = await self.session.execute(query, params)
             row = result.fetchone()
+            units_result = await self.session.execute(units_query, params)
+            units_row = units_result.fetchone()
             
             if row:
-                transaction_count = row[0] or 0
+                transaction_count = int(row[0] or 0)
                 total_revenue = float(row[1] or 0)
-                units_sold = float(row[2] or 0)
+                units_sold = float(units_row[0] or 0) if units_row else 0
                 avg_order_value = total_revenue / transaction_count if transaction_count > 0 else 0
                 
                 return {
@@ -146,16 +159,15 @@ class DailySalesService:
             
             location_filter = ""
             if location_id:
-                location_filter = "AND o.location_id = :location_id"
+                location_filter = "AND dls.location_id = :location_id"
             
             # Yesterday's performance
             yesterday_query = text(f"""
                 SELECT 
-                    COALESCE(SUM((o.total_money->>'amount')::numeric / 100), 0) as total_revenue,
-                    COUNT(DISTINCT o.id) as transaction_count
-                FROM orders o
-                WHERE DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') = :yesterday
-                AND o.state = 'COMPLETED'
+                    COALESCE(SUM(dls.gross_sales_cents), 0) / 100.0 as total_revenue,
+                    COALESCE(SUM(dls.completed_orders), 0) as transaction_count
+                FROM daily_location_sales dls
+                WHERE dls.sale_date = :yesterday
                 {location_filter}
             """)
             
@@ -166,16 +178,15 @@ class DailySalesService:
             result = await self.session.execute(yesterday_query, params_yesterday)
             yesterday_row = result.fetchone()
             yesterday_revenue = float(yesterday_row[0] or 0) if yesterday_row else 0
-            yesterday_transactions = yesterday_row[1] or 0 if yesterday_row else 0
+            yesterday_transactions = int(yesterday_row[1] or 0) if yesterday_row else 0
             
             # Same day last year performance  
             last_year_query = text(f"""
                 SELECT 
-                    COALESCE(SUM((o.total_money->>'amount')::numeric / 100), 0) as total_revenue,
-                    COUNT(DISTINCT o.id) as transaction_count
-                FROM orders o
-                WHERE DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') = :same_day_last_year
-                AND o.state = 'COMPLETED'
+                    COALESCE(SUM(dls.gross_sales_cents), 0) / 100.0 as total_revenue,
+                    COALESCE(SUM(dls.completed_orders), 0) as transaction_count
+                FROM daily_location_sales dls
+                WHERE dls.sale_date = :same_day_last_year
                 {location_filter}
             """)
             
@@ -186,7 +197,7 @@ class DailySalesService:
             result = await self.session.execute(last_year_query, params_last_year)
             last_year_row = result.fetchone()
             last_year_revenue = float(last_year_row[0] or 0) if last_year_row else 0
-            last_year_transactions = last_year_row[1] or 0 if last_year_row else 0
+            last_year_transactions = int(last_year_row[1] or 0) if last_year_row else 0
             
             return {
                 "yesterday_revenue": yesterday_revenue,
@@ -251,12 +262,11 @@ class DailySalesService:
                     SELECT 
                         l.name,
                         l.id,
-                        COUNT(DISTINCT o.id) as transaction_count,
-                        SUM((o.total_money->>'amount')::numeric / 100) as total_revenue
-                    FROM orders o
-                    JOIN locations l ON o.location_id = l.id
-                    WHERE DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') = :report_date
-                    AND o.state = 'COMPLETED'
+                        SUM(dls.completed_orders) as transaction_count,
+                        SUM(dls.gross_sales_cents) / 100.0 as total_revenue
+                    FROM daily_location_sales dls
+                    JOIN locations l ON dls.location_id = l.id
+                    WHERE dls.sale_date = :report_date
                     GROUP BY l.name, l.id
                     ORDER BY total_revenue DESC
                 """)
@@ -266,7 +276,7 @@ class DailySalesService:
                     top_locations.append({
                         "name": row[0],
                         "id": row[1],
-                        "transaction_count": row[2] or 0,
+                        "transaction_count": int(row[2] or 0),
                         "revenue": float(row[3] or 0)
                     })
             
@@ -0,0 +1,132 @@
+"""
+Daily Location Sales Rollup
+Keeps daily_location_sales: one row per Central-time day and location with that
+day's completed orders and their money totals, so dashboard aggregates read a
+few thousand rows instead of rescanning orders and parsing total_money for
+every order since 2018.
+
+The table is created by migration f3a9c61d2b87 and filled from orders with
+scripts/rebuild_sales_rollup.py (or POST /admin/rebuild-sales-rollup); after
+that SyncEngine refreshes the days touched by each batch of orders it writes.
+
+Only COMPLETED orders are counted. Amounts are in cents:
+- gross_sales_cents: total_money
+- tax_cents / discount_cents: total_tax_money / total_discount_money
+- net_sales_cents: total_money less tax
+- zero_amount_orders: completed orders whose total_money is $0 (or has no
+  amount); the location pages leave these out of their order counts, so they
+  use completed_orders - zero_amount_orders
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.utils.timezone import CENTRAL_TZ
+
+logger = logging.getLogger(__name__)
+
+# orders.created_at holds naive UTC; this is the same conversion the dashboard queries use
+SALE_DATE_SQL = "CAST((o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') AS DATE)"
+
+ROLLUP_INSERT_SQL = f"""
+    INSERT INTO daily_location_sales (
+        sale_date, location_id, completed_orders, zero_amount_orders,
+        gross_sales_cents, net_sales_cents, tax_cents, discount_cents, updated_at
+    )
+    SELECT
+        {SALE_DATE_SQL} AS sale_date,
+        o.location_id,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE o.total_money IS NOT NULL
+                         AND COALESCE(CAST(o.total_money->>'amount' AS BIGINT), 0) <= 0),
+        COALESCE(SUM(CAST(o.total_money->>'amount' AS BIGINT)), 0),
+        COALESCE(SUM(COALESCE(CAST(o.total_money->>'amount' AS BIGINT), 0)
+                     - COALESCE(CAST(o.total_tax_money->>'amount' AS BIGINT), 0)), 0),
+        COALESCE(SUM(CAST(o.total_tax_money->>'amount' AS BIGINT)), 0),
+        COALESCE(SUM(CAST(o.total_discount_money->>'amount' AS BIGINT)), 0),
+        NOW()
+    FROM orders o
+    WHERE o.state = 'COMPLETED'
+    AND o.location_id IS NOT NULL
+    AND o.created_at IS NOT NULL
+    {{filters}}
+    GROUP BY 1, 2
+"""
+
+
+def central_date(timestamp: datetime) -> date:
+    """Central-time calendar date of a UTC timestamp (naive values are taken as UTC)"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(CENTRAL_TZ).date()
+
+
+def _utc_bounds(first_day: date, last_day: date) -> Tuple[datetime, datetime]:
+    """Naive UTC [start, end) covering the Central days first_day..last_day, to match orders.created_at"""
+    def start_of(day: date) -> datetime:
+        local = datetime.combine(day, time.min, tzinfo=CENTRAL_TZ)
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+    return start_of(first_day), start_of(last_day + timedelta(days=1))
+
+
+async def _lock_rollup(conn):
+    """
+    Serialize rollup writers until the transaction ends. Two writers refreshing
+    the same day would otherwise both delete nothing and then collide on insert.
+    """
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('daily_location_sales'))"))
+
+
+async def refresh_daily_location_sales(conn, sale_dates: Iterable[date]) -> int:
+    """
+    Recompute the rollup rows of the given Central dates from orders; returns
+    the rows written. Run it inside a transaction so readers never see a day
+    half-refreshed.
+    """
+    days = sorted(set(sale_dates))
+    if not days:
+        return 0
+
+    await _lock_rollup(conn)
+    start, end = _utc_bounds(days[0], days[-1])
+    await conn.execute(text("DELETE FROM daily_location_sales WHERE sale_date = ANY(:days)"), {'days': days})
+    # The created_at range lets the orders index narrow the scan; the date list drops the days in between
+    result = await conn.execute(
+        text(ROLLUP_INSERT_SQL.format(filters=f"""
+            AND o.created_at >= :start AND o.created_at < :end
+            AND {SALE_DATE_SQL} = ANY(:days)
+        """)),
+        {'start': start, 'end': end, 'days': days}
+    )
+    return result.rowcount
+
+
+async def rebuild_daily_location_sales(conn, start_date: Optional[date] = None,
+                                       end_date: Optional[date] = None) -> int:
+    """
+    Recompute daily_location_sales from orders, for every day or for
+    start_date..end_date (inclusive); returns the rows written. In one
+    transaction the previous rows stay visible until the new ones replace them.
+    """
+    await _lock_rollup(conn)
+
+    if start_date is None and end_date is None:
+        await conn.execute(text("DELETE FROM daily_location_sales"))
+        result = await conn.execute(text(ROLLUP_INSERT_SQL.format(filters='')))
+    else:
+        first_day = start_date or date(2018, 1, 1)
+        last_day = end_date or datetime.now(CENTRAL_TZ).date()
+        start, end = _utc_bounds(first_day, last_day)
+        await conn.execute(text("""
+            DELETE FROM daily_location_sales WHERE sale_date BETWEEN :first_day AND :last_day
+        """), {'first_day': first_day, 'last_day': last_day})
+        result = await conn.execute(
+            text(ROLLUP_INSERT_SQL.format(filters="AND o.created_at >= :start AND o.created_at < :end")),
+            {'start': start, 'end': end}
+        )
+
+    logger.info(f"📊 Rebuilt daily_location_sales: {result.rowcount} day/location rows")
+    return result.rowcount
@@ -9,7 +9,7 @@ from contextlib import asynccontextmanager
 from app.database.models.order import Order
 from app.database.models.location import Location
 from app.logger import logger
-from app.utils.timezone import convert_utc_to_central, CENTRAL_TZ
+from app.utils.timezone import CENTRAL_TZ
 
 class SeasonService:
     def __init__(self, session: AsyncSession = None):
@@ -88,21 +88,23 @@ class SeasonService:
             async with self._get_session_context() as session:
                 current_year = datetime.now().year
                 
-                # Get all orders for the current year with location timezone info
+                # Get daily sales for the current year from the Central-day rollup
                 query = """
                     SELECT 
-                        o.created_at,
-                        COALESCE(CAST(o.total_money->>'amount' AS INTEGER), 0) as amount,
-                        l.timezone as location_timezone
-                    FROM orders o
-                    LEFT JOIN locations l ON o.location_id = l.id
-                    WHERE EXTRACT(YEAR FROM o.created_at) = :year
-                    AND o.state = 'COMPLETED'
-                    ORDER BY o.created_at
+                        dls.sale_date,
+                        SUM(dls.gross_sales_cents) as amount
+                    FROM daily_location_sales dls
+                    WHERE dls.sale_date >= :year_start
+                    AND dls.sale_date < :next_year_start
+                    GROUP BY dls.sale_date
+                    ORDER BY dls.sale_date
                 """
                 
-                result = await session.execute(text(query), {"year": current_year})
-                orders = result.fetchall()
+                result = await session.execute(text(query), {
+                    "year_start": date(current_year, 1, 1),
+                    "next_year_start": date(current_year + 1, 1, 1)
+                })
+                days = result.fetchall()
                 
                 # Initialize season totals
                 season_totals = {
@@ -112,19 +114,12 @@ class SeasonService:
                     'Winter': 0
                 }
                 
-                # Process each order
-                for order in orders:
-                    created_at, amount, location_timezone = order
-                    
-                    # Convert UTC stored time to Central Time for proper season categorization
-                    if created_at:
-                        central_dt = convert_utc_to_central(created_at)
-                        order_date = central_dt.date()
-                        
-                        season = self._categorize_season(order_date)
-                        if season in season_totals:
-                            # Convert amount from cents to dollars
-                            season_totals[season] += (amount or 0) / 100
+                # Process each day (sale dates are already in Central Time)
+                for sale_date, amount in days:
+                    season = self._categorize_season(sale_date)
+                    if season in season_totals:
+                        # Convert amount from cents to dollars
+                        season_totals[season] += float(amount or 0) / 100
                 
                 logger.info(f"Season totals calculated for {current_year}: {season_totals}")
                 return season_totals
@@ -139,49 +134,44 @@ class SeasonService:
             async with self._get_session_context() as session:
                 current_year = datetime.now().year
                 
-                # Get all orders from 2020 to current year with location timezone info
+                # Get daily sales from 2020 to current year from the Central-day rollup
                 query = """
                     SELECT 
-                        o.created_at,
-                        COALESCE(CAST(o.total_money->>'amount' AS INTEGER), 0) as amount,
-                        l.timezone as location_timezone
-                    FROM orders o
-                    LEFT JOIN locations l ON o.location_id = l.id
-                    WHERE EXTRACT(YEAR FROM o.created_at) >= 2020
-                    AND EXTRACT(YEAR FROM o.created_at) <= :current_year
-                    AND o.state = 'COMPLETED'
-                    ORDER BY o.created_at
+                        dls.sale_date,
+                        SUM(dls.gross_sales_cents) as amount
+                    FROM daily_location_sales dls
+                    WHERE dls.sale_date >= :first_year_start
+                    AND dls.sale_date < :next_year_start
+                    GROUP BY dls.sale_date
+                    ORDER BY dls.sale_date
                 """
                 
-                result = await session.execute(text(query), {"current_year": current_year})
-                orders = result.fetchall()
+                result = await session.execute(text(query), {
+                    "first_year_start": date(2020, 1, 1),
+                    "next_year_start": date(current_year + 1, 1, 1)
+                })
+                days = result.fetchall()
                 
                 # Initialize yearly season totals
                 yearly_totals = {}
                 
-                # Process each order
-                for order in orders:
-                    created_at, amount, location_timezone = order
+                # Process each day (sale dates are already in Central Time)
+                for sale_date, amount in days:
+                    order_year = sale_date.year
+                    
+                    # Initialize year if not exists
+                    if order_year not in yearly_totals:
+                        yearly_totals[order_year] = {
+                            'Spring': 0,
+                            'Summer': 0,
+                            'Fall': 0,
+                            'Winter': 0
+                        }
                     
-                    if created_at:
-                        # Convert UTC stored time to Central Time for proper season categorization
-                        central_dt = convert_utc_to_central(created_at)
-                        order_date = central_dt.date()
-                        order_year = order_date.year
-                        
-                        # Initialize year if not exists
-                        if order_year not in yearly_totals:
-                            yearly_totals[order_year] = {
-                                'Spring': 0,
-                                'Summer': 0,
-                                'Fall': 0,
-                                'Winter': 0
-                            }
-                        
-                        season = self._categorize_season(order_date)
-                        if season in yearly_totals[order_year]:
-                            # Convert amount from cents to dollars
-                            yearly_totals[order_year][season] += (amount or 0) / 100
+                    season = self._categorize_season(sale_date)
+                    if season in yearly_totals[order_year]:
+                        # Convert amount from cents to dollars
+                        yearly_totals[order_year][season] += float(amount or 0) / 100
                 
                 logger.info(f"Yearly season totals calculated: {yearly_totals}")
                 return yearly_totals
@@ -203,14 +193,13 @@ class SeasonService:
                 # Query daily sales within the season date range
                 query = """
                     SELECT 
-                        DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') as order_date,
-                        SUM(COALESCE(CAST(o.total_money->>'amount' AS INTEGER), 0)) as daily_amount,
-                        COUNT(*) as daily_transactions
-                    FROM orders o
-                    WHERE o.state = 'COMPLETED'
-                    AND DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') >= :start_date
-                    AND DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago') <= :end_date
-                    GROUP BY DATE(o.created_at AT TIME ZONE 'UTC' AT TIME ZONE 'America/Chicago')
+                        dls.sale_date as order_date,
+                        SUM(dls.gross_sales_cents) as daily_amount,
+                        SUM(dls.completed_orders) as daily_transactions
+                    FROM daily_location_sales dls
+                    WHERE dls.sale_date >= :start_date
+                    AND dls.sale_date <= :end_date
+                    GROUP BY dls.sale_date
                     ORDER BY order_date
                 """
                 
@@ -233,8 +222,8 @@ class SeasonService:
                     order_date, daily_amount, daily_transactions = row
                     dates.append(order_date)
                     # Convert from cents to dollars
-                    amounts.append((daily_amount or 0) / 100)
-                    transactions.append(daily_transactions or 0)
+                    amounts.append(float(daily_amount or 0) / 100)
+                    transactions.append(int(daily_transactions or 0))
                 
                 logger.info(f"Found {len(dates)} days of sales data for season {current_season['name']}")
                 
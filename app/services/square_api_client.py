@@ -0,0 +1,323 @@
+"""
+Square API Client
+Shared, pooled and rate-limited HTTP client used by every Square sync path.
+
+All callers in a process share one token bucket, so concurrent syncs together
+stay under Square's rate limit instead of each pacing itself with fixed sleeps.
+Each event loop gets its own keep-alive connection pool (aiohttp sessions are
+bound to the loop that created them).
+
+This module only depends on aiohttp (sync telemetry is optional) so the catalog
+export service can ship a copy of it alongside its own app.py.
+"""
+
+import asyncio
+import json as json_lib
+import logging
+import os
+import random
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+# Per-run sync telemetry lives in the dashboard app; the catalog export service's copy runs without it
+try:
+    from app.services.sync_telemetry import record_api_request, sync_stage
+except ImportError:
+    from contextlib import nullcontext
+
+    def record_api_request(*args):
+        pass
+
+    def sync_stage(stage: str):
+        return nullcontext()
+
+logger = logging.getLogger(__name__)
+
+SQUARE_PRODUCTION_URL = "https://connect.squareup.com"
+SQUARE_SANDBOX_URL = "https://connect.squareupsandbox.com"
+
+# Status codes worth retrying: rate limited or a transient server-side failure
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def square_base_url(environment: Optional[str] = None) -> str:
+    """Resolve the Square API base URL from SQUARE_BASE_URL or the environment name"""
+    explicit_url = os.getenv('SQUARE_BASE_URL')
+    if explicit_url:
+        return explicit_url.rstrip('/')
+
+    environment = environment or os.getenv('SQUARE_ENVIRONMENT', 'production')
+    if environment.lower() == 'production':
+        return SQUARE_PRODUCTION_URL
+    return SQUARE_SANDBOX_URL
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter.
+    Callers reserve a token up front and sleep off any deficit, so the bucket
+    needs no lock and can be shared across event loops in the same process.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(capacity if capacity is not None else rate_per_second)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _reserve(self) -> float:
+        """Take one token and return how long the caller must wait for it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+
+        wait = max(0.0, -self.tokens / self.rate)
+        return max(wait, self.blocked_until - now)
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds` (used when Square answers 429)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class SquareResponse:
+    """Fully-read Square API response, shaped like the aiohttp response callers already use"""
+
+    def __init__(self, status: int, body: str, headers: Dict[str, str], retries: int = 0, rate_limited: int = 0):
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.retries = retries
+        self.rate_limited = rate_limited
+
+    async def json(self) -> Dict[str, Any]:
+        with sync_stage('parse'):
+            return json_lib.loads(self.body) if self.body else {}
+
+    async def text(self) -> str:
+        return self.body
+
+
+class _SquareRequest:
+    """Awaitable / async context manager wrapper so call sites can keep `async with session.post(...)`"""
+
+    def __init__(self, client: 'SquareAPIClient', method: str, url: str, kwargs: Dict[str, Any]):
+        self.client = client
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+
+    def __await__(self):
+        return self.client.request(self.method, self.url, **self.kwargs).__await__()
+
+    async def __aenter__(self) -> SquareResponse:
+        return await self.client.request(self.method, self.url, **self.kwargs)
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class SquareAPIClient:
+    """Pooled, rate-limited Square API client with retries on 429/5xx"""
+
+    def __init__(self, access_token: str, base_url: Optional[str] = None,
+                 rate_limiter: Optional[TokenBucket] = None,
+                 max_connections: Optional[int] = None,
+                 endpoint_concurrency: Optional[int] = None,
+                 max_retries: Optional[int] = None,
+                 timeout_seconds: float = 300):
+        if not access_token:
+            raise ValueError("Square access token is required")
+
+        self.access_token = access_token
+        self.base_url = (base_url or square_base_url()).rstrip('/')
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_connections = max_connections or int(os.getenv('SQUARE_API_MAX_CONNECTIONS', '20'))
+        self.endpoint_concurrency = endpoint_concurrency or int(os.getenv('SQUARE_API_ENDPOINT_CONCURRENCY', '8'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('SQUARE_API_MAX_RETRIES', '5'))
+        self.timeout = aiohttp.ClientTimeout(total=timeout_seconds)
+        self.headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._endpoint_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # Counters for telemetry and logging
+        self.requests_sent = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=self.headers
+            )
+        return self._session
+
+    def _resolve(self, url: str) -> Tuple[str, str]:
+        """Return (absolute URL, endpoint key) for a path or absolute URL"""
+        if url.startswith('http://') or url.startswith('https://'):
+            absolute_url = url
+        else:
+            absolute_url = f"{self.base_url}{url}"
+
+        # Cap concurrency on the first three path segments (e.g. /v2/orders/search, /v2/inventory/counts)
+        parts = urlsplit(absolute_url).path.rstrip('/').split('/')
+        endpoint = '/'.join(parts[:4])
+        return absolute_url, endpoint
+
+    def _endpoint_semaphore(self, endpoint: str) -> asyncio.Semaphore:
+        if endpoint not in self._endpoint_semaphores:
+            self._endpoint_semaphores[endpoint] = asyncio.Semaphore(self.endpoint_concurrency)
+        return self._endpoint_semaphores[endpoint]
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Retry-After when Square sends it, otherwise exponential backoff, plus jitter"""
+        delay = None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = None
+        if delay is None:
+            delay = min(60.0, 0.5 * (2 ** attempt))
+        return delay + random.uniform(0, max(0.1, min(1.0, delay * 0.25)))
+
+    async def request(self, method: str, url: str, json: Any = None, params: Optional[Dict[str, Any]] = None,
+                      headers: Optional[Dict[str, str]] = None) -> SquareResponse:
+        """
+        Send a request through the shared limiter and connection pool.
+        Retries 429/5xx and connection errors; any other status is returned to the caller.
+        `headers` is accepted for call-site compatibility - auth headers come from the client.
+        """
+        absolute_url, endpoint = self._resolve(url)
+        session = self._get_session()
+        attempt = 0
+        rate_limited = 0
+        started = time.monotonic()
+
+        async with self._endpoint_semaphore(endpoint):
+            while True:
+                await self.rate_limiter.acquire()
+                self.requests_sent += 1
+
+                try:
+                    async with session.request(method, absolute_url, json=json, params=params) as response:
+                        body = await response.text()
+                        status = response.status
+                        response_headers = dict(response.headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= self.max_retries:
+                        record_api_request(time.monotonic() - started, attempt + 1, attempt, rate_limited, False)
+                        raise
+                    delay = self._retry_delay(attempt, None)
+                    logger.warning(f"Square {method} {endpoint} failed ({e}); retrying in {delay:.1f}s")
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                if status in RETRYABLE_STATUSES and attempt < self.max_retries:
+                    delay = self._retry_delay(attempt, response_headers.get('Retry-After'))
+                    if status == 429:
+                        rate_limited += 1
+                        self.rate_limited += 1
+                        self.rate_limiter.pause(delay)
+                    logger.warning(f"Square {method} {endpoint} returned {status}; retrying in {delay:.1f}s "
+                                   f"(attempt {attempt + 1}/{self.max_retries})")
+                    attempt += 1
+                    self.retries += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                record_api_request(time.monotonic() - started, attempt + 1, attempt, rate_limited, 200 <= status < 300)
+                return SquareResponse(status, body, response_headers, retries=attempt, rate_limited=rate_limited)
+
+    def get(self, url: str, **kwargs) -> _SquareRequest:
+        return _SquareRequest(self, 'GET', url, kwargs)
+
+    def post(self, url: str, **kwargs) -> _SquareRequest:
+        return _SquareRequest(self, 'POST', url, kwargs)
+
+    def put(self, url: str, **kwargs) -> _SquareRequest:
+        return _SquareRequest(self, 'PUT', url, kwargs)
+
+    def session(self) -> '_SharedSession':
+        """Context manager for call sites that previously opened their own ClientSession"""
+        return _SharedSession(self)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class _SharedSession:
+    """`async with client.session() as session:` - yields the client and leaves the pool open"""
+
+    def __init__(self, client: SquareAPIClient):
+        self.client = client
+
+    async def __aenter__(self) -> SquareAPIClient:
+        return self.client
+
+    async def __aexit__(self, *args):
+        return False
+
+
+# Process-wide limiter and per-event-loop clients
+_rate_limiter: Optional[TokenBucket] = None
+_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], SquareAPIClient]]' = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Return the token bucket shared by every Square caller in this process"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        rate = float(os.getenv('SQUARE_API_RATE_PER_SECOND', '10'))
+        burst = float(os.getenv('SQUARE_API_BURST', '20'))
+        _rate_limiter = TokenBucket(rate, burst)
+    return _rate_limiter
+
+
+def get_square_client(access_token: Optional[str] = None, base_url: Optional[str] = None) -> SquareAPIClient:
+    """
+    Return the shared Square client for the running event loop.
+    Defaults to SQUARE_ACCESS_TOKEN and the configured Square environment.
+    """
+    access_token = access_token or os.getenv('SQUARE_ACCESS_TOKEN')
+    base_url = (base_url or square_base_url()).rstrip('/')
+
+    loop = asyncio.get_running_loop()
+    loop_clients = _clients.setdefault(loop, {})
+    key = (access_token, base_url)
+
+    client = loop_clients.get(key)
+    if client is None:
+        client = SquareAPIClient(access_token, base_url)
+        loop_clients[key] = client
+    return client
+
+
+async def close_square_clients():
+    """Close the connection pools owned by the running event loop"""
+    loop = asyncio.get_running_loop()
+    for client in _clients.pop(loop, {}).values():
+        await client.close()
@@ -1,6 +1,6 @@
 import aiohttp
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.config import Config
@@ -26,7 +26,8 @@ class SquareCatalogService:
             # Custom URL provided - use as-is
             self.export_service_urls = [base_url]
             
-        self.timeout = aiohttp.ClientTimeout(total=300)  # 5 minute timeout for export operations
+        # Exports run as background jobs in the service, so every call here returns quickly
+        self.timeout = aiohttp.ClientTimeout(total=30)
         
     async def _make_request(self, endpoint: str, method: str = 'GET', **kwargs) -> Dict[str, Any]:
         """Make a request to the external service, trying multiple URLs if needed"""
@@ -59,7 +60,7 @@ class SquareCatalogService:
     
     async def _handle_response(self, response, url: str) -> Dict[str, Any]:
         """Handle HTTP response from the external service"""
-        if response.status == 200:
+        if response.status in (200, 202):
             result_data = await response.json()
             logger.info(f"Successful response from {url}")
             return {'success': True, 'data': result_data, 'status_code': response.status}
@@ -72,13 +73,18 @@ class SquareCatalogService:
                 'status_code': response.status
             }
         
-    async def export_catalog_to_database(self, session: AsyncSession) -> Dict[str, Any]:
-        """Call the external square_catalog_export service to perform the export"""
+    async def export_catalog_to_database(self, session: AsyncSession, incremental: bool = False) -> Dict[str, Any]:
+        """
+        Start an export job in the external square_catalog_export service. The service
+        answers with a job ID straight away; poll check_export_status(job_id) for progress.
+        """
         try:
             logger.info("Starting Square catalog export via external service")
             
             # Use the new helper method that tries multiple URLs
-            response_data = await self._make_request('export', method='POST')
+            response_data = await self._make_request(
+                'export', method='POST', params={'mode': 'incremental' if incremental else 'full'}
+            )
             
             if response_data['success']:
                 result_data = response_data['data']
@@ -89,10 +95,11 @@ class SquareCatalogService:
                     return {
                         'success': True,
                         'status': 'running',
+                        'job_id': result_data.get('job_id'),
                         'message': result_data.get('message', 'Export started'),
                         'export_time': datetime.now(timezone.utc).isoformat(),
                         'external_service_response': result_data,
-                        'note': 'Export started via external square_catalog_export service - check logs for progress'
+                        'note': 'Export started via external square_catalog_export service - poll /catalog/export/status for progress'
                     }
                 else:
                     # Export completed
@@ -134,11 +141,11 @@ class SquareCatalogService:
                 'export_time': datetime.now(timezone.utc).isoformat()
             }
     
-    async def check_export_status(self) -> Dict[str, Any]:
-        """Check the status of the external export service"""
+    async def check_export_status(self, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Check the status of the external export service, or of one of its export jobs"""
         try:
             # Use the new helper method that tries multiple URLs
-            response_data = await self._make_request('status', method='GET')
+            response_data = await self._make_request(f'status/{job_id}' if job_id else 'status', method='GET')
                 
             if response_data['success']:
                 return {
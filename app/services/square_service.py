@@ -1,9 +1,146 @@
+import asyncio
 import os
-from datetime import datetime, timezone
-from square.client import Client
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from app.config import Config
 from app.logger import logger
-from app.utils.timezone import get_central_today_range, parse_utc_datetime, CENTRAL_TZ
+from app.services.square_api_client import get_square_client, square_base_url
+from app.utils.timezone import get_central_now, get_central_today_range, parse_utc_datetime, CENTRAL_TZ
+
+# Re-read this much of the previous poll window to cover Square's eventual consistency
+TODAYS_SALES_DELTA_OVERLAP_SECONDS = 60
+
+
+def _order_amount(order: Dict[str, Any]) -> float:
+    return float(order.get('total_money', {}).get('amount', 0))
+
+
+def _parse_square_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class TodaysOrdersLedger:
+    """
+    In-memory record of today's completed orders with running per-location totals.
+    Orders are merged by ID and version, so re-reading an order is a no-op and
+    each delta poll costs time proportional to the orders that changed.
+    Amounts are kept in cents.
+    """
+
+    def __init__(self, key: Tuple[str, str, str]):
+        self.key = key
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.total_amount = 0.0
+        self.orders_with_sales = 0
+        self.location_totals: Dict[str, Dict[str, float]] = {}
+        self.high_water: Optional[datetime] = None
+
+    def _apply(self, entry: Dict[str, Any], sign: int):
+        self.total_amount += sign * entry['amount']
+        # $0 orders (no sale transactions to open cash drawer) only count toward total sales
+        if entry['amount'] > 0:
+            self.orders_with_sales += sign
+            totals = self.location_totals.setdefault(entry['location_id'], {'amount': 0.0, 'orders': 0})
+            totals['amount'] += sign * entry['amount']
+            totals['orders'] += sign
+
+    def merge(self, order: Dict[str, Any], start_time: datetime, end_time: datetime) -> bool:
+        """Fold one order into the totals; returns True if the totals changed"""
+        order_id = order.get('id')
+        version = order.get('version', 0)
+        existing = self.orders.get(order_id)
+        if existing is not None and existing['version'] >= version:
+            return False
+
+        created_at = _parse_square_time(order.get('created_at'))
+        belongs_today = (order.get('state', 'COMPLETED') == 'COMPLETED'
+                         and (created_at is None or start_time <= created_at <= end_time))
+
+        if existing is not None:
+            self._apply(existing, -1)
+            del self.orders[order_id]
+        if not belongs_today:
+            return existing is not None
+
+        entry = {
+            'version': version,
+            'location_id': order.get('location_id'),
+            'amount': _order_amount(order),
+            'order': order
+        }
+        self.orders[order_id] = entry
+        self._apply(entry, 1)
+        return True
+
+    def sales_orders(self) -> List[Dict[str, Any]]:
+        return [entry['order'] for entry in self.orders.values() if entry['amount'] > 0]
+
+
+_todays_orders_ledger: Optional[TodaysOrdersLedger] = None
+
+
+class TodaysSalesSnapshot:
+    """
+    Process-wide, TTL-cached snapshot of today's sales.
+    Every dashboard fragment reads the same snapshot, and concurrent callers
+    share one in-flight Square fetch instead of each searching today's orders.
+    """
+
+    def __init__(self):
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.refreshed_at: Optional[datetime] = None
+        self._key: Optional[Tuple[str, str, str]] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._inflight_key: Optional[Tuple[str, str, str]] = None
+
+    def _is_fresh(self, key: Tuple[str, str, str]) -> bool:
+        return self.metrics is not None and self._key == key and time.monotonic() < self._expires_at
+
+    async def get(self, key: Tuple[str, str, str], fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+                  force_refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the cached metrics for `key`, refreshing them through `fetch` at most once at a time"""
+        if not force_refresh and self._is_fresh(key):
+            return self.metrics
+
+        task = self._inflight
+        if (task is None or task.done() or self._inflight_key != key
+                or task.get_loop() is not asyncio.get_running_loop()):
+            task = asyncio.ensure_future(self._refresh(key, fetch))
+            self._inflight = task
+            self._inflight_key = key
+        else:
+            logger.info("Joining in-flight today's sales refresh")
+
+        # Shield so one disconnected request does not cancel the fetch other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: Tuple[str, str, str],
+                       fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        metrics = await fetch()
+        if not metrics:
+            # Failed fetches are not cached so the next caller tries again
+            return metrics
+
+        self.refreshed_at = datetime.now(timezone.utc)
+        metrics['last_refreshed'] = self.refreshed_at.isoformat()
+        self.metrics = metrics
+        self._key = key
+        self._expires_at = time.monotonic() + Config.TODAYS_SALES_CACHE_TTL_SECONDS
+        return metrics
+
+    def clear(self):
+        self.metrics = None
+        self.refreshed_at = None
+        self._key = None
+        self._expires_at = 0.0
+
+
+todays_sales_snapshot = TodaysSalesSnapshot()
+
 
 class SquareService:
     def __init__(self):
@@ -13,17 +150,21 @@ class SquareService:
             raise ValueError("Square access token not found in environment variables")
         
         logger.info(f"Initializing Square client with environment: {environment}")
-        self.client = Client(
-            access_token=access_token,
-            environment=environment
-        )
+        self.access_token = access_token
+        self.base_url = square_base_url(environment)
+
+    @property
+    def client(self):
+        """Shared async Square client, so API calls never block the event loop"""
+        return get_square_client(self.access_token, self.base_url)
 
     async def get_active_locations(self):
         """Fetch all active locations from Square"""
         try:
-            result = self.client.locations.list_locations()
-            if result.is_success():
-                locations = result.body.get('locations', [])
+            response = await self.client.get('/v2/locations')
+            result = await response.json()
+            if response.status == 200:
+                locations = result.get('locations', [])
                 # Filter for active locations
                 active_locations = [loc for loc in locations if loc.get('status') == 'ACTIVE']
                 logger.info(f"Found {len(active_locations)} active locations")
@@ -35,14 +176,20 @@ class SquareService:
                     
                 return active_locations
             else:
-                logger.error(f"Error fetching locations: {result.errors}")
+                logger.error(f"Error fetching locations: {result.get('errors')}")
                 return []
         except Exception as e:
             logger.error(f"Error fetching locations: {str(e)}", exc_info=True)
             return []
 
-    async def fetch_todays_orders(self):
-        """Fetch today's orders from Square API for all active locations"""
+    async def fetch_todays_orders(self, full_refresh: bool = False):
+        """
+        Fetch today's orders from Square API for all active locations.
+        The first call of the day loads every completed order; later calls only
+        ask Square for orders updated since the previous poll and merge them into
+        the running per-location totals (disable with TODAYS_SALES_INCREMENTAL=false).
+        """
+        global _todays_orders_ledger
         try:
             logger.info("=== Starting Square API orders fetch ===")
             # Get active locations
@@ -61,10 +208,27 @@ class SquareService:
             logger.info(f"- Start: {start_time.astimezone(CENTRAL_TZ)} Central")
             logger.info(f"- End: {end_time.astimezone(CENTRAL_TZ)} Central")
 
-            # Build the base query
-            base_query = {
-                "location_ids": location_ids,
-                "query": {
+            key = (self.access_token, self.base_url, start_time.isoformat())
+            ledger = _todays_orders_ledger
+            incremental = (Config.TODAYS_SALES_INCREMENTAL and not full_refresh and ledger is not None
+                           and ledger.key == key and ledger.high_water is not None)
+            poll_started_at = datetime.now(timezone.utc)
+
+            if incremental:
+                # Only orders touched since the last poll; state is checked on merge so
+                # orders that leave COMPLETED are dropped from the totals
+                query = {
+                    "filter": {
+                        "date_time_filter": {
+                            "updated_at": {"start_at": ledger.high_water.isoformat()}
+                        }
+                    },
+                    "sort": {"sort_field": "UPDATED_AT", "sort_order": "ASC"}
+                }
+                logger.info(f"Fetching orders updated since {ledger.high_water.isoformat()}")
+            else:
+                ledger = TodaysOrdersLedger(key)
+                query = {
                     "filter": {
                         "date_time_filter": {
                             "created_at": {
@@ -76,72 +240,42 @@ class SquareService:
                             "states": ["COMPLETED"]
                         }
                     }
-                },
-                "limit": 500  # Maximum allowed by Square API
-            }
-            logger.info("Prepared Square API base query")
-
-            # Initialize variables for pagination
-            all_orders = []
-            cursor = None
-            page = 1
+                }
 
-            while True:
-                # Add cursor to query if we have one
-                body = base_query.copy()
-                if cursor:
-                    body["cursor"] = cursor
+            orders = await self._search_all_orders(location_ids, query)
+            if orders is None:
+                logger.error("=== Failed Square API orders fetch ===")
+                return None
 
-                logger.info(f"Making Square API search_orders call (page {page})...")
-                result = self.client.orders.search_orders(body=body)
-                
-                if result.is_success():
-                    orders = result.body.get('orders', [])
-                    logger.info(f"Retrieved {len(orders)} orders on page {page}")
-                    all_orders.extend(orders)
-                    
-                    # Check if we have more pages
-                    cursor = result.body.get('cursor')
-                    if not cursor:
-                        logger.info("No more pages to fetch")
-                        break
-                    
-                    page += 1
-                    logger.info(f"Moving to page {page}")
-                else:
-                    logger.error(f"Square API error: {result.errors}")
-                    logger.error("=== Failed Square API orders fetch ===")
-                    return None
-
-            logger.info(f"Successfully retrieved {len(all_orders)} total orders across all pages")
+            changed = sum(1 for order in orders if ledger.merge(order, start_time, end_time))
+            ledger.high_water = poll_started_at - timedelta(seconds=TODAYS_SALES_DELTA_OVERLAP_SECONDS)
+            _todays_orders_ledger = ledger
+            logger.info(f"Merged {changed} changed orders ({'incremental' if incremental else 'full'} load, "
+                        f"{len(ledger.orders)} orders tracked today)")
             
             # Calculate total sales
-            total_sales = sum(float(order.get('total_money', {}).get('amount', 0)) / 100 for order in all_orders)
+            total_sales = ledger.total_amount / 100
             logger.info(f"Calculated total sales: ${total_sales:,.2f}")
             
-            # Filter out $0 orders (no sale transactions to open cash drawer)
-            orders_with_sales = [order for order in all_orders if float(order.get('total_money', {}).get('amount', 0)) > 0]
-            logger.info(f"Filtered out {len(all_orders) - len(orders_with_sales)} $0 orders (no sale transactions)")
-            
-            # Process location data
+            # Process location data from the running totals
             locations_data = {}
             for loc in active_locations:
                 loc_id = loc.get('id')
-                loc_orders = [order for order in orders_with_sales if order.get('location_id') == loc_id]
-                loc_sales = sum(float(order.get('total_money', {}).get('amount', 0)) / 100 for order in loc_orders)
+                loc_totals = ledger.location_totals.get(loc_id, {'amount': 0, 'orders': 0})
+                loc_sales = loc_totals['amount'] / 100
                 
                 locations_data[loc_id] = {
                     'name': loc.get('name'),
                     'sales': loc_sales,
-                    'orders': len(loc_orders),
+                    'orders': loc_totals['orders'],
                     'postal_code': loc.get('address', {}).get('postal_code', '').split('-')[0]
                 }
-                logger.info(f"Location {loc.get('name')}: ${loc_sales:,.2f} ({len(loc_orders)} orders)")
+                logger.info(f"Location {loc.get('name')}: ${loc_sales:,.2f} ({loc_totals['orders']} orders)")
             
             response_data = {
                 'total_sales': total_sales,
-                'total_orders': len(orders_with_sales),
-                'orders': orders_with_sales,
+                'total_orders': ledger.orders_with_sales,
+                'orders': ledger.sales_orders(),
                 'locations': locations_data
             }
             
@@ -154,8 +288,58 @@ class SquareService:
             logger.error("=== Failed Square API orders fetch ===")
             return None
 
-    async def get_todays_sales(self):
-        """Get today's sales metrics"""
+    async def _search_all_orders(self, location_ids, query):
+        """Page through SearchOrders for `query`; returns None if Square answers with an error"""
+        base_query = {
+            "location_ids": location_ids,
+            "query": query,
+            "limit": 500  # Maximum allowed by Square API
+        }
+
+        all_orders = []
+        cursor = None
+        page = 1
+
+        while True:
+            # Add cursor to query if we have one
+            body = base_query.copy()
+            if cursor:
+                body["cursor"] = cursor
+
+            logger.info(f"Making Square API search_orders call (page {page})...")
+            response = await self.client.post('/v2/orders/search', json=body)
+            result = await response.json()
+            
+            if response.status != 200:
+                logger.error(f"Square API error: {result.get('errors')}")
+                return None
+
+            orders = result.get('orders', [])
+            logger.info(f"Retrieved {len(orders)} orders on page {page}")
+            all_orders.extend(orders)
+            
+            # Check if we have more pages
+            cursor = result.get('cursor')
+            if not cursor:
+                logger.info("No more pages to fetch")
+                break
+            
+            page += 1
+
+        logger.info(f"Successfully retrieved {len(all_orders)} orders across {page} pages")
+        return all_orders
+
+    async def get_todays_sales(self, force_refresh: bool = False):
+        """
+        Get today's sales metrics from the shared snapshot.
+        Square is only searched again once the snapshot is older than
+        TODAYS_SALES_CACHE_TTL_SECONDS or `force_refresh` is set.
+        """
+        key = (self.access_token, self.base_url, get_central_now().date().isoformat())
+        return await todays_sales_snapshot.get(key, self._fetch_todays_sales, force_refresh=force_refresh)
+
+    async def _fetch_todays_sales(self):
+        """Fetch today's sales metrics straight from Square"""
         try:
             logger.info("=== Starting Square API sales metrics fetch ===")
             # Fetch fresh data from Square
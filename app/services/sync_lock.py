@@ -0,0 +1,199 @@
+"""
+Sync Locks
+Single-flight locking for sync runs across every Cloud Run instance. A run of a
+data type holds a Postgres advisory lock for that type, so the scheduled
+orchestrator, a manual sync from the admin page and a second instance never
+fetch and write the same data at once.
+
+A second run of a type in the same process attaches to the run already in
+flight and gets its result. When another instance holds the lock, the caller
+waits up to `wait_seconds` for it and then gets SyncAlreadyRunning, which
+callers report as "already running" rather than as a failure. Time spent
+waiting for locks is recorded per data type (see lock_wait_stats()).
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Iterable, List, Tuple, TypeVar, Union
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Names different sync paths use for the same data; they share one lock
+LOCK_NAME_ALIASES = {
+    'catalog_inventory': 'inventory',
+    'categories': 'catalog_categories',
+    'items': 'catalog_items',
+    'variations': 'catalog_variations',
+}
+
+# Keeps these advisory lock keys apart from any other user of pg_advisory_lock
+LOCK_NAMESPACE = 'nytex-sync'
+
+Connect = Callable[[], AsyncContextManager[Any]]
+
+
+class SyncAlreadyRunning(Exception):
+    """Another instance holds the lock for a data type"""
+
+    def __init__(self, name: str, waited_seconds: float = 0.0):
+        super().__init__(f"{name} sync already running on another instance")
+        self.name = name
+        self.waited_seconds = waited_seconds
+
+
+@dataclass
+class LockWaitStats:
+    """Lock activity for one data type since this process started"""
+    acquired: int = 0
+    attached: int = 0
+    already_running: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    def record_wait(self, seconds: float):
+        self.total_wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+LOCK_WAIT_STATS: Dict[str, LockWaitStats] = {}
+
+# (caller, name) -> result of the run in flight in this process
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+def lock_name(name: str) -> str:
+    return LOCK_NAME_ALIASES.get(name, name)
+
+
+def lock_key(name: str) -> int:
+    """Signed 64-bit advisory lock key for a data type"""
+    digest = hashlib.sha256(f"{LOCK_NAMESPACE}:{lock_name(name)}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def lock_wait_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: asdict(stats) for name, stats in sorted(LOCK_WAIT_STATS.items())}
+
+
+def _stats(name: str) -> LockWaitStats:
+    return LOCK_WAIT_STATS.setdefault(name, LockWaitStats())
+
+
+@asynccontextmanager
+async def database_connection():
+    """Connection from the app's shared pool, for callers without their own engine"""
+    # Import here to avoid circular imports
+    from app.database import get_engine
+    engine = get_engine()
+    if engine is None:
+        raise RuntimeError("Database not configured")
+    async with engine.connect() as conn:
+        yield conn
+
+
+@asynccontextmanager
+async def advisory_lock(names: Union[str, Iterable[str]], connect: Connect = database_connection,
+                        wait_seconds: float = 0.0, poll_seconds: float = 0.5):
+    """
+    Hold the advisory locks for `names` until the block exits. The locks are
+    session-level and the connection sits idle outside a transaction while the
+    block runs, so a long sync neither pins the oldest visible transaction nor
+    trips idle_in_transaction_session_timeout; it does keep one pooled
+    connection for its whole run. Postgres releases the locks if this process
+    dies. Raises SyncAlreadyRunning when a lock is still held elsewhere after
+    wait_seconds. Yields the seconds spent waiting.
+    """
+    names = [names] if isinstance(names, str) else list(names)
+    # Sorted so two callers locking overlapping sets can't deadlock
+    names = sorted({lock_name(name) for name in names})
+    start = time.monotonic()
+
+    async with connect() as conn:
+        held = []
+        try:
+            for name in names:
+                while not await _try_lock(conn, lock_key(name)):
+                    waited = time.monotonic() - start
+                    if waited >= wait_seconds:
+                        _stats(name).already_running += 1
+                        _stats(name).record_wait(waited)
+                        logger.info(f"⏭️ {name} sync already running elsewhere (waited {waited:.1f}s)")
+                        raise SyncAlreadyRunning(name, waited)
+                    await asyncio.sleep(poll_seconds)
+                held.append(name)
+
+            waited = time.monotonic() - start
+            for name in names:
+                _stats(name).acquired += 1
+                _stats(name).record_wait(waited)
+            if waited >= poll_seconds:
+                logger.info(f"🔒 Waited {waited:.1f}s for the {', '.join(names)} sync lock")
+            yield waited
+        finally:
+            await _unlock(conn, held)
+
+
+async def _try_lock(conn, key: int) -> bool:
+    result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': key})
+    locked = bool(result.scalar())
+    # End the implicit transaction; the session lock outlives it
+    await conn.commit()
+    return locked
+
+
+async def _unlock(conn, names: List[str]):
+    """Release session locks before the connection goes back to the pool"""
+    try:
+        for name in names:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': lock_key(name)})
+        await conn.commit()
+    except BaseException as e:
+        # A pooled connection must not be reused while still holding the locks;
+        # closing it releases them
+        logger.warning(f"Could not release the {', '.join(names)} sync lock, closing its connection: {e}")
+        await conn.invalidate()
+        if not isinstance(e, Exception):
+            raise
+
+
+async def single_flight(name: str, run: Callable[[], Awaitable[T]], connect: Connect = database_connection,
+                        wait_seconds: float = 0.0, caller: str = '') -> T:
+    """
+    Run `run` while holding the lock for `name`. A call from the same `caller`
+    for a name already in flight in this process waits for that run and
+    returns its result instead of starting another; other callers (whose
+    results have a different shape) contend for the lock as usual.
+    """
+    name = lock_name(name)
+    flight = (caller, name)
+    running = _in_flight.get(flight)
+    if running is not None:
+        _stats(name).attached += 1
+        logger.info(f"🔗 {name} sync already in flight here; attaching to its result")
+        return await asyncio.shield(running)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[flight] = future
+    try:
+        async with advisory_lock(name, connect, wait_seconds):
+            result = await run()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark the exception retrieved when nobody attached
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(flight, None)
@@ -0,0 +1,109 @@
+"""
+Sync Scheduler
+Runs sync data types as a dependency graph instead of one after another.
+Independent types run concurrently up to a concurrency limit, and each type
+starts as soon as its own prerequisites have finished rather than waiting for
+a whole "level" of the graph. The report records when every type ran and the
+critical path: the chain of dependent types that bounds the total run time.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScheduleReport:
+    """Results and timings of one scheduled run (times are seconds since it began)"""
+    results: Dict[str, Any] = field(default_factory=dict)
+    started_at: Dict[str, float] = field(default_factory=dict)
+    finished_at: Dict[str, float] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    critical_path: List[str] = field(default_factory=list)
+    critical_path_seconds: float = 0.0
+
+    def duration(self, name: str) -> float:
+        return self.finished_at.get(name, 0.0) - self.started_at.get(name, 0.0)
+
+    def summary(self) -> str:
+        path = ' → '.join(self.critical_path) or 'none'
+        return (f"Critical path {path}: {self.critical_path_seconds:.1f}s "
+                f"of {self.wall_seconds:.1f}s wall time")
+
+
+async def run_dependency_graph(tasks: Dict[str, Callable[[], Awaitable[Any]]],
+                               dependencies: Dict[str, List[str]],
+                               max_concurrency: int = 3) -> ScheduleReport:
+    """
+    Run `tasks` (name -> coroutine function) so that no task starts before the
+    tasks it depends on have finished, with at most `max_concurrency` running.
+    Dependencies on names that are not being run are ignored, and a task starts
+    whether its prerequisites succeeded or not - each task reports its own
+    failure. Ready tasks start in the order `tasks` lists them. An exception
+    raised by a task cancels the rest and propagates.
+    """
+    deps = {
+        name: [dep for dep in dependencies.get(name, []) if dep in tasks and dep != name]
+        for name in tasks
+    }
+    report = ScheduleReport()
+    pending = list(tasks)
+    running: Dict[asyncio.Task, str] = {}
+    finished = set()
+    limit = max(1, max_concurrency)
+    start = time.monotonic()
+
+    try:
+        while pending or running:
+            ready = [name for name in pending if all(dep in finished for dep in deps[name])]
+            if not ready and not running:
+                # Circular dependency - run the first waiting task rather than stall
+                logger.warning(f"⚠️ Dependency cycle among {pending}; starting {pending[0]} anyway")
+                ready = [pending[0]]
+
+            for name in ready[:limit - len(running)]:
+                pending.remove(name)
+                report.started_at[name] = time.monotonic() - start
+                running[asyncio.create_task(tasks[name]())] = name
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                report.finished_at[name] = time.monotonic() - start
+                report.results[name] = task.result()
+                finished.add(name)
+    finally:
+        for task in running:
+            task.cancel()
+
+    report.wall_seconds = time.monotonic() - start
+    report.critical_path, report.critical_path_seconds = _critical_path(report, deps)
+    return report
+
+
+def _critical_path(report: ScheduleReport, deps: Dict[str, List[str]]):
+    """Longest chain of task durations along dependency edges"""
+    cost: Dict[str, float] = {}
+    previous: Dict[str, str] = {}
+
+    # Prerequisites always finish before their dependents, so finish order is a topological order
+    for name in sorted(report.finished_at, key=report.finished_at.get):
+        costed_deps = [dep for dep in deps[name] if dep in cost]
+        longest = max(costed_deps, key=cost.get, default=None)
+        cost[name] = report.duration(name) + (cost[longest] if longest else 0.0)
+        if longest:
+            previous[name] = longest
+
+    if not cost:
+        return [], 0.0
+
+    name = max(cost, key=cost.get)
+    total = cost[name]
+    path = [name]
+    while path[-1] in previous:
+        path.append(previous[path[-1]])
+    return list(reversed(path)), total
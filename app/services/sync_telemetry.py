@@ -0,0 +1,235 @@
+"""
+Sync Run Telemetry
+Records a timing breakdown for every sync run in the sync_runs table, so a slow
+night can be traced to Square (fetch time, retries, 429s) or to Postgres (write
+time) instead of just showing up as a long total duration.
+
+A run is tracked with `async with track_sync_run(...)`. While it is open the
+Square client and the sync code add to it through a context variable, so
+concurrent runs of different data types each collect their own numbers:
+
+- api_seconds: time inside Square requests, including retry back-off
+- api_requests / pages / retries / rate_limited: HTTP attempts, successful
+  responses, retried attempts and 429 answers
+- parse_seconds: decoding responses and turning them into rows
+- db_seconds: time writing to the database
+
+Stage times are summed across concurrent requests, so they can add up to more
+than the run's wall time.
+"""
+
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, AsyncContextManager, Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncRunStats:
+    """Timing breakdown and row counts for one sync run of one data type"""
+    data_type: str
+    source: str
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    success: bool = True
+    error: Optional[str] = None
+    api_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    db_seconds: float = 0.0
+    lock_wait_seconds: float = 0.0
+    api_requests: int = 0
+    pages: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    rows_unchanged: int = 0
+    rows_skipped: int = 0
+
+    @property
+    def duration_seconds(self) -> float:
+        end = self.finished_at or datetime.now(timezone.utc)
+        return (end - self.started_at).total_seconds()
+
+    def add_time(self, stage: str, seconds: float):
+        setattr(self, f"{stage}_seconds", getattr(self, f"{stage}_seconds") + seconds)
+
+    def record_rows(self, inserted: int = 0, updated: int = 0, unchanged: int = 0, skipped: int = 0):
+        self.rows_inserted += inserted
+        self.rows_updated += updated
+        self.rows_unchanged += unchanged
+        self.rows_skipped += skipped
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            'data_type': self.data_type,
+            'source': self.source,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration_seconds': round(self.duration_seconds, 3),
+            'success': self.success,
+            'error': self.error[:1000] if self.error else None,
+            'api_seconds': round(self.api_seconds, 3),
+            'parse_seconds': round(self.parse_seconds, 3),
+            'db_seconds': round(self.db_seconds, 3),
+            'lock_wait_seconds': round(self.lock_wait_seconds, 3),
+            'api_requests': self.api_requests,
+            'pages': self.pages,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'rows_inserted': self.rows_inserted,
+            'rows_updated': self.rows_updated,
+            'rows_unchanged': self.rows_unchanged,
+            'rows_skipped': self.rows_skipped
+        }
+
+
+_current_run: ContextVar[Optional[SyncRunStats]] = ContextVar('sync_run', default=None)
+
+
+def current_sync_run() -> Optional[SyncRunStats]:
+    """Stats of the sync run the calling task belongs to, if any"""
+    return _current_run.get()
+
+
+@contextmanager
+def sync_stage(stage: str):
+    """Add the time spent in the block to the current run's `stage` total"""
+    run = _current_run.get()
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        if run is not None:
+            run.add_time(stage, time.monotonic() - start)
+
+
+def record_api_request(seconds: float, attempts: int, retries: int, rate_limited: int, ok: bool):
+    """Called by the Square client once per request (after any retries)"""
+    run = _current_run.get()
+    if run is None:
+        return
+    run.api_seconds += seconds
+    run.api_requests += attempts
+    run.retries += retries
+    run.rate_limited += rate_limited
+    if ok:
+        run.pages += 1
+
+
+@asynccontextmanager
+async def track_sync_run(data_type: str, source: str,
+                         connect: Optional[Callable[[], AsyncContextManager[Any]]] = None):
+    """
+    Collect telemetry for one sync run and write it to sync_runs when the block
+    exits. An exception marks the run failed. Saving is best effort: a
+    telemetry failure is logged and never fails the sync itself.
+    """
+    run = SyncRunStats(data_type=data_type, source=source)
+    token = _current_run.set(run)
+    try:
+        yield run
+    except Exception as e:
+        run.success = False
+        run.error = str(e)
+        raise
+    finally:
+        _current_run.reset(token)
+        run.finished_at = datetime.now(timezone.utc)
+        logger.info(f"⏱️ {data_type}: {run.duration_seconds:.1f}s total - API {run.api_seconds:.1f}s "
+                    f"({run.pages} pages, {run.retries} retries, {run.rate_limited} × 429), "
+                    f"parse {run.parse_seconds:.1f}s, DB {run.db_seconds:.1f}s")
+        if connect is not None:
+            try:
+                await save_sync_run(connect, run)
+            except Exception as e:
+                logger.warning(f"Could not record {data_type} sync run: {str(e)}")
+
+
+async def _ensure_table(conn):
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS sync_runs (
+            id BIGSERIAL PRIMARY KEY,
+            data_type VARCHAR(100) NOT NULL,
+            source VARCHAR(50) NOT NULL,
+            started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            finished_at TIMESTAMP WITH TIME ZONE,
+            duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            success BOOLEAN NOT NULL,
+            error TEXT,
+            api_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            parse_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            db_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            lock_wait_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            api_requests INTEGER NOT NULL DEFAULT 0,
+            pages INTEGER NOT NULL DEFAULT 0,
+            retries INTEGER NOT NULL DEFAULT 0,
+            rate_limited INTEGER NOT NULL DEFAULT 0,
+            rows_inserted INTEGER NOT NULL DEFAULT 0,
+            rows_updated INTEGER NOT NULL DEFAULT 0,
+            rows_unchanged INTEGER NOT NULL DEFAULT 0,
+            rows_skipped INTEGER NOT NULL DEFAULT 0
+        )
+    """))
+    await conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_sync_runs_type_started
+        ON sync_runs (data_type, started_at DESC)
+    """))
+
+
+async def save_sync_run(connect: Callable[[], AsyncContextManager[Any]], run: SyncRunStats):
+    row = run.to_row()
+    async with connect() as conn:
+        async with conn.begin():
+            await _ensure_table(conn)
+            await conn.execute(text(f"""
+                INSERT INTO sync_runs ({', '.join(row)})
+                VALUES ({', '.join(':' + name for name in row)})
+            """), row)
+
+
+async def recent_sync_runs(conn, limit: int = 50, data_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Latest runs, newest first"""
+    await _ensure_table(conn)
+    result = await conn.execute(text("""
+        SELECT * FROM sync_runs
+        WHERE CAST(:data_type AS VARCHAR) IS NULL OR data_type = :data_type
+        ORDER BY started_at DESC
+        LIMIT :limit
+    """), {'data_type': data_type, 'limit': limit})
+    return [dict(row) for row in result.mappings().all()]
+
+
+async def daily_sync_trends(conn, days: int = 14) -> List[Dict[str, Any]]:
+    """Per data type and day: run count, failures, and average stage times and row counts"""
+    await _ensure_table(conn)
+    result = await conn.execute(text("""
+        SELECT
+            data_type,
+            DATE(started_at) AS day,
+            COUNT(*) AS runs,
+            COUNT(*) FILTER (WHERE NOT success) AS failed_runs,
+            ROUND(AVG(duration_seconds)::numeric, 2) AS avg_duration_seconds,
+            ROUND(AVG(api_seconds)::numeric, 2) AS avg_api_seconds,
+            ROUND(AVG(parse_seconds)::numeric, 2) AS avg_parse_seconds,
+            ROUND(AVG(db_seconds)::numeric, 2) AS avg_db_seconds,
+            ROUND(AVG(lock_wait_seconds)::numeric, 2) AS avg_lock_wait_seconds,
+            SUM(pages) AS pages,
+            SUM(retries) AS retries,
+            SUM(rate_limited) AS rate_limited,
+            SUM(rows_inserted) AS rows_inserted,
+            SUM(rows_updated) AS rows_updated,
+            SUM(rows_unchanged) AS rows_unchanged
+        FROM sync_runs
+        WHERE started_at >= :since
+        GROUP BY data_type, DATE(started_at)
+        ORDER BY day DESC, data_type
+    """), {'since': datetime.now(timezone.utc) - timedelta(days=days)})
+    return [dict(row) for row in result.mappings().all()]
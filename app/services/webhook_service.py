@@ -0,0 +1,333 @@
+"""
+Square Webhook Service
+Receives order.created, order.updated and inventory.count.updated notifications
+so dashboards stay current without waiting for the next polling sync.
+
+Verified events are queued durably in the square_webhook_events table (Square's
+event_id de-duplicates redeliveries) and applied in small batches: order events
+are re-read with BatchRetrieveOrders and written through the sync engine's bulk
+upserts, inventory counts are written straight from the payload. Events are
+claimed with FOR UPDATE SKIP LOCKED, so several app instances can drain the
+queue at once. When a batch fails its events are retried one at a time, so one
+bad event does not hold back the rest; failed events are retried on later
+drains up to max_attempts times. Besides the drain each delivery schedules, a
+periodic drain picks up retries and events left behind by a restart. Both run
+after the delivery has been acknowledged, so the service is deployed with CPU
+always allocated and a minimum instance (see deploy.sh).
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.services.incremental_sync_service import inventory_rows_from_counts, write_inventory_counts
+from app.services.sync_engine import SyncEngine, SyncResult
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENT_TYPES = {'order.created', 'order.updated'}
+INVENTORY_EVENT_TYPES = {'inventory.count.updated'}
+SUPPORTED_EVENT_TYPES = ORDER_EVENT_TYPES | INVENTORY_EVENT_TYPES
+
+# Events stuck in 'processing' this long (e.g. the instance died mid-batch) are claimed again
+STALE_CLAIM_MINUTES = 5
+
+
+def verify_square_signature(body: bytes, signature: Optional[str], signature_key: Optional[str],
+                            notification_url: str) -> bool:
+    """Check the x-square-hmacsha256-signature header: base64(HMAC-SHA256(key, url + body))"""
+    if not signature or not signature_key:
+        return False
+    digest = hmac.new(signature_key.encode('utf-8'), notification_url.encode('utf-8') + body,
+                      hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode('utf-8'), signature)
+
+
+@dataclass
+class WebhookEvent:
+    """One queued Square notification"""
+    id: int
+    event_id: str
+    event_type: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+
+
+@dataclass
+class WebhookBatchResult:
+    """Result of draining the webhook queue"""
+    events_applied: int = 0
+    events_failed: int = 0
+    orders_written: int = 0
+    inventory_counts_written: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+class SquareWebhookService:
+    """Durable queue and batch applier for Square webhook events"""
+
+    def __init__(self, sync_engine: Optional[SyncEngine] = None, batch_size: Optional[int] = None,
+                 max_attempts: int = 5, drain_interval_seconds: Optional[float] = None):
+        self._sync_engine = sync_engine
+        self.batch_size = batch_size or int(os.getenv('SQUARE_WEBHOOK_BATCH_SIZE', '50'))
+        self.max_attempts = max_attempts
+        self.drain_interval_seconds = drain_interval_seconds or float(
+            os.getenv('SQUARE_WEBHOOK_DRAIN_SECONDS', '60'))
+        self._table_ready = False
+        self._drain_task: Optional[asyncio.Task] = None
+        self._periodic_task: Optional[asyncio.Task] = None
+        self._wakeup = False
+
+    @property
+    def sync_engine(self) -> SyncEngine:
+        # Created on first use so the receiver can start without a Square token
+        if self._sync_engine is None:
+            self._sync_engine = SyncEngine()
+        return self._sync_engine
+
+    async def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Store a verified event; returns False for redeliveries of an event already queued"""
+        await self._ensure_queue_table()
+        return await self._insert_event(event)
+
+    def schedule_processing(self):
+        """Drain the queue in the background, reusing the running drain if there is one"""
+        self._wakeup = True
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+
+    def start_periodic_drain(self):
+        """Drain the queue every drain_interval_seconds until shutdown()"""
+        if self._periodic_task is None or self._periodic_task.done():
+            self._periodic_task = asyncio.create_task(self._drain_periodically())
+
+    async def shutdown(self):
+        """Stop the periodic and any running drain; claimed events are picked up again once stale"""
+        tasks = [task for task in (self._periodic_task, self._drain_task) if task is not None]
+        self._periodic_task = self._drain_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _drain_periodically(self):
+        while True:
+            await asyncio.sleep(self.drain_interval_seconds)
+            self.schedule_processing()
+
+    async def _drain(self):
+        try:
+            while self._wakeup:
+                self._wakeup = False
+                await self.process_pending()
+        except Exception as e:
+            logger.error(f"❌ Webhook queue drain failed: {str(e)}")
+
+    async def process_pending(self) -> WebhookBatchResult:
+        """Apply queued events batch by batch until none are left to claim"""
+        await self._ensure_queue_table()
+        result = WebhookBatchResult()
+        # Events that fail are retried on the next drain, not straight away in this one
+        failed_ids: List[int] = []
+
+        while True:
+            events = await self._claim_batch(self.batch_size, failed_ids)
+            if not events:
+                break
+            failed_ids.extend(await self._apply_batch(events, result))
+
+        if result.events_applied or result.events_failed:
+            logger.info(f"🔔 Webhook events: {result.events_applied} applied, {result.events_failed} failed "
+                        f"({result.orders_written} orders, {result.inventory_counts_written} inventory counts)")
+        return result
+
+    async def _apply_batch(self, events: List[WebhookEvent], result: WebhookBatchResult) -> List[int]:
+        """
+        Apply one claimed batch and return the IDs of the events that failed.
+        If the batch fails as a whole, its events are retried one at a time so
+        only the events that fail on their own are marked for retry.
+        """
+        if await self._apply_events(events, result, mark_failed=len(events) == 1):
+            return []
+        if len(events) == 1:
+            return [events[0].id]
+
+        logger.warning(f"⚠️ Retrying {len(events)} webhook events one at a time after their batch failed")
+        failed_ids = []
+        for event in events:
+            if not await self._apply_events([event], result, mark_failed=True):
+                failed_ids.append(event.id)
+        return failed_ids
+
+    async def _apply_events(self, events: List[WebhookEvent], result: WebhookBatchResult,
+                            mark_failed: bool) -> bool:
+        """Apply events together; on failure, mark them failed only if `mark_failed`"""
+        try:
+            order_versions = self._order_versions(events)
+            inventory_rows = self._inventory_rows(events)
+
+            orders_written = await self._apply_orders(order_versions) if order_versions else 0
+            inventory_counts_written = (await self._write_inventory_counts(inventory_rows)
+                                        if inventory_rows else 0)
+
+            await self._mark_events([event.id for event in events], 'applied')
+            result.orders_written += orders_written
+            result.inventory_counts_written += inventory_counts_written
+            result.events_applied += len(events)
+            return True
+
+        except Exception as e:
+            if not mark_failed:
+                logger.warning(f"⚠️ Failed to apply {len(events)} webhook events together: {str(e)}")
+                return False
+            logger.error(f"❌ Failed to apply {len(events)} webhook events: {str(e)}")
+            await self._mark_events([event.id for event in events], 'failed', str(e))
+            result.events_failed += len(events)
+            result.errors.append(str(e))
+            return False
+
+    def _order_versions(self, events: List[WebhookEvent]) -> Dict[str, int]:
+        """Newest notified version per order ID"""
+        versions: Dict[str, int] = {}
+        for event in events:
+            if event.event_type not in ORDER_EVENT_TYPES:
+                continue
+            data = event.payload.get('data', {})
+            obj = data.get('object', {})
+            summary = obj.get('order_created') or obj.get('order_updated') or {}
+            order_id = summary.get('order_id') or data.get('id')
+            if order_id:
+                versions[order_id] = max(versions.get(order_id, 0), summary.get('version') or 0)
+        return versions
+
+    def _inventory_rows(self, events: List[WebhookEvent]) -> List[Dict[str, Any]]:
+        """Latest IN_STOCK count per (variation, location) across the batch"""
+        counts = [
+            count
+            for event in events if event.event_type in INVENTORY_EVENT_TYPES
+            for count in event.payload.get('data', {}).get('object', {}).get('inventory_counts', [])
+        ]
+        return inventory_rows_from_counts(counts)
+
+    async def _apply_orders(self, order_versions: Dict[str, int]) -> int:
+        """Re-read notified orders not already stored at that version and upsert them"""
+        stored_versions = await self._load_order_versions(list(order_versions))
+        order_ids = [
+            order_id for order_id, version in order_versions.items()
+            if stored_versions.get(order_id) is None or stored_versions[order_id] < version
+        ]
+        if not order_ids:
+            return 0
+
+        orders, _ = await self.sync_engine._batch_retrieve_orders(self.sync_engine._square_client(), order_ids)
+        result = SyncResult(success=True, data_type='orders', records_processed=len(orders))
+        await self.sync_engine.write_orders(orders, result)
+        if result.errors:
+            raise Exception('; '.join(result.errors))
+        return result.records_added + result.records_updated
+
+    async def _ensure_queue_table(self):
+        if self._table_ready:
+            return
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                await conn.execute(text("""
+                    CREATE TABLE IF NOT EXISTS square_webhook_events (
+                        id BIGSERIAL PRIMARY KEY,
+                        event_id VARCHAR(100) NOT NULL UNIQUE,
+                        event_type VARCHAR(100) NOT NULL,
+                        payload JSONB NOT NULL,
+                        status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        error TEXT,
+                        received_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                        claimed_at TIMESTAMP WITH TIME ZONE,
+                        processed_at TIMESTAMP WITH TIME ZONE
+                    )
+                """))
+                await conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_square_webhook_events_unapplied
+                    ON square_webhook_events (id) WHERE status <> 'applied'
+                """))
+        self._table_ready = True
+
+    async def _insert_event(self, event: Dict[str, Any]) -> bool:
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                result = await conn.execute(text("""
+                    INSERT INTO square_webhook_events (event_id, event_type, payload)
+                    VALUES (:event_id, :event_type, CAST(:payload AS JSONB))
+                    ON CONFLICT (event_id) DO NOTHING
+                    RETURNING id
+                """), {
+                    'event_id': event['event_id'],
+                    'event_type': event['type'],
+                    'payload': json.dumps(event)
+                })
+                return result.scalar() is not None
+
+    async def _claim_batch(self, limit: int, exclude_ids: List[int]) -> List[WebhookEvent]:
+        """Mark up to `limit` pending (or retryable) events as processing and return them"""
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                result = await conn.execute(text(f"""
+                    UPDATE square_webhook_events
+                    SET status = 'processing', attempts = attempts + 1, claimed_at = NOW()
+                    WHERE id IN (
+                        SELECT id FROM square_webhook_events
+                        WHERE (status = 'pending'
+                               OR (status = 'failed' AND attempts < :max_attempts)
+                               OR (status = 'processing' AND claimed_at < NOW() - INTERVAL '{STALE_CLAIM_MINUTES} minutes'))
+                          AND id <> ALL(:exclude_ids)
+                        ORDER BY id
+                        LIMIT :limit
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, event_id, event_type, payload, attempts
+                """), {'limit': limit, 'max_attempts': self.max_attempts, 'exclude_ids': exclude_ids})
+                rows = result.fetchall()
+
+        events = [
+            WebhookEvent(row.id, row.event_id, row.event_type,
+                         row.payload if isinstance(row.payload, dict) else json.loads(row.payload), row.attempts)
+            for row in rows
+        ]
+        return sorted(events, key=lambda event: event.id)
+
+    async def _mark_events(self, ids: List[int], status: str, error: Optional[str] = None):
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                await conn.execute(text("""
+                    UPDATE square_webhook_events
+                    SET status = :status, error = :error, processed_at = NOW()
+                    WHERE id = ANY(:ids)
+                """), {'status': status, 'error': error, 'ids': ids})
+
+    async def _load_order_versions(self, order_ids: List[str]) -> Dict[str, Optional[int]]:
+        async with self.sync_engine.connect() as conn:
+            result = await conn.execute(text("SELECT id, version FROM orders WHERE id = ANY(:ids)"),
+                                        {'ids': order_ids})
+            return {row.id: row.version for row in result.fetchall()}
+
+    async def _write_inventory_counts(self, rows: List[Dict[str, Any]]) -> int:
+        async with self.sync_engine.connect() as conn:
+            async with conn.begin():
+                return await write_inventory_counts(conn, rows)
+
+
+_webhook_service: Optional[SquareWebhookService] = None
+
+
+def get_webhook_service() -> SquareWebhookService:
+    """Process-wide webhook service, so concurrent deliveries share one queue drain"""
+    global _webhook_service
+    if _webhook_service is None:
+        _webhook_service = SquareWebhookService()
+    return _webhook_service
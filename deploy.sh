@@ -37,7 +37,12 @@ docker push $IMAGE_NAME
 
 echo "🌐 Deploying to Cloud Run..."
 
-# Deploy to Cloud Run with secrets from Secret Manager
+# Deploy to Cloud Run with secrets from Secret Manager.
+# Background jobs keep running after their endpoint has returned 202, and
+# Square webhook events are applied after the delivery is acknowledged, so CPU
+# stays allocated outside requests (--no-cpu-throttling) and one instance is
+# always up (--min-instances 1) to finish them, reclaim abandoned jobs and run
+# the periodic webhook drain.
 gcloud run deploy nytex-dashboard \
     --image $IMAGE_NAME \
     --platform managed \
@@ -46,7 +51,8 @@ gcloud run deploy nytex-dashboard \
     --memory 1Gi \
     --cpu 1 \
     --max-instances 10 \
-    --min-instances 0 \
+    --min-instances 1 \
+    --no-cpu-throttling \
     --timeout 300 \
     --concurrency 80 \
     --add-cloudsql-instances nytex-business-systems:us-central1:nytex-main-db \
@@ -0,0 +1,34 @@
+"""Add content_hash to synced tables
+
+Revision ID: e4c7b2a91f3d
+Revises: d9a8493aa014
+Create Date: 2026-10-16 09:12:41.338207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c7b2a91f3d'
+down_revision = 'd9a8493aa014'
+branch_labels = None
+depends_on = None
+
+# Tables written by the sync upserts; a row whose stored hash matches the
+# incoming one is skipped instead of being rewritten
+SYNCED_TABLES = [
+    'orders', 'order_line_items', 'tenders', 'payments', 'locations', 'vendors',
+    'catalog_categories', 'catalog_items', 'catalog_variations'
+]
+
+
+def upgrade():
+    # Existing rows keep a NULL hash, so the next sync rewrites them once and stores it
+    for table_name in SYNCED_TABLES:
+        op.add_column(table_name, sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    for table_name in reversed(SYNCED_TABLES):
+        op.drop_column(table_name, 'content_hash')
@@ -0,0 +1,39 @@
+"""Add daily_location_sales rollup table
+
+Revision ID: f3a9c61d2b87
+Revises: e4c7b2a91f3d
+Create Date: 2026-10-16 15:47:09.512804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c61d2b87'
+down_revision = 'e4c7b2a91f3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled from orders by scripts/rebuild_sales_rollup.py; sync keeps it current after that
+    op.create_table('daily_location_sales',
+    sa.Column('sale_date', sa.Date(), nullable=False),
+    sa.Column('location_id', sa.String(), nullable=False),
+    sa.Column('completed_orders', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('zero_amount_orders', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('gross_sales_cents', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('net_sales_cents', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('tax_cents', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('discount_cents', sa.BigInteger(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('sale_date', 'location_id')
+    )
+    op.create_index('ix_daily_location_sales_location_date', 'daily_location_sales',
+                    ['location_id', 'sale_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_daily_location_sales_location_date', table_name='daily_location_sales')
+    op.drop_table('daily_location_sales')
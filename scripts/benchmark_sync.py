@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Sync Throughput Benchmark
+Drives SyncEngine, IncrementalSyncService and the historical order backfill
+against the fake Square server (tests/fake_square_server.py) and reports
+records per second and peak resident memory for each, so a change that slows
+sync down shows up here rather than in the middle of a fireworks season.
+
+Without --database-url the syncs run API-only: requests, retries and parsing
+run as in production and the parsed rows are counted instead of written.
+With --database-url they write to that database, which must be a scratch
+one; --fresh empties the synced tables first. The fake server runs in its
+own process so its work doesn't count against the syncs.
+
+Usage:
+    python scripts/benchmark_sync.py --orders 50000
+    python scripts/benchmark_sync.py --orders 50000 --latency-ms 80 --rate-limit-ratio 0.02
+    python scripts/benchmark_sync.py --save benchmark_baseline.json
+    python scripts/benchmark_sync.py --baseline benchmark_baseline.json --max-regression 0.2
+    python scripts/benchmark_sync.py --database-url postgresql://localhost/sync_benchmark --fresh
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import psutil
+
+# Add the app directory to the Python path
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+from app.services.incremental_sync_service import IncrementalSyncService
+from app.services.order_backfill import OrderBackfill
+from app.services.square_api_client import close_square_clients
+from app.services.sync_engine import SyncEngine
+from tests.fake_square_server import SyntheticSquareData, add_server_arguments, server_argv
+
+logger = logging.getLogger(__name__)
+
+# The fake server accepts any bearer token
+BENCHMARK_ACCESS_TOKEN = 'benchmark-token'
+
+WORKLOADS = ['sync_engine_orders', 'incremental_sync', 'historical_backfill']
+
+# Tables --fresh empties; sync_state and the backfill checkpoints are recreated on first use
+SYNCED_TABLES = ['order_line_items', 'tenders', 'orders', 'daily_location_sales', 'catalog_inventory',
+                 'catalog_variations', 'catalog_items', 'catalog_categories', 'locations', 'vendors']
+RUNTIME_TABLES = ['sync_state', 'order_backfill_checkpoints']
+
+
+@dataclass
+class BenchmarkResult:
+    """Throughput and memory of one workload"""
+    name: str
+    records: int = 0
+    seconds: float = 0.0
+    peak_memory_mb: float = 0.0
+    requests: int = 0
+    rate_limited: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = asdict(self)
+        result['seconds'] = round(self.seconds, 3)
+        result['peak_memory_mb'] = round(self.peak_memory_mb, 1)
+        result['records_per_second'] = round(self.records_per_second, 1)
+        return result
+
+
+class MemorySampler:
+    """
+    Peak resident memory of this process while the block runs. Sampled from a
+    thread, so the peak is caught even while the event loop is busy parsing;
+    unlike tracemalloc this doesn't slow the workload down.
+    """
+
+    def __init__(self, interval_seconds: float = 0.01):
+        self.interval_seconds = interval_seconds
+        self.process = psutil.Process()
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak_bytes = max(self.peak_bytes, self.process.memory_info().rss)
+            if self._stop.wait(self.interval_seconds):
+                return
+
+    def __enter__(self) -> 'MemorySampler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.process.memory_info().rss)
+
+
+class ApiOnlySyncEngine(SyncEngine):
+    """SyncEngine that counts parsed order rows instead of writing them"""
+
+    async def _write_order_rows(self, order_rows, line_item_rows, tender_rows, skipped, result):
+        result.records_skipped += skipped
+        result.records_added += len(order_rows)
+        return len(line_item_rows), len(tender_rows)
+
+
+class MemoryCheckpointBackfill(OrderBackfill):
+    """OrderBackfill keeping its checkpoints in a dict, for API-only runs"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.checkpoints = {}
+
+    async def _ensure_checkpoint_table(self):
+        pass
+
+    async def _load_daily_counts(self):
+        return {}
+
+    async def _reset_checkpoints(self):
+        self.checkpoints.clear()
+
+    async def _load_checkpoints(self):
+        return dict(self.checkpoints)
+
+    async def _save_checkpoint(self, checkpoint):
+        self.checkpoints[checkpoint.chunk_start] = checkpoint
+
+
+def make_sync_engine(base_url: str, database_url: Optional[str] = None) -> SyncEngine:
+    os.environ.setdefault('SQUARE_ACCESS_TOKEN', BENCHMARK_ACCESS_TOKEN)
+    engine = SyncEngine(database_url) if database_url else \
+        ApiOnlySyncEngine(database_url='postgresql://benchmark@localhost/unused')
+    engine.square_base_url = base_url
+    return engine
+
+
+async def run_sync_engine_orders(base_url: str, data: SyntheticSquareData,
+                                 database_url: Optional[str] = None) -> Tuple[int, List[str]]:
+    """Whole order history through SyncEngine's fetch -> parse -> write pipeline, as a first sync does"""
+    engine = make_sync_engine(base_url, database_url)
+    try:
+        locations = await engine.fetch_locations()
+        result = await engine._sync_order_pages(engine._fetch_order_pages([loc['id'] for loc in locations], None))
+    finally:
+        await engine.close()
+    return result.records_processed, result.errors
+
+
+async def run_incremental_sync(base_url: str, data: SyntheticSquareData,
+                               database_url: Optional[str] = None) -> Tuple[int, List[str]]:
+    """IncrementalSyncService's enabled types from scratch (catalog, inventory and locations)"""
+    service = IncrementalSyncService()
+    service.base_url = base_url
+    service.square_access_token = service.square_access_token or BENCHMARK_ACCESS_TOKEN
+    sync_types = [sync_type for sync_type, config in service.sync_configs.items() if config.get('enabled', True)]
+
+    if not database_url:
+        results = await asyncio.gather(*(service._fetch_changes(sync_type, None) for sync_type in sync_types))
+        records = sum(result.get('total_items', 0) for result in results if result['success'])
+        return records, [result['error'] for result in results if not result['success']]
+
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    engine = make_sync_engine(base_url, database_url)
+    service.lock_connect = engine.connect
+    async_engine = create_async_engine(_async_url(database_url))
+    try:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            result = await service.run_incremental_sync(session, sync_types)
+            await session.commit()
+    finally:
+        await async_engine.dispose()
+        await engine.close()
+
+    if not result['success']:
+        return 0, [result['error']]
+    return result['total_changes'] + result['total_unchanged'], [
+        f"{sync_type}: {type_result.get('error')}"
+        for sync_type, type_result in result['results'].items() if not type_result['success']
+    ]
+
+
+async def run_historical_backfill(base_url: str, data: SyntheticSquareData,
+                                  database_url: Optional[str] = None) -> Tuple[int, List[str]]:
+    """The chunked, checkpointed backfill over the whole synthetic date range (HISTORICAL_SYNC_CONCURRENCY chunks at once)"""
+    engine = make_sync_engine(base_url, database_url)
+    start_date = datetime.combine(data.start, datetime.min.time(), tzinfo=timezone.utc)
+    options = dict(sync_engine=engine, start_date=start_date, end_date=data.latest_time, name='sync_benchmark')
+    backfill = OrderBackfill(**options) if database_url else MemoryCheckpointBackfill(**options)
+    try:
+        result = await backfill.run(reset=True)
+    finally:
+        await engine.close()
+    return result.total_orders_synced, result.errors
+
+
+WORKLOAD_RUNNERS: Dict[str, Callable[..., Awaitable[Tuple[int, List[str]]]]] = {
+    'sync_engine_orders': run_sync_engine_orders,
+    'incremental_sync': run_incremental_sync,
+    'historical_backfill': run_historical_backfill,
+}
+
+
+async def fetch_server_stats(base_url: str) -> Dict[str, Any]:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/_fake/stats") as response:
+            return await response.json()
+
+
+async def run_workload(name: str, base_url: str, data: SyntheticSquareData,
+                       database_url: Optional[str] = None) -> BenchmarkResult:
+    """Run one workload, timing it and tracking its peak memory and the requests it made"""
+    before = await fetch_server_stats(base_url)
+    with MemorySampler() as memory:
+        started = time.monotonic()
+        try:
+            records, errors = await WORKLOAD_RUNNERS[name](base_url, data, database_url)
+        except Exception as e:
+            records, errors = 0, [f"{type(e).__name__}: {e}"]
+        seconds = time.monotonic() - started
+    # Start every workload with cold connections, as a scheduled sync does
+    await close_square_clients()
+    after = await fetch_server_stats(base_url)
+
+    return BenchmarkResult(
+        name=name,
+        records=records,
+        seconds=seconds,
+        peak_memory_mb=memory.peak_bytes / 1024 ** 2,
+        requests=after['total_requests'] - before['total_requests'],
+        rate_limited=after['rate_limited'] - before['rate_limited'],
+        errors=errors
+    )
+
+
+async def run_benchmarks(base_url: str, data: SyntheticSquareData, workloads: Optional[List[str]] = None,
+                         database_url: Optional[str] = None) -> List[BenchmarkResult]:
+    results = []
+    for name in workloads or WORKLOADS:
+        logger.info(f"⏱️ Running {name}...")
+        result = await run_workload(name, base_url, data, database_url)
+        logger.info(f"   {name}: {result.records} records in {result.seconds:.1f}s "
+                    f"({result.records_per_second:.0f}/s, peak {result.peak_memory_mb:.1f} MB)")
+        results.append(result)
+    return results
+
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline: Dict[str, Dict[str, Any]],
+                        max_regression: float) -> List[str]:
+    """Workloads whose records per second fell more than max_regression (a fraction) below the baseline"""
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if not previous or not previous.get('records_per_second'):
+            continue
+        change = result.records_per_second / previous['records_per_second'] - 1
+        if change < -max_regression:
+            regressions.append(f"{result.name}: {result.records_per_second:.0f} records/s is {-change:.0%} below "
+                               f"the baseline's {previous['records_per_second']:.0f}")
+    return regressions
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    lines = [f"{'Workload':<22}{'Records':>10}{'Seconds':>10}{'Records/s':>12}{'Peak MB':>10}"
+             f"{'Requests':>10}{'429s':>7}"]
+    for result in results:
+        lines.append(f"{result.name:<22}{result.records:>10}{result.seconds:>10.2f}{result.records_per_second:>12.0f}"
+                     f"{result.peak_memory_mb:>10.1f}{result.requests:>10}{result.rate_limited:>7}")
+        lines.extend(f"   ❌ {error}" for error in result.errors[:5])
+    return '\n'.join(lines)
+
+
+def _async_url(database_url: str) -> str:
+    if database_url.startswith('postgresql://'):
+        return database_url.replace('postgresql://', 'postgresql+asyncpg://', 1)
+    return database_url
+
+
+async def prepare_database(database_url: str, fresh: bool):
+    """Create the app's tables in the scratch database and, with fresh, empty the synced ones"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.database import Base, init_models
+
+    init_models()
+    engine = create_async_engine(_async_url(database_url))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            if fresh:
+                await conn.execute(text(f"TRUNCATE {', '.join(SYNCED_TABLES)} CASCADE"))
+                for table in RUNTIME_TABLES:
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    finally:
+        await engine.dispose()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def fake_square_process(args: argparse.Namespace, startup_seconds: float = 30.0):
+    """Run tests/fake_square_server.py in a child process and yield its base URL"""
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'tests.fake_square_server', *server_argv(args),
+                                '--port', str(port)], cwd=REPO_ROOT)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_seconds
+        while True:
+            try:
+                await fetch_server_stats(base_url)
+                break
+            except aiohttp.ClientError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Fake Square server did not start")
+                await asyncio.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark sync throughput against a local fake Square API")
+    add_server_arguments(parser)
+    parser.add_argument('--workload', action='append', choices=WORKLOADS,
+                        help="Workload to run (repeatable; default all)")
+    parser.add_argument('--square-rate', type=float, default=None,
+                        help="Client requests per second (default SQUARE_API_RATE_PER_SECOND or 10, as in production)")
+    parser.add_argument('--database-url', default=None,
+                        help="Scratch database to write to (default: API-only, nothing is written)")
+    parser.add_argument('--fresh', action='store_true', help="Empty the synced tables in --database-url first")
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file from an earlier --save to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Allowed drop in records/s against --baseline before failing (default 0.2)")
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    if args.square_rate:
+        os.environ['SQUARE_API_RATE_PER_SECOND'] = str(args.square_rate)
+        os.environ['SQUARE_API_BURST'] = str(args.square_rate)
+    if args.database_url:
+        await prepare_database(args.database_url, args.fresh)
+
+    data = SyntheticSquareData(orders=args.orders, locations=args.locations, items=args.items, seed=args.seed)
+    async with fake_square_process(args) as base_url:
+        results = await run_benchmarks(base_url, data, args.workload, args.database_url)
+
+    mode = 'database' if args.database_url else 'API-only'
+    print(f"\nSync benchmark: {args.orders} orders, {args.items} items, {mode}")
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'config': vars(args), 'results': {result.name: result.to_dict() for result in results}},
+                      f, indent=2, default=str)
+        print(f"\n💾 Results saved to {args.save}")
+
+    failed = any(result.errors for result in results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f)['results'], args.max_regression)
+        for regression in regressions:
+            print(f"📉 {regression}")
+        if not regressions:
+            print(f"✅ Within {args.max_regression:.0%} of {args.baseline}")
+        failed = failed or bool(regressions)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+    sys.exit(asyncio.run(main()))
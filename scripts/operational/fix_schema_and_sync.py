@@ -151,7 +151,7 @@ class SchemaAndSyncFixer:
                 logger.info(f"📡 Calling production sync API: {url}")
                 
                 async with session.post(url) as response:
-                    if response.status == 200:
+                    if response.status in (200, 202):
                         data = await response.json()
                         logger.info("✅ Production sync initiated successfully!")
                         logger.info(f"Response: {data}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Sales Rollup Rebuild Script
+Recomputes daily_location_sales from the orders table, for every day or for a
+range of Central-time dates. Run it once after the migration that creates the
+table; SyncEngine keeps the rollup current from then on, so later runs are for
+orders changed outside a sync (manual fixes, bulk imports) or a failed refresh.
+
+Usage:
+    python scripts/rebuild_sales_rollup.py
+    python scripts/rebuild_sales_rollup.py --start-date 2024-06-20 --end-date 2024-07-05
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+from datetime import datetime
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import get_engine
+from app.services.sales_rollup import rebuild_daily_location_sales
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value: str):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild the daily_location_sales rollup from orders")
+    parser.add_argument('--start-date', type=parse_date, default=None,
+                        help="First Central-time day to rebuild (YYYY-MM-DD, default: all days)")
+    parser.add_argument('--end-date', type=parse_date, default=None,
+                        help="Last Central-time day to rebuild (YYYY-MM-DD, default: today)")
+    return parser.parse_args()
+
+
+async def main():
+    """Main entry point"""
+    args = parse_args()
+    engine = get_engine()
+
+    try:
+        if engine is None:
+            raise ValueError("Database is not configured")
+
+        async with engine.begin() as conn:
+            rows = await rebuild_daily_location_sales(conn, args.start_date, args.end_date)
+
+        scope = f"{args.start_date or 'first order'} to {args.end_date or 'today'}"
+        print(f"\n✅ Rebuilt daily_location_sales ({scope}): {rows} day/location rows")
+
+    except Exception as e:
+        print(f"\n❌ Rollup rebuild failed: {str(e)}")
+        return 1
+
+    finally:
+        if engine is not None:
+            await engine.dispose()
+
+    return 0
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
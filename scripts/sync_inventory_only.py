@@ -37,10 +37,10 @@ async def sync_inventory_only():
             
             logger.info("✅ Service is healthy")
             
-            # Trigger complete sync in incremental mode (inventory included)
+            # Trigger complete sync in incremental mode (inventory included) and wait for the job
             logger.info("📦 Triggering complete sync (incremental mode)...")
             async with session.post(
-                f"{base_url}/admin/complete-sync",
+                f"{base_url}/admin/complete-sync?wait=true",
                 headers={"Content-Type": "application/json"},
                 json={"full_refresh": False}
             ) as response:
@@ -11,6 +11,7 @@ Coordinates daily synchronization of all Square data types:
 
 Features:
 - Configurable sync schedules
+- Independent data types run concurrently, dependents as soon as their prerequisites finish
 - Email notifications on failures
 - Comprehensive logging
 - Retry logic with exponential backoff
@@ -37,6 +38,7 @@ from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict, Optional
+from functools import partial
 from dataclasses import dataclass
 import time
 import json
@@ -44,7 +46,9 @@ import json
 # Add the app directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from app.database import get_engine
 from app.services.sync_engine import SyncEngine, SyncConfig, SyncResult
+from app.services.sync_scheduler import ScheduleReport, run_dependency_graph
 from app.services.notifications import NotificationService
 
 @dataclass
@@ -71,6 +75,9 @@ class OrchestratorConfig:
     retry_delay_seconds: int = 300  # 5 minutes
     retry_backoff_multiplier: float = 2.0
     
+    # Data types synced at once when their dependencies allow it
+    max_concurrent_syncs: int = 3
+    
     # Notification settings
     notifications: NotificationConfig = None
     
@@ -83,6 +90,7 @@ class SyncOrchestrator:
     
     def __init__(self, config: OrchestratorConfig):
         self.config = config
+        # asyncpg, so the data types run_dependency_graph syncs at once overlap their writes
         self.sync_engine = SyncEngine()
         self.notification_service = NotificationService()
         self.logger = self._setup_logging()
@@ -177,20 +185,15 @@ class SyncOrchestrator:
             try:
                 self.logger.info(f"Starting sync for {data_type} (attempt {attempt + 1})")
                 
-                # Call the appropriate sync method based on data type
-                if data_type == 'orders':
-                    result = await self.sync_engine.sync_orders()
-                elif data_type == 'catalog_items':
-                    result = await self.sync_engine.sync_catalog_items()
-                elif data_type == 'catalog_categories':
-                    result = await self.sync_engine.sync_catalog_categories()
-                elif data_type == 'locations':
-                    result = await self.sync_engine.sync_locations()
-                elif data_type == 'inventory':
-                    result = await self.sync_engine.sync_inventory()
-                else:
+                if data_type not in self.sync_engine.sync_configs:
                     raise ValueError(f"Unknown data type: {data_type}")
                 
+                # Holds the data type's sync lock, so a manual or other-instance run isn't duplicated
+                result = await self.sync_engine.sync_data_type(data_type)
+                
+                if result.already_running:
+                    self.logger.info(f"Skipped {data_type}: already running on another instance")
+                    return result
                 if result.success:
                     self.logger.info(f"Successfully synced {data_type}: {result.records_processed} records")
                     return result
@@ -256,23 +259,23 @@ class SyncOrchestrator:
         
         self.logger.info(f"Syncing data types: {sync_targets}")
         
-        # Execute syncs
-        results = {}
-        failed_syncs = []
-        
-        for data_type in sync_targets:
-            self.logger.info(f"Processing {data_type}...")
-            result = await self._sync_with_retry(data_type)
-            results[data_type] = result
-            
-            if not result.success:
-                failed_syncs.append(data_type)
+        # Execute syncs with the engine's dependency graph (inventory waits for catalog items and locations)
+        report = await run_dependency_graph(
+            {data_type: partial(self._sync_with_retry, data_type) for data_type in sync_targets},
+            {data_type: config.dependencies for data_type, config in self.sync_engine.sync_configs.items()},
+            self.config.max_concurrent_syncs
+        )
+        results = {data_type: report.results[data_type] for data_type in sync_targets}
+        for data_type, result in results.items():
+            if not result.duration_seconds:
+                result.duration_seconds = report.duration(data_type)
+        failed_syncs = [data_type for data_type, result in results.items() if not result.success]
         
         # Generate summary
         end_time = datetime.now()
         total_duration = end_time - start_time
         
-        summary = self._generate_summary(results, total_duration)
+        summary = self._generate_summary(results, total_duration, report)
         self.logger.info(summary)
         
         # Send notifications
@@ -300,21 +303,27 @@ class SyncOrchestrator:
         
         return results
     
-    def _generate_summary(self, results: Dict[str, SyncResult], total_duration: timedelta) -> str:
+    def _generate_summary(self, results: Dict[str, SyncResult], total_duration: timedelta,
+                          report: Optional[ScheduleReport] = None) -> str:
         """Generate a summary of sync results"""
         summary_lines = [
             "=== SYNC ORCHESTRATOR SUMMARY ===",
             f"Total Duration: {total_duration}",
             f"Data Types Processed: {len(results)}",
-            ""
         ]
+        if report:
+            summary_lines.append(report.summary())
+        summary_lines.append("")
         
         successful = 0
         failed = 0
         total_records = 0
         
         for data_type, result in results.items():
-            status = "✅ SUCCESS" if result.success else "❌ FAILED"
+            if result.already_running:
+                status = "⏭️ ALREADY RUNNING"
+            else:
+                status = "✅ SUCCESS" if result.success else "❌ FAILED"
             duration = f"{result.duration_seconds:.1f}s"
             records = result.records_processed
             
@@ -325,8 +334,8 @@ class SyncOrchestrator:
                 total_records += records
             else:
                 failed += 1
-                if result.error_message:
-                    summary_lines.append(f"  Error: {result.error_message}")
+                if result.errors:
+                    summary_lines.append(f"  Error: {'; '.join(result.errors)}")
         
         summary_lines.extend([
             "",
@@ -360,6 +369,7 @@ def load_config() -> OrchestratorConfig:
     # Retry configuration
     config.max_retries = int(os.getenv('SYNC_MAX_RETRIES', '3'))
     config.retry_delay_seconds = int(os.getenv('SYNC_RETRY_DELAY', '300'))
+    config.max_concurrent_syncs = int(os.getenv('SYNC_TYPE_CONCURRENCY', '3'))
     
     # Logging
     config.log_level = os.getenv('SYNC_LOG_LEVEL', 'INFO')
@@ -403,6 +413,12 @@ async def main():
     except Exception as e:
         orchestrator.logger.error(f"Orchestrator failed with unexpected error: {e}")
         sys.exit(1)
+    
+    finally:
+        await orchestrator.sync_engine.close()
+        engine = get_engine()
+        if engine is not None:
+            await engine.dispose()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
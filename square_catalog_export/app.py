@@ -3,11 +3,13 @@ Square Catalog Export Service
 A microservice for exporting Square catalog data to the database
 """
 import os
+import sys
 import asyncio
-import aiohttp
-from datetime import datetime, timezone
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
 from flask import Flask, request, jsonify
-from sqlalchemy import create_engine, text, Column, Integer, String, Numeric, Text, DateTime
+from sqlalchemy import create_engine, insert, text, Column, Integer, MetaData, String, Numeric, Text, DateTime
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -18,6 +20,14 @@ import json
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared Square API client - copied next to app.py in the container image,
+# loaded from the dashboard's services package when running from a checkout
+try:
+    from square_api_client import get_square_client
+except ImportError:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app', 'services'))
+    from square_api_client import get_square_client
+
 # Secret Manager integration for production
 try:
     from google.cloud import secretmanager
@@ -169,6 +179,23 @@ class SquareItemLibraryExport(Base):
     updated_at = Column(DateTime)
     export_date = Column(DateTime)
 
+# Each export is bulk-loaded here and then copied into square_item_library_export in
+# one transaction, so items_view and the reports never read a half-built table
+SHADOW_TABLE = 'square_item_library_export_shadow'
+shadow_table = SquareItemLibraryExport.__table__.to_metadata(MetaData(), name=SHADOW_TABLE)
+
+# Incremental exports look back this much further than the last export, so a change
+# whose updated_at lags a little behind the export clock isn't missed
+INCREMENTAL_EXPORT_OVERLAP = timedelta(minutes=5)
+
+def square_updated_since(catalog_object, since):
+    """Whether a Square catalog object's updated_at is after since (naive UTC)"""
+    updated_at = catalog_object.get('updated_at')
+    if not updated_at:
+        return False
+    updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+    return updated_at.astimezone(timezone.utc).replace(tzinfo=None) > since
+
 def get_database_url():
     """Get database URL from environment variables"""
     # Check for SQLALCHEMY_DATABASE_URI first (matches main app)
@@ -201,15 +228,32 @@ def get_database_url():
 # Global variables for export status
 export_status = {
     'running': False,
+    'job_id': None,
     'last_export': None,
     'total_items': 0,
+    'rows_touched': 0,
     'error': None
 }
 
+# Active location names the last successful export was built for. The export has
+# per-location columns, so an incremental export is only valid against the same set;
+# None (no export since this process started) also forces a full export
+exported_locations = None
+
+# Export jobs by ID for /status/<job_id>, oldest first; only the most recent are kept.
+# Jobs live in this process only: the service must run as a single instance
+# with CPU allocated outside requests (deploy.sh pins --max-instances=1 and
+# --no-cpu-throttling), or /status polls can miss the job and a running export
+# can be throttled or scaled away after POST /export has returned.
+export_jobs = {}
+export_jobs_lock = threading.Lock()
+MAX_EXPORT_JOBS = 20
+
 class SquareCatalogExporter:
     """Handles Square catalog export operations"""
     
-    def __init__(self):
+    def __init__(self, job=None):
+        self.job = job
         self.square_access_token = os.environ.get('SQUARE_ACCESS_TOKEN')
         self.square_environment = os.environ.get('SQUARE_ENVIRONMENT', 'sandbox')
         
@@ -218,30 +262,519 @@ class SquareCatalogExporter:
         else:
             self.base_url = "https://connect.squareupsandbox.com"
     
-    async def export_catalog_data(self):
-        """Export catalog data from Square API to database with complete field mapping"""
-        global export_status
+    def _report_progress(self, phase=None, rows_processed=None, rows_total=None):
+        """Update the export job this exporter runs for, if any, for /status/<job_id>"""
+        if not self.job:
+            return
+        if phase is not None:
+            self.job['phase'] = phase
+            self.job['rows_processed'] = 0
+            self.job['rows_total'] = None
+        if rows_processed is not None:
+            self.job['rows_processed'] = rows_processed
+        if rows_total is not None:
+            self.job['rows_total'] = rows_total
+    
+    def _load_inventory(self, session, variation_ids):
+        """Quantities at active locations as {variation_id: {location_name: quantity}}"""
+        inventory = {}
+        result = session.execute(text("""
+            SELECT ci.variation_id, l.name, ci.quantity
+            FROM catalog_inventory ci
+            JOIN locations l ON ci.location_id = l.id
+            WHERE ci.variation_id = ANY(:variation_ids) AND l.status = 'ACTIVE'
+        """), {'variation_ids': variation_ids})
+        
+        for variation_id, location_name, quantity in result:
+            inventory.setdefault(variation_id, {})[location_name.lower()] = str(quantity or 0)
+        return inventory
+    
+    def _load_variation_attributes(self, session, variation_ids):
+        """catalog_variations rows as {variation_id: (sellable, stockable, track_inventory, units_per_case, default_unit_cost)}"""
+        result = session.execute(text("""
+            SELECT cv.id, cv.sellable, cv.stockable, cv.track_inventory,
+                   cv.units_per_case, cv.default_unit_cost
+            FROM catalog_variations cv
+            WHERE cv.id = ANY(:variation_ids)
+        """), {'variation_ids': variation_ids})
+        
+        return {row[0]: tuple(row[1:]) for row in result}
+    
+    def _load_default_vendors(self, session, variation_ids):
+        """Each variation's first vendor by ordinal as {variation_id: (vendor_name, vendor_code)}"""
+        result = session.execute(text("""
+            SELECT DISTINCT ON (cvi.variation_id)
+                   cvi.variation_id, v.name as vendor_name, v.account_number as vendor_code
+            FROM catalog_vendor_info cvi
+            JOIN vendors v ON cvi.vendor_id = v.id
+            WHERE cvi.variation_id = ANY(:variation_ids) AND cvi.is_deleted = false
+            ORDER BY cvi.variation_id, cvi.ordinal
+        """), {'variation_ids': variation_ids})
+        
+        return {row[0]: (row[1], row[2]) for row in result}
+    
+    def _load_location_availability(self, session, item_ids):
+        """Availability at active locations as {item_id: {location_name: 'Y' or 'N'}}"""
+        availability = {}
+        result = session.execute(text("""
+            SELECT cla.item_id, l.name, cla.sold_out
+            FROM catalog_location_availability cla
+            JOIN locations l ON cla.location_id = l.id
+            WHERE cla.item_id = ANY(:item_ids) AND l.status = 'ACTIVE'
+        """), {'item_ids': item_ids})
+        
+        for item_id, location_name, is_sold_out in result:
+            # Available = not sold out, so enabled = 'Y' if not sold out
+            availability.setdefault(item_id, {})[location_name.lower()] = 'N' if is_sold_out else 'Y'
+        return availability
+    
+    def _load_item_attributes(self, session, item_ids):
+        """catalog_items rows as {item_id: (is_archived, ecom_visibility, is_taxable, category_name, reporting_category_name)}"""
+        result = session.execute(text("""
+            SELECT ci.id, ci.is_archived, ci.ecom_visibility, ci.is_taxable,
+                   cc.name as category_name, rc.name as reporting_category_name
+            FROM catalog_items ci
+            LEFT JOIN catalog_categories cc ON ci.category_id = cc.id
+            LEFT JOIN catalog_categories rc ON ci.reporting_category_id = rc.id
+            WHERE ci.id = ANY(:item_ids)
+        """), {'item_ids': item_ids})
+        
+        return {row[0]: tuple(row[1:]) for row in result}
+    
+    def _load_shadow_table(self, session, export_rows):
+        """Recreate the shadow table and bulk-insert this export's rows into it"""
+        self._report_progress('loading', rows_total=len(export_rows))
+        session.execute(text(f"DROP TABLE IF EXISTS {SHADOW_TABLE}"))
+        session.execute(text(f"""
+            CREATE UNLOGGED TABLE {SHADOW_TABLE}
+            (LIKE square_item_library_export INCLUDING DEFAULTS)
+        """))
+        if export_rows:
+            # Core insert with a list of rows is sent as multi-row INSERT ... VALUES batches
+            session.execute(insert(shadow_table), export_rows)
+        session.commit()
+        self._report_progress(rows_processed=len(export_rows))
+    
+    def _swap_in_shadow_table(self, session):
+        """
+        Replace square_item_library_export's rows with the shadow table's in one
+        transaction. Readers keep seeing the previous export until the commit and
+        aren't blocked meanwhile. Renaming the shadow table into place would leave
+        items_view pointing at the old table, which views follow by OID.
+        """
+        self._report_progress('swapping')
+        columns = ', '.join(column.name for column in shadow_table.columns if column.name != 'id')
+        session.execute(text("DELETE FROM square_item_library_export"))
+        session.execute(text(f"""
+            INSERT INTO square_item_library_export ({columns})
+            SELECT {columns} FROM {SHADOW_TABLE}
+        """))
+        session.execute(text(f"DROP TABLE {SHADOW_TABLE}"))
+        session.commit()
+    
+    async def _fetch_catalog_objects(self):
+        """Non-archived items from SearchCatalogItems, followed by their related objects (categories, etc.)"""
+        all_items = []
+        cursor = None
+        page = 1
+        
+        async with get_square_client(self.square_access_token, self.base_url).session() as client_session:
+            while True:
+                # Use SearchCatalogItems to properly filter archived items
+                url = f"{self.base_url}/v2/catalog/search-catalog-items"
+                headers = {
+                    'Authorization': f'Bearer {self.square_access_token}',
+                    'Content-Type': 'application/json'
+                }
+                
+                body = {
+                    "limit": 100,  # Maximum allowed for SearchCatalogItems
+                    "archived_state": "ARCHIVED_STATE_NOT_ARCHIVED",  # Exclude archived items
+                    "include_related_objects": True  # Include variations and other related objects
+                }
+                
+                if cursor:
+                    body["cursor"] = cursor
+                
+                logger.info(f"Fetching catalog page {page}...")
+                
+                async with client_session.post(url, headers=headers, json=body) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        items = data.get('items', [])  # SearchCatalogItems returns 'items' not 'objects'
+                        all_items.extend(items)
+                        
+                        # Also collect related objects (categories, etc.)
+                        related_objects = data.get('related_objects', [])
+                        all_items.extend(related_objects)
+                        
+                        logger.info(f"Retrieved {len(items)} items on page {page} (total: {len(all_items)})")
+                        self._report_progress(rows_processed=len(all_items))
+                        
+                        cursor = data.get('cursor')
+                        if not cursor:
+                            break
+                        page += 1
+                    else:
+                        error_text = await response.text()
+                        raise Exception(f"Square API error: {response.status} - {error_text}")
+        
+        return all_items
+    
+    def _build_export_rows(self, session, catalog_items, categories_lookup, export_time, variation_filter=None):
+        """
+        Map Square items and our catalog tables to square_item_library_export rows,
+        one per variation. With variation_filter, only those variation IDs are mapped.
+        """
+        # Load everything the field mapping needs from our tables in a few queries up front,
+        # so the loop below doesn't go back to the database for each variation
+        item_ids = [item.get('id', '') for item in catalog_items]
+        variation_ids = [variation.get('id', '') for item in catalog_items
+                         for variation in item.get('item_data', {}).get('variations', [])
+                         if variation_filter is None or variation.get('id') in variation_filter]
+        
+        inventory_by_variation = self._load_inventory(session, variation_ids)
+        variation_rows = self._load_variation_attributes(session, variation_ids)
+        default_vendors = self._load_default_vendors(session, variation_ids)
+        availability_by_item = self._load_location_availability(session, item_ids)
+        item_rows = self._load_item_attributes(session, item_ids)
+        
+        logger.info(f"Loaded database data for {len(item_ids)} items and {len(variation_ids)} variations")
+        self._report_progress('building', rows_total=len(variation_ids))
+        
+        # Process and save items with complete field mapping
+        logger.info(f"Processing catalog items with full field mapping...")
+        
+        processed_count = 0
+        export_rows = []
+        for item in catalog_items:
+            # Extract item data
+            item_id = item.get('id', '')
+            item_data = item.get('item_data', {})
+            variations = item_data.get('variations', [])
+            
+            # Get item-level fields
+            item_name = item_data.get('name', '')
+            description = item_data.get('description', '')
+            
+            # Debug: Log the full item_data structure for first few items
+            if processed_count < 3:
+                logger.info(f"Full item_data for '{item_name}': {item_data}")
+            
+            # Extract categories from Square API
+            # The categories are in item_data.categories as objects with 'id' and 'ordinal'
+            categories_list = item_data.get('categories', [])
+            category_names = []
+            category_ids = []
+            
+            for cat_obj in categories_list:
+                cat_id = cat_obj.get('id')
+                if cat_id:
+                    category_ids.append(cat_id)
+                    if cat_id in categories_lookup:
+                        category_names.append(categories_lookup[cat_id])
+            
+            categories_from_api = ','.join(category_names)
+            
+            # Debug logging for first few items
+            if processed_count < 5:
+                logger.info(f"Item '{item_name}': categories_list={categories_list}, category_ids={category_ids}, categories_from_api='{categories_from_api}'")
+            
+            # Extract ecom data
+            ecom_data = item_data.get('ecom_seo_data', {})
+            seo_title = ecom_data.get('seo_title', '')
+            seo_description = ecom_data.get('seo_description', '')
+            permalink = ecom_data.get('permalink', '')
+            
+            # Extract item options
+            item_options = item_data.get('item_options', [])
+            option_name_1 = item_options[0].get('name', '') if item_options else ''
+            
+            # Item-level data from our production tables, including categories
+            location_availability = availability_by_item.get(item_id, {})
+            logger.debug(f"Location availability for {item_name}: {location_availability}")
+            
+            item_row = item_rows.get(item_id)
+            if item_row:
+                archived = 'Y' if item_row[0] else 'N'
+                ecom_visibility = item_row[1] or 'UNINDEXED'
+                is_taxable = item_row[2]
+                category_name = item_row[3] or ''
+                reporting_category_name = item_row[4] or ''
+            else:
+                archived = 'N'
+                ecom_visibility = 'UNINDEXED'
+                is_taxable = True
+                category_name = ''
+                reporting_category_name = ''
+            
+            for variation in variations:
+                variation_data = variation.get('item_variation_data', {})
+                variation_id = variation.get('id', '')
+                if variation_filter is not None and variation_id not in variation_filter:
+                    continue
+                
+                # Extract vendor information from Square API
+                vendor_infos = variation_data.get('item_variation_vendor_infos', [])
+                api_vendor_code = ''
+                if vendor_infos:
+                    # Get the first vendor info's SKU as the vendor code
+                    vendor_info_data = vendor_infos[0].get('item_variation_vendor_info_data', {})
+                    api_vendor_code = vendor_info_data.get('sku', '')
+                
+                # Inventory for this variation across all locations, and its variation-level data
+                inventory_data = inventory_by_variation.get(variation_id, {})
+                
+                variation_row = variation_rows.get(variation_id)
+                if variation_row:
+                    sellable = 'Y' if variation_row[0] else 'N'
+                    stockable = 'Y' if variation_row[1] else 'N'
+                    track_inventory = variation_row[2]
+                    units_per_case = variation_row[3]
+                    
+                    # Extract and convert default_unit_cost from JSONB
+                    default_unit_cost_json = variation_row[4]
+                    default_unit_cost = None
+                    if default_unit_cost_json and isinstance(default_unit_cost_json, dict):
+                        amount = default_unit_cost_json.get('amount')
+                        if amount is not None:
+                            # Convert from cents to dollars
+                            default_unit_cost = float(amount) / 100
+                else:
+                    sellable = 'Y'
+                    stockable = 'Y'
+                    track_inventory = True
+                    units_per_case = None
+                    default_unit_cost = None
+                
+                # Default vendor for this variation
+                vendor_row = default_vendors.get(variation_id)
+                if vendor_row:
+                    default_vendor_name = vendor_row[0] or ''
+                    default_vendor_code = vendor_row[1] or api_vendor_code  # Use API vendor code if DB is empty
+                else:
+                    default_vendor_name = ''
+                    default_vendor_code = api_vendor_code  # Use API vendor code as fallback
+                
+                # Extract price information
+                price_money = variation_data.get('price_money', {})
+                price = float(price_money.get('amount', 0)) / 100 if price_money else None
+                
+                # Extract option values
+                option_values = variation_data.get('item_option_values', [])
+                option_value_1 = option_values[0].get('option_value', '') if option_values else ''
+                
+                # Create export record with all fields
+                export_rows.append(dict(
+                    # Core fields
+                    reference_handle=item.get('id'),
+                    token=variation.get('id'),
+                    item_name=item_name,
+                    variation_name=variation_data.get('name', ''),
+                    sku=variation_data.get('sku', ''),
+                    description=description,
+                    categories=category_name if category_name else categories_from_api,  # Prefer database category, fallback to API
+                    reporting_category=category_name if category_name else categories_from_api,  # Copy from categories like dev
+                    seo_title=seo_title,
+                    seo_description=seo_description,
+                    permalink=permalink,
+                    gtin='',  # Not available in API
+                    square_online_item_visibility=ecom_visibility,
+                    item_type='REGULAR',  # Default
+                    weight_lb='',  # Not available in API
+                    social_media_link_title='',  # Not available in API
+                    social_media_link_description='',  # Not available in API
+                    shipping_enabled='N',  # Square uses N, not TRUE
+                    self_serve_ordering_enabled='N',  # Square uses N, not TRUE
+                    delivery_enabled='N',  # Square uses N, not TRUE
+                    pickup_enabled='Y',  # Most items support pickup
+                    price=price,
+                    online_sale_price=price,  # Same as regular price
+                    archived=archived,  # Already in Y/N format
+                    sellable=sellable,  # Already in Y/N format
+                    contains_alcohol='N',  # Square uses N, not FALSE
+                    stockable=stockable,  # Already in Y/N format
+                    skip_detail_screen_in_pos='N',  # Square uses N, not FALSE
+                    option_name_1=option_name_1,
+                    option_value_1=option_value_1,
+                    default_unit_cost=default_unit_cost,
+                    default_vendor_name=default_vendor_name,
+                    default_vendor_code=default_vendor_code,
+                    
+                    # Location-specific fields - Use actual location availability data
+                    enabled_aubrey=location_availability.get('aubrey', 'N'),
+                    current_quantity_aubrey=inventory_data.get('aubrey', '0'),
+                    new_quantity_aubrey='',  # Leave blank for manual entry
+                    stock_alert_enabled_aubrey='N',  # Square uses N, not FALSE
+                    stock_alert_count_aubrey='0',
+                    price_aubrey=str(price) if price else '',
+                    
+                    enabled_bridgefarmer=location_availability.get('bridgefarmer', 'N'),
+                    current_quantity_bridgefarmer=inventory_data.get('bridgefarmer', '0'),
+                    new_quantity_bridgefarmer='',  # Leave blank for manual entry
+                    stock_alert_enabled_bridgefarmer='N',  # Square uses N, not FALSE
+                    stock_alert_count_bridgefarmer='0',
+                    price_bridgefarmer=str(price) if price else '',
+                    
+                    enabled_building=location_availability.get('building', 'N'),
+                    current_quantity_building=inventory_data.get('building', '0'),
+                    new_quantity_building='',  # Leave blank for manual entry
+                    stock_alert_enabled_building='N',  # Square uses N, not FALSE
+                    stock_alert_count_building='0',
+                    price_building=str(price) if price else '',
+                    
+                    enabled_flomo=location_availability.get('flomo', 'N'),
+                    current_quantity_flomo=inventory_data.get('flomo', '0'),
+                    new_quantity_flomo='',  # Leave blank for manual entry
+                    stock_alert_enabled_flomo='N',  # Square uses N, not FALSE
+                    stock_alert_count_flomo='0',
+                    price_flomo=str(price) if price else '',
+                    
+                    enabled_justin=location_availability.get('justin', 'N'),
+                    current_quantity_justin=inventory_data.get('justin', '0'),
+                    new_quantity_justin='',  # Leave blank for manual entry
+                    stock_alert_enabled_justin='N',  # Square uses N, not FALSE
+                    stock_alert_count_justin='0',
+                    price_justin=str(price) if price else '',
+                    
+                    enabled_quinlan=location_availability.get('quinlan', 'N'),
+                    current_quantity_quinlan=inventory_data.get('quinlan', '0'),
+                    new_quantity_quinlan='',  # Leave blank for manual entry
+                    stock_alert_enabled_quinlan='N',  # Square uses N, not FALSE
+                    stock_alert_count_quinlan='0',
+                    price_quinlan=str(price) if price else '',
+                    
+                    enabled_terrell=location_availability.get('terrell', 'N'),
+                    current_quantity_terrell=inventory_data.get('terrell', '0'),
+                    new_quantity_terrell='',  # Leave blank for manual entry
+                    stock_alert_enabled_terrell='N',  # Square uses N, not FALSE
+                    stock_alert_count_terrell='0',
+                    price_terrell=str(price) if price else '',
+                    
+                    # Tax field
+                    tax_sales_tax='Sales Tax (8.25%)' if is_taxable else '',
+                    
+                    # Metadata
+                    created_at=export_time,
+                    updated_at=export_time,
+                    export_date=export_time
+                ))
+                processed_count += 1
+                
+                if processed_count % 100 == 0:
+                    self._report_progress(rows_processed=processed_count)
+        
+        self._report_progress(rows_processed=processed_count)
+        return export_rows
+    
+    def _load_changed_ids(self, session, since):
+        """
+        Variation and item IDs whose rows in our catalog tables were updated after since,
+        as (variation_ids, item_ids)
+        """
+        variation_result = session.execute(text("""
+            SELECT variation_id FROM catalog_inventory WHERE updated_at > :since
+            UNION
+            SELECT id FROM catalog_variations WHERE updated_at > :since
+            UNION
+            SELECT variation_id FROM catalog_vendor_info WHERE updated_at > :since
+        """), {'since': since})
+        variation_ids = {row[0] for row in variation_result}
+        
+        item_result = session.execute(text("""
+            SELECT id FROM catalog_items WHERE updated_at > :since
+            UNION
+            SELECT item_id FROM catalog_location_availability WHERE updated_at > :since
+            UNION
+            SELECT ci.id
+            FROM catalog_items ci
+            JOIN catalog_categories cc ON cc.id IN (ci.category_id, ci.reporting_category_id)
+            WHERE cc.updated_at > :since
+        """), {'since': since})
+        item_ids = {row[0] for row in item_result}
+        
+        return variation_ids, item_ids
+    
+    def _refresh_changed_rows(self, session, catalog_items, categories_lookup, export_time, last_export):
+        """
+        Incremental export keyed by variation ID (the token column). Rewrites the rows
+        whose Square item or variation, catalog rows, inventory, availability or vendor
+        changed since last_export, adds new variations and deletes rows for variations
+        no longer in the catalog, all in one transaction.
+        """
+        since = last_export - INCREMENTAL_EXPORT_OVERLAP
+        self._report_progress('detecting_changes')
+        existing_ids = {row[0] for row in session.execute(text("SELECT token FROM square_item_library_export"))
+                        if row[0]}
+        changed_variation_ids, changed_item_ids = self._load_changed_ids(session, since)
+        
+        current_ids = set()
+        refresh_ids = set()
+        refresh_items = []
+        for item in catalog_items:
+            item_changed = item.get('id') in changed_item_ids or square_updated_since(item, since)
+            variation_ids = set()
+            for variation in item.get('item_data', {}).get('variations', []):
+                variation_id = variation.get('id')
+                current_ids.add(variation_id)
+                if (item_changed or variation_id not in existing_ids or variation_id in changed_variation_ids
+                        or square_updated_since(variation, since)):
+                    variation_ids.add(variation_id)
+            if variation_ids:
+                refresh_ids |= variation_ids
+                refresh_items.append(item)
+        removed_ids = existing_ids - current_ids
+        
+        logger.info(f"Incremental export since {since}: {len(refresh_ids)} variations changed, "
+                    f"{len(removed_ids)} removed")
+        
+        export_rows = self._build_export_rows(session, refresh_items, categories_lookup, export_time, refresh_ids)
+        
+        self._report_progress('applying', rows_total=len(refresh_ids) + len(removed_ids))
+        if refresh_ids or removed_ids:
+            session.execute(text("DELETE FROM square_item_library_export WHERE token = ANY(:tokens)"),
+                            {'tokens': list(refresh_ids | removed_ids)})
+            if export_rows:
+                session.execute(insert(SquareItemLibraryExport.__table__), export_rows)
+        session.commit()
+        
+        rows_inserted = len(refresh_ids - existing_ids)
+        return {
+            'mode': 'incremental',
+            'rows_inserted': rows_inserted,
+            'rows_updated': len(refresh_ids) - rows_inserted,
+            'rows_deleted': len(removed_ids),
+            'rows_touched': len(refresh_ids) + len(removed_ids),
+            'items_exported': len(existing_ids) - len(removed_ids) + rows_inserted
+        }
+    
+    async def export_catalog_data(self, incremental=False):
+        """
+        Export catalog data from Square API to database with complete field mapping.
+        With incremental, only rows whose sources changed since the last export are rewritten.
+        """
+        global export_status, exported_locations
         
         try:
             export_status['running'] = True
             export_status['error'] = None
             
-            logger.info("Starting comprehensive Square catalog export...")
+            logger.info(f"Starting {'incremental' if incremental else 'comprehensive'} Square catalog export...")
             
             if not self.square_access_token:
                 raise Exception("Square access token not configured")
             
+            # Taken before anything is read, so changes made during the export are picked up next time
+            export_time = datetime.utcnow()
+            
+            self._report_progress('fetching')
+            
             # Get database connection
             database_url = get_database_url()
             engine = create_engine(database_url)
             Session = sessionmaker(bind=engine)
             session = Session()
             
-            # Clear existing data
-            logger.info("Clearing existing catalog data...")
-            session.execute(text("DELETE FROM square_item_library_export"))
-            session.commit()
-            
             # Get location mapping for inventory data
             location_mapping = {}
             locations_result = session.execute(text("""
@@ -252,50 +785,7 @@ class SquareCatalogExporter:
             
             logger.info(f"Found {len(location_mapping)} active locations: {list(location_mapping.values())}")
             
-            # Fetch catalog data from Square
-            all_items = []
-            cursor = None
-            page = 1
-            
-            async with aiohttp.ClientSession() as client_session:
-                while True:
-                    # Use SearchCatalogItems to properly filter archived items
-                    url = f"{self.base_url}/v2/catalog/search-catalog-items"
-                    headers = {
-                        'Authorization': f'Bearer {self.square_access_token}',
-                        'Content-Type': 'application/json'
-                    }
-                    
-                    body = {
-                        "limit": 100,  # Maximum allowed for SearchCatalogItems
-                        "archived_state": "ARCHIVED_STATE_NOT_ARCHIVED",  # Exclude archived items
-                        "include_related_objects": True  # Include variations and other related objects
-                    }
-                    
-                    if cursor:
-                        body["cursor"] = cursor
-                    
-                    logger.info(f"Fetching catalog page {page}...")
-                    
-                    async with client_session.post(url, headers=headers, json=body) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            items = data.get('items', [])  # SearchCatalogItems returns 'items' not 'objects'
-                            all_items.extend(items)
-                            
-                            # Also collect related objects (categories, etc.)
-                            related_objects = data.get('related_objects', [])
-                            all_items.extend(related_objects)
-                            
-                            logger.info(f"Retrieved {len(items)} items on page {page} (total: {len(all_items)})")
-                            
-                            cursor = data.get('cursor')
-                            if not cursor:
-                                break
-                            page += 1
-                        else:
-                            error_text = await response.text()
-                            raise Exception(f"Square API error: {response.status} - {error_text}")
+            all_items = await self._fetch_catalog_objects()
             
             # Build a lookup for categories and other related objects
             categories_lookup = {}
@@ -309,297 +799,39 @@ class SquareCatalogExporter:
             category_sample = list(categories_lookup.items())[:5]
             logger.info(f"Sample categories: {category_sample}")
             
-            # Process and save items with complete field mapping
-            logger.info(f"Processing catalog items with full field mapping...")
+            catalog_items = [obj for obj in all_items if obj.get('type') == 'ITEM']
             
-            processed_count = 0
-            for item in all_items:
-                # Only process ITEM objects, skip related objects
-                if item.get('type') != 'ITEM':
-                    continue
-                    
-                # Extract item data
-                item_data = item.get('item_data', {})
-                variations = item_data.get('variations', [])
-                
-                # Get item-level fields
-                item_name = item_data.get('name', '')
-                description = item_data.get('description', '')
-                
-                # Debug: Log the full item_data structure for first few items
-                if processed_count < 3:
-                    logger.info(f"Full item_data for '{item_name}': {item_data}")
-                
-                # Extract categories from Square API
-                # The categories are in item_data.categories as objects with 'id' and 'ordinal'
-                categories_list = item_data.get('categories', [])
-                category_names = []
-                category_ids = []
-                
-                for cat_obj in categories_list:
-                    cat_id = cat_obj.get('id')
-                    if cat_id:
-                        category_ids.append(cat_id)
-                        if cat_id in categories_lookup:
-                            category_names.append(categories_lookup[cat_id])
-                
-                categories_from_api = ','.join(category_names)
-                
-                # Debug logging for first few items
-                if processed_count < 5:
-                    logger.info(f"Item '{item_name}': categories_list={categories_list}, category_ids={category_ids}, categories_from_api='{categories_from_api}'")
-                
-                # Extract ecom data
-                ecom_data = item_data.get('ecom_seo_data', {})
-                seo_title = ecom_data.get('seo_title', '')
-                seo_description = ecom_data.get('seo_description', '')
-                permalink = ecom_data.get('permalink', '')
-                
-                # Extract item options
-                item_options = item_data.get('item_options', [])
-                option_name_1 = item_options[0].get('name', '') if item_options else ''
-                
-                for variation in variations:
-                    variation_data = variation.get('item_variation_data', {})
-                    variation_id = variation.get('id', '')
-                    
-                    # Extract vendor information from Square API
-                    vendor_infos = variation_data.get('item_variation_vendor_infos', [])
-                    api_vendor_code = ''
-                    if vendor_infos:
-                        # Get the first vendor info's SKU as the vendor code
-                        vendor_info_data = vendor_infos[0].get('item_variation_vendor_info_data', {})
-                        api_vendor_code = vendor_info_data.get('sku', '')
-                    
-                    # Get inventory data for this variation across all locations
-                    inventory_data = {}
-                    inventory_result = session.execute(text("""
-                        SELECT l.name, ci.quantity 
-                        FROM catalog_inventory ci
-                        JOIN locations l ON ci.location_id = l.id
-                        WHERE ci.variation_id = :variation_id AND l.status = 'ACTIVE'
-                    """), {'variation_id': variation_id})
-                    
-                    for inv_row in inventory_result:
-                        location_name = inv_row[0].lower()
-                        quantity = inv_row[1] or 0
-                        inventory_data[location_name] = str(quantity)
-                    
-                    # Get variation-level data from our production tables
-                    variation_result = session.execute(text("""
-                        SELECT cv.sellable, cv.stockable, cv.track_inventory,
-                               cv.units_per_case, cv.default_unit_cost
-                        FROM catalog_variations cv
-                        WHERE cv.id = :variation_id
-                    """), {'variation_id': variation_id})
-                    
-                    variation_row = variation_result.fetchone()
-                    if variation_row:
-                        sellable = 'Y' if variation_row[0] else 'N'
-                        stockable = 'Y' if variation_row[1] else 'N'
-                        track_inventory = variation_row[2]
-                        units_per_case = variation_row[3]
-                        
-                        # Extract and convert default_unit_cost from JSONB
-                        default_unit_cost_json = variation_row[4]
-                        default_unit_cost = None
-                        if default_unit_cost_json and isinstance(default_unit_cost_json, dict):
-                            amount = default_unit_cost_json.get('amount')
-                            if amount is not None:
-                                # Convert from cents to dollars
-                                default_unit_cost = float(amount) / 100
-                    else:
-                        sellable = 'Y'
-                        stockable = 'Y'
-                        track_inventory = True
-                        units_per_case = None
-                        default_unit_cost = None
-                    
-                    # Get location availability for this item from catalog_location_availability
-                    item_id = item.get('id', '')
-                    location_availability = {}
-                    
-                    availability_result = session.execute(text("""
-                        SELECT l.name, cla.sold_out
-                        FROM catalog_location_availability cla
-                        JOIN locations l ON cla.location_id = l.id
-                        WHERE cla.item_id = :item_id AND l.status = 'ACTIVE'
-                    """), {'item_id': item_id})
-                    
-                    for avail_row in availability_result:
-                        location_name = avail_row[0].lower()
-                        is_sold_out = avail_row[1]
-                        # Available = not sold out, so enabled = 'Y' if not sold out
-                        location_availability[location_name] = 'N' if is_sold_out else 'Y'
-                    
-                    logger.debug(f"Location availability for {item_name}: {location_availability}")
-                    
-                    # Get item-level data from our production tables including categories
-                    item_result = session.execute(text("""
-                        SELECT ci.is_archived, ci.ecom_visibility, ci.is_taxable,
-                               cc.name as category_name, rc.name as reporting_category_name
-                        FROM catalog_items ci
-                        LEFT JOIN catalog_categories cc ON ci.category_id = cc.id
-                        LEFT JOIN catalog_categories rc ON ci.reporting_category_id = rc.id
-                        WHERE ci.id = :item_id
-                    """), {'item_id': item.get('id', '')})
-                    
-                    item_row = item_result.fetchone()
-                    if item_row:
-                        archived = 'Y' if item_row[0] else 'N'
-                        ecom_visibility = item_row[1] or 'UNINDEXED'
-                        is_taxable = item_row[2]
-                        category_name = item_row[3] or ''
-                        reporting_category_name = item_row[4] or ''
-                    else:
-                        archived = 'N'
-                        ecom_visibility = 'UNINDEXED'
-                        is_taxable = True
-                        category_name = ''
-                        reporting_category_name = ''
-                    
-                    # Get vendor information for this variation
-                    vendor_result = session.execute(text("""
-                        SELECT v.name as vendor_name, v.account_number as vendor_code
-                        FROM catalog_vendor_info cvi
-                        JOIN vendors v ON cvi.vendor_id = v.id
-                        WHERE cvi.variation_id = :variation_id AND cvi.is_deleted = false
-                        ORDER BY cvi.ordinal
-                        LIMIT 1
-                    """), {'variation_id': variation_id})
-                    
-                    vendor_row = vendor_result.fetchone()
-                    if vendor_row:
-                        default_vendor_name = vendor_row[0] or ''
-                        default_vendor_code = vendor_row[1] or api_vendor_code  # Use API vendor code if DB is empty
-                    else:
-                        default_vendor_name = ''
-                        default_vendor_code = api_vendor_code  # Use API vendor code as fallback
-                    
-                    # Extract price information
-                    price_money = variation_data.get('price_money', {})
-                    price = float(price_money.get('amount', 0)) / 100 if price_money else None
-                    
-                    # Extract option values
-                    option_values = variation_data.get('item_option_values', [])
-                    option_value_1 = option_values[0].get('option_value', '') if option_values else ''
-                    
-                    # Create export record with all fields
-                    export_record = SquareItemLibraryExport(
-                        # Core fields
-                        reference_handle=item.get('id'),
-                        token=variation.get('id'),
-                        item_name=item_name,
-                        variation_name=variation_data.get('name', ''),
-                        sku=variation_data.get('sku', ''),
-                        description=description,
-                        categories=category_name if category_name else categories_from_api,  # Prefer database category, fallback to API
-                        reporting_category=category_name if category_name else categories_from_api,  # Copy from categories like dev
-                        seo_title=seo_title,
-                        seo_description=seo_description,
-                        permalink=permalink,
-                        gtin='',  # Not available in API
-                        square_online_item_visibility=ecom_visibility,
-                        item_type='REGULAR',  # Default
-                        weight_lb='',  # Not available in API
-                        social_media_link_title='',  # Not available in API
-                        social_media_link_description='',  # Not available in API
-                        shipping_enabled='N',  # Square uses N, not TRUE
-                        self_serve_ordering_enabled='N',  # Square uses N, not TRUE
-                        delivery_enabled='N',  # Square uses N, not TRUE
-                        pickup_enabled='Y',  # Most items support pickup
-                        price=price,
-                        online_sale_price=price,  # Same as regular price
-                        archived=archived,  # Already in Y/N format
-                        sellable=sellable,  # Already in Y/N format
-                        contains_alcohol='N',  # Square uses N, not FALSE
-                        stockable=stockable,  # Already in Y/N format
-                        skip_detail_screen_in_pos='N',  # Square uses N, not FALSE
-                        option_name_1=option_name_1,
-                        option_value_1=option_value_1,
-                        default_unit_cost=default_unit_cost,
-                        default_vendor_name=default_vendor_name,
-                        default_vendor_code=default_vendor_code,
-                        
-                        # Location-specific fields - Use actual location availability data
-                        enabled_aubrey=location_availability.get('aubrey', 'N'),
-                        current_quantity_aubrey=inventory_data.get('aubrey', '0'),
-                        new_quantity_aubrey='',  # Leave blank for manual entry
-                        stock_alert_enabled_aubrey='N',  # Square uses N, not FALSE
-                        stock_alert_count_aubrey='0',
-                        price_aubrey=str(price) if price else '',
-                        
-                        enabled_bridgefarmer=location_availability.get('bridgefarmer', 'N'),
-                        current_quantity_bridgefarmer=inventory_data.get('bridgefarmer', '0'),
-                        new_quantity_bridgefarmer='',  # Leave blank for manual entry
-                        stock_alert_enabled_bridgefarmer='N',  # Square uses N, not FALSE
-                        stock_alert_count_bridgefarmer='0',
-                        price_bridgefarmer=str(price) if price else '',
-                        
-                        enabled_building=location_availability.get('building', 'N'),
-                        current_quantity_building=inventory_data.get('building', '0'),
-                        new_quantity_building='',  # Leave blank for manual entry
-                        stock_alert_enabled_building='N',  # Square uses N, not FALSE
-                        stock_alert_count_building='0',
-                        price_building=str(price) if price else '',
-                        
-                        enabled_flomo=location_availability.get('flomo', 'N'),
-                        current_quantity_flomo=inventory_data.get('flomo', '0'),
-                        new_quantity_flomo='',  # Leave blank for manual entry
-                        stock_alert_enabled_flomo='N',  # Square uses N, not FALSE
-                        stock_alert_count_flomo='0',
-                        price_flomo=str(price) if price else '',
-                        
-                        enabled_justin=location_availability.get('justin', 'N'),
-                        current_quantity_justin=inventory_data.get('justin', '0'),
-                        new_quantity_justin='',  # Leave blank for manual entry
-                        stock_alert_enabled_justin='N',  # Square uses N, not FALSE
-                        stock_alert_count_justin='0',
-                        price_justin=str(price) if price else '',
-                        
-                        enabled_quinlan=location_availability.get('quinlan', 'N'),
-                        current_quantity_quinlan=inventory_data.get('quinlan', '0'),
-                        new_quantity_quinlan='',  # Leave blank for manual entry
-                        stock_alert_enabled_quinlan='N',  # Square uses N, not FALSE
-                        stock_alert_count_quinlan='0',
-                        price_quinlan=str(price) if price else '',
-                        
-                        enabled_terrell=location_availability.get('terrell', 'N'),
-                        current_quantity_terrell=inventory_data.get('terrell', '0'),
-                        new_quantity_terrell='',  # Leave blank for manual entry
-                        stock_alert_enabled_terrell='N',  # Square uses N, not FALSE
-                        stock_alert_count_terrell='0',
-                        price_terrell=str(price) if price else '',
-                        
-                        # Tax field
-                        tax_sales_tax='Sales Tax (8.25%)' if is_taxable else '',
-                        
-                        # Metadata
-                        created_at=datetime.utcnow(),
-                        updated_at=datetime.utcnow(),
-                        export_date=datetime.utcnow()
-                    )
-                    
-                    session.add(export_record)
-                    processed_count += 1
-                    
-                    # Commit in batches for performance
-                    if processed_count % 100 == 0:
-                        session.commit()
-                        logger.info(f"Processed {processed_count} variations...")
+            last_export = None
+            if incremental:
+                last_export = session.execute(text("SELECT MAX(export_date) FROM square_item_library_export")).scalar()
+                if not last_export:
+                    logger.info("No previous export to refresh, running a full export instead")
+                elif set(location_mapping.values()) != exported_locations:
+                    logger.info("Active locations changed since the last export, running a full export instead")
+                    last_export = None
             
-            session.commit()
+            if last_export:
+                result = self._refresh_changed_rows(session, catalog_items, categories_lookup, export_time, last_export)
+            else:
+                export_rows = self._build_export_rows(session, catalog_items, categories_lookup, export_time)
+                logger.info(f"Loading {len(export_rows)} variations into {SHADOW_TABLE}...")
+                self._load_shadow_table(session, export_rows)
+                self._swap_in_shadow_table(session)
+                result = {'mode': 'full', 'items_exported': len(export_rows), 'rows_touched': len(export_rows)}
             session.close()
+            exported_locations = set(location_mapping.values())
             
             export_status['running'] = False
             export_status['last_export'] = datetime.utcnow().isoformat()
-            export_status['total_items'] = processed_count
+            export_status['total_items'] = result['items_exported']
+            export_status['rows_touched'] = result['rows_touched']
             
-            logger.info(f"Comprehensive catalog export completed successfully: {processed_count} variations processed")
+            logger.info(f"Catalog export ({result['mode']}) completed successfully: "
+                        f"{result['rows_touched']} rows touched, {result['items_exported']} variations exported")
             
             return {
                 'success': True,
-                'items_exported': processed_count,
+                **result,
                 'export_time': export_status['last_export']
             }
             
@@ -613,6 +845,42 @@ class SquareCatalogExporter:
                 'error': str(e)
             }
 
+def create_export_job(mode):
+    """Register a new export job; call with export_jobs_lock held"""
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'mode': mode,
+        'status': 'running',
+        'phase': 'queued',
+        'rows_processed': 0,
+        'rows_total': None,
+        'started_at': datetime.utcnow().isoformat(),
+        'finished_at': None,
+        'result': None,
+        'error': None
+    }
+    export_jobs[job['job_id']] = job
+    for job_id in list(export_jobs)[:-MAX_EXPORT_JOBS]:
+        if export_jobs[job_id]['status'] != 'running':
+            del export_jobs[job_id]
+    return job
+
+def run_export_job(job):
+    """Run an export job to completion on its own thread and event loop"""
+    try:
+        exporter = SquareCatalogExporter(job=job)
+        result = asyncio.run(exporter.export_catalog_data(incremental=(job['mode'] == 'incremental')))
+    except Exception as e:
+        logger.error(f"Export job {job['job_id']} crashed: {str(e)}")
+        export_status['running'] = False
+        result = {'success': False, 'error': str(e)}
+    
+    job['result'] = result
+    job['error'] = result.get('error')
+    job['status'] = job['phase'] = 'completed' if result['success'] else 'failed'
+    job['finished_at'] = datetime.utcnow().isoformat()
+    logger.info(f"Export job {job['job_id']} {job['status']}")
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -630,7 +898,8 @@ def service_info():
             '/': 'Service information (this endpoint)',
             '/health': 'Health check',
             '/status': 'Export status',
-            '/export': 'Start catalog export (POST)',
+            '/status/<job_id>': 'Export job phase and row progress',
+            '/export': 'Start a background catalog export job (POST, ?mode=incremental to rewrite only changed rows)',
             '/query/categories': 'Check category data',
             '/query/category-comparison': 'Compare category fields',
             '/query/vendors': 'Check vendor data'
@@ -638,7 +907,8 @@ def service_info():
         'usage': {
             'health_check': 'GET /',
             'start_export': 'POST /export',
-            'check_status': 'GET /status'
+            'check_status': 'GET /status',
+            'check_job': 'GET /status/<job_id>'
         }
     })
 
@@ -647,51 +917,67 @@ def get_status():
     """Get current export status"""
     return jsonify({
         'running': export_status['running'],
+        'job_id': export_status['job_id'],
         'last_export': export_status['last_export'],
         'total_items': export_status['total_items'],
+        'rows_touched': export_status['rows_touched'],
         'error': export_status['error']
     })
 
-@app.route('/export', methods=['POST'])
-def start_export():
-    """Start catalog export"""
-    if export_status['running']:
+@app.route('/status/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get an export job's phase and row progress"""
+    job = export_jobs.get(job_id)
+    if not job:
         return jsonify({
             'success': False,
-            'message': 'Export already in progress'
-        }), 400
+            'message': f"Unknown export job: {job_id}"
+        }), 404
     
-    try:
-        # Run export in background
-        exporter = SquareCatalogExporter()
-        
-        # For simplicity, we'll run this synchronously
-        # In production, you might want to use a task queue
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(exporter.export_catalog_data())
-        loop.close()
-        
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'status': 'completed',
-                'message': f"Export completed successfully: {result['items_exported']} items",
-                'data': result
-            })
-        else:
+    return jsonify({'success': True, **job})
+
+@app.route('/export', methods=['POST'])
+def start_export():
+    """
+    Start a catalog export job in the background and return its ID right away;
+    mode=incremental (query string or JSON body) rewrites only changed rows
+    """
+    mode = request.args.get('mode') or (request.get_json(silent=True) or {}).get('mode')
+    mode = 'incremental' if mode == 'incremental' else 'full'
+    
+    with export_jobs_lock:
+        if export_status['running']:
             return jsonify({
                 'success': False,
-                'message': f"Export failed: {result['error']}",
-                'data': result
-            }), 500
-            
+                'message': 'Export already in progress',
+                'job_id': export_status['job_id']
+            }), 400
+        
+        job = create_export_job(mode)
+        export_status['running'] = True
+        export_status['job_id'] = job['job_id']
+    
+    try:
+        threading.Thread(target=run_export_job, args=(job,), daemon=True,
+                         name=f"catalog-export-{job['job_id']}").start()
     except Exception as e:
         logger.error(f"Error starting export: {str(e)}")
+        export_status['running'] = False
+        job['status'] = job['phase'] = 'failed'
+        job['error'] = str(e)
         return jsonify({
             'success': False,
             'message': f"Failed to start export: {str(e)}"
         }), 500
+    
+    logger.info(f"Started {mode} export job {job['job_id']}")
+    return jsonify({
+        'success': True,
+        'status': 'running',
+        'job_id': job['job_id'],
+        'status_url': f"/status/{job['job_id']}",
+        'message': f"{mode.capitalize()} export started"
+    }), 202
 
 @app.route('/query/categories', methods=['GET'])
 def check_categories():
@@ -16,12 +16,16 @@ TIMESTAMP=$(date +%Y%m%d-%H%M%S)
 IMAGE_TAG="${IMAGE_NAME}:${TIMESTAMP}"
 
 echo "📦 Building Docker image for linux/amd64 platform..."
-docker build --platform linux/amd64 -t ${IMAGE_TAG} .
+# Build from the repository root so the shared Square API client is in the context
+docker build --platform linux/amd64 -f Dockerfile -t ${IMAGE_TAG} ..
 
 echo "🔄 Pushing image to Google Container Registry..."
 docker push ${IMAGE_TAG}
 
 echo "☁️ Deploying to Cloud Run..."
+# Export jobs run on a background thread after POST /export returns and are
+# tracked in that instance's memory, so the service must be exactly one
+# instance that keeps its CPU between requests
 gcloud run deploy ${SERVICE_NAME} \
     --image=${IMAGE_TAG} \
     --region=${REGION} \
@@ -31,7 +35,9 @@ gcloud run deploy ${SERVICE_NAME} \
     --memory=1Gi \
     --cpu=1 \
     --timeout=900 \
-    --max-instances=10 \
+    --min-instances=1 \
+    --max-instances=1 \
+    --no-cpu-throttling \
     --set-env-vars="ENVIRONMENT=production,GOOGLE_CLOUD_PROJECT=${PROJECT_ID}" \
     --add-cloudsql-instances=nytex-business-systems:us-central1:nytex-main-db
 
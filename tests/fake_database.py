@@ -0,0 +1,122 @@
+"""
+Fake Database Connections
+Stand-ins for the async SQLAlchemy connections the sync services write through,
+shared by the unit tests that check what those services execute without a
+database.
+
+- FakeResult: a result answering scalar(), fetchall(), scalars().all() and rowcount
+- FakeTransaction: an async context manager for begin() / begin_nested()
+- RecordingConnection: keeps every statement it executes
+- AdvisoryLockDatabase: session-level advisory locks shared by its connections
+"""
+
+from contextlib import asynccontextmanager
+
+
+class FakeResult:
+    """Result of one fake statement"""
+
+    def __init__(self, value=None, rows=None, rowcount=0):
+        self.value = value
+        self.rows = list(rows or [])
+        self.rowcount = rowcount
+
+    def scalar(self):
+        return self.value
+
+    def fetchall(self):
+        return self.rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class RecordingConnection:
+    """
+    Keeps every statement it executes as (whitespace-collapsed SQL, params) and
+    answers with a FakeResult of `rowcount`; with `failing`, DELETEs raise
+    """
+
+    def __init__(self, rowcount=0, failing=False):
+        self.rowcount = rowcount
+        self.failing = failing
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = ' '.join(str(statement).split())
+        self.statements.append((sql, params))
+        if self.failing and sql.startswith('DELETE'):
+            raise ValueError("deadlock detected")
+        return FakeResult(rowcount=self.rowcount)
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    def sql(self):
+        return [sql for sql, _ in self.statements]
+
+
+class AdvisoryLockDatabase:
+    """
+    Session-level advisory locks shared by every connection it hands out. Like a
+    pooled connection, one returned without unlocking keeps its locks; an
+    invalidated connection releases them.
+    """
+
+    def __init__(self):
+        self.held = set()
+        self.connections = []
+
+    @asynccontextmanager
+    async def connect(self):
+        conn = _LockConnection(self)
+        self.connections.append(conn)
+        yield conn
+
+
+class _LockConnection:
+    def __init__(self, database):
+        self.database = database
+        self.keys = set()
+        self.in_transaction = False
+        self.invalidated = False
+        self.fail_unlock = False
+
+    async def execute(self, statement, params):
+        # Like SQLAlchemy, the first statement begins a transaction
+        self.in_transaction = True
+        key = params['key']
+        if 'pg_advisory_unlock' in str(statement):
+            if self.fail_unlock:
+                raise ConnectionError("connection was closed")
+            self.keys.discard(key)
+            self.database.held.discard(key)
+            return FakeResult(True)
+        if key in self.database.held and key not in self.keys:
+            return FakeResult(False)
+        self.database.held.add(key)
+        self.keys.add(key)
+        return FakeResult(True)
+
+    async def commit(self):
+        self.in_transaction = False
+
+    async def invalidate(self):
+        self.invalidated = True
+        self.database.held -= self.keys
+        self.keys.clear()
@@ -0,0 +1,594 @@
+"""
+Fake Square API Server
+A local stand-in for the Square endpoints the syncs use, serving deterministic
+synthetic fireworks-stand data at any size, so sync throughput can be measured
+without touching production Square.
+
+Served endpoints:
+- GET  /v2/locations
+- POST /v2/orders/search (location, state and created_at filters, entries or full orders)
+- POST /v2/orders/batch-retrieve
+- POST /v2/catalog/search (object types, begin_time, deleted objects)
+- POST /v2/inventory/counts/batch-retrieve (states, updated_after)
+- POST /v2/vendors/search
+
+Orders cluster in the two fireworks seasons (June 24 - July 4 and
+December 20 - January 1) with a trickle in between. Nothing is stored per
+order: each one is rebuilt from its index and the seed, so a million-order
+server uses no more memory than a small one.
+
+Latency (fixed plus jitter) and 429 answers can be injected; GET /_fake/stats
+reports what was served. Run it on its own with:
+
+    python -m tests.fake_square_server --orders 100000 --port 8089
+
+and point SQUARE_BASE_URL at it.
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+LOCATION_NAMES = ['Aubrey', 'Frisco', 'Celina', 'Krum', 'Pilot Point', 'Sanger', 'Denton', 'Little Elm']
+PRODUCT_WORDS = ['Mortar', 'Fountain', 'Roman Candle', 'Sparkler', 'Rocket', 'Cake', 'Firecracker', 'Smoke Ball']
+ORDER_STATES = ['COMPLETED'] * 97 + ['CANCELED'] * 2 + ['OPEN']
+TENDER_TYPES = ['CARD', 'CARD', 'CARD', 'CASH']
+TAX_RATE = 0.0825
+
+# Stores are open 10am - 11pm Central, i.e. 15:00 - 04:00 UTC
+OPENING_HOUR_UTC = 15
+OPEN_SECONDS = 13 * 3600
+
+SEARCH_ORDERS_DEFAULT_LIMIT = 500
+SEARCH_ORDERS_MAX_LIMIT = 1000
+BATCH_RETRIEVE_MAX_IDS = 100
+CATALOG_DEFAULT_LIMIT = 100
+CATALOG_MAX_LIMIT = 1000
+INVENTORY_MAX_LIMIT = 1000
+
+
+def square_timestamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def is_fireworks_season(day: date) -> bool:
+    return ((day.month == 6 and day.day >= 24) or (day.month == 7 and day.day <= 4)
+            or (day.month == 12 and day.day >= 20) or (day.month == 1 and day.day == 1))
+
+
+class SyntheticSquareData:
+    """
+    Deterministic Square data for a seed. Orders are numbered in created_at
+    order, so a date filter maps to an index range found by binary search.
+    """
+
+    def __init__(self, orders: int = 10000, locations: int = 6, items: int = 2000, categories: int = 40,
+                 start: date = date(2023, 1, 1), end: date = date(2024, 12, 31),
+                 season_weight: int = 40, seed: int = 1):
+        self.order_count = orders
+        self.item_count = items
+        self.category_count = categories
+        self.start = start
+        self.end = end
+        self.seed = seed
+        self.latest_time = datetime.combine(end + timedelta(days=1), dt_time(6, 0), tzinfo=timezone.utc)
+
+        self.locations = [self._location(i) for i in range(locations)]
+        self.active_location_ids = [loc['id'] for loc in self.locations if loc['status'] == 'ACTIVE']
+
+        # Spread the orders over the days by weight (largest remainder, so counts add up exactly)
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+        weights = [season_weight if is_fireworks_season(day) else 1 for day in days]
+        total_weight = sum(weights)
+        shares = [orders * weight / total_weight for weight in weights]
+        counts = [int(share) for share in shares]
+        by_remainder = sorted(range(len(days)), key=lambda n: shares[n] - counts[n], reverse=True)
+        for n in by_remainder[:orders - sum(counts)]:
+            counts[n] += 1
+
+        self.days = days
+        self.day_counts = counts
+        self.day_starts = []
+        first = 0
+        for count in counts:
+            self.day_starts.append(first)
+            first += count
+
+        self._catalog_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._variation_ids: Optional[List[Tuple[str, int]]] = None
+
+    # Orders
+
+    def order_created_at(self, index: int) -> datetime:
+        # Empty days share their start with the next day, so this lands on the day holding the order
+        day_number = bisect.bisect_right(self.day_starts, index) - 1
+        position = index - self.day_starts[day_number]
+        offset = (position + 0.5) * OPEN_SECONDS / self.day_counts[day_number]
+        opening = datetime.combine(self.days[day_number], dt_time(OPENING_HOUR_UTC), tzinfo=timezone.utc)
+        return opening + timedelta(seconds=offset)
+
+    def first_order_at(self, moment: Optional[datetime]) -> int:
+        """Index of the first order created at or after `moment`"""
+        if moment is None:
+            return 0
+        low, high = 0, self.order_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.order_created_at(middle) < moment:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def order_id(self, index: int) -> str:
+        return f"ORD{index:09d}"
+
+    def order_index(self, order_id: str) -> Optional[int]:
+        if not order_id.startswith('ORD') or not order_id[3:].isdigit():
+            return None
+        index = int(order_id[3:])
+        return index if index < self.order_count else None
+
+    def _order_rng(self, index: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def order_summary(self, index: int) -> Tuple[str, str]:
+        """(location_id, state) without building the whole order"""
+        rng = self._order_rng(index)
+        return rng.choice(self.active_location_ids), rng.choice(ORDER_STATES)
+
+    def order(self, index: int) -> Dict[str, Any]:
+        rng = self._order_rng(index)
+        location_id = rng.choice(self.active_location_ids)
+        state = rng.choice(ORDER_STATES)
+        order_id = self.order_id(index)
+        created_at = self.order_created_at(index)
+        updated_at = created_at + timedelta(minutes=rng.randint(1, 30))
+
+        line_items = []
+        subtotal = 0
+        for number in range(rng.randint(1, 6)):
+            item_index = rng.randrange(self.item_count)
+            variation_number = rng.randrange(self._variations_per_item(item_index))
+            price = self._variation_price(item_index, variation_number)
+            quantity = rng.randint(1, 4)
+            gross = price * quantity
+            tax = round(gross * TAX_RATE)
+            subtotal += gross
+            line_items.append({
+                'uid': f"{order_id}-L{number}",
+                'catalog_object_id': self._variation_id(item_index, variation_number),
+                'catalog_version': self._catalog_version(item_index),
+                'name': self._item_name(item_index),
+                'variation_name': self._variation_name(variation_number),
+                'quantity': str(quantity),
+                'item_type': 'ITEM',
+                'base_price_money': {'amount': price, 'currency': 'USD'},
+                'variation_total_price_money': {'amount': gross, 'currency': 'USD'},
+                'gross_sales_money': {'amount': gross, 'currency': 'USD'},
+                'total_discount_money': {'amount': 0, 'currency': 'USD'},
+                'total_tax_money': {'amount': tax, 'currency': 'USD'},
+                'total_money': {'amount': gross + tax, 'currency': 'USD'}
+            })
+
+        tax = round(subtotal * TAX_RATE)
+        total = subtotal + tax
+        order = {
+            'id': order_id,
+            'location_id': location_id,
+            'state': state,
+            'version': rng.randint(1, 3),
+            'created_at': square_timestamp(created_at),
+            'updated_at': square_timestamp(updated_at),
+            'line_items': line_items,
+            'total_money': {'amount': total, 'currency': 'USD'},
+            'total_tax_money': {'amount': tax, 'currency': 'USD'},
+            'total_discount_money': {'amount': 0, 'currency': 'USD'},
+            'net_amounts': {'total_money': {'amount': total, 'currency': 'USD'},
+                            'tax_money': {'amount': tax, 'currency': 'USD'}},
+            'source': {'name': 'Square Point of Sale'}
+        }
+        if state == 'COMPLETED':
+            order['closed_at'] = order['updated_at']
+            tender_type = rng.choice(TENDER_TYPES)
+            order['tenders'] = [{
+                'id': f"{order_id}-T0",
+                'location_id': location_id,
+                'type': tender_type,
+                'created_at': order['updated_at'],
+                'amount_money': {'amount': total, 'currency': 'USD'},
+                'processing_fee_money': {'amount': round(total * 0.026) if tender_type == 'CARD' else 0,
+                                         'currency': 'USD'},
+                'card_details': {'status': 'CAPTURED', 'card': {'card_brand': 'VISA'}} if tender_type == 'CARD' else {},
+                'cash_details': {'buyer_tendered_money': {'amount': total, 'currency': 'USD'}}
+                if tender_type == 'CASH' else {}
+            }]
+        return order
+
+    def search_orders(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        limit = body.get('limit', SEARCH_ORDERS_DEFAULT_LIMIT)
+        if not 1 <= limit <= SEARCH_ORDERS_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {SEARCH_ORDERS_MAX_LIMIT}")
+
+        query_filter = body.get('query', {}).get('filter', {})
+        created_at = query_filter.get('date_time_filter', {}).get('created_at', {})
+        states = set(query_filter.get('state_filter', {}).get('states', [])) or None
+        location_ids = set(body.get('location_ids', []))
+
+        end = self.first_order_at(parse_timestamp(created_at.get('end_at'))) if created_at.get('end_at') \
+            else self.order_count
+        index = int(body['cursor']) if body.get('cursor') else \
+            self.first_order_at(parse_timestamp(created_at.get('start_at')))
+
+        matches = []
+        while index < end and len(matches) < limit:
+            location_id, state = self.order_summary(index)
+            if location_id in location_ids and (states is None or state in states):
+                matches.append(index)
+            index += 1
+
+        if body.get('return_entries'):
+            response = {'order_entries': [
+                {'order_id': self.order_id(i), 'location_id': self.order_summary(i)[0]} for i in matches
+            ]}
+        else:
+            response = {'orders': [self.order(i) for i in matches]}
+        if index < end:
+            response['cursor'] = str(index)
+        return response
+
+    def batch_retrieve_orders(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        order_ids = body.get('order_ids', [])
+        if len(order_ids) > BATCH_RETRIEVE_MAX_IDS:
+            raise ValueError(f"at most {BATCH_RETRIEVE_MAX_IDS} order_ids per request")
+        indexes = (self.order_index(order_id) for order_id in order_ids)
+        return {'orders': [self.order(index) for index in indexes if index is not None]}
+
+    # Locations
+
+    def _location(self, index: int) -> Dict[str, Any]:
+        name = LOCATION_NAMES[index % len(LOCATION_NAMES)]
+        if index >= len(LOCATION_NAMES):
+            name = f"{name} {index // len(LOCATION_NAMES) + 1}"
+        return {
+            'id': f"LOC{index:03d}",
+            'name': name,
+            'business_name': 'NyTex Fireworks',
+            'type': 'PHYSICAL',
+            'status': 'ACTIVE',
+            'timezone': 'America/Chicago',
+            'currency': 'USD',
+            'country': 'US',
+            'address': {
+                'address_line_1': f"{100 + index * 17} Highway 377",
+                'locality': name,
+                'administrative_district_level_1': 'TX',
+                'postal_code': f"76{227 + index:03d}"
+            },
+            'created_at': square_timestamp(datetime.combine(self.start, dt_time(12), tzinfo=timezone.utc))
+        }
+
+    # Catalog
+
+    def _variations_per_item(self, item_index: int) -> int:
+        return 1 + item_index % 3
+
+    def _variation_id(self, item_index: int, number: int) -> str:
+        return f"VAR{item_index:06d}-{number}"
+
+    def _variation_name(self, number: int) -> str:
+        return ['Single', '3 Pack', 'Case'][number]
+
+    def _variation_price(self, item_index: int, number: int) -> int:
+        single = 499 + (item_index * 7919 + self.seed) % 5000
+        return single * [1, 3, 10][number]
+
+    def _item_name(self, item_index: int) -> str:
+        return f"{PRODUCT_WORDS[item_index % len(PRODUCT_WORDS)]} #{item_index}"
+
+    def _catalog_updated_at(self, item_index: int) -> datetime:
+        span = (self.latest_time - datetime.combine(self.start, dt_time(0), tzinfo=timezone.utc)).total_seconds()
+        offset = ((item_index * 2654435761 + self.seed) % 1_000_000) / 1_000_000 * span
+        return datetime.combine(self.start, dt_time(0), tzinfo=timezone.utc) + timedelta(seconds=offset)
+
+    def _catalog_version(self, item_index: int) -> int:
+        return int(self._catalog_updated_at(item_index).timestamp() * 1000)
+
+    def catalog_objects(self, object_type: str) -> List[Dict[str, Any]]:
+        """Every object of one type, deleted ones included (built once, the catalog is small)"""
+        if object_type in self._catalog_cache:
+            return self._catalog_cache[object_type]
+
+        objects = []
+        if object_type == 'CATEGORY':
+            for index in range(self.category_count):
+                updated_at = self._catalog_updated_at(index)
+                objects.append({
+                    'type': 'CATEGORY', 'id': f"CAT{index:04d}", 'is_deleted': False,
+                    'updated_at': square_timestamp(updated_at), 'version': int(updated_at.timestamp() * 1000),
+                    'category_data': {'name': f"{PRODUCT_WORDS[index % len(PRODUCT_WORDS)]}s {index}"}
+                })
+        elif object_type in ('ITEM', 'ITEM_VARIATION'):
+            for index in range(self.item_count):
+                updated_at = square_timestamp(self._catalog_updated_at(index))
+                version = self._catalog_version(index)
+                is_deleted = index % 97 == 96
+                variations = [{
+                    'type': 'ITEM_VARIATION', 'id': self._variation_id(index, number), 'is_deleted': is_deleted,
+                    'updated_at': updated_at, 'version': version,
+                    'item_variation_data': {
+                        'item_id': f"ITEM{index:06d}",
+                        'name': self._variation_name(number),
+                        'sku': f"NT{index:06d}{number}",
+                        'pricing_type': 'FIXED_PRICING',
+                        'price_money': {'amount': self._variation_price(index, number), 'currency': 'USD'},
+                        'track_inventory': True
+                    }
+                } for number in range(self._variations_per_item(index))]
+                if object_type == 'ITEM_VARIATION':
+                    objects.extend(variations)
+                    continue
+                objects.append({
+                    'type': 'ITEM', 'id': f"ITEM{index:06d}", 'is_deleted': is_deleted,
+                    'updated_at': updated_at, 'version': version,
+                    'item_data': {
+                        'name': self._item_name(index),
+                        'description': f"{self._item_name(index)} - {index % 48 + 1} shots",
+                        'categories': [{'id': f"CAT{index % self.category_count:04d}"}],
+                        'is_archived': index % 50 == 49,
+                        'variations': variations
+                    }
+                })
+        self._catalog_cache[object_type] = objects
+        return objects
+
+    def search_catalog(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        limit = body.get('limit', CATALOG_DEFAULT_LIMIT)
+        if not 1 <= limit <= CATALOG_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {CATALOG_MAX_LIMIT}")
+        begin_time = parse_timestamp(body.get('begin_time'))
+        include_deleted = body.get('include_deleted_objects', False)
+
+        matching = [
+            obj for object_type in body.get('object_types', [])
+            for obj in self.catalog_objects(object_type)
+            if (include_deleted or not obj['is_deleted'])
+            and (begin_time is None or parse_timestamp(obj['updated_at']) >= begin_time)
+        ]
+        offset = int(body['cursor']) if body.get('cursor') else 0
+        response = {'objects': matching[offset:offset + limit], 'latest_time': square_timestamp(self.latest_time)}
+        if offset + limit < len(matching):
+            response['cursor'] = str(offset + limit)
+        return response
+
+    # Inventory
+
+    def _inventory_variations(self) -> List[Tuple[str, int]]:
+        if self._variation_ids is None:
+            self._variation_ids = [
+                (obj['id'], index) for index, obj in enumerate(self.catalog_objects('ITEM_VARIATION'))
+                if not obj['is_deleted']
+            ]
+        return self._variation_ids
+
+    def inventory_count(self, index: int) -> Dict[str, Any]:
+        variations = self._inventory_variations()
+        variation_id, variation_number = variations[index // len(self.active_location_ids)]
+        location_id = self.active_location_ids[index % len(self.active_location_ids)]
+        rng = random.Random(self.seed * 7_000_003 + index)
+        calculated_at = self.latest_time - timedelta(hours=rng.randint(1, 24 * 365))
+        return {
+            'catalog_object_id': variation_id,
+            'catalog_object_type': 'ITEM_VARIATION',
+            'state': 'IN_STOCK',
+            'location_id': location_id,
+            'quantity': str(rng.randint(0, 240)),
+            'calculated_at': square_timestamp(calculated_at)
+        }
+
+    def batch_retrieve_inventory_counts(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        limit = body.get('limit', INVENTORY_MAX_LIMIT)
+        if not 1 <= limit <= INVENTORY_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {INVENTORY_MAX_LIMIT}")
+        states = set(body.get('states', []))
+        if states and 'IN_STOCK' not in states:
+            return {'counts': []}
+        updated_after = parse_timestamp(body.get('updated_after'))
+        location_ids = set(body.get('location_ids', [])) or None
+
+        total = len(self._inventory_variations()) * len(self.active_location_ids)
+        index = int(body['cursor']) if body.get('cursor') else 0
+        counts = []
+        while index < total and len(counts) < limit:
+            count = self.inventory_count(index)
+            index += 1
+            if location_ids is not None and count['location_id'] not in location_ids:
+                continue
+            if updated_after is not None and parse_timestamp(count['calculated_at']) <= updated_after:
+                continue
+            counts.append(count)
+
+        response: Dict[str, Any] = {'counts': counts}
+        if index < total:
+            response['cursor'] = str(index)
+        return response
+
+    # Vendors
+
+    def vendors(self) -> List[Dict[str, Any]]:
+        return [{
+            'id': f"VEN{index:03d}", 'name': f"{name} Fireworks Supply", 'status': 'ACTIVE', 'version': 1,
+            'account_number': f"NT-{index:04d}", 'address': {'administrative_district_level_1': 'TX'}, 'contacts': []
+        } for index, name in enumerate(['Winco', 'Black Cat', 'Brothers', 'Dominator'])]
+
+
+@dataclass
+class FakeSquareStats:
+    """What the server has answered since the last reset"""
+    requests: Dict[str, int] = field(default_factory=dict)
+    rate_limited: int = 0
+    orders_served: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'requests': dict(self.requests), 'total_requests': sum(self.requests.values()),
+                'rate_limited': self.rate_limited, 'orders_served': self.orders_served}
+
+
+class FakeSquareServer:
+    """
+    aiohttp app serving SyntheticSquareData. latency_ms (plus up to jitter_ms)
+    delays every answer; rate_limit_ratio of requests get a 429 with
+    Retry-After: retry_after_seconds instead.
+    """
+
+    def __init__(self, data: SyntheticSquareData, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 rate_limit_ratio: float = 0.0, retry_after_seconds: float = 0.0):
+        self.data = data
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after_seconds = retry_after_seconds
+        self.stats = FakeSquareStats()
+        self._rng = random.Random(data.seed)
+        self._server: Optional[TestServer] = None
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware], client_max_size=16 * 1024 ** 2)
+        app.router.add_get('/v2/locations', self.locations)
+        app.router.add_post('/v2/orders/search', self.search_orders)
+        app.router.add_post('/v2/orders/batch-retrieve', self.batch_retrieve_orders)
+        app.router.add_post('/v2/catalog/search', self.search_catalog)
+        app.router.add_post('/v2/inventory/counts/batch-retrieve', self.batch_retrieve_inventory_counts)
+        app.router.add_post('/v2/vendors/search', self.search_vendors)
+        app.router.add_get('/_fake/stats', self.get_stats)
+        return app
+
+    async def start(self) -> str:
+        """Serve on a free local port and return the base URL"""
+        self._server = TestServer(self.app())
+        await self._server.start_server()
+        return str(self._server.make_url('')).rstrip('/')
+
+    async def close(self):
+        if self._server is not None:
+            await self._server.close()
+            self._server = None
+
+    async def __aenter__(self) -> str:
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def reset_stats(self):
+        self.stats = FakeSquareStats()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        if request.path.startswith('/_fake/'):
+            return await handler(request)
+
+        self.stats.requests[request.path] = self.stats.requests.get(request.path, 0) + 1
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep((self.latency_ms + self._rng.random() * self.jitter_ms) / 1000)
+        if not request.headers.get('Authorization', '').startswith('Bearer '):
+            return self._error(401, 'UNAUTHORIZED', 'This request could not be authorized.')
+        if self.rate_limit_ratio and self._rng.random() < self.rate_limit_ratio:
+            self.stats.rate_limited += 1
+            return self._error(429, 'RATE_LIMITED', 'Rate limited', {'Retry-After': str(self.retry_after_seconds)})
+        try:
+            return await handler(request)
+        except ValueError as e:
+            return self._error(400, 'BAD_REQUEST', str(e))
+
+    def _error(self, status: int, code: str, detail: str, headers: Optional[Dict[str, str]] = None):
+        category = 'RATE_LIMIT_ERROR' if status == 429 else 'INVALID_REQUEST_ERROR'
+        return web.json_response({'errors': [{'category': category, 'code': code, 'detail': detail}]},
+                                 status=status, headers=headers)
+
+    async def _body(self, request: web.Request) -> Dict[str, Any]:
+        try:
+            return await request.json() if request.can_read_body else {}
+        except json.JSONDecodeError:
+            raise ValueError("request body is not valid JSON")
+
+    async def locations(self, request: web.Request):
+        return web.json_response({'locations': self.data.locations})
+
+    async def search_orders(self, request: web.Request):
+        response = self.data.search_orders(await self._body(request))
+        self.stats.orders_served += len(response.get('orders', []))
+        return web.json_response(response)
+
+    async def batch_retrieve_orders(self, request: web.Request):
+        response = self.data.batch_retrieve_orders(await self._body(request))
+        self.stats.orders_served += len(response['orders'])
+        return web.json_response(response)
+
+    async def search_catalog(self, request: web.Request):
+        return web.json_response(self.data.search_catalog(await self._body(request)))
+
+    async def batch_retrieve_inventory_counts(self, request: web.Request):
+        return web.json_response(self.data.batch_retrieve_inventory_counts(await self._body(request)))
+
+    async def search_vendors(self, request: web.Request):
+        return web.json_response({'vendors': self.data.vendors()})
+
+    async def get_stats(self, request: web.Request):
+        return web.json_response(self.stats.to_dict())
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Data and fault-injection options shared with scripts/benchmark_sync.py"""
+    parser.add_argument('--orders', type=int, default=10000, help="Orders to generate (default 10000)")
+    parser.add_argument('--locations', type=int, default=6, help="Store locations (default 6)")
+    parser.add_argument('--items', type=int, default=2000, help="Catalog items, 1-3 variations each (default 2000)")
+    parser.add_argument('--seed', type=int, default=1, help="Data seed; the same seed gives the same data")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay added to every answer")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="Random extra delay, up to this much")
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0,
+                        help="Share of requests answered with 429 (e.g. 0.05)")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with a 429")
+
+
+def server_argv(args: argparse.Namespace) -> List[str]:
+    """The add_server_arguments options in `args`, back as command-line arguments"""
+    return ['--orders', str(args.orders), '--locations', str(args.locations), '--items', str(args.items),
+            '--seed', str(args.seed), '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+            '--rate-limit-ratio', str(args.rate_limit_ratio), '--retry-after', str(args.retry_after)]
+
+
+def server_from_args(args: argparse.Namespace) -> FakeSquareServer:
+    data = SyntheticSquareData(orders=args.orders, locations=args.locations, items=args.items, seed=args.seed)
+    return FakeSquareServer(data, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            rate_limit_ratio=args.rate_limit_ratio, retry_after_seconds=args.retry_after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic Square data locally")
+    add_server_arguments(parser)
+    parser.add_argument('--port', type=int, default=8089, help="Port to listen on (default 8089)")
+    args = parser.parse_args()
+
+    server = server_from_args(args)
+    print(f"Fake Square API with {args.orders} orders on http://127.0.0.1:{args.port}")
+    web.run_app(server.app(), host='127.0.0.1', port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()
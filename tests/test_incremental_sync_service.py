@@ -0,0 +1,306 @@
+"""
+Incremental Sync Service Tests
+Validates IncrementalSyncService against a local fake Square API without a database.
+"""
+
+import asyncio
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from sqlalchemy.dialects import postgresql
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.incremental_sync_service import (
+    IncrementalSyncService, filter_changed_catalog_objects, inventory_rows_from_counts
+)
+from tests.fake_database import AdvisoryLockDatabase, FakeResult
+
+
+class RecordingSession:
+    """Stands in for AsyncSession, recording statements and parameters"""
+
+    def __init__(self, scalar=None, stored=None, unchanged=()):
+        self.statements = []
+        self.scalar = scalar
+        # table name -> {id: (version, is_deleted)} answered to version lookups
+        self.stored = stored or {}
+        # ids whose stored content hash matches, so the upsert skips them
+        self.unchanged = set(unchanged)
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if sql.startswith('INSERT INTO') and params is None:
+            # Multi-row upsert: report every row not in `unchanged` as written
+            params = statement.compile(dialect=postgresql.dialect()).params
+            self.statements.append((sql, params))
+            ids = [value for key, value in params.items() if key.startswith('id_m')]
+            return FakeResult(rows=[(1,)] * sum(1 for id_ in ids if id_ not in self.unchanged))
+        self.statements.append((sql, params))
+        for table_name, rows in self.stored.items():
+            if sql.startswith(f"SELECT id, version, is_deleted FROM {table_name}"):
+                return FakeResult(rows=[(id_, *rows[id_]) for id_ in params['ids'] if id_ in rows])
+        if 'unnest(CAST(:ids' in sql:
+            return FakeResult(rowcount=len(params['ids']))
+        return FakeResult(self.scalar)
+
+
+async def start_fake_square(handlers):
+    app = web.Application()
+    for path, handler in handlers.items():
+        app.router.add_post(path, handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.fixture
+def sync_service():
+    service = IncrementalSyncService()
+    service.square_access_token = 'test-token'
+    return service
+
+
+@pytest.mark.unit
+class TestIncrementalInventorySync:
+    """Test the updated_after inventory sync"""
+
+    async def test_counts_are_fetched_since_the_high_water_mark(self, sync_service):
+        bodies = []
+
+        async def batch_retrieve(request):
+            body = await request.json()
+            bodies.append(body)
+            if not body.get('cursor'):
+                return web.json_response({'cursor': 'page-2', 'counts': [
+                    {'catalog_object_id': 'VAR1', 'location_id': 'LOC1', 'state': 'IN_STOCK',
+                     'quantity': '4', 'calculated_at': '2024-07-04T15:00:00Z'}
+                ]})
+            return web.json_response({'counts': [
+                {'catalog_object_id': 'VAR1', 'location_id': 'LOC1', 'state': 'IN_STOCK',
+                 'quantity': '3', 'calculated_at': '2024-07-04T15:05:00Z'},
+                {'catalog_object_id': 'VAR2', 'location_id': 'LOC1', 'state': 'IN_STOCK',
+                 'quantity': '7.0', 'calculated_at': '2024-07-04T15:01:00Z'}
+            ]})
+
+        server = await start_fake_square({'/v2/inventory/counts/batch-retrieve': batch_retrieve})
+        sync_service.base_url = str(server.make_url('')).rstrip('/')
+        try:
+            changes = await sync_service._fetch_inventory_changes(datetime(2024, 7, 4, 14, 0))
+        finally:
+            await server.close()
+
+        assert changes['success']
+        assert bodies[0]['updated_after'] == '2024-07-04T13:55:00Z'
+        assert bodies[0]['states'] == ['IN_STOCK']
+        assert bodies[1]['cursor'] == 'page-2'
+        # The newer count for VAR1 wins
+        assert sorted((row['variation_id'], row['quantity']) for row in changes['data']) == [('VAR1', 3), ('VAR2', 7)]
+        assert changes['high_water'] == datetime(2024, 7, 4, 15, 5)
+
+    async def test_first_run_retrieves_every_count(self, sync_service):
+        bodies = []
+
+        async def batch_retrieve(request):
+            bodies.append(await request.json())
+            return web.json_response({})
+
+        server = await start_fake_square({'/v2/inventory/counts/batch-retrieve': batch_retrieve})
+        sync_service.base_url = str(server.make_url('')).rstrip('/')
+        try:
+            changes = await sync_service._fetch_inventory_changes(None)
+        finally:
+            await server.close()
+
+        assert 'updated_after' not in bodies[0]
+        assert changes['data'] == [] and changes['high_water'] is None
+
+    async def test_counts_are_written_in_one_statement(self, sync_service):
+        rows = inventory_rows_from_counts([
+            {'catalog_object_id': f'VAR{i}', 'location_id': 'LOC1', 'state': 'IN_STOCK', 'quantity': str(i)}
+            for i in range(250)
+        ] + [{'catalog_object_id': 'VAR0', 'location_id': 'LOC1', 'state': 'SOLD', 'quantity': '9'}])
+        session = RecordingSession(scalar=12)
+
+        changed = await sync_service._apply_inventory_changes(session, rows)
+
+        assert changed == 12
+        assert len(session.statements) == 1
+        params = session.statements[0][1]
+        assert len(params['variation_ids']) == 250
+        assert params['quantities'][0] == 0
+
+    async def test_high_water_mark_is_stored(self, sync_service):
+        session = RecordingSession()
+        high_water = datetime(2024, 7, 4, 15, 5)
+
+        async def fetch(last_sync):
+            return {'success': True, 'data': [], 'high_water': high_water}
+
+        with patch.object(sync_service, '_get_last_sync_timestamp', return_value=None), \
+             patch.object(sync_service, '_fetch_inventory_changes', side_effect=fetch):
+            result = await sync_service._sync_data_type(session, 'catalog_inventory')
+
+        assert result['success']
+        assert session.statements[-1][1]['high_water'] == high_water
+
+
+@pytest.mark.unit
+class TestVersionAwareCatalogSync:
+    """Test begin_time catalog deltas and version comparison"""
+
+    async def test_catalog_fetch_starts_from_the_recorded_timestamp(self, sync_service):
+        bodies = []
+
+        async def search(request):
+            bodies.append(await request.json())
+            return web.json_response({'objects': [], 'latest_time': '2024-07-04T15:05:00.123Z'})
+
+        server = await start_fake_square({'/v2/catalog/search': search})
+        sync_service.base_url = str(server.make_url('')).rstrip('/')
+        try:
+            changes = await sync_service._fetch_catalog_changes(
+                'catalog_items', sync_service.sync_configs['catalog_items'], datetime(2024, 7, 4, 12, 0))
+        finally:
+            await server.close()
+
+        assert bodies[0]['begin_time'] == '2024-07-04T12:00:00Z'
+        assert bodies[0]['include_deleted_objects'] is True
+        assert changes['high_water'] == datetime(2024, 7, 4, 15, 5, 0, 123000)
+
+    async def test_only_objects_whose_version_moved_are_kept(self):
+        session = RecordingSession(stored={'catalog_items': {
+            'SAME': (5, False), 'NEWER': (5, False), 'GONE': (5, False), 'NO_VERSION': (None, False)
+        }})
+        objects = [
+            {'type': 'ITEM', 'id': 'SAME', 'version': 5},
+            {'type': 'ITEM', 'id': 'NEWER', 'version': 6},
+            {'type': 'ITEM', 'id': 'GONE', 'version': 6, 'is_deleted': True},
+            {'type': 'ITEM', 'id': 'NO_VERSION', 'version': 5},
+            {'type': 'ITEM', 'id': 'NEW', 'version': 1},
+            {'type': 'ITEM', 'id': 'NEVER_STORED', 'version': 2, 'is_deleted': True}
+        ]
+
+        changed = await filter_changed_catalog_objects(session, objects)
+
+        assert [obj['id'] for obj in changed] == ['NEWER', 'GONE', 'NO_VERSION', 'NEW']
+        # One lookup for the whole object type
+        assert len(session.statements) == 1
+
+    async def test_deleted_variations_are_flagged_not_upserted(self, sync_service):
+        session = RecordingSession()
+        variations = [
+            {'type': 'ITEM_VARIATION', 'id': 'V1', 'version': 9, 'is_deleted': True},
+            {'type': 'ITEM_VARIATION', 'id': 'V2', 'version': 3,
+             'item_variation_data': {'name': 'Large', 'item_id': 'ITEM1'}}
+        ]
+
+        changes = await sync_service._apply_variation_changes(session, variations)
+
+        assert changes == 2
+        delete_sql, delete_params = session.statements[0]
+        assert 'SET is_deleted = true' in delete_sql and delete_params['ids'] == ['V1']
+        upsert_sql, upsert_params = session.statements[1]
+        assert 'ON CONFLICT (id) DO UPDATE' in upsert_sql and upsert_params['id_m0'] == 'V2'
+        assert len(session.statements) == 2
+
+
+@pytest.mark.unit
+class TestBulkApply:
+    """Test the chunked multi-row upserts behind the _apply_* methods"""
+
+    async def test_variations_are_written_one_statement_per_chunk(self, sync_service):
+        sync_service.upsert_chunk_size = 100
+        session = RecordingSession()
+        variations = [
+            {'type': 'ITEM_VARIATION', 'id': f'V{i}', 'version': 1,
+             'item_variation_data': {'name': f'Size {i}', 'item_id': 'ITEM1'}}
+            for i in range(250)
+        ]
+
+        changes = await sync_service._apply_variation_changes(session, variations)
+
+        assert changes == 250
+        assert [sql.count('ON CONFLICT') for sql, _ in session.statements] == [1, 1, 1]
+
+    async def test_duplicate_rows_are_collapsed_before_writing(self, sync_service):
+        session = RecordingSession()
+        locations = [{'id': 'LOC1', 'name': 'Old name'}, {'id': 'LOC2', 'name': 'Other'},
+                     {'id': 'LOC1', 'name': 'New name'}]
+
+        changes = await sync_service._apply_location_changes(session, locations)
+
+        assert changes == 2
+        params = session.statements[0][1]
+        assert params['id_m0'] == 'LOC1' and params['name_m0'] == 'New name'
+
+    async def test_archived_items_are_removed_in_one_statement(self, sync_service):
+        session = RecordingSession()
+        items = [
+            {'type': 'ITEM', 'id': f'ITEM{i}', 'version': 2, 'item_data': {'name': f'Item {i}', 'is_archived': i < 3}}
+            for i in range(6)
+        ]
+
+        changes = await sync_service._apply_item_changes(session, items)
+
+        delete_sql, delete_params = session.statements[0]
+        assert delete_sql.startswith('DELETE FROM catalog_items') and delete_params['item_ids'] == ['ITEM0', 'ITEM1', 'ITEM2']
+        assert session.statements[1][1]['id_m0'] == 'ITEM3'
+        # FakeResult reports no archived rows deleted, three live items written
+        assert changes == 3
+
+    async def test_rows_with_matching_content_hash_are_skipped(self, sync_service):
+        locations = [{'id': 'LOC1', 'name': 'Downtown'}, {'id': 'LOC2', 'name': 'Uptown'}]
+        first = RecordingSession(unchanged={'LOC2'})
+        second = RecordingSession()
+
+        changes = await sync_service._apply_location_changes(first, locations)
+        await sync_service._apply_location_changes(second, locations)
+
+        assert changes == 1 and sync_service.rows_unchanged == 1
+        sql, params = first.statements[0]
+        assert 'WHERE locations.content_hash IS DISTINCT FROM excluded.content_hash' in sql
+        # The timestamps stamped on every run do not change the hash
+        assert params['content_hash_m0'] == second.statements[0][1]['content_hash_m0']
+
+
+@pytest.mark.unit
+class TestConcurrentSyncTypes:
+    """Test that independent sync types overlap their Square fetches"""
+
+    async def test_independent_fetches_overlap(self, sync_service):
+        log = []
+
+        async def fetch(name):
+            log.append(('start', name))
+            await asyncio.sleep(0.05)
+            log.append(('finish', name))
+            return {'success': True, 'data': []}
+
+        async def fetch_locations(last_sync):
+            return await fetch('locations')
+
+        async def fetch_catalog(sync_type, config, last_sync):
+            return await fetch(sync_type)
+
+        with patch.object(sync_service, '_ensure_sync_state_table'), \
+             patch.object(sync_service, '_update_sync_status'), \
+             patch.object(sync_service, '_get_last_sync_timestamp', return_value=None), \
+             patch.object(sync_service, '_update_last_sync_timestamp'), \
+             patch.object(sync_service, '_fetch_location_changes', side_effect=fetch_locations), \
+             patch.object(sync_service, '_fetch_catalog_changes', side_effect=fetch_catalog), \
+             patch.object(sync_service, 'lock_connect', AdvisoryLockDatabase().connect):
+            result = await sync_service.run_incremental_sync(
+                RecordingSession(), ['catalog_items', 'locations', 'catalog_categories'])
+
+        assert result['success'] and set(result['results']) == {'locations', 'catalog_categories', 'catalog_items'}
+        # locations and categories fetch together; items wait for categories
+        assert [event for event, _ in log[:2]] == ['start', 'start']
+        assert log.index(('start', 'catalog_items')) > log.index(('finish', 'catalog_categories'))
+        assert result['critical_path'] == ['catalog_categories', 'catalog_items']
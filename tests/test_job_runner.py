@@ -0,0 +1,308 @@
+"""
+Background Job Runner Tests
+Runs jobs through an in-memory job table and checks de-duplication, progress,
+failure, cancellation and the admin endpoints that queue jobs.
+"""
+
+import asyncio
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.job_runner import Job, JobRunner, dedup_key
+
+
+class InMemoryJobRunner(JobRunner):
+    """JobRunner with the background_jobs table kept in memory"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('heartbeat_seconds', 0.01)
+        super().__init__(**kwargs)
+        self.jobs = {}
+        self.keys = {}
+
+    async def _ensure_table(self):
+        pass
+
+    async def _insert_job(self, job_type, params, key):
+        if any(self.keys[job.id] == key and not job.is_finished for job in self.jobs.values()):
+            return None
+        job = Job(id=len(self.jobs) + 1, job_type=job_type, params=params,
+                  created_at=datetime.now(timezone.utc))
+        self.jobs[job.id] = job
+        self.keys[job.id] = key
+        return job
+
+    async def _find_active(self, key):
+        return next((job for job in self.jobs.values()
+                     if self.keys[job.id] == key and not job.is_finished), None)
+
+    async def _claim_job(self):
+        for job in self.jobs.values():
+            if job.status == 'queued' and not job.cancel_requested:
+                job.status = 'running'
+                job.attempts += 1
+                job.started_at = datetime.now(timezone.utc)
+                return job
+        return None
+
+    async def _heartbeat(self, job_id, progress):
+        self.jobs[job_id].progress = dict(progress)
+        return self.jobs[job_id].cancel_requested
+
+    async def _finish(self, job_id, status, progress, result=None, error=None):
+        job = self.jobs[job_id]
+        job.status, job.progress, job.result, job.error = status, dict(progress), result, error
+        job.finished_at = datetime.now(timezone.utc)
+
+    async def _request_cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel_requested = True
+            if job.status == 'queued':
+                job.status = 'cancelled'
+        return job
+
+    async def _load_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _list_jobs(self, job_type, limit):
+        jobs = [job for job in self.jobs.values() if job_type is None or job.job_type == job_type]
+        return sorted(jobs, key=lambda job: job.id, reverse=True)[:limit]
+
+
+def make_runner(**handlers):
+    return InMemoryJobRunner(handlers=handlers, max_workers=1)
+
+
+@pytest.mark.unit
+class TestJobRunner:
+    """Test JobRunner queueing and execution"""
+
+    async def test_identical_active_jobs_are_deduplicated(self):
+        async def handler(job):
+            return {}
+        runner = make_runner(sync=handler)
+
+        first, created = await runner.enqueue('sync', {'full_refresh': False})
+        second, created_again = await runner.enqueue('sync', {'full_refresh': False})
+        other, created_other = await runner.enqueue('sync', {'full_refresh': True})
+
+        assert created and not created_again and created_other
+        assert second.id == first.id
+        assert other.id != first.id
+
+        await runner.run_next()
+        third, created_after_finish = await runner.enqueue('sync', {'full_refresh': False})
+        assert created_after_finish and third.id != first.id
+
+    async def test_dedup_key_ignores_parameter_order(self):
+        assert dedup_key('sync', {'a': 1, 'b': 2}) == dedup_key('sync', {'b': 2, 'a': 1})
+
+    async def test_successful_job_records_progress_and_result(self):
+        async def handler(job):
+            job.update_progress({'completed_chunks': 1}, total_chunks=2)
+            await asyncio.sleep(0.05)
+            job.update_progress(completed_chunks=2)
+            return {'success': True, 'orders': job.params['limit']}
+        runner = make_runner(backfill=handler)
+
+        job, _ = await runner.enqueue('backfill', {'limit': 5})
+        await runner.run_next()
+
+        job = await runner.get(job.id)
+        assert job.status == 'succeeded'
+        assert job.result == {'success': True, 'orders': 5}
+        assert job.progress == {'completed_chunks': 2, 'total_chunks': 2}
+
+    async def test_handler_exception_fails_the_job(self):
+        async def handler(job):
+            raise RuntimeError("Location sync failed: 401")
+        runner = make_runner(sync=handler)
+
+        job, _ = await runner.enqueue('sync')
+        await runner.run_next()
+
+        job = await runner.get(job.id)
+        assert job.status == 'failed'
+        assert job.error == "Location sync failed: 401"
+
+    async def test_cancelling_a_queued_job_means_it_never_runs(self):
+        calls = []
+
+        async def handler(job):
+            calls.append(job)
+        runner = make_runner(sync=handler)
+
+        job, _ = await runner.enqueue('sync')
+        cancelled = await runner.cancel(job.id)
+
+        assert cancelled.status == 'cancelled'
+        assert await runner.run_next() is False
+        assert calls == []
+
+    async def test_cancel_requested_elsewhere_stops_a_running_job(self):
+        started = asyncio.Event()
+
+        async def handler(job):
+            started.set()
+            await asyncio.sleep(10)
+        runner = make_runner(sync=handler)
+
+        job, _ = await runner.enqueue('sync')
+        run = asyncio.create_task(runner.run_next())
+        await started.wait()
+        # Set the flag directly, as another instance's cancel request would
+        runner.jobs[job.id].cancel_requested = True
+        await asyncio.wait_for(run, timeout=1)
+
+        assert runner.jobs[job.id].status == 'cancelled'
+
+    async def test_shutdown_leaves_the_job_to_be_claimed_again(self):
+        started = asyncio.Event()
+        stopped = asyncio.Event()
+
+        async def handler(job):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+        runner = make_runner(sync=handler)
+
+        job, _ = await runner.enqueue('sync')
+        runner.schedule()
+        await started.wait()
+        await runner.shutdown()
+        await asyncio.wait_for(stopped.wait(), timeout=1)
+
+        assert runner.jobs[job.id].status == 'running'
+        assert runner.jobs[job.id].finished_at is None
+
+    async def test_claim_finishes_abandoned_cancelled_jobs(self):
+        statements = []
+
+        class Recorder:
+            async def execute(self, statement, params=None):
+                statements.append(' '.join(str(statement).split()))
+                return self
+
+            def mappings(self):
+                return self
+
+            def first(self):
+                return None
+
+        @asynccontextmanager
+        async def connect():
+            yield Recorder()
+
+        runner = JobRunner(handlers={})
+        with patch.object(runner, '_connect', connect):
+            assert await runner._claim_job() is None
+
+        sweep = next(sql for sql in statements if "SET status = 'cancelled'" in sql)
+        assert "status = 'running' AND cancel_requested AND heartbeat_at <" in sweep
+        assert statements.index(sweep) < len(statements) - 1
+
+    async def test_unknown_job_type_is_rejected(self):
+        runner = make_runner()
+
+        with pytest.raises(ValueError):
+            await runner.enqueue('nope')
+
+    async def test_schedule_drains_the_queue(self):
+        async def handler(job):
+            return {'n': job.params['n']}
+        runner = make_runner(sync=handler)
+
+        jobs = [(await runner.enqueue('sync', {'n': n}))[0] for n in range(3)]
+        runner.schedule()
+        finished = [await asyncio.wait_for(runner.wait(job.id, poll_seconds=0.01), timeout=1) for job in jobs]
+
+        assert [job.result for job in finished] == [{'n': 0}, {'n': 1}, {'n': 2}]
+
+    async def test_periodic_reclaim_schedules_workers_until_shutdown(self):
+        runner = make_runner()
+        runner.reclaim_seconds = 0.01
+
+        with patch.object(runner, 'schedule') as schedule:
+            runner.start_periodic_reclaim()
+            await asyncio.sleep(0.05)
+            await runner.shutdown()
+            calls = schedule.call_count
+            await asyncio.sleep(0.03)
+
+        assert calls >= 1
+        assert schedule.call_count == calls
+
+
+@pytest.mark.unit
+class TestAdminJobEndpoints:
+    """Test that long admin operations are queued rather than run in the request"""
+
+    @pytest.fixture
+    def runner(self):
+        from app.services.job_runner import JOB_HANDLERS
+        from app.routes import admin  # registers the admin job handlers
+        runner = InMemoryJobRunner(handlers=dict(JOB_HANDLERS), max_workers=1)
+        with patch.object(admin, 'get_job_runner', return_value=runner):
+            yield runner
+
+    @pytest.fixture
+    def client(self, runner):
+        from app.routes.admin import router as admin_router
+        app = FastAPI()
+        app.include_router(admin_router)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver')
+
+    async def test_complete_sync_returns_a_job_id_and_deduplicates(self, runner, client):
+        with patch.object(runner, 'schedule'):
+            first = await client.post('/admin/complete-sync', json={'full_refresh': False})
+            second = await client.post('/admin/complete-sync', json={'full_refresh': False})
+
+        assert first.status_code == 202
+        body = first.json()
+        assert body['status_url'] == f"/admin/jobs/{body['job_id']}"
+        assert body['deduplicated'] is False
+        assert second.json()['job_id'] == body['job_id']
+        assert second.json()['deduplicated'] is True
+        assert runner.jobs[body['job_id']].params == {'full_refresh': False}
+
+    async def test_job_status_and_cancel_endpoints(self, runner, client):
+        with patch.object(runner, 'schedule'):
+            job_id = (await client.post('/admin/bulk-data-sync')).json()['job_id']
+
+        status = await client.get(f'/admin/jobs/{job_id}')
+        assert status.json()['job']['status'] == 'queued'
+        assert status.json()['job']['job_type'] == 'bulk_data_sync'
+
+        cancel = await client.post(f'/admin/jobs/{job_id}/cancel')
+        assert cancel.json()['job']['status'] == 'cancelled'
+        assert (await client.get('/admin/jobs/999')).status_code == 404
+
+    async def test_historical_status_reads_the_latest_job(self, runner, client):
+        assert (await client.get('/admin/historical-orders-sync-status')).json()['is_running'] is False
+
+        with patch.object(runner, 'schedule'):
+            job_id = (await client.post('/admin/historical-orders-sync')).json()['job_id']
+        runner.jobs[job_id].status = 'running'
+        runner.jobs[job_id].started_at = datetime.now(timezone.utc)
+        runner.jobs[job_id].progress = {'total_chunks': 4, 'completed_chunks': 1,
+                                        'current_chunk_info': 'Chunk 2/4', 'total_orders_synced': 120}
+
+        status = (await client.get('/admin/historical-orders-sync-status')).json()
+
+        assert status['is_running'] is True
+        assert status['progress_percentage'] == 25.0
+        assert status['total_orders_synced'] == 120
+        assert status['estimated_remaining_seconds'] is not None
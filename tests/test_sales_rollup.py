@@ -0,0 +1,102 @@
+"""
+Sales Rollup Tests
+Checks the Central-day keys of daily_location_sales and that SyncEngine
+refreshes only the days a batch of orders touched.
+"""
+
+import pytest
+import sys
+import os
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.sales_rollup import _utc_bounds, central_date, refresh_daily_location_sales
+from app.services.sync_engine import SyncEngine, SyncResult
+from tests.fake_database import RecordingConnection
+
+
+@pytest.fixture
+def sync_engine():
+    with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}):
+        yield SyncEngine(database_url="postgresql://test@localhost/test")
+
+
+@pytest.mark.unit
+class TestSaleDates:
+    """Test which Central day an order's UTC timestamp falls on"""
+
+    def test_evening_orders_belong_to_the_previous_central_day(self):
+        # 03:30 UTC on July 5th is 22:30 CDT on July 4th
+        assert central_date(datetime(2024, 7, 5, 3, 30)) == date(2024, 7, 4)
+        assert central_date(datetime(2024, 7, 5, 5, 0)) == date(2024, 7, 5)
+
+    def test_utc_bounds_follow_daylight_saving(self):
+        summer = _utc_bounds(date(2024, 7, 4), date(2024, 7, 4))
+        winter = _utc_bounds(date(2024, 12, 31), date(2025, 1, 1))
+
+        assert summer == (datetime(2024, 7, 4, 5), datetime(2024, 7, 5, 5))
+        assert winter == (datetime(2024, 12, 31, 6), datetime(2025, 1, 2, 6))
+
+
+@pytest.mark.unit
+class TestRollupRefresh:
+    """Test the per-day refresh of daily_location_sales"""
+
+    async def test_refresh_replaces_only_the_given_days(self):
+        conn = RecordingConnection(rowcount=3)
+
+        rows = await refresh_daily_location_sales(conn, [date(2024, 7, 4), date(2024, 6, 30), date(2024, 7, 4)])
+
+        lock, delete, insert = conn.statements
+        assert 'pg_advisory_xact_lock' in lock[0]
+        assert delete[1] == {'days': [date(2024, 6, 30), date(2024, 7, 4)]}
+        assert insert[1]['start'] == datetime(2024, 6, 30, 5) and insert[1]['end'] == datetime(2024, 7, 5, 5)
+        assert "o.state = 'COMPLETED'" in insert[0]
+        assert rows == 3
+
+    async def test_no_days_runs_nothing(self):
+        conn = RecordingConnection()
+
+        assert await refresh_daily_location_sales(conn, []) == 0
+        assert conn.statements == []
+
+
+@pytest.mark.unit
+class TestSyncEngineRollup:
+    """Test SyncEngine keeping the rollup current as it writes orders"""
+
+    async def test_batch_refreshes_the_days_it_touched(self, sync_engine):
+        conn = RecordingConnection()
+        rows = [{'id': 'a', 'created_at': datetime(2024, 7, 5, 3, 30)},
+                {'id': 'b', 'created_at': datetime(2024, 7, 5, 18, 0)}]
+
+        await sync_engine._refresh_sales_rollup(conn, rows)
+
+        delete = next(params for sql, params in conn.statements if sql.startswith('DELETE'))
+        assert delete == {'days': [date(2024, 7, 4), date(2024, 7, 5)]}
+        assert not any('CREATE TABLE' in sql for sql in conn.sql())
+
+    async def test_failed_refresh_does_not_fail_the_sync(self, sync_engine):
+        conn = RecordingConnection(failing=True)
+        result = SyncResult(success=True, data_type='orders', errors=[])
+        order_rows = [{'id': 'a', 'created_at': datetime(2024, 7, 5, 18, 0)}]
+
+        async def write_orders(conn, table, rows, *args, **kwargs):
+            return (len(rows), 0, 0, 0) if rows is order_rows else (0, 0, 0, 0)
+
+        @asynccontextmanager
+        async def connect():
+            yield conn
+
+        with patch.object(sync_engine, 'connect', connect), \
+             patch.object(sync_engine, '_bulk_upsert', side_effect=write_orders):
+            await sync_engine._write_order_rows(order_rows, [], [], 0, result)
+
+        assert result.records_added == 1
+        assert result.success and result.errors == []
+        assert any(sql.startswith('DELETE FROM daily_location_sales') for sql in conn.sql())
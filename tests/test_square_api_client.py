@@ -0,0 +1,94 @@
+"""
+Square API Client Tests
+Validates rate limiting and retry behaviour of the shared Square client.
+"""
+
+import pytest
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.square_api_client import SquareAPIClient, TokenBucket
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """Test the shared token-bucket limiter"""
+
+    async def test_burst_is_not_delayed(self):
+        bucket = TokenBucket(rate_per_second=100, capacity=5)
+
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+
+        assert time.monotonic() - start < 0.05
+
+    async def test_requests_beyond_burst_are_paced(self):
+        bucket = TokenBucket(rate_per_second=50, capacity=1)
+
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+
+        # 5 requests beyond the burst at 50/s need roughly 0.1s
+        assert time.monotonic() - start >= 0.08
+
+
+@pytest.mark.unit
+class TestSquareAPIClient:
+    """Test retries against a local HTTP server"""
+
+    async def _start_server(self, handler):
+        app = web.Application()
+        app.router.add_post('/v2/orders/search', handler)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    async def test_retries_after_429_and_reports_it(self):
+        calls = {'count': 0}
+
+        async def handler(request):
+            calls['count'] += 1
+            if calls['count'] == 1:
+                return web.json_response({'errors': []}, status=429, headers={'Retry-After': '0'})
+            return web.json_response({'orders': [{'id': 'order-1'}]})
+
+        server = await self._start_server(handler)
+        client = SquareAPIClient('test-token', str(server.make_url('')), rate_limiter=TokenBucket(100, 10))
+        try:
+            async with client.post('/v2/orders/search', json={}) as response:
+                data = await response.json()
+
+            assert response.status == 200
+            assert response.rate_limited == 1
+            assert data['orders'][0]['id'] == 'order-1'
+            assert calls['count'] == 2
+        finally:
+            await client.close()
+            await server.close()
+
+    async def test_client_errors_are_returned_without_retry(self):
+        calls = {'count': 0}
+
+        async def handler(request):
+            calls['count'] += 1
+            return web.json_response({'errors': [{'code': 'BAD_REQUEST'}]}, status=400)
+
+        server = await self._start_server(handler)
+        client = SquareAPIClient('test-token', str(server.make_url('')), rate_limiter=TokenBucket(100, 10))
+        try:
+            response = await client.post('/v2/orders/search', json={})
+
+            assert response.status == 400
+            assert calls['count'] == 1
+        finally:
+            await client.close()
+            await server.close()
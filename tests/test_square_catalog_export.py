@@ -0,0 +1,219 @@
+"""
+Square Catalog Export Tests
+Checks which rows an incremental catalog export rewrites, inserts and deletes,
+and when it falls back to a full export.
+"""
+
+import os
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+pytest.importorskip('flask')
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from square_catalog_export import app as catalog_export
+from square_catalog_export.app import INCREMENTAL_EXPORT_OVERLAP, SquareCatalogExporter
+from tests.fake_database import FakeResult
+
+LAST_EXPORT = datetime(2024, 7, 4, 12, 0)
+EXPORT_TIME = datetime(2024, 7, 5, 12, 0)
+BEFORE_LAST_EXPORT = '2024-07-01T00:00:00Z'
+
+
+def catalog_item(item_id, variation_ids, updated_at=BEFORE_LAST_EXPORT):
+    return {
+        'type': 'ITEM', 'id': item_id, 'updated_at': updated_at,
+        'item_data': {'name': item_id, 'variations': [
+            {'type': 'ITEM_VARIATION', 'id': variation_id, 'updated_at': BEFORE_LAST_EXPORT}
+            for variation_id in variation_ids
+        ]}
+    }
+
+
+class FakeSession:
+    """Answers each statement with the rows of the first matching SQL fragment"""
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.statements = []
+        self.commits = 0
+
+    def execute(self, statement, params=None):
+        sql = ' '.join(str(statement).split())
+        self.statements.append((sql, params))
+        for fragment, rows in self.responses:
+            if fragment in sql:
+                return FakeResult(rows[0][0] if rows else None, rows)
+        return FakeResult()
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+    def params_for(self, fragment):
+        return [params for sql, params in self.statements if fragment in sql]
+
+
+@pytest.fixture
+def exporter():
+    exporter = SquareCatalogExporter()
+    built = []
+
+    def build_export_rows(session, catalog_items, categories_lookup, export_time, variation_filter=None):
+        built.append(([item['id'] for item in catalog_items], variation_filter))
+        return [{'token': variation['id']}
+                for item in catalog_items for variation in item['item_data']['variations']
+                if variation_filter is None or variation['id'] in variation_filter]
+
+    with patch.object(exporter, '_build_export_rows', side_effect=build_export_rows):
+        exporter.built = built
+        yield exporter
+
+
+def refresh(exporter, catalog_items, existing_tokens, changed_variations=(), changed_items=()):
+    session = FakeSession([('SELECT token FROM square_item_library_export', [(token,) for token in existing_tokens])])
+    with patch.object(exporter, '_load_changed_ids', return_value=(set(changed_variations), set(changed_items))):
+        result = exporter._refresh_changed_rows(session, catalog_items, {}, EXPORT_TIME, LAST_EXPORT)
+    deleted = session.params_for('DELETE FROM square_item_library_export')
+    return result, (set(deleted[0]['tokens']) if deleted else set()), session
+
+
+@pytest.mark.unit
+class TestChangeDetection:
+    """Test reading changed variation and item IDs from our catalog tables"""
+
+    def test_changed_ids_are_split_into_variations_and_items(self):
+        since = LAST_EXPORT - INCREMENTAL_EXPORT_OVERLAP
+        session = FakeSession([
+            ('FROM catalog_inventory', [('VAR1',), ('VAR2',)]),
+            ('FROM catalog_items', [('ITEM1',)]),
+        ])
+
+        variation_ids, item_ids = SquareCatalogExporter()._load_changed_ids(session, since)
+
+        assert variation_ids == {'VAR1', 'VAR2'}
+        assert item_ids == {'ITEM1'}
+        (variation_sql, variation_params), (item_sql, item_params) = session.statements
+        assert 'catalog_variations' in variation_sql and 'catalog_vendor_info' in variation_sql
+        assert 'catalog_location_availability' in item_sql and 'catalog_categories' in item_sql
+        assert variation_params == item_params == {'since': since}
+
+
+@pytest.mark.unit
+class TestIncrementalExport:
+    """Test the rows an incremental export rewrites"""
+
+    def test_changed_inventory_row_refreshes_only_its_variation(self, exporter):
+        items = [catalog_item('ITEM1', ['VAR1', 'VAR2']), catalog_item('ITEM2', ['VAR3'])]
+
+        result, deleted, session = refresh(exporter, items, ['VAR1', 'VAR2', 'VAR3'], changed_variations=['VAR2'])
+
+        assert exporter.built == [(['ITEM1'], {'VAR2'})]
+        assert deleted == {'VAR2'}
+        assert (result['rows_updated'], result['rows_inserted'], result['rows_deleted']) == (1, 0, 0)
+        assert result['items_exported'] == 3
+        assert session.commits == 1
+
+    def test_changed_item_refreshes_all_its_variations(self, exporter):
+        items = [catalog_item('ITEM1', ['VAR1', 'VAR2']), catalog_item('ITEM2', ['VAR3'])]
+
+        result, deleted, _ = refresh(exporter, items, ['VAR1', 'VAR2', 'VAR3'], changed_items=['ITEM1'])
+
+        assert exporter.built == [(['ITEM1'], {'VAR1', 'VAR2'})]
+        assert deleted == {'VAR1', 'VAR2'}
+        assert result['rows_updated'] == 2
+
+    def test_item_updated_in_square_refreshes_all_its_variations(self, exporter):
+        since = LAST_EXPORT - INCREMENTAL_EXPORT_OVERLAP + timedelta(minutes=1)
+        items = [catalog_item('ITEM1', ['VAR1', 'VAR2'], updated_at=since.isoformat() + 'Z'),
+                 catalog_item('ITEM2', ['VAR3'])]
+
+        result, deleted, _ = refresh(exporter, items, ['VAR1', 'VAR2', 'VAR3'])
+
+        assert deleted == {'VAR1', 'VAR2'}
+        assert result['rows_updated'] == 2
+
+    def test_new_variation_is_inserted(self, exporter):
+        items = [catalog_item('ITEM1', ['VAR1', 'VAR2'])]
+
+        result, deleted, session = refresh(exporter, items, ['VAR1'])
+
+        assert exporter.built == [(['ITEM1'], {'VAR2'})]
+        assert (result['rows_inserted'], result['rows_updated']) == (1, 0)
+        assert result['items_exported'] == 2
+        assert any(sql.startswith('INSERT INTO square_item_library_export') for sql, _ in session.statements)
+
+    def test_variation_removed_from_catalog_is_deleted(self, exporter):
+        items = [catalog_item('ITEM1', ['VAR1'])]
+
+        result, deleted, session = refresh(exporter, items, ['VAR1', 'VAR2'])
+
+        assert deleted == {'VAR2'}
+        assert (result['rows_deleted'], result['rows_updated'], result['rows_inserted']) == (1, 0, 0)
+        assert result['items_exported'] == 1
+        assert not any(sql.startswith('INSERT') for sql, _ in session.statements)
+
+    def test_nothing_changed_touches_no_rows(self, exporter):
+        items = [catalog_item('ITEM1', ['VAR1'])]
+
+        result, deleted, session = refresh(exporter, items, ['VAR1'])
+
+        assert result['rows_touched'] == 0
+        assert session.params_for('DELETE') == []
+
+
+@pytest.mark.unit
+class TestExportMode:
+    """Test when an incremental export request falls back to a full export"""
+
+    async def run_export(self, last_export, locations, exported_locations):
+        session = FakeSession([
+            ("FROM locations WHERE status = 'ACTIVE'", [(f'LOC{i}', name) for i, name in enumerate(locations)]),
+            ('SELECT MAX(export_date)', [(last_export,)]),
+        ])
+        with patch.dict(os.environ, {'SQUARE_ACCESS_TOKEN': 'test-token'}):
+            exporter = SquareCatalogExporter()
+        refresh = MagicMock(return_value={'mode': 'incremental', 'items_exported': 1, 'rows_touched': 1})
+
+        with patch.object(catalog_export, 'create_engine'), \
+             patch.object(catalog_export, 'sessionmaker', return_value=lambda: session), \
+             patch.object(catalog_export, 'exported_locations', exported_locations), \
+             patch.object(exporter, '_fetch_catalog_objects', AsyncMock(return_value=[catalog_item('ITEM1', ['VAR1'])])), \
+             patch.object(exporter, '_build_export_rows', return_value=[{'token': 'VAR1'}]), \
+             patch.object(exporter, '_load_shadow_table') as load_shadow_table, \
+             patch.object(exporter, '_swap_in_shadow_table'), \
+             patch.object(exporter, '_refresh_changed_rows', refresh):
+            result = await exporter.export_catalog_data(incremental=True)
+            now_exported = catalog_export.exported_locations
+
+        return result, refresh, load_shadow_table, now_exported
+
+    async def test_no_previous_export_runs_a_full_export(self):
+        result, refresh, load_shadow_table, now_exported = await self.run_export(None, ['Aubrey'], {'aubrey'})
+
+        assert result['success'] and result['mode'] == 'full'
+        refresh.assert_not_called()
+        load_shadow_table.assert_called_once()
+        assert now_exported == {'aubrey'}
+
+    async def test_unchanged_locations_run_an_incremental_export(self):
+        result, refresh, load_shadow_table, _ = await self.run_export(LAST_EXPORT, ['Aubrey', 'Justin'],
+                                                                      {'aubrey', 'justin'})
+
+        assert result['mode'] == 'incremental'
+        assert refresh.call_args.args[4] == LAST_EXPORT
+        load_shadow_table.assert_not_called()
+
+    async def test_changed_locations_force_a_full_export(self):
+        result, refresh, _, now_exported = await self.run_export(LAST_EXPORT, ['Aubrey', 'Justin'], {'aubrey'})
+
+        assert result['mode'] == 'full'
+        refresh.assert_not_called()
+        assert now_exported == {'aubrey', 'justin'}
@@ -0,0 +1,73 @@
+"""
+Square Catalog Service Tests
+Checks that the dashboard starts catalog exports as background jobs in the
+export service and polls them by job ID.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.square_catalog_service import SquareCatalogService
+
+
+@pytest.fixture
+async def export_service():
+    """Stand-in for the square_catalog_export service's job endpoints"""
+    requests = []
+
+    async def start_export(request):
+        requests.append(('export', request.query.get('mode')))
+        return web.json_response({'success': True, 'status': 'running', 'job_id': 'job-1',
+                                  'message': 'Full export started'}, status=202)
+
+    async def job_status(request):
+        requests.append(('status', request.match_info['job_id']))
+        if request.match_info['job_id'] != 'job-1':
+            return web.json_response({'success': False, 'message': 'Unknown export job'}, status=404)
+        return web.json_response({'success': True, 'job_id': 'job-1', 'status': 'running',
+                                  'phase': 'building', 'rows_processed': 200, 'rows_total': 1500})
+
+    app = web.Application()
+    app.router.add_post('/export', start_export)
+    app.router.add_get('/status/{job_id}', job_status)
+    server = TestServer(app)
+    await server.start_server()
+
+    service = SquareCatalogService()
+    service.export_service_urls = [str(server.make_url('')).rstrip('/')]
+    try:
+        yield service, requests
+    finally:
+        await server.close()
+
+
+@pytest.mark.unit
+class TestSquareCatalogService:
+    """Test starting and polling export jobs"""
+
+    async def test_export_returns_the_running_job(self, export_service):
+        service, requests = export_service
+
+        result = await service.export_catalog_to_database(session=None, incremental=True)
+
+        assert result['success'] and result['status'] == 'running'
+        assert result['job_id'] == 'job-1'
+        assert requests == [('export', 'incremental')]
+
+    async def test_job_status_reports_phase_and_rows(self, export_service):
+        service, requests = export_service
+
+        status = await service.check_export_status('job-1')
+        unknown = await service.check_export_status('job-2')
+
+        job = status['external_service_status']
+        assert (job['phase'], job['rows_processed'], job['rows_total']) == ('building', 200, 1500)
+        assert not unknown['success']
+        assert requests == [('status', 'job-1'), ('status', 'job-2')]
@@ -0,0 +1,190 @@
+"""
+Square Service Tests
+Validates that SquareService talks to Square without blocking the event loop.
+"""
+
+import asyncio
+import os
+import pytest
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import Config
+from app.services import square_service
+from app.services.square_service import SquareService, todays_sales_snapshot
+
+SQUARE_DELAY_SECONDS = 0.2
+
+
+async def start_fake_square(calls=None):
+    """Serve canned locations and orders, each answer delayed like a real round trip"""
+    calls = calls if calls is not None else {}
+
+    async def locations(request):
+        await asyncio.sleep(SQUARE_DELAY_SECONDS)
+        return web.json_response({'locations': [
+            {'id': 'LOC1', 'name': 'Aubrey', 'status': 'ACTIVE', 'address': {'postal_code': '76227-1234'}},
+            {'id': 'LOC2', 'name': 'Closed', 'status': 'INACTIVE'}
+        ]})
+
+    async def search_orders(request):
+        calls['search'] = calls.get('search', 0) + 1
+        await asyncio.sleep(SQUARE_DELAY_SECONDS)
+        return web.json_response({'orders': [
+            {'id': 'A', 'location_id': 'LOC1', 'total_money': {'amount': 1250}},
+            {'id': 'B', 'location_id': 'LOC1', 'total_money': {'amount': 0}}
+        ]})
+
+    app = web.Application()
+    app.router.add_get('/v2/locations', locations)
+    app.router.add_post('/v2/orders/search', search_orders)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+@pytest.fixture(autouse=True)
+def empty_snapshot():
+    todays_sales_snapshot.clear()
+    square_service._todays_orders_ledger = None
+    yield
+    todays_sales_snapshot.clear()
+    square_service._todays_orders_ledger = None
+
+
+@pytest.mark.unit
+class TestSquareService:
+    """Test SquareService against a local fake Square API"""
+
+    async def test_todays_orders_keep_return_shape(self):
+        server = await start_fake_square()
+        try:
+            with patch.object(Config, 'SQUARE_ACCESS_TOKEN', 'test-token'), \
+                 patch.dict(os.environ, {'SQUARE_BASE_URL': str(server.make_url('')).rstrip('/')}):
+                data = await SquareService().fetch_todays_orders()
+
+            assert data['total_sales'] == 12.5
+            assert data['total_orders'] == 1
+            assert [order['id'] for order in data['orders']] == ['A']
+            assert data['locations']['LOC1'] == {
+                'name': 'Aubrey', 'sales': 12.5, 'orders': 1, 'postal_code': '76227'
+            }
+        finally:
+            await server.close()
+
+    async def test_concurrent_requests_do_not_serialize(self):
+        server = await start_fake_square()
+        try:
+            with patch.object(Config, 'SQUARE_ACCESS_TOKEN', 'test-token'), \
+                 patch.dict(os.environ, {'SQUARE_BASE_URL': str(server.make_url('')).rstrip('/')}):
+                start = time.monotonic()
+                results = await asyncio.gather(*(SquareService().get_todays_sales() for _ in range(4)))
+                elapsed = time.monotonic() - start
+
+            assert all(result['total_orders'] == 1 for result in results)
+            # Serialized calls would take 4 x 2 round trips
+            assert elapsed < SQUARE_DELAY_SECONDS * 2 * 4 * 0.6
+        finally:
+            await server.close()
+
+
+@pytest.mark.unit
+class TestTodaysSalesSnapshot:
+    """Test the shared, TTL-cached today's sales snapshot"""
+
+    async def test_concurrent_callers_share_one_fetch(self):
+        calls = {}
+        server = await start_fake_square(calls)
+        try:
+            with patch.object(Config, 'SQUARE_ACCESS_TOKEN', 'test-token'), \
+                 patch.object(Config, 'TODAYS_SALES_CACHE_TTL_SECONDS', 60), \
+                 patch.dict(os.environ, {'SQUARE_BASE_URL': str(server.make_url('')).rstrip('/')}):
+                results = await asyncio.gather(*(SquareService().get_todays_sales() for _ in range(5)))
+                cached = await SquareService().get_todays_sales()
+
+            assert calls['search'] == 1
+            assert all(result is results[0] for result in results)
+            assert cached is results[0]
+            assert cached['last_refreshed'] == todays_sales_snapshot.refreshed_at.isoformat()
+        finally:
+            await server.close()
+
+    async def test_expired_or_forced_snapshot_is_refetched(self):
+        calls = {}
+        server = await start_fake_square(calls)
+        try:
+            with patch.object(Config, 'SQUARE_ACCESS_TOKEN', 'test-token'), \
+                 patch.dict(os.environ, {'SQUARE_BASE_URL': str(server.make_url('')).rstrip('/')}):
+                with patch.object(Config, 'TODAYS_SALES_CACHE_TTL_SECONDS', 0):
+                    await SquareService().get_todays_sales()
+                    await SquareService().get_todays_sales()
+                with patch.object(Config, 'TODAYS_SALES_CACHE_TTL_SECONDS', 60):
+                    await SquareService().get_todays_sales(force_refresh=True)
+
+            assert calls['search'] == 3
+        finally:
+            await server.close()
+
+
+@pytest.mark.unit
+class TestIncrementalTodaysOrders:
+    """Test merging updated_at deltas into the running per-location totals"""
+
+    async def test_delta_poll_merges_by_id_and_version(self):
+        today = datetime.now(timezone.utc).isoformat()
+        pages = [
+            [
+                {'id': 'A', 'version': 1, 'state': 'COMPLETED', 'location_id': 'LOC1', 'total_money': {'amount': 1000}},
+                {'id': 'B', 'version': 1, 'state': 'COMPLETED', 'location_id': 'LOC1', 'total_money': {'amount': 500}}
+            ],
+            [
+                # A was updated, B was re-read unchanged, C is new and D was canceled
+                {'id': 'A', 'version': 2, 'state': 'COMPLETED', 'location_id': 'LOC1', 'total_money': {'amount': 1500}},
+                {'id': 'B', 'version': 1, 'state': 'COMPLETED', 'location_id': 'LOC1', 'total_money': {'amount': 500}},
+                {'id': 'C', 'version': 1, 'state': 'COMPLETED', 'location_id': 'LOC1', 'total_money': {'amount': 250}},
+                {'id': 'D', 'version': 3, 'state': 'CANCELED', 'location_id': 'LOC1', 'total_money': {'amount': 9900}}
+            ]
+        ]
+        for page in pages:
+            for order in page:
+                order['created_at'] = today
+        bodies = []
+
+        async def locations(request):
+            return web.json_response({'locations': [{'id': 'LOC1', 'name': 'Aubrey', 'status': 'ACTIVE'}]})
+
+        async def search_orders(request):
+            bodies.append(await request.json())
+            return web.json_response({'orders': pages[len(bodies) - 1]})
+
+        app = web.Application()
+        app.router.add_get('/v2/locations', locations)
+        app.router.add_post('/v2/orders/search', search_orders)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            with patch.object(Config, 'SQUARE_ACCESS_TOKEN', 'test-token'), \
+                 patch.object(Config, 'TODAYS_SALES_INCREMENTAL', True), \
+                 patch.dict(os.environ, {'SQUARE_BASE_URL': str(server.make_url('')).rstrip('/')}):
+                first = await SquareService().fetch_todays_orders()
+                second = await SquareService().fetch_todays_orders()
+
+            assert first['total_sales'] == 15.0
+            assert 'created_at' in bodies[0]['query']['filter']['date_time_filter']
+            assert 'updated_at' in bodies[1]['query']['filter']['date_time_filter']
+            assert bodies[1]['query']['sort']['sort_field'] == 'UPDATED_AT'
+            assert second['total_sales'] == 22.5
+            assert second['total_orders'] == 3
+            assert second['locations']['LOC1']['sales'] == 22.5
+            assert second['locations']['LOC1']['orders'] == 3
+        finally:
+            await server.close()
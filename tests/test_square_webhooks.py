@@ -0,0 +1,316 @@
+"""
+Square Webhook Tests
+Posts recorded Square event payloads to the webhook receiver and checks they are
+verified, de-duplicated, queued and applied in batches.
+"""
+
+import asyncio
+import base64
+import copy
+import hashlib
+import hmac
+import json
+import os
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import httpx
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import FastAPI
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import Config
+from app.routes.webhooks import router as webhooks_router
+from app.services import webhook_service
+from app.services.sync_engine import SyncEngine
+from app.services.webhook_service import SquareWebhookService, WebhookEvent
+
+SIGNATURE_KEY = 'test-signature-key'
+NOTIFICATION_URL = 'https://dashboard.example.com/webhooks/square'
+
+# Recorded from the Square webhook event reference (IDs shortened)
+ORDER_CREATED_EVENT = {
+    "merchant_id": "MERCHANT1",
+    "type": "order.created",
+    "event_id": "evt-order-created-1",
+    "created_at": "2024-07-04T15:00:01.000Z",
+    "data": {
+        "type": "order_created",
+        "id": "ORDER1",
+        "object": {
+            "order_created": {
+                "created_at": "2024-07-04T15:00:00.000Z",
+                "location_id": "LOC1",
+                "order_id": "ORDER1",
+                "state": "OPEN",
+                "version": 1
+            }
+        }
+    }
+}
+
+ORDER_UPDATED_EVENT = {
+    "merchant_id": "MERCHANT1",
+    "type": "order.updated",
+    "event_id": "evt-order-updated-1",
+    "created_at": "2024-07-04T15:02:00.000Z",
+    "data": {
+        "type": "order_updated",
+        "id": "ORDER1",
+        "object": {
+            "order_updated": {
+                "created_at": "2024-07-04T15:00:00.000Z",
+                "location_id": "LOC1",
+                "order_id": "ORDER1",
+                "state": "COMPLETED",
+                "updated_at": "2024-07-04T15:01:59.000Z",
+                "version": 3
+            }
+        }
+    }
+}
+
+INVENTORY_COUNT_UPDATED_EVENT = {
+    "merchant_id": "MERCHANT1",
+    "type": "inventory.count.updated",
+    "event_id": "evt-inventory-1",
+    "created_at": "2024-07-04T15:02:05.000Z",
+    "data": {
+        "type": "inventory_counts",
+        "id": "evt-inventory-1-counts",
+        "object": {
+            "inventory_counts": [
+                {
+                    "calculated_at": "2024-07-04T15:02:04.000Z",
+                    "catalog_object_id": "VAR1",
+                    "catalog_object_type": "ITEM_VARIATION",
+                    "location_id": "LOC1",
+                    "quantity": "11",
+                    "state": "IN_STOCK"
+                },
+                {
+                    "calculated_at": "2024-07-04T15:02:04.000Z",
+                    "catalog_object_id": "VAR1",
+                    "catalog_object_type": "ITEM_VARIATION",
+                    "location_id": "LOC1",
+                    "quantity": "1",
+                    "state": "SOLD"
+                }
+            ]
+        }
+    }
+}
+
+
+class InMemoryWebhookService(SquareWebhookService):
+    """SquareWebhookService with the queue and target tables kept in memory"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.events = {}
+        self.stored_versions = {}
+        self.inventory = {}
+        self.claimed_batches = []
+
+    async def _ensure_queue_table(self):
+        pass
+
+    async def _insert_event(self, event):
+        if event['event_id'] in self.events:
+            return False
+        self.events[event['event_id']] = {
+            'id': len(self.events) + 1, 'type': event['type'], 'payload': copy.deepcopy(event),
+            'status': 'pending', 'attempts': 0, 'error': None
+        }
+        return True
+
+    async def _claim_batch(self, limit, exclude_ids):
+        claimable = [
+            (event_id, row) for event_id, row in self.events.items()
+            if (row['status'] == 'pending' or (row['status'] == 'failed' and row['attempts'] < self.max_attempts))
+            and row['id'] not in exclude_ids
+        ][:limit]
+        for _, row in claimable:
+            row['status'] = 'processing'
+            row['attempts'] += 1
+        self.claimed_batches.append([event_id for event_id, _ in claimable])
+        return [WebhookEvent(row['id'], event_id, row['type'], row['payload'], row['attempts'])
+                for event_id, row in claimable]
+
+    async def _mark_events(self, ids, status, error=None):
+        for row in self.events.values():
+            if row['id'] in ids:
+                row['status'] = status
+                row['error'] = error
+
+    async def _load_order_versions(self, order_ids):
+        return {order_id: self.stored_versions[order_id] for order_id in order_ids if order_id in self.stored_versions}
+
+    async def _write_inventory_counts(self, rows):
+        for row in rows:
+            self.inventory[(row['variation_id'], row['location_id'])] = row['quantity']
+        return len(rows)
+
+
+class RecordedWebhookSender:
+    """Plays recorded events against the receiver the way Square delivers them"""
+
+    def __init__(self, app, signature_key=SIGNATURE_KEY):
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://testserver')
+        self.signature_key = signature_key
+
+    def sign(self, body: bytes) -> str:
+        digest = hmac.new(self.signature_key.encode(), NOTIFICATION_URL.encode() + body, hashlib.sha256).digest()
+        return base64.b64encode(digest).decode()
+
+    async def send(self, event, signature=None):
+        body = json.dumps(event).encode()
+        return await self.client.post('/webhooks/square', content=body, headers={
+            'content-type': 'application/json',
+            'x-square-hmacsha256-signature': signature or self.sign(body)
+        })
+
+    async def close(self):
+        await self.client.aclose()
+
+
+@pytest.fixture
+async def fake_square():
+    """BatchRetrieveOrders returning a completed version of every requested order"""
+    requests = []
+
+    async def batch_retrieve(request):
+        body = await request.json()
+        requests.append(body['order_ids'])
+        return web.json_response({'orders': [
+            {'id': order_id, 'version': 3, 'state': 'COMPLETED', 'location_id': 'LOC1'}
+            for order_id in body['order_ids']
+        ]})
+
+    app = web.Application()
+    app.router.add_post('/v2/orders/batch-retrieve', batch_retrieve)
+    server = TestServer(app)
+    await server.start_server()
+    server.requests = requests
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+def service(fake_square):
+    written = []
+
+    async def write_orders(orders, result):
+        written.extend(orders)
+        result.records_added += len(orders)
+        return 0, 0
+
+    with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}):
+        engine = SyncEngine(database_url="postgresql://test@localhost/test")
+    engine.square_base_url = str(fake_square.make_url('')).rstrip('/')
+    engine.write_orders = write_orders
+
+    service = InMemoryWebhookService(sync_engine=engine, batch_size=2)
+    service.written = written
+    with patch.object(webhook_service, '_webhook_service', service), \
+         patch.object(Config, 'SQUARE_WEBHOOK_SIGNATURE_KEY', SIGNATURE_KEY), \
+         patch.object(Config, 'SQUARE_WEBHOOK_NOTIFICATION_URL', NOTIFICATION_URL):
+        yield service
+
+
+@pytest.fixture
+async def sender():
+    app = FastAPI()
+    app.include_router(webhooks_router, prefix="/webhooks")
+    sender = RecordedWebhookSender(app)
+    yield sender
+    await sender.close()
+
+
+@pytest.mark.unit
+class TestSquareWebhooks:
+    """Test the signed webhook receiver and its durable queue"""
+
+    async def test_invalid_signature_is_rejected(self, service, sender):
+        response = await sender.send(ORDER_CREATED_EVENT, signature='bm90LWEtc2lnbmF0dXJl')
+
+        assert response.status_code == 403
+        assert service.events == {}
+
+    async def test_redelivered_event_is_queued_once(self, service, sender):
+        with patch.object(service, 'schedule_processing'):
+            first = await sender.send(ORDER_CREATED_EVENT)
+            second = await sender.send(ORDER_CREATED_EVENT)
+
+        assert first.status_code == 200 and first.json()['queued'] is True
+        assert second.status_code == 200 and second.json()['queued'] is False
+        assert list(service.events) == ['evt-order-created-1']
+
+    async def test_events_are_applied_in_batches(self, service, sender, fake_square):
+        with patch.object(service, 'schedule_processing'):
+            for event in (ORDER_CREATED_EVENT, ORDER_UPDATED_EVENT, INVENTORY_COUNT_UPDATED_EVENT):
+                assert (await sender.send(event)).status_code == 200
+
+        result = await service.process_pending()
+
+        assert result.events_applied == 3
+        assert service.claimed_batches[:2] == [['evt-order-created-1', 'evt-order-updated-1'], ['evt-inventory-1']]
+        # Both order events collapse into one retrieval of the order
+        assert fake_square.requests == [['ORDER1']]
+        assert [order['id'] for order in service.written] == ['ORDER1']
+        # Only the IN_STOCK count is stored
+        assert service.inventory == {('VAR1', 'LOC1'): 11}
+        assert all(row['status'] == 'applied' for row in service.events.values())
+
+    async def test_orders_already_stored_at_that_version_are_not_refetched(self, service, fake_square):
+        service.stored_versions['ORDER1'] = 3
+        await service.enqueue(ORDER_UPDATED_EVENT)
+
+        result = await service.process_pending()
+
+        assert result.events_applied == 1
+        assert fake_square.requests == []
+
+    async def test_failed_batch_is_retried(self, service):
+        await service.enqueue(ORDER_UPDATED_EVENT)
+
+        with patch.object(service, '_apply_orders', side_effect=Exception('database unavailable')):
+            failed = await service.process_pending()
+        assert failed.events_failed == 1
+        assert service.events['evt-order-updated-1']['status'] == 'failed'
+
+        retried = await service.process_pending()
+        assert retried.events_applied == 1
+        assert service.events['evt-order-updated-1']['attempts'] == 2
+
+    async def test_failed_batch_is_retried_one_event_at_a_time(self, service):
+        await service.enqueue(ORDER_UPDATED_EVENT)
+        await service.enqueue(INVENTORY_COUNT_UPDATED_EVENT)
+
+        with patch.object(service, '_apply_orders', side_effect=Exception('order not found')):
+            result = await service.process_pending()
+
+        assert service.claimed_batches[0] == ['evt-order-updated-1', 'evt-inventory-1']
+        assert result.events_applied == 1 and result.events_failed == 1
+        assert result.errors == ['order not found']
+        assert service.events['evt-order-updated-1']['status'] == 'failed'
+        assert service.events['evt-inventory-1']['status'] == 'applied'
+        assert service.inventory == {('VAR1', 'LOC1'): 11}
+
+    async def test_periodic_drain_processes_the_queue_until_shutdown(self, service):
+        service.drain_interval_seconds = 0.01
+
+        with patch.object(service, 'process_pending', new_callable=AsyncMock) as process_pending:
+            service.start_periodic_drain()
+            await asyncio.sleep(0.05)
+            await service.shutdown()
+            calls = process_pending.await_count
+            await asyncio.sleep(0.03)
+
+        assert calls >= 1
+        assert process_pending.await_count == calls
@@ -0,0 +1,153 @@
+"""
+Sync Benchmark Tests
+Checks the fake Square server's synthetic data and fault injection, and runs
+the sync throughput benchmark against it at a small size.
+"""
+
+import aiohttp
+import pytest
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import square_api_client
+from app.services.square_api_client import TokenBucket
+from scripts.benchmark_sync import BenchmarkResult, compare_to_baseline, run_benchmarks
+from tests.fake_square_server import FakeSquareServer, SyntheticSquareData, is_fireworks_season
+
+HEADERS = {'Authorization': 'Bearer test-token'}
+
+
+def search_body(data, **kwargs):
+    body = {'location_ids': data.active_location_ids, 'limit': 100}
+    body.update(kwargs)
+    return body
+
+
+@pytest.mark.unit
+class TestSyntheticSquareData:
+    """Test the generated orders, catalog and inventory"""
+
+    def test_same_seed_gives_same_data(self):
+        first = SyntheticSquareData(orders=500, items=50, seed=3)
+        second = SyntheticSquareData(orders=500, items=50, seed=3)
+        other = SyntheticSquareData(orders=500, items=50, seed=4)
+
+        assert first.order(123) == second.order(123)
+        assert first.order(123) != other.order(123)
+        assert first.search_catalog({'object_types': ['ITEM']}) == second.search_catalog({'object_types': ['ITEM']})
+
+    def test_orders_cluster_in_fireworks_seasons(self):
+        data = SyntheticSquareData(orders=5000)
+        in_season = sum(1 for index in range(5000) if is_fireworks_season(data.order_created_at(index).date()))
+
+        # Roughly 45 of the 730 days are in season
+        assert in_season > 5000 * 0.6
+
+    def test_date_filtered_pages_return_every_order_once(self):
+        data = SyntheticSquareData(orders=2000)
+        start, end = datetime(2023, 6, 1, tzinfo=timezone.utc), datetime(2023, 8, 1, tzinfo=timezone.utc)
+        query = {'filter': {'date_time_filter': {'created_at': {'start_at': start.isoformat(), 'end_at': end.isoformat()}}}}
+
+        seen, cursor = [], None
+        while True:
+            page = data.search_orders(search_body(data, query=query, cursor=cursor))
+            seen.extend(order['id'] for order in page['orders'])
+            cursor = page.get('cursor')
+            if not cursor:
+                break
+
+        expected = [data.order_id(index) for index in range(2000)
+                    if start <= data.order_created_at(index) < end]
+        assert seen == expected and len(seen) > 100
+
+    def test_catalog_begin_time_and_deleted_objects(self):
+        data = SyntheticSquareData(orders=10, items=200)
+        everything = data.search_catalog({'object_types': ['ITEM'], 'limit': 1000, 'include_deleted_objects': True})
+        live = data.search_catalog({'object_types': ['ITEM'], 'limit': 1000})
+        recent = data.search_catalog({'object_types': ['ITEM'], 'limit': 1000, 'include_deleted_objects': True,
+                                      'begin_time': '2024-06-01T00:00:00Z'})
+
+        assert len(everything['objects']) == 200
+        assert len(live['objects']) == 200 - sum(1 for obj in everything['objects'] if obj['is_deleted'])
+        assert 0 < len(recent['objects']) < 200
+        assert all(obj['updated_at'] >= '2024-06-01' for obj in recent['objects'])
+
+
+@pytest.mark.unit
+class TestFakeSquareServer:
+    """Test the HTTP side: limits, auth and injected faults"""
+
+    async def test_batch_retrieve_enforces_square_limit(self):
+        data = SyntheticSquareData(orders=300)
+        async with FakeSquareServer(data) as base_url:
+            async with aiohttp.ClientSession(headers=HEADERS) as session:
+                ok = await session.post(f"{base_url}/v2/orders/batch-retrieve",
+                                        json={'order_ids': [data.order_id(i) for i in range(100)]})
+                too_many = await session.post(f"{base_url}/v2/orders/batch-retrieve",
+                                              json={'order_ids': [data.order_id(i) for i in range(101)]})
+                unauthorized = await session.get(f"{base_url}/v2/locations", headers={'Authorization': ''})
+
+                assert len((await ok.json())['orders']) == 100
+                assert too_many.status == 400
+                assert unauthorized.status == 401
+
+    async def test_injected_rate_limits_carry_retry_after(self):
+        server = FakeSquareServer(SyntheticSquareData(orders=10), rate_limit_ratio=1.0, retry_after_seconds=2)
+        async with server as base_url:
+            async with aiohttp.ClientSession(headers=HEADERS) as session:
+                response = await session.get(f"{base_url}/v2/locations")
+
+                assert response.status == 429
+                assert response.headers['Retry-After'] == '2'
+                assert (await (await session.get(f"{base_url}/_fake/stats")).json())['rate_limited'] == 1
+
+
+@pytest.mark.performance
+class TestSyncBenchmark:
+    """Run the benchmark workloads against the fake server, API-only"""
+
+    @pytest.fixture(autouse=True)
+    def fast_rate_limit(self):
+        # Production's 10 requests/s would make this a slow test
+        with patch.object(square_api_client, '_rate_limiter', TokenBucket(1000, 1000)), \
+             patch.dict('os.environ', {'SQUARE_ACCESS_TOKEN': 'test-token'}):
+            yield
+
+    async def test_every_workload_syncs_all_records(self):
+        data = SyntheticSquareData(orders=1500, items=100)
+        async with FakeSquareServer(data) as base_url:
+            results = {result.name: result for result in await run_benchmarks(base_url, data)}
+
+        open_or_completed = sum(1 for index in range(1500) if data.order_summary(index)[1] != 'CANCELED')
+        assert results['sync_engine_orders'].records == open_or_completed
+        assert results['historical_backfill'].records == 1500
+        assert results['incremental_sync'].records > 0
+        for result in results.values():
+            assert not result.errors
+            assert result.requests > 0 and result.peak_memory_mb > 0 and result.records_per_second > 0
+
+    async def test_rate_limited_server_still_delivers_everything(self):
+        data = SyntheticSquareData(orders=800, items=50)
+        server = FakeSquareServer(data, rate_limit_ratio=0.2, latency_ms=1)
+        async with server as base_url:
+            [result] = await run_benchmarks(base_url, data, ['historical_backfill'])
+
+        assert result.records == 800
+        assert result.rate_limited > 0 and not result.errors
+
+    def test_regressions_are_measured_against_the_baseline(self):
+        baseline = {'sync_engine_orders': {'records_per_second': 1000.0},
+                    'historical_backfill': {'records_per_second': 1000.0}}
+        results = [BenchmarkResult('sync_engine_orders', records=700, seconds=1.0),
+                   BenchmarkResult('historical_backfill', records=900, seconds=1.0),
+                   BenchmarkResult('incremental_sync', records=10, seconds=1.0)]
+
+        regressions = compare_to_baseline(results, baseline, max_regression=0.2)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith('sync_engine_orders')
@@ -0,0 +1,320 @@
+"""
+Sync Engine Unit Tests
+Validates SyncEngine behaviour that does not need Square or a database.
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.sync_engine import SyncEngine, ORDERS_BATCH_RETRIEVE_SIZE, ORDERS_TABLE, content_hash
+from tests.fake_database import FakeResult, FakeTransaction
+
+
+class FakeResponse:
+    """Minimal stand-in for an aiohttp response context manager"""
+
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def json(self):
+        return self.payload
+
+    async def text(self):
+        return str(self.payload)
+
+
+class FakeOrdersSession:
+    """Answers BatchRetrieveOrders calls by echoing back the requested IDs"""
+
+    def __init__(self):
+        self.calls = []
+
+    def post(self, url, json=None):
+        self.calls.append((url, json))
+        return FakeResponse({'orders': [{'id': order_id} for order_id in json['order_ids']]})
+
+
+class FakeUpsertConnection:
+    """
+    Records upsert statements; rows whose id is in `existing` report as updates
+    and rows whose id is in `unchanged` return nothing, as the hash check skips them
+    """
+
+    def __init__(self, existing=(), failing=(), unchanged=()):
+        self.existing = set(existing)
+        self.failing = set(failing)
+        self.unchanged = set(unchanged)
+        self.statements = []
+
+    def begin_nested(self):
+        return FakeTransaction()
+
+    async def execute(self, statement):
+        params = statement.compile(dialect=postgresql.dialect()).params
+        ids = [value for key, value in params.items() if key.startswith('id_m') or key == 'id']
+        self.statements.append(ids)
+        if self.failing & set(ids):
+            raise ValueError("bad row")
+        flags = [order_id not in self.existing for order_id in ids if order_id not in self.unchanged]
+        return FakeResult(rows=flags)
+
+
+@pytest.fixture
+def sync_engine():
+    with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}):
+        yield SyncEngine(database_url="postgresql://test@localhost/test")
+
+
+@pytest.mark.unit
+class TestBatchOrderRetrieval:
+    """Test batched order retrieval in SyncEngine.sync_orders"""
+
+    async def test_batches_are_capped_at_square_limit(self, sync_engine):
+        session = FakeOrdersSession()
+        order_ids = [f"order-{i}" for i in range(250)]
+
+        orders, api_calls = await sync_engine._batch_retrieve_orders(session, order_ids)
+
+        assert api_calls == 3
+        assert all(len(body['order_ids']) <= ORDERS_BATCH_RETRIEVE_SIZE for _, body in session.calls)
+        assert all(url.endswith('/v2/orders/batch-retrieve') for url, _ in session.calls)
+        assert [order['id'] for order in orders] == order_ids
+
+    async def test_empty_page_makes_no_calls(self, sync_engine):
+        session = FakeOrdersSession()
+
+        orders, api_calls = await sync_engine._batch_retrieve_orders(session, [])
+
+        assert orders == []
+        assert api_calls == 0
+        assert session.calls == []
+
+
+@pytest.mark.unit
+class TestBulkOrderUpserts:
+    """Test the set-based order writes in SyncEngine._write_order_rows and _bulk_upsert"""
+
+    def test_rows_are_parsed_once_and_deduplicated(self, sync_engine):
+        orders = [
+            {'id': 'A', 'version': 1, 'line_items': [{'uid': 'L1'}], 'tenders': [{'id': 'T1'}]},
+            {'id': 'A', 'version': 2, 'line_items': [{'uid': 'L1'}, {'uid': 'L2'}], 'tenders': [{'id': 'T1'}]},
+            {'id': 'mknasZtDiUul9el73zNLANleV', 'line_items': [{'uid': 'L3'}]}
+        ]
+
+        order_rows, line_item_rows, tender_rows, skipped = sync_engine._build_order_rows(orders)
+
+        assert [row['version'] for row in order_rows] == [2]
+        assert sorted(row['uid'] for row in line_item_rows) == ['L1', 'L2']
+        assert [row['id'] for row in tender_rows] == ['T1']
+        assert skipped == 1
+
+    async def test_chunks_report_inserted_and_updated(self, sync_engine):
+        sync_engine.upsert_chunk_size = 2
+        rows = [sync_engine._parse_order_data({'id': f'order-{i}'}) for i in range(5)]
+        conn = FakeUpsertConnection(existing={'order-1', 'order-4'})
+
+        inserted, updated, unchanged, skipped = await sync_engine._bulk_upsert(conn, ORDERS_TABLE, rows, ['id'], 'orders')
+
+        assert conn.statements == [['order-0', 'order-1'], ['order-2', 'order-3'], ['order-4']]
+        assert (inserted, updated, unchanged, skipped) == (3, 2, 0, 0)
+
+    async def test_failed_chunk_falls_back_to_single_rows(self, sync_engine):
+        rows = [sync_engine._parse_order_data({'id': f'order-{i}'}) for i in range(3)]
+        conn = FakeUpsertConnection(failing={'order-1'})
+
+        inserted, updated, unchanged, skipped = await sync_engine._bulk_upsert(conn, ORDERS_TABLE, rows, ['id'], 'orders')
+
+        assert len(conn.statements) == 4
+        assert (inserted, updated, unchanged, skipped) == (2, 0, 0, 1)
+
+    async def test_rows_with_matching_hash_count_as_unchanged(self, sync_engine):
+        rows = [sync_engine._parse_order_data({'id': f'order-{i}'}) for i in range(4)]
+        conn = FakeUpsertConnection(existing={'order-1', 'order-2'}, unchanged={'order-2', 'order-3'})
+
+        inserted, updated, unchanged, skipped = await sync_engine._bulk_upsert(conn, ORDERS_TABLE, rows, ['id'], 'orders')
+
+        assert (inserted, updated, unchanged, skipped) == (1, 1, 2, 0)
+
+    def test_upsert_is_one_multi_row_statement(self, sync_engine):
+        rows = [sync_engine._parse_order_data({'id': f'order-{i}'}) for i in range(3)]
+
+        sql = str(sync_engine._upsert_statement(ORDERS_TABLE, rows, ['id'], insert_only=['created_at'])
+                  .compile(dialect=postgresql.dialect()))
+
+        assert sql.count('INSERT INTO orders') == 1
+        assert 'ON CONFLICT (id) DO UPDATE' in sql
+        assert 'created_at = excluded.created_at' not in sql
+        assert 'RETURNING xmax = 0' in sql
+        assert 'WHERE orders.content_hash IS DISTINCT FROM excluded.content_hash' in sql
+
+    def test_content_hash_ignores_key_order_and_excluded_columns(self):
+        first = {'id': 'A', 'state': 'OPEN', 'updated_at': datetime(2024, 7, 4, 15, 0)}
+        second = {'updated_at': datetime(2024, 7, 5, 9, 0), 'state': 'OPEN', 'id': 'A'}
+
+        assert content_hash(first, exclude=['updated_at']) == content_hash(second, exclude=['updated_at'])
+        assert content_hash(first) != content_hash(second)
+        assert content_hash(dict(first, state='COMPLETED')) != content_hash(first)
+
+
+@pytest.mark.unit
+class TestDatabasePaths:
+    """Test that web-triggered syncs write through asyncpg"""
+
+    async def test_async_path_uses_asyncpg(self, sync_engine):
+        engine = sync_engine._get_async_engine()
+        try:
+            assert sync_engine.async_db is True
+            assert engine.url.drivername == 'postgresql+asyncpg'
+        finally:
+            await sync_engine.close()
+
+    def test_cli_path_keeps_blocking_engine(self):
+        with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}):
+            engine = SyncEngine(database_url="postgresql://test@localhost/test", async_db=False)
+
+        assert engine._get_engine().url.drivername == 'postgresql'
+        # Blocking writes stall the loop, so types are synced one at a time
+        assert engine.max_concurrent_types == 1
+
+    async def test_close_disposes_engines_it_created(self, sync_engine):
+        async_engine = sync_engine._get_async_engine()
+        blocking_engine = sync_engine._get_engine()
+
+        with patch.object(type(async_engine), 'dispose', new_callable=AsyncMock) as dispose_async, \
+             patch.object(type(blocking_engine), 'dispose') as dispose_blocking:
+            await sync_engine.close()
+
+        dispose_async.assert_awaited_once()
+        dispose_blocking.assert_called_once()
+        assert sync_engine._async_engine is None and sync_engine._engine is None
+
+    async def test_close_leaves_the_shared_pool_open(self):
+        shared_engine = AsyncMock()
+        with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}), \
+             patch('app.database.get_engine', return_value=shared_engine):
+            engine = SyncEngine()
+            assert engine._get_async_engine() is shared_engine
+
+            await engine.close()
+
+        shared_engine.dispose.assert_not_awaited()
+
+    def test_order_timestamps_are_timezone_aware(self, sync_engine):
+        row = sync_engine._parse_order_data({'id': 'A', 'created_at': '2024-05-01T15:30:00Z'})
+
+        assert row['created_at'].utcoffset().total_seconds() == 0
+
+
+@pytest.mark.unit
+class TestOrderPipeline:
+    """Test the streaming fetch -> parse -> upsert pipeline"""
+
+    async def test_writes_overlap_fetches_with_bounded_queue(self, sync_engine):
+        sync_engine.pipeline_queue_size = 1
+        fetched = []
+        written = []
+        max_ahead = 0
+
+        async def pages():
+            nonlocal max_ahead
+            for page in range(5):
+                await asyncio.sleep(0.05)
+                fetched.append(page)
+                max_ahead = max(max_ahead, len(fetched) - len(written))
+                yield [{'id': f'order-{page}-{i}'} for i in range(3)], 2
+
+        async def write(order_rows, line_item_rows, tender_rows, skipped, result):
+            await asyncio.sleep(0.05)
+            written.append([row['id'] for row in order_rows])
+            result.records_added += len(order_rows)
+            return 0, 0
+
+        with patch.object(sync_engine, '_write_order_rows', side_effect=write):
+            start = time.monotonic()
+            result = await sync_engine._sync_order_pages(pages())
+            elapsed = time.monotonic() - start
+
+        assert result.success
+        assert result.records_processed == 15
+        assert result.records_added == 15
+        assert result.api_calls_saved == 10
+        assert len(written) == 5
+        # Sequential fetch-then-write would take 10 x 0.05s
+        assert elapsed < 0.4
+        # One page being written, one queued and one just fetched
+        assert max_ahead <= 3
+
+    async def test_fetch_error_still_writes_fetched_pages(self, sync_engine):
+        written = []
+
+        async def pages():
+            yield [{'id': 'order-1'}], 0
+            raise RuntimeError("API error 500: boom")
+
+        async def write(order_rows, line_item_rows, tender_rows, skipped, result):
+            written.extend(row['id'] for row in order_rows)
+            return 0, 0
+
+        with patch.object(sync_engine, '_write_order_rows', side_effect=write):
+            result = await sync_engine._sync_order_pages(pages())
+
+        assert not result.success
+        assert result.errors == ["API error 500: boom"]
+        assert written == ['order-1']
+
+    async def test_write_failure_fails_the_sync_and_stops_fetching(self, sync_engine):
+        written = []
+
+        async def pages():
+            for page in range(3):
+                yield [{'id': f'order-{page}'}], 0
+
+        async def write(order_rows, line_item_rows, tender_rows, skipped, result):
+            if order_rows[0]['id'] == 'order-1':
+                raise RuntimeError("deadlock detected")
+            written.append(order_rows[0]['id'])
+            return 0, 0
+
+        class MaxCreatedAt:
+            async def execute(self, statement):
+                return self
+
+            def scalar(self):
+                return datetime(2024, 7, 1)
+
+        @asynccontextmanager
+        async def connect():
+            yield MaxCreatedAt()
+
+        sync_engine.pipeline_queue_size = 1
+        update_timestamp = AsyncMock()
+        with patch.object(sync_engine, 'fetch_locations', AsyncMock(return_value=[{'id': 'LOC1'}])), \
+             patch.object(sync_engine, 'connect', connect), \
+             patch.object(sync_engine, '_fetch_order_pages', lambda *args: pages()), \
+             patch.object(sync_engine, '_write_order_rows', side_effect=write), \
+             patch.object(sync_engine, '_update_last_sync_timestamp', update_timestamp):
+            result = await sync_engine.sync_orders()
+
+        assert result.success is False
+        assert result.errors == ["deadlock detected"]
+        assert written == ['order-0']
+        update_timestamp.assert_not_called()
@@ -0,0 +1,164 @@
+"""
+Sync Lock Tests
+Checks that sync runs are single-flight per data type: callers in the same
+process share one run, and a type locked by another instance is reported as
+already running instead of being synced twice.
+"""
+
+import asyncio
+import os
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.sync_engine import SyncEngine, SyncResult
+from app.services.sync_lock import (
+    LOCK_WAIT_STATS, SyncAlreadyRunning, advisory_lock, lock_key, single_flight
+)
+from tests.fake_database import AdvisoryLockDatabase
+
+
+@pytest.fixture(autouse=True)
+def clear_stats():
+    LOCK_WAIT_STATS.clear()
+    yield
+    LOCK_WAIT_STATS.clear()
+
+
+@pytest.mark.unit
+class TestAdvisoryLock:
+    """Test advisory_lock and single_flight"""
+
+    def test_lock_keys_are_stable_and_share_aliases(self):
+        assert lock_key('inventory') == lock_key('catalog_inventory')
+        assert lock_key('inventory') != lock_key('locations')
+        assert -2 ** 63 <= lock_key('orders') < 2 ** 63
+
+    async def test_second_holder_gets_already_running(self):
+        database = AdvisoryLockDatabase()
+
+        async with advisory_lock('locations', database.connect):
+            with pytest.raises(SyncAlreadyRunning):
+                async with advisory_lock('locations', database.connect):
+                    pass
+            # Other data types are unaffected
+            async with advisory_lock('vendors', database.connect):
+                pass
+
+        async with advisory_lock('locations', database.connect):
+            pass
+        assert LOCK_WAIT_STATS['locations'].acquired == 2
+        assert LOCK_WAIT_STATS['locations'].already_running == 1
+
+    async def test_waiter_acquires_when_the_holder_finishes(self):
+        database = AdvisoryLockDatabase()
+        release = asyncio.Event()
+
+        async def holder():
+            async with advisory_lock('orders', database.connect):
+                await release.wait()
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().call_later(0.05, release.set)
+
+        async with advisory_lock('orders', database.connect, wait_seconds=1, poll_seconds=0.01) as waited:
+            assert waited >= 0.04
+        await task
+        assert LOCK_WAIT_STATS['orders'].max_wait_seconds >= 0.04
+
+    async def test_multi_type_lock_releases_everything_when_one_is_busy(self):
+        database = AdvisoryLockDatabase()
+
+        async with advisory_lock('catalog_items', database.connect):
+            with pytest.raises(SyncAlreadyRunning):
+                async with advisory_lock(['catalog_categories', 'catalog_items'], database.connect):
+                    pass
+            assert lock_key('catalog_categories') not in database.held
+
+    async def test_lock_is_held_outside_a_transaction_and_unlocked_on_exit(self):
+        database = AdvisoryLockDatabase()
+
+        async with advisory_lock(['orders', 'locations'], database.connect):
+            conn, = database.connections
+            assert conn.keys == {lock_key('orders'), lock_key('locations')}
+            assert not conn.in_transaction
+
+        assert database.held == set()
+        assert not conn.in_transaction and not conn.invalidated
+
+    async def test_connection_is_closed_when_unlock_fails(self):
+        database = AdvisoryLockDatabase()
+
+        with pytest.raises(RuntimeError):
+            async with advisory_lock('orders', database.connect):
+                database.connections[0].fail_unlock = True
+                raise RuntimeError("Square API error")
+
+        assert database.connections[0].invalidated
+        assert database.held == set()
+
+    async def test_same_process_callers_attach_to_one_run(self):
+        database = AdvisoryLockDatabase()
+        runs = []
+
+        async def run():
+            runs.append(1)
+            await asyncio.sleep(0.02)
+            return {'changes_applied': 3}
+
+        first, second = await asyncio.gather(
+            single_flight('locations', run, database.connect),
+            single_flight('locations', run, database.connect))
+
+        assert runs == [1]
+        assert first is second
+        assert LOCK_WAIT_STATS['locations'].attached == 1
+
+    async def test_failure_is_shared_with_attached_callers(self):
+        database = AdvisoryLockDatabase()
+
+        async def run():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("Square API error")
+
+        results = await asyncio.gather(
+            single_flight('locations', run, database.connect),
+            single_flight('locations', run, database.connect), return_exceptions=True)
+
+        assert [str(result) for result in results] == ["Square API error"] * 2
+
+
+@pytest.mark.unit
+class TestSyncEngineLocking:
+    """Test that SyncEngine takes the data type's lock for every run"""
+
+    @pytest.fixture
+    def engine(self):
+        with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}):
+            engine = SyncEngine(database_url="postgresql://test@localhost/test")
+        database = AdvisoryLockDatabase()
+        engine.connect = database.connect
+        return engine
+
+    async def test_type_locked_elsewhere_is_reported_already_running(self, engine):
+        with patch.object(engine, '_sync_data_type') as sync:
+            async with advisory_lock('locations', engine.connect):
+                result = await engine.sync_data_type('locations')
+
+        sync.assert_not_called()
+        assert result.success and result.already_running
+
+    async def test_unlocked_type_syncs_normally(self, engine):
+        async def sync_data_type(data_type):
+            return SyncResult(success=True, data_type=data_type, records_processed=4)
+
+        with patch.object(engine, '_sync_data_type', side_effect=sync_data_type):
+            result = await engine.sync_data_type('locations')
+
+        assert result.records_processed == 4
+        assert not result.already_running
@@ -0,0 +1,117 @@
+"""
+Sync Scheduler Tests
+Validates the dependency-graph runner used by SyncEngine.sync_all, the incremental
+sync and the sync orchestrator.
+"""
+
+import asyncio
+import os
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.sync_engine import SyncEngine, SyncResult
+from app.services.sync_scheduler import run_dependency_graph
+from tests.fake_database import AdvisoryLockDatabase
+
+
+def timed_tasks(durations, log):
+    """name -> coroutine function that records start/finish and sleeps for its duration"""
+    def make(name, seconds):
+        async def run():
+            log.append(('start', name))
+            await asyncio.sleep(seconds)
+            log.append(('finish', name))
+            return name.upper()
+        return run
+    return {name: make(name, seconds) for name, seconds in durations.items()}
+
+
+@pytest.mark.unit
+class TestDependencyGraph:
+    """Test run_dependency_graph"""
+
+    async def test_independent_types_run_concurrently(self):
+        log = []
+        tasks = timed_tasks({'locations': 0.1, 'catalog_categories': 0.1, 'vendors': 0.1}, log)
+
+        report = await run_dependency_graph(tasks, {}, max_concurrency=3)
+
+        assert report.results == {'locations': 'LOCATIONS', 'catalog_categories': 'CATALOG_CATEGORIES',
+                                  'vendors': 'VENDORS'}
+        assert [event for event, _ in log[:3]] == ['start', 'start', 'start']
+        assert report.wall_seconds < 0.25
+
+    async def test_dependent_starts_when_its_own_prerequisites_finish(self):
+        log = []
+        tasks = timed_tasks({'locations': 0.02, 'catalog_items': 0.2, 'inventory': 0.02}, log)
+
+        await run_dependency_graph(tasks, {'inventory': ['locations']}, max_concurrency=3)
+
+        # inventory does not wait for the slow, unrelated catalog_items
+        assert log.index(('start', 'inventory')) > log.index(('finish', 'locations'))
+        assert log.index(('finish', 'inventory')) < log.index(('finish', 'catalog_items'))
+
+    async def test_concurrency_limit_is_respected(self):
+        running = []
+        peak = []
+
+        def make(name):
+            async def run():
+                running.append(name)
+                peak.append(len(running))
+                await asyncio.sleep(0.02)
+                running.remove(name)
+            return run
+
+        await run_dependency_graph({f'type-{i}': make(f'type-{i}') for i in range(5)}, {}, max_concurrency=2)
+
+        assert max(peak) == 2
+
+    async def test_critical_path_follows_the_longest_chain(self):
+        tasks = timed_tasks({'catalog_items': 0.1, 'locations': 0.02, 'inventory': 0.05, 'vendors': 0.02}, [])
+
+        report = await run_dependency_graph(
+            tasks, {'inventory': ['catalog_items', 'locations', 'not-scheduled']}, max_concurrency=4)
+
+        assert report.critical_path == ['catalog_items', 'inventory']
+        assert report.critical_path_seconds == pytest.approx(0.15, abs=0.05)
+        assert 'catalog_items → inventory' in report.summary()
+
+    async def test_dependency_cycle_does_not_stall(self):
+        tasks = timed_tasks({'a': 0, 'b': 0}, [])
+
+        report = await run_dependency_graph(tasks, {'a': ['b'], 'b': ['a']})
+
+        assert set(report.results) == {'a', 'b'}
+
+
+@pytest.mark.unit
+class TestSyncAllScheduling:
+    """Test that SyncEngine.sync_all runs its data types through the scheduler"""
+
+    async def test_sync_all_overlaps_independent_types(self):
+        with patch.dict(os.environ, {"SQUARE_ACCESS_TOKEN": "test-token"}):
+            engine = SyncEngine(database_url="postgresql://test@localhost/test")
+        engine.connect = AdvisoryLockDatabase().connect
+        log = []
+
+        async def sync_data_type(data_type):
+            log.append(('start', data_type))
+            await asyncio.sleep(0.05)
+            log.append(('finish', data_type))
+            return SyncResult(success=True, data_type=data_type, records_processed=1)
+
+        with patch.object(engine, '_sync_data_type', side_effect=sync_data_type):
+            results = await engine.sync_all(['inventory', 'locations', 'catalog_items', 'orders'])
+
+        assert list(results) == ['locations', 'catalog_items', 'orders', 'inventory']
+        assert all(result.success for result in results.values())
+        # Three independent types start before any finishes; inventory waits for both its prerequisites
+        assert [event for event, _ in log[:3]] == ['start', 'start', 'start']
+        assert log.index(('start', 'inventory')) > max(log.index(('finish', 'locations')),
+                                                       log.index(('finish', 'catalog_items')))
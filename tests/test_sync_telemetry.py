@@ -0,0 +1,114 @@
+"""
+Sync Telemetry Tests
+Checks that each sync run collects its own stage timings and request counts,
+including those the Square client reports, and that finished runs are written
+to sync_runs.
+"""
+
+import asyncio
+import pytest
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add the app directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.square_api_client import SquareAPIClient, TokenBucket
+from app.services.sync_telemetry import (
+    current_sync_run, record_api_request, sync_stage, track_sync_run
+)
+from tests.fake_database import RecordingConnection
+
+
+@pytest.mark.unit
+class TestSyncTelemetry:
+    """Test per-run stage timings and saving to sync_runs"""
+
+    async def test_concurrent_runs_collect_their_own_numbers(self):
+        async def sync(data_type, pages):
+            async with track_sync_run(data_type, 'test') as stats:
+                for _ in range(pages):
+                    await asyncio.sleep(0)
+                    record_api_request(0.5, attempts=1, retries=0, rate_limited=0, ok=True)
+                return stats
+
+        locations, orders = await asyncio.gather(sync('locations', 1), sync('orders', 3))
+
+        assert (locations.pages, orders.pages) == (1, 3)
+        assert orders.api_seconds == 1.5
+        assert current_sync_run() is None
+
+    async def test_stages_outside_a_run_are_ignored(self):
+        with sync_stage('db'):
+            pass
+        record_api_request(1.0, attempts=1, retries=0, rate_limited=0, ok=True)
+
+        assert current_sync_run() is None
+
+    async def test_stage_time_and_retries_are_recorded(self):
+        async with track_sync_run('orders', 'test') as stats:
+            with sync_stage('db'):
+                await asyncio.sleep(0.02)
+            record_api_request(2.0, attempts=3, retries=2, rate_limited=1, ok=True)
+
+        assert stats.db_seconds >= 0.02
+        assert (stats.api_requests, stats.retries, stats.rate_limited, stats.pages) == (3, 2, 1, 1)
+        assert stats.success and stats.finished_at is not None
+
+    async def test_failed_run_is_saved_with_its_error(self):
+        conn = RecordingConnection()
+
+        @asynccontextmanager
+        async def connect():
+            yield conn
+
+        with pytest.raises(RuntimeError):
+            async with track_sync_run('inventory', 'test', connect) as stats:
+                stats.record_rows(inserted=2, updated=1, unchanged=5)
+                raise RuntimeError("Square API error")
+
+        sql, row = conn.statements[-1]
+        assert 'INSERT INTO sync_runs' in sql
+        assert row['success'] is False
+        assert row['error'] == "Square API error"
+        assert (row['rows_inserted'], row['rows_updated'], row['rows_unchanged']) == (2, 1, 5)
+
+    async def test_save_failure_does_not_fail_the_sync(self):
+        @asynccontextmanager
+        async def connect():
+            raise ConnectionError("database unavailable")
+            yield
+
+        async with track_sync_run('locations', 'test', connect) as stats:
+            pass
+
+        assert stats.success
+
+    async def test_square_client_reports_requests_to_the_run(self):
+        calls = {'count': 0}
+
+        async def handler(request):
+            calls['count'] += 1
+            if calls['count'] == 1:
+                return web.json_response({'errors': []}, status=429, headers={'Retry-After': '0'})
+            return web.json_response({'orders': []})
+
+        app = web.Application()
+        app.router.add_post('/v2/orders/search', handler)
+        server = TestServer(app)
+        await server.start_server()
+        client = SquareAPIClient('test-token', str(server.make_url('')), rate_limiter=TokenBucket(100, 10))
+        try:
+            async with track_sync_run('orders', 'test') as stats:
+                async with client.post('/v2/orders/search', json={}) as response:
+                    await response.json()
+        finally:
+            await client.close()
+            await server.close()
+
+        assert (stats.api_requests, stats.retries, stats.rate_limited, stats.pages) == (2, 1, 1, 1)
+        assert stats.api_seconds > 0